@@ -1,14 +1,79 @@
 """
 Backend d'authentification personnalisé pour JWT
-Utilise is_active de Django (vérifié automatiquement par SimpleJWT)
+Utilise is_active de Django (vérifié à chaque requête, comme SimpleJWT)
 """
+from django.db import router
+from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from apps.core.cache import is_shared
+from apps.core.services import AUTH_PRINCIPAL_CACHE
+
+# Champs de l'utilisateur portés par le principal (droits et site, sans requête)
+PRINCIPAL_FIELDS = ('id', 'is_active', 'is_superuser', 'is_staff', 'is_site_admin', 'site_configuration_id')
 
 
 class CustomJWTAuthentication(JWTAuthentication):
     """
     Authentification JWT personnalisée
-    SimpleJWT vérifie déjà is_active automatiquement, donc on hérite simplement
+    Avec Redis, le principal du jeton (identifiant, droits, site, version du jeton) est gardé
+    dans le cache partagé : un jeton d'utilisateur désactivé ou dont le mot de passe a changé
+    est refusé sans requête SQL, et un jeton valide l'est aussi. L'utilisateur est alors
+    construit depuis le principal, ses autres champs différés : la ligne n'est lue (une
+    requête) que si la vue en a besoin, et le site (site_configuration) à son premier accès,
+    le plan venant du contexte de site (apps.core.site_context). Sans Redis, pas de cache :
+    un cache local ne verrait pas les invalidations des autres instances ; l'utilisateur est
+    lu en base avec son site à chaque requête.
     """
-    pass
 
+    def load_user(self, user_id):
+        return self.user_model.objects.select_related('site_configuration').filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).first()
+
+    @staticmethod
+    def principal(user):
+        return {
+            **{field: getattr(user, field) for field in PRINCIPAL_FIELDS},
+            'token_version': get_md5_hash_password(user.password),
+        }
+
+    def principal_user(self, principal):
+        """Utilisateur construit depuis le principal, sans requête (autres champs différés)"""
+        # from_db attend les valeurs dans l'ordre des champs du modèle
+        fields = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in PRINCIPAL_FIELDS]
+        return self.user_model.from_db(
+            router.db_for_read(self.user_model), fields, [principal[field] for field in fields]
+        )
+
+    def check_principal(self, principal, validated_token):
+        if not principal['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != principal['token_version']
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        cached = AUTH_PRINCIPAL_CACHE.get(user_id) if is_shared() else None
+        # Principal d'un format antérieur : relu en base
+        if cached is not None and set(PRINCIPAL_FIELDS) <= set(cached):
+            self.check_principal(cached, validated_token)
+            return self.principal_user(cached)
+
+        user = self.load_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        principal = self.principal(user)
+        if is_shared():
+            AUTH_PRINCIPAL_CACHE.set(user_id, value=principal)
+        self.check_principal(principal, validated_token)
+        return user
@@ -1,10 +1,11 @@
 from rest_framework import serializers
-from apps.inventory.models import Product, Category, Brand, Transaction, Barcode, LabelTemplate, LabelBatch, LabelItem
+from apps.inventory.models import Product, Category, Brand, Transaction, TransactionArchive, Barcode, LabelTemplate, LabelBatch, LabelItem
 from apps.sales.models import Sale, SaleItem, Customer, CreditTransaction
 from apps.core.models import Configuration
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from decimal import Decimal
+import logging
 import os
 import re
 from bolibanastock.local_storage import get_current_local_site_storage
@@ -19,6 +20,7 @@ except ImportError:
     LoyaltyTransaction = None
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 def clean_image_path(image_name):
@@ -46,7 +48,7 @@ def clean_image_path(image_name):
         filename = match.group(3)  # Le nom du fichier
         cleaned_path = f'assets/products/{site_id}/{filename}'
         if cleaned_path != original_path:
-            print(f"🔧 [clean_image_path] Chemin dupliqué corrigé: {original_path} -> {cleaned_path}")
+            logger.debug("🔧 [clean_image_path] Chemin dupliqué corrigé: %s -> %s", original_path, cleaned_path)
         image_name = cleaned_path
     else:
         # Vérifier aussi les cas avec plusieurs occurrences de /assets/products/
@@ -62,7 +64,9 @@ def clean_image_path(image_name):
                     if len(site_and_file) == 2:
                         cleaned_path = f'assets/products/{site_and_file[0]}/{site_and_file[1]}'
                         if cleaned_path != original_path:
-                            print(f"🔧 [clean_image_path] Chemin dupliqué corrigé (split): {original_path} -> {cleaned_path}")
+                            logger.debug(
+                                "🔧 [clean_image_path] Chemin dupliqué corrigé (split): %s -> %s", original_path, cleaned_path
+                            )
                         image_name = cleaned_path
     
     return image_name
@@ -193,7 +197,7 @@ class ProductSerializer(serializers.ModelSerializer):
                         return f"{media_url.rstrip('/')}/{image_path}"
                     return f"https://web-production-e896b.up.railway.app{url}"
             except (ValueError, AttributeError) as e:
-                print(f"⚠️ Erreur dans get_image_url: {e}")
+                logger.warning("⚠️ [IMAGE_URL] Erreur dans get_image_url: %s", e)
                 try:
                     return image_field.url
                 except Exception:
@@ -383,13 +387,20 @@ class ProductListSerializer(serializers.ModelSerializer):
         - Sinon, utiliser l'image du produit courant
         """
         image_field = getattr(obj, 'image', None)
-        try:
-            from apps.inventory.models import ProductCopy
-            copy = ProductCopy.objects.select_related('original_product').filter(copied_product=obj).first()
-            if copy and getattr(copy.original_product, 'image', None):
-                image_field = copy.original_product.image
-        except Exception:
-            pass
+        # Listes : originaux des copies fournis par la vue (une requête pour la page)
+        copy_originals = self.context.get('copy_originals')
+        if copy_originals is not None:
+            original = copy_originals.get(obj.id)
+            if original is not None and getattr(original, 'image', None):
+                image_field = original.image
+        else:
+            try:
+                from apps.inventory.models import ProductCopy
+                copy = ProductCopy.objects.select_related('original_product').filter(copied_product=obj).first()
+                if copy and getattr(copy.original_product, 'image', None):
+                    image_field = copy.original_product.image
+            except Exception:
+                pass
 
         if image_field:
             try:
@@ -449,7 +460,7 @@ class ProductListSerializer(serializers.ModelSerializer):
                         return f"{media_url.rstrip('/')}/{image_path}"
                     return f"https://web-production-e896b.up.railway.app{url}"
             except (ValueError, AttributeError) as e:
-                print(f"⚠️ Erreur dans get_image_url: {e}")
+                logger.warning("⚠️ [IMAGE_URL] Erreur dans get_image_url: %s", e)
                 try:
                     return image_field.url
                 except Exception:
@@ -458,6 +469,9 @@ class ProductListSerializer(serializers.ModelSerializer):
     
     def get_primary_barcode(self, obj):
         """Retourne le code-barres principal du produit"""
+        if hasattr(obj, 'primary_ean'):
+            # Annoté en SQL par la vue (voir ProductViewSet._stock_alert_list)
+            return obj.primary_ean
         try:
             primary = obj.barcodes.filter(is_primary=True).first()
             return primary.ean if primary else None
@@ -516,17 +530,16 @@ class CategorySerializer(serializers.ModelSerializer):
     
     def validate(self, data):
         """Validation personnalisée pour les catégories"""
-        # Debug log au début
-        print(f"🔍 Category validation START - data: {data}, instance: {self.instance.id if self.instance else 'None'}")
-        
         # Pour les mises à jour partielles, récupérer les valeurs existantes si non fournies
         is_rayon = data.get('is_rayon', self.instance.is_rayon if self.instance else False)
         is_global = data.get('is_global', self.instance.is_global if self.instance else False)
         rayon_type = data.get('rayon_type', self.instance.rayon_type if self.instance else None)
         parent = data.get('parent', self.instance.parent if self.instance else None)
         
-        # Debug log
-        print(f"🔍 Category validation - is_rayon: {is_rayon}, is_global: {is_global}, parent: {parent}, instance: {self.instance.id if self.instance else 'None'}")
+        logger.debug(
+            "🔍 [CATEGORY_VALIDATION] is_rayon=%s, is_global=%s, parent=%s, instance=%s",
+            is_rayon, is_global, parent, self.instance.id if self.instance else None,
+        )
         
         # Si c'est un rayon principal, le type de rayon est obligatoire
         if is_rayon and not rayon_type:
@@ -544,7 +557,6 @@ class CategorySerializer(serializers.ModelSerializer):
         # Les catégories globales personnalisées (is_global=True, is_rayon=False) peuvent exister sans parent
         # Les rayons (is_rayon=True) ne peuvent pas avoir de parent
         if not is_rayon and not is_global and not parent:
-            print(f"❌ Validation failed - not is_rayon: {not is_rayon}, not is_global: {not is_global}, not parent: {not parent}")
             raise serializers.ValidationError({
                 'parent': 'Une sous-catégorie doit avoir une catégorie parente.'
             })
@@ -588,7 +600,7 @@ class BrandSerializer(serializers.ModelSerializer):
     
     def get_is_global(self, obj):
         """Retourne True si la marque est globale (site_configuration=None)"""
-        return obj.site_configuration is None
+        return obj.site_configuration_id is None
     
     def get_can_edit(self, obj):
         """Retourne True si l'utilisateur peut modifier cette marque"""
@@ -702,6 +714,20 @@ class TransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'transaction_date']
 
 
+class TransactionArchiveSerializer(serializers.ModelSerializer):
+    """Serializer pour les transactions archivées (lecture seule)"""
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    type_display = serializers.CharField(source='get_type_display', read_only=True)
+
+    class Meta:
+        model = TransactionArchive
+        fields = [
+            'id', 'type', 'type_display', 'reason', 'product', 'product_name', 'quantity',
+            'transaction_date', 'notes', 'unit_price', 'total_amount', 'user', 'sale', 'order',
+        ]
+        read_only_fields = fields
+
+
 class SaleItemSerializer(serializers.ModelSerializer):
     """Serializer pour les éléments de vente"""
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -793,7 +819,10 @@ class CustomerSerializer(serializers.ModelSerializer):
     
     def get_recent_credit_transactions(self, obj):
         """Retourne les 5 dernières transactions de crédit"""
-        transactions = obj.credit_transactions.all()[:5]
+        # Listes : préchargées par la vue (voir api.views.recent_credit_transactions)
+        transactions = getattr(obj, 'recent_credit_transactions', None)
+        if transactions is None:
+            transactions = obj.credit_transactions.select_related('sale', 'user')[:5]
         return CreditTransactionSerializer(transactions, many=True, context=self.context).data
 
 
@@ -0,0 +1,135 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import CustomJWTAuthentication
+from api.tests_cache import redis_caches
+from apps.core.models import Configuration
+from apps.core.services import AUTH_PRINCIPAL_CACHE
+from apps.subscription.models import Plan
+
+User = get_user_model()
+
+
+class JWTAuthenticationTestMixin:
+
+    def setUp(self):
+        cache.clear()
+        self.plan = Plan.objects.create(name='Plan JWT', slug='plan-jwt')
+        self.user = User.objects.create_user(username='caissier', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site JWT', site_owner=self.user, nom_societe='Test Company', adresse='Bamako',
+            telephone='123456789', email='test@example.com', subscription_plan=self.plan,
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        self.token = str(AccessToken.for_user(self.user))
+
+    def _authenticate(self):
+        request = APIRequestFactory().get('/api/v1/products/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        return CustomJWTAuthentication().authenticate(request)[0]
+
+
+class CachedJWTAuthenticationTest(JWTAuthenticationTestMixin, TestCase):
+    """Principal du jeton dans le cache partagé (Redis), relu après chaque modification validée"""
+
+    def setUp(self):
+        overrides = override_settings(CACHES=redis_caches())
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        super().setUp()
+
+    def test_cached_principal_authenticates_without_query(self):
+        self._authenticate()
+        self.assertEqual(AUTH_PRINCIPAL_CACHE.get(self.user.pk)['site_configuration_id'], self.site.pk)
+        self.assertNotIn('password', AUTH_PRINCIPAL_CACHE.get(self.user.pk))
+        with CaptureQueriesContext(connection) as queries:
+            user = self._authenticate()
+            self.assertEqual((user.pk, user.is_active, user.is_superuser), (self.user.pk, True, False))
+            self.assertEqual(user.site_configuration_id, self.site.pk)
+        self.assertEqual(len(queries), 0)
+
+        # Autres champs lus à la demande, toute la ligne en une requête ; site au premier accès
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual((user.username, user.email), ('caissier', ''))
+            self.assertEqual(user.site_configuration.site_name, 'Site JWT')
+        self.assertEqual(len(queries), 2)
+
+    def test_views_served_with_principal_user(self):
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        for _ in range(2):  # Principal mis en cache, puis utilisateur construit depuis le principal
+            response = client.get('/api/v1/user/info/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['data']['user']['username'], 'caissier')
+
+    def test_inactive_principal_rejected_without_query(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+        with CaptureQueriesContext(connection) as queries, self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+        self.assertEqual(len(queries), 0)
+
+    def test_user_changes_seen_after_commit(self):
+        self._authenticate()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.is_active = False
+            self.user.save()
+            self.assertIsNotNone(AUTH_PRINCIPAL_CACHE.get(self.user.pk))  # Pas avant la validation
+        self.assertTrue(callbacks)
+        self.assertIsNone(AUTH_PRINCIPAL_CACHE.get(self.user.pk))
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+
+        self.site.site_name = 'Site renommé'
+        self.site.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = True
+            self.user.save()
+        self.assertEqual(self._authenticate().site_configuration.site_name, 'Site renommé')
+
+    @mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True)
+    def test_password_change_revokes_token(self):
+        self.token = str(AccessToken.for_user(self.user))  # Jeton portant l'empreinte du mot de passe
+        self._authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('nouveau123')
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+        with CaptureQueriesContext(connection) as queries, self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+        self.assertEqual(len(queries), 0)  # Version du jeton périmée vue dans le principal
+
+    def test_logout_drops_cached_principal(self):
+        self._authenticate()
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post('/api/v1/auth/logout/').status_code, 200)
+        self.assertIsNone(AUTH_PRINCIPAL_CACHE.get(self.user.pk))
+
+
+class LocalCacheJWTAuthenticationTest(JWTAuthenticationTestMixin, TestCase):
+    """Sans Redis : pas de principal en cache, utilisateur lu en base à chaque requête"""
+
+    def test_no_cache_without_redis(self):
+        self._authenticate()
+        self.assertIsNone(AUTH_PRINCIPAL_CACHE.get(self.user.pk))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._authenticate().site_configuration.site_name, 'Site JWT')
+        self.assertEqual(len(queries), 1)
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
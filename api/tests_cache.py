@@ -0,0 +1,169 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+import fakeredis
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from apps.core import cache as cache_module
+from apps.core.cache import Namespace, cache_settings
+from apps.core.metrics import registry, render_prometheus
+from apps.core.utils import cache_result
+
+REDIS_URL = os.getenv('CACHE_TEST_REDIS_URL')
+
+
+def redis_caches():
+    """
+    CACHES du RedisCache de Django : vrai serveur si CACHE_TEST_REDIS_URL est défini
+    (redis://localhost:6379/15), sinon serveur fakeredis en mémoire (même client redis-py)
+    """
+    if REDIS_URL:
+        return cache_settings(REDIS_URL, key_prefix='bolibana_test')
+    caches = cache_settings('redis://fakeredis:6379/15', key_prefix='bolibana_test')
+    caches['default']['OPTIONS'] = {'connection_class': fakeredis.FakeConnection, 'server': fakeredis.FakeServer()}
+    return caches
+
+
+class CacheSettingsTest(SimpleTestCase):
+    def test_backends_from_url(self):
+        self.assertEqual(cache_settings('redis://cache:6379/1')['default']['BACKEND'],
+                         'django.core.cache.backends.redis.RedisCache')
+        file_cache = cache_settings('file:///tmp/bolibana_cache', timeout=60)['default']
+        self.assertEqual((file_cache['LOCATION'], file_cache['TIMEOUT']), ('/tmp/bolibana_cache', 60))
+        local = cache_settings('')['default']
+        self.assertEqual(local['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        self.assertGreater(local['OPTIONS']['MAX_ENTRIES'], 300)  # Versions d'espaces non évincées
+        with self.assertRaises(ImproperlyConfigured):
+            cache_settings('memcached://cache:11211')
+
+
+class NamespaceTest(SimpleTestCase):
+    """Espaces de noms versionnés, recalcul protégé et compteurs (cache locmem des tests)"""
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_bump_invalidates_site_or_every_site(self):
+        site_1, site_2 = Namespace('cadencier', 1), Namespace('cadencier', 2)
+        site_1.set('page', 1, value='site 1')
+        site_2.set('page', 1, value='site 2')
+
+        site_1.bump()
+        self.assertIsNone(site_1.get('page', 1))
+        self.assertEqual(site_2.get('page', 1), 'site 2')
+
+        Namespace('cadencier').bump()
+        self.assertIsNone(site_2.get('page', 1))
+
+    def test_get_or_compute_caches_once_and_counts(self):
+        space = Namespace('reports', 1)
+        compute = mock.Mock(return_value={'total': 3})
+        self.assertEqual(space.get_or_compute('day', compute=compute), {'total': 3})
+        self.assertEqual(space.get_or_compute('day', compute=compute), {'total': 3})
+        self.assertEqual(compute.call_count, 1)
+        self.assertEqual(registry.cache, {'reports|miss': 1, 'reports|hit': 1})
+
+    def test_expiring_value_recomputed_early_or_served_stale_while_locked(self):
+        space = Namespace('reports', 1)
+        key = space.key('day')
+        # Valeur expirée pour XFetch mais toujours présente dans le cache
+        cache.set(key, ('ancienne', time.time() - 1, 0.5), 300)
+
+        cache.add(f"{key}:lock", 1)  # Un autre processus recalcule déjà
+        self.assertEqual(space.get_or_compute('day', compute=lambda: 'nouvelle'), 'ancienne')
+
+        cache.delete(f"{key}:lock")
+        self.assertEqual(space.get_or_compute('day', compute=lambda: 'nouvelle'), 'nouvelle')
+        self.assertIsNone(cache.get(f"{key}:lock"))
+        self.assertEqual(registry.cache, {'reports|stale': 1, 'reports|early': 1})
+
+    def test_missing_value_waits_for_concurrent_computation(self):
+        space = Namespace('reports', 1)
+        key = space.key('day')
+        cache.add(f"{key}:lock", 1)  # Un autre processus calcule la valeur absente
+
+        def other_process_finishes(seconds):
+            cache.set(key, ('calculée ailleurs', time.time() + 300, 0.1), 300)
+
+        with mock.patch.object(cache_module.time, 'sleep', side_effect=other_process_finishes):
+            value = space.get_or_compute('day', compute=lambda: 'calculée ici')
+        self.assertEqual(value, 'calculée ailleurs')
+        self.assertEqual(registry.cache, {'reports|wait': 1})
+
+    def test_get_many_and_cache_result_invalidation(self):
+        embeddings = Namespace('category_embeddings')
+        embeddings.set_many({(1, 'Thé'): [0.1], (2, 'Sucre'): [0.2]})
+        self.assertEqual(embeddings.get_many([(1, 'Thé'), (2, 'Riz')]), {(1, 'Thé'): [0.1]})
+
+        calls = []
+
+        @cache_result(timeout=60)
+        def total(site_id):
+            calls.append(site_id)
+            return {'site': site_id}
+
+        total(1), total(1), total(2)
+        total.invalidate()
+        total(1)
+        self.assertEqual(calls, [1, 2, 1])
+
+    def test_cache_events_exported(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        Namespace('stock_alerts', 1).get_or_compute('unread', compute=lambda: 0)
+        Namespace('stock_alerts', 1).get_or_compute('unread', compute=lambda: 0)
+        with override_settings(METRICS_DIR=metrics_dir):
+            body = render_prometheus()
+        self.assertIn('bolibana_cache_events_total{namespace="stock_alerts",result="hit"} 1', body)
+        self.assertIn('bolibana_cache_events_total{namespace="stock_alerts",result="miss"} 1', body)
+
+
+class RedisNamespaceTest(SimpleTestCase):
+    """Mêmes garanties sur le RedisCache de Django (fakeredis, ou vrai serveur, voir redis_caches)"""
+
+    def setUp(self):
+        overrides = override_settings(CACHES=redis_caches())
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        cache.clear()
+
+    def _in_threads(self, target, count):
+        # Un client Redis par thread (caches propres au thread) : comme autant d'instances
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_versioned_keys_and_lock(self):
+        space = Namespace('cadencier', 1)
+        self.assertEqual(space.get_or_compute('page', 1, compute=lambda: [1, 2]), [1, 2])
+        self.assertEqual(space.get_or_compute('page', 1, compute=lambda: [3]), [1, 2])
+        space.bump()
+        self.assertEqual(space.get_or_compute('page', 1, compute=lambda: [3]), [3])
+        self.assertTrue(cache.add(f"{space.key('page', 1)}:lock", 1, 5))
+        self.assertFalse(cache.add(f"{space.key('page', 1)}:lock", 1, 5))
+
+    def test_concurrent_bumps_and_locks_are_atomic(self):
+        space = Namespace('cadencier', 1)
+        version = space.versions()[1]
+        self._in_threads(space.bump, 20)
+        self.assertEqual(space.versions()[1], version + 20)
+
+        acquired = []
+        self._in_threads(lambda: acquired.append(cache.add('cadencier:lock', 1, 5)), 20)
+        self.assertEqual(acquired.count(True), 1)
+
+    def test_bump_seen_by_other_client(self):
+        space = Namespace('stock_alerts', 1)
+        space.set('unread', value=4)
+        self._in_threads(space.bump, 1)  # Invalidation depuis une autre instance
+        self.assertIsNone(space.get('unread'))
@@ -0,0 +1,118 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.core.models import Configuration
+from apps.inventory.models import Barcode, Brand, Category, Product
+
+User = get_user_model()
+
+
+class LabelGeneratorAPITest(TestCase):
+    """Tests de la liste paginée des produits pour les étiquettes"""
+
+    url = '/api/v1/labels/generate/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='labels', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Etiquettes',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        self.category = Category.objects.create(name='Boissons', site_configuration=self.site)
+        self.brand = Brand.objects.create(name='Marque', site_configuration=self.site)
+        self.client.force_authenticate(user=self.user)
+
+    def _create_products(self, count):
+        products = []
+        for i in range(count):
+            product = Product.objects.create(
+                name=f'Produit {i}',
+                purchase_price=Decimal('500'),
+                selling_price=Decimal('750'),
+                quantity=i,
+                category=self.category,
+                brand=self.brand,
+                site_configuration=self.site,
+            )
+            Barcode.objects.create(product=product, ean=f'{3000000000000 + product.id}', is_primary=True)
+            products.append(product)
+        return products
+
+    def _count_queries(self, params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_cursor_pagination(self):
+        """Les pages se suivent par curseur sans doublon ni oubli"""
+        products = self._create_products(5)
+
+        first = self.client.get(self.url, {'page_size': 3}).data
+        self.assertEqual(first['total_products'], 5)
+        self.assertTrue(first['has_more'])
+        self.assertEqual(len(first['products']), 3)
+
+        second = self.client.get(self.url, {'page_size': 3, 'cursor': first['next_cursor']}).data
+        self.assertFalse(second['has_more'])
+        self.assertIsNone(second['next_cursor'])
+
+        ids = [p['id'] for p in first['products'] + second['products']]
+        self.assertEqual(ids, [p.id for p in products])
+
+    def test_fields_selection(self):
+        """Seuls les champs demandés sont renvoyés, avec l'EAN du code-barres principal"""
+        product = self._create_products(1)[0]
+
+        data = self.client.get(self.url, {'fields': 'name,selling_price,barcode_ean'}).data
+        self.assertEqual(set(data['products'][0]), {'id', 'name', 'selling_price', 'barcode_ean'})
+        self.assertEqual(data['products'][0]['barcode_ean'], f'{3000000000000 + product.id}')
+
+        response = self.client.get(self.url, {'fields': 'name,unknown'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reference_data_sent_once(self):
+        """Catégories et marques omises quand le client a déjà la version courante"""
+        self._create_products(1)
+
+        first = self.client.get(self.url, {'page_size': 10}).data
+        self.assertEqual(first['categories'], [{'id': self.category.id, 'name': 'Boissons'}])
+
+        again = self.client.get(self.url, {'page_size': 10, 'ref_version': first['reference_version']}).data
+        self.assertNotIn('categories', again)
+        self.assertNotIn('brands', again)
+
+        Brand.objects.create(name='Nouvelle marque', site_configuration=self.site)
+        changed = self.client.get(self.url, {'page_size': 10, 'ref_version': first['reference_version']}).data
+        self.assertEqual(len(changed['brands']), 2)
+
+    def test_query_count_independent_of_products(self):
+        """Le nombre de requêtes ne dépend pas du nombre de produits (pas de N+1)"""
+        self._create_products(3)
+        small_paginated = self._count_queries({'page_size': 100})
+        small_legacy = self._count_queries({})
+
+        self._create_products(20)
+        self.assertEqual(self._count_queries({'page_size': 100}), small_paginated)
+        self.assertEqual(self._count_queries({}), small_legacy)
+
+    def test_lean_barcode_fields_query_count(self):
+        """Les champs d'EAN seuls ne rechargent pas generated_ean produit par produit"""
+        self._create_products(3)
+        params = {'page_size': 100, 'fields': 'has_barcode_ean,barcode_ean_from_model'}
+        small = self._count_queries(params)
+
+        self._create_products(20)
+        self.assertEqual(self._count_queries(params), small)
@@ -0,0 +1,139 @@
+import io
+import json
+import logging
+import sys
+import threading
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from apps.core.log import (
+    AsyncStreamHandler, JsonFormatter, RequestIdFilter, SamplingFilter, logging_config, parse_levels,
+    parse_sampling, request_id_var,
+)
+from apps.core.middlewares import RequestIdMiddleware
+
+
+def _record(name='api.views', level=logging.DEBUG, msg='message %s', args=('x',), lineno=10, **extra):
+    record = logging.LogRecord(name, level, '/app/api/views.py', lineno, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class RequestIdTest(SimpleTestCase):
+    """Identifiant de requête : en-tête de réponse et enregistrements émis pendant la requête"""
+
+    def test_records_carry_request_id(self):
+        handler = _ListHandler()
+        handler.addFilter(RequestIdFilter())
+        test_logger = logging.getLogger('api.tests_logging')
+        test_logger.addHandler(handler)
+        self.addCleanup(test_logger.removeHandler, handler)
+
+        def view(request):
+            test_logger.warning('dans la requête')
+            return HttpResponse()
+
+        response = RequestIdMiddleware(view)(RequestFactory().get('/api/v1/products/'))
+        self.assertEqual(handler.records[0].request_id, response['X-Request-ID'])
+        self.assertIsNone(request_id_var.get())
+
+        test_logger.warning('hors requête')
+        self.assertEqual(handler.records[1].request_id, '-')
+
+    def test_incoming_id_reused_when_sane(self):
+        middleware = RequestIdMiddleware(lambda request: HttpResponse())
+        response = middleware(RequestFactory().get('/', HTTP_X_REQUEST_ID='abc-123'))
+        self.assertEqual(response['X-Request-ID'], 'abc-123')
+        response = middleware(RequestFactory().get('/', HTTP_X_REQUEST_ID='<script>'))
+        self.assertNotEqual(response['X-Request-ID'], '<script>')
+
+
+class SamplingFilterTest(SimpleTestCase):
+    def test_one_debug_record_in_n_per_line(self):
+        sampler = SamplingFilter({'api': 10, 'api.views': 3})
+        kept = [sampler.filter(_record()) for _ in range(9)]
+        self.assertEqual(kept.count(True), 3)  # Préfixe le plus long : 1 sur 3
+        self.assertTrue(sampler.filter(_record(lineno=11)))  # Autre ligne, compteur distinct
+
+    def test_info_and_unconfigured_loggers_pass(self):
+        sampler = SamplingFilter({'api': 100})
+        self.assertTrue(all(sampler.filter(_record(level=logging.INFO)) for _ in range(5)))
+        self.assertTrue(all(sampler.filter(_record(name='apps.sales.views')) for _ in range(5)))
+
+
+class FormattingTest(SimpleTestCase):
+    def test_json_line_with_extras_and_exception(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = logging.LogRecord('api.views', logging.ERROR, '/app/api/views.py', 5, 'échec %s', ('vente',),
+                                       sys.exc_info())
+        record.request_id, record.sale_id = 'abc', 42
+        payload = json.loads(JsonFormatter().format(record))
+        self.assertEqual(payload['msg'], 'échec vente')
+        self.assertEqual((payload['request_id'], payload['sale_id']), ('abc', 42))
+        self.assertIn('ValueError: boom', payload['exc'])
+
+    def test_parse_settings(self):
+        self.assertEqual(parse_levels('api.views=debug, apps.sales=WARNING,bad'),
+                         {'api.views': 'DEBUG', 'apps.sales': 'WARNING'})
+        self.assertEqual(parse_sampling('api=100'), {'api': 100})
+        config = logging_config(levels={'api': 'DEBUG'}, asynchronous=False, json_format=False)
+        self.assertEqual(config['handlers']['console']['class'], 'logging.StreamHandler')
+        self.assertEqual(config['loggers']['api'], {'level': 'DEBUG'})
+
+
+class AsyncStreamHandlerTest(SimpleTestCase):
+    def test_records_written_off_thread_with_message_resolved_at_call(self):
+        stream = io.StringIO()
+        handler = AsyncStreamHandler(stream)
+        self.addCleanup(handler.close)
+        cart = ['thé']
+        handler.handle(_record(msg='panier %s', args=(cart,)))
+        cart.append('sucre')  # Modifié après l'appel : le message reste celui du moment de l'appel
+        handler.flush_and_stop()
+        self.assertEqual(json.loads(stream.getvalue())['msg'], "panier ['thé']")
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        release = threading.Event()
+
+        class SlowHandler(_ListHandler):
+            def emit(self, record):
+                release.wait(5)
+                super().emit(record)
+
+        handler = AsyncStreamHandler(maxsize=1)
+        handler.target = SlowHandler()
+        self.addCleanup(handler.close)
+        for _ in range(5):
+            handler.handle(_record(level=logging.INFO))
+        self.assertGreaterEqual(handler.dropped, 3)  # Au plus un en écriture et un en file
+
+        release.set()
+        handler.queue.join()
+        handler.flush_and_stop()
+        self.assertEqual(len(handler.target.records) + handler.dropped, 5)
+
+    def test_stop_after_stream_closed(self):
+        """Arrêt à la sortie après fermeture du flux (capture de pytest) : ni erreur ni écriture"""
+        stream = io.StringIO()
+        handler = AsyncStreamHandler(stream)
+        self.addCleanup(handler.close)
+        handler.handle(_record(level=logging.INFO))
+        handler.queue.join()
+        handler.handle(_record(level=logging.INFO))
+        stream.close()
+        with mock.patch.object(handler.target, 'handleError') as handle_error:
+            handler.flush_and_stop()
+        handle_error.assert_not_called()
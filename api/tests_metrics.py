@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.core.metrics import registry
+from apps.core.models import Configuration
+from apps.inventory.models import Product
+
+User = get_user_model()
+
+
+class RequestMetricsTest(TestCase):
+    """Tests du middleware de métriques par route et de l'export Prometheus"""
+
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir, ignore_errors=True)
+        overrides = override_settings(METRICS_DIR=self.metrics_dir, METRICS_FLUSH_INTERVAL=0, METRICS_TOKEN='secret')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        registry.reset()
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='metrics', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Métriques',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        Product.objects.create(
+            name='Thé', purchase_price=Decimal('100'), selling_price=Decimal('150'), site_configuration=self.site,
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _scrape(self, **headers):
+        return self.client.get('/metrics/', **headers)
+
+    def test_route_metrics_merged_across_workers(self):
+        """Durée, requêtes SQL et statut par route, fichiers des autres workers additionnés"""
+        self.client.get('/api/v1/products/')
+        self.client.get('/api/v1/products/')
+        # Cumuls identiques d'un autre worker, déjà écrits dans le répertoire partagé
+        with open(os.path.join(self.metrics_dir, f'metrics-{os.getpid()}.json')) as handle:
+            worker = json.load(handle)
+        with open(os.path.join(self.metrics_dir, 'metrics-999999.json'), 'w') as handle:
+            json.dump(worker, handle)
+
+        self.client.force_authenticate(user=None)
+        body = self._scrape(HTTP_AUTHORIZATION='Bearer secret').content.decode()
+
+        labels = 'route="product-list",method="GET"'
+        self.assertIn(f'bolibana_http_request_duration_seconds_count{{{labels}}} 4', body)
+        self.assertIn(f'bolibana_http_requests_total{{{labels},status="200"}} 4', body)
+        self.assertIn(f'bolibana_http_request_queries_bucket{{{labels},le="+Inf"}} 4', body)
+        self.assertIn(f'bolibana_http_request_queries_bucket{{{labels},le="0"}} 0', body)
+        self.assertRegex(body, rf'bolibana_http_response_bytes_total\{{{labels}\}} [1-9]\d*')
+
+    def test_endpoint_is_protected(self):
+        """Personnel connecté ou jeton du collecteur uniquement"""
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self._scrape().status_code, 403)
+        self.assertEqual(self._scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self._scrape(HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+        staff = User.objects.create_user(username='metrics_staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        response = self._scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    @override_settings(SLOW_REQUEST_MS=0.001, SLOW_REQUEST_TOP_QUERIES=2, SLOW_QUERY_MS=0)
+    def test_slow_request_logs_top_queries_with_call_sites(self):
+        """Au-delà du seuil : requêtes SQL les plus longues et appelant dans le projet"""
+        with self.assertLogs('apps.core.middlewares', level='WARNING') as logs:
+            self.client.get('/api/v1/products/')
+
+        message = logs.output[0]
+        self.assertIn('[SLOW_REQUEST] GET /api/v1/products/ (product-list)', message)
+        self.assertEqual(message.count('\n  '), 2)
+        self.assertRegex(message, r'\.py:\d+ \w+  SELECT')
+
+    @override_settings(SLOW_REQUEST_MS=0.001, SLOW_QUERY_MS=60000)
+    def test_call_site_resolved_only_for_slow_queries(self):
+        """Requêtes sous SLOW_QUERY_MS : SQL et durée seulement, sans remontée de la pile"""
+        with mock.patch('apps.core.metrics.call_site') as call_site, \
+                self.assertLogs('apps.core.middlewares', level='WARNING') as logs:
+            self.client.get('/api/v1/products/')
+
+        call_site.assert_not_called()
+        self.assertIn('  ?  SELECT', logs.output[0])
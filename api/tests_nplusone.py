@@ -0,0 +1,86 @@
+import io
+import unittest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from apps.core.models import Configuration
+from apps.core.nplusone import NPlusOneError, assert_no_n_plus_one, normalize_sql
+from apps.inventory.models import Barcode, Product
+from apps.inventory.tests.test_runner import CustomTestRunner
+
+from .serializers import ProductListSerializer
+
+User = get_user_model()
+
+
+class NormalizeSQLTest(SimpleTestCase):
+    def test_literals_and_in_lists(self):
+        """Listes IN de toute longueur et littéraux ramenés au même gabarit"""
+        self.assertEqual(
+            normalize_sql('SELECT * FROM "t" WHERE "t"."id" IN (%s, %s, %s) AND "t"."name" = \'x\'  LIMIT 21'),
+            normalize_sql('SELECT * FROM "t" WHERE "t"."id" IN (%s) AND "t"."name" = \'y\' LIMIT 5'),
+        )
+
+
+class NPlusOneDetectorTest(TestCase):
+    """Tests du détecteur de requêtes N+1"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='nplusone', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site N+1',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        for index in range(6):
+            product = Product.objects.create(
+                name=f'Produit N+1 {index}', purchase_price=Decimal('100'), selling_price=Decimal('150'),
+                site_configuration=self.site,
+            )
+            Barcode.objects.create(product=product, ean=f'{4000000000000 + product.id}', is_primary=True)
+
+    def test_serializer_field_is_reported(self):
+        """Une requête par ligne dans un champ de serializer : champ et appelant signalés"""
+        products = Product.objects.filter(site_configuration=self.site)
+        with self.assertRaises(NPlusOneError) as raised:
+            with assert_no_n_plus_one(threshold=5):
+                ProductListSerializer(products, many=True).data
+
+        report = str(raised.exception)
+        self.assertIn('6x SELECT', report)
+        self.assertIn('champ ProductListSerializer.primary_barcode', report)
+        self.assertIn('appel api/serializers.py', report)
+
+    def test_annotated_queryset_passes(self):
+        """Avec l'EAN principal annoté en SQL, plus de requête par ligne pour ce champ"""
+        from django.db.models import OuterRef, Subquery
+
+        products = Product.objects.filter(site_configuration=self.site).annotate(primary_ean=Subquery(
+            Barcode.objects.filter(product=OuterRef('pk'), is_primary=True).values('ean')[:1]
+        ))
+        with assert_no_n_plus_one(threshold=5) as detector:
+            data = ProductListSerializer(products, many=True, context={'copy_originals': {}}).data
+        self.assertEqual(len(data), 6)
+        self.assertEqual(detector.offenders(), [])
+
+    def test_runner_fails_offending_test(self):
+        """Avec --nplusone-fail, un test répétant une requête est compté en échec"""
+        site = self.site
+
+        class Repeating(unittest.TestCase):
+            def test_repeat(self):
+                for _ in range(3):
+                    list(Product.objects.filter(site_configuration=site)[:1])
+
+        result_class = CustomTestRunner(nplusone_threshold=3, nplusone_fail=True, verbosity=0).get_resultclass()
+        result = result_class(unittest.runner._WritelnDecorator(io.StringIO()), False, 0)
+        Repeating('test_repeat').run(result)
+
+        self.assertEqual(len(result.failures), 1)
+        self.assertIn('3x SELECT', result.failures[0][1])
+        self.assertEqual(len(result.nplusone_reports), 1)
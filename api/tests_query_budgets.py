@@ -0,0 +1,498 @@
+"""
+Budgets de requêtes SQL et de temps de réponse des routes de l'API.
+
+Un site réaliste (produits avec codes-barres, catégories sur 3 niveaux, marques,
+copies depuis un autre site, ventes, crédit et fidélité) est mesuré à deux tailles :
+le nombre de requêtes de chaque route doit être identique aux deux tailles (aucune
+requête par ligne) et égal au budget de api/query_budgets.json, le temps de réponse
+rester sous le plafond. Les routes d'écriture du parcours de caisse (vente, mouvements
+de stock, produits, étiquettes) sont mesurées de même avec un corps de requête construit
+par le test ; leur budget est nommé 'MÉTHODE route'. Toute autre route, pour chaque
+méthode, figure dans EXEMPT avec la raison.
+
+Un budget se modifie volontairement : relancer avec UPDATE_QUERY_BUDGETS=1 réécrit
+le fichier d'après les mesures, puis la différence est relue et commitée.
+"""
+import itertools
+import json
+import os
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.models import Configuration
+from apps.inventory.models import (
+    Barcode, Brand, Category, Customer, InventoryCountLine, InventoryCountSession, LabelBatch, LabelItem,
+    LabelTemplate, Product, ProductCopy, ProductCopyJob, ReorderJob, Transaction, TransactionArchive,
+)
+from apps.loyalty.models import LoyaltyProgram, LoyaltyTransaction
+from apps.sales.models import CreditTransaction, Sale, SaleItem
+from apps.subscription.models import Plan
+
+User = get_user_model()
+
+BUDGET_FILE = os.path.join(os.path.dirname(__file__), 'query_budgets.json')
+SMALL, LARGE = 12, 300  # Produits : en dessous d'une page (20), puis plusieurs centaines
+MS_FLOOR = 500  # Plafond minimal (ms) : les mesures varient d'une machine à l'autre
+
+# Routes hors budget, avec la raison ('route' pour GET, 'MÉTHODE route' sinon)
+EXEMPT = {
+    'api-root': "Index du routeur DRF, sans requête",
+    'schema-swagger-ui': "Génération du schéma OpenAPI, sans données",
+    'schema-redoc': "Génération du schéma OpenAPI, sans données",
+    'api_sites': "Réservée aux superutilisateurs ; liste des sites, indépendante du volume d'un site",
+    'api_collect_static': "Lance collectstatic (effet de bord sur le disque)",
+    'api_catalog_generation_status': "Nécessite un modèle de catalogue et un PDF généré",
+    'api_catalog_generation_download': "Nécessite un modèle de catalogue et un PDF généré",
+    'api_product_import_job': "Nécessite un fichier importé",
+    'label-batch-pdf': "Rendu PDF, mesuré par les tests d'impression",
+    'label-batch-tsc': "Rendu TSC, mesuré par les tests d'impression",
+    **dict.fromkeys([
+        'POST api_login', 'POST api_register', 'POST api_signup', 'POST api_signup_simple', 'POST api_refresh',
+        'POST api_logout', 'POST api_logout_all', 'POST api_password_reset_request',
+        'POST api_password_reset_confirm', 'POST token_obtain_pair', 'POST token_refresh',
+        'POST api_change_password', 'POST api_change_password_auth', 'POST api_delete_account',
+        'POST api_delete_account_auth',
+    ], "Authentification et compte utilisateur, indépendants du volume du site (tests d'authentification)"),
+    **dict.fromkeys([
+        'PUT api_users', 'PUT api_profile', 'PUT api_profile_alt', 'PUT api_configuration',
+        'POST api_configuration_reset', 'PUT api_parametres', 'PUT api_loyalty_program',
+    ], "Paramètres de l'utilisateur ou du site : une ligne modifiée, indépendante du volume"),
+    **dict.fromkeys([
+        'POST api_label_generator', 'POST api_catalog_pdf', 'POST api_label_print', 'POST api_receipt_print',
+    ], "Rendu d'étiquettes, de catalogue ou de ticket, mesuré par les tests d'impression"),
+    **dict.fromkeys([
+        'POST api_product_copy', 'POST api_product_copy_management', 'POST api_product_import', 'POST api_reorder',
+    ], "Crée un travail de fond (copie, import, réapprovisionnement), mesuré par ses propres tests"),
+    'POST api_stock_alerts': "Marque les alertes lues : une mise à jour groupée",
+    **dict.fromkeys([
+        'POST api_loyalty_account', 'POST api_loyalty_points_calculate', 'POST customer-add-payment',
+    ], "Compte d'un client (fidélité, crédit), indépendant du volume du site"),
+    'POST api_collect_static': "Lance collectstatic (effet de bord sur le disque)",
+    **dict.fromkeys([
+        'POST api_barcode_add', 'PUT api_barcode_set_primary', 'DELETE api_barcode_delete',
+        'POST product-add-barcode', 'DELETE product-remove-barcode', 'POST product-set-primary-barcode',
+        'PUT product-set-primary-barcode', 'PUT product-update-barcode',
+    ], "Codes-barres d'un produit : requêtes bornées par les codes de ce produit"),
+    'POST product-scan': "Recherche par code-barres (lecture en POST), mêmes requêtes que barcode-search",
+    'PUT product-detail': "Mise à jour partielle forcée, même traitement que PATCH (budgété)",
+    **dict.fromkeys([
+        'POST product-adjust-stock', 'POST product-update-stock', 'POST transaction-list',
+        'PUT transaction-detail', 'PATCH transaction-detail',
+    ], "Même mouvement de stock que add_stock / remove_stock (budgétés)"),
+    'POST product-upload-image': "Envoi d'image (stockage de fichiers), mesuré par les tests d'images",
+    **dict.fromkeys([
+        'DELETE product-detail', 'DELETE transaction-detail', 'DELETE sale-detail', 'DELETE label-batch-detail',
+        'PUT sale-detail', 'PATCH sale-detail',
+    ], "Correction ou suppression après coup, hors parcours de caisse"),
+    **dict.fromkeys([
+        'POST category-list', 'PUT category-detail', 'PATCH category-detail', 'DELETE category-detail',
+        'POST brand-list', 'PUT brand-detail', 'PATCH brand-detail', 'DELETE brand-detail',
+        'POST customer-list', 'PUT customer-detail', 'PATCH customer-detail', 'DELETE customer-detail',
+    ], "Référentiel (catégories, marques, clients) : une ligne écrite, hors parcours de caisse"),
+    'POST label-batch-list': "Lot créé sans lignes ; l'application passe par create_batch (budgété)",
+    **dict.fromkeys(['PUT label-batch-detail', 'PATCH label-batch-detail'], "Modification d'une ligne de lot"),
+    **dict.fromkeys([
+        'POST inventory-count-session-list', 'POST inventory-count-session-apply',
+        'POST inventory-count-session-cancel', 'POST inventory-count-session-counts',
+        'POST inventory-count-session-freeze',
+    ], "Inventaire : nombre fixe de requêtes vérifié par apps/inventory/tests/test_inventory_count.py"),
+}
+
+# Route -> URL (fonction du test, qui porte les objets de référence)
+ROUTES = {
+    'product-list': lambda t: '/api/v1/products/',
+    'product-detail': lambda t: f'/api/v1/products/{t.product.id}/',
+    'product-all-barcodes': lambda t: '/api/v1/products/all_barcodes/',
+    'product-low-stock': lambda t: '/api/v1/products/low_stock/',
+    'product-out-of-stock': lambda t: '/api/v1/products/out_of_stock/',
+    'product-backorders': lambda t: '/api/v1/products/backorders/',
+    'product-list-barcodes': lambda t: f'/api/v1/products/{t.product.id}/list_barcodes/',
+    'product-stock-movements': lambda t: f'/api/v1/products/{t.product.id}/stock_movements/',
+    'category-list': lambda t: '/api/v1/categories/',
+    'category-detail': lambda t: f'/api/v1/categories/{t.category.id}/',
+    'brand-list': lambda t: '/api/v1/brands/',
+    'brand-detail': lambda t: f'/api/v1/brands/{t.brand.id}/',
+    'brand-by-rayon': lambda t: f'/api/v1/brands/by_rayon/?rayon_id={t.rayon.id}',
+    'transaction-list': lambda t: '/api/v1/transactions/',
+    'transaction-detail': lambda t: f'/api/v1/transactions/{t.transaction.id}/',
+    'transaction-archive-list': lambda t: '/api/v1/transactions-archive/',
+    'transaction-archive-detail': lambda t: f'/api/v1/transactions-archive/{t.archived.id}/',
+    'sale-list': lambda t: '/api/v1/sales/',
+    'sale-detail': lambda t: f'/api/v1/sales/{t.sale.id}/',
+    'customer-list': lambda t: '/api/v1/customers/',
+    'customer-detail': lambda t: f'/api/v1/customers/{t.customer.id}/',
+    'customer-with-debt': lambda t: '/api/v1/customers/with_debt/',
+    'customer-credit-history': lambda t: f'/api/v1/customers/{t.customer.id}/credit_history/',
+    'credit-transaction-list': lambda t: '/api/v1/credit-transactions/',
+    'credit-transaction-detail': lambda t: f'/api/v1/credit-transactions/{t.credit.id}/',
+    'label-template-list': lambda t: '/api/v1/labels/templates/',
+    'label-template-detail': lambda t: f'/api/v1/labels/templates/{t.template.id}/',
+    'label-batch-list': lambda t: '/api/v1/labels/batches/',
+    'label-batch-detail': lambda t: f'/api/v1/labels/batches/{t.batch.id}/',
+    'barcode-list': lambda t: '/api/v1/barcodes/',
+    'barcode-detail': lambda t: f'/api/v1/barcodes/{t.barcode.id}/',
+    'barcode-search': lambda t: '/api/v1/barcodes/search/?q=200',
+    'barcode-statistics': lambda t: '/api/v1/barcodes/statistics/',
+    'inventory-count-session-list': lambda t: '/api/v1/inventory/count-sessions/',
+    'inventory-count-session-detail': lambda t: f'/api/v1/inventory/count-sessions/{t.session.id}/',
+    'inventory-count-session-diff': lambda t: f'/api/v1/inventory/count-sessions/{t.session.id}/diff/',
+    'api_dashboard': lambda t: '/api/v1/dashboard/',
+    'api_configuration': lambda t: '/api/v1/configuration/',
+    'api_currencies': lambda t: '/api/v1/currencies/',
+    'api_parametres': lambda t: '/api/v1/parametres/',
+    'api_users': lambda t: '/api/v1/users/',
+    'api_profile': lambda t: '/api/v1/users/profile/',
+    'api_profile_alt': lambda t: '/api/v1/profile/',
+    'api_user_info': lambda t: '/api/v1/user/info/',
+    'api_user_permissions': lambda t: '/api/v1/user/permissions/',
+    'api_user_list': lambda t: '/api/v1/users/list/',
+    'api_label_generator': lambda t: '/api/v1/labels/generate/',
+    'api_rayons': lambda t: '/api/v1/rayons/',
+    'api_subcategories_mobile': lambda t: f'/api/v1/subcategories/?rayon_id={t.rayon.id}',
+    'api_brands_by_rayon': lambda t: f'/api/v1/brands/by-rayon/?rayon_id={t.rayon.id}',
+    'api_product_copy': lambda t: '/api/v1/inventory/copy/',
+    'api_product_copy_management': lambda t: '/api/v1/inventory/copy/management/',
+    'api_product_copy_job': lambda t: f'/api/v1/inventory/copy/jobs/{t.copy_job.id}/',
+    'api_reorder_job': lambda t: f'/api/v1/inventory/reorder/{t.reorder_job.id}/',
+    'api_stock_valuation': lambda t: '/api/v1/reports/stock-valuation/',
+    'api_stock_alerts': lambda t: '/api/v1/inventory/stock-alerts/',
+    'api_category_recommend': lambda t: '/api/v1/categories/recommend/?product_name=Produit',
+    'api_loyalty_program': lambda t: '/api/v1/loyalty/program/',
+    'api_loyalty_account': lambda t: f'/api/v1/loyalty/account/?phone={t.customer.phone}',
+}
+
+# 'MÉTHODE route' -> (URL, corps JSON), fonctions du test ; un corps neuf à chaque appel
+WRITE_ROUTES = {
+    'POST sale-list': (lambda t: '/api/v1/sales/', lambda t: {
+        'customer': t.customer.id, 'payment_method': 'cash', 'status': 'completed', 'amount_given': '1000',
+        'items': [
+            {'product_id': product.id, 'quantity': 1, 'unit_price': int(product.selling_price)}
+            for product in t.checkout_products
+        ],
+    }),
+    'POST product-add-stock': (
+        lambda t: f'/api/v1/products/{t.stocked_product.id}/add_stock/', lambda t: {'quantity': 5, 'context': 'reception'}
+    ),
+    'POST product-remove-stock': (
+        lambda t: f'/api/v1/products/{t.stocked_product.id}/remove_stock/', lambda t: {'quantity': 2}
+    ),
+    'POST product-list': (lambda t: '/api/v1/products/', lambda t: {
+        'name': f'Produit créé {next(t.numbers)}', 'purchase_price': '100', 'selling_price': '150',
+        'quantity': 5, 'category': t.category.id, 'brand': t.brand.id,
+    }),
+    'PATCH product-detail': (
+        lambda t: f'/api/v1/products/{t.product.id}/', lambda t: {'selling_price': str(160 + next(t.numbers))}
+    ),
+    'POST label-batch-create-batch': (lambda t: '/api/v1/labels/batches/create_batch/', lambda t: {
+        'template': t.template.id, 'channel': 'escpos',
+        'items': [{'product_id': product.id, 'copies': 2} for product in t.checkout_products],
+    }),
+}
+
+
+def seed_site(site, source, user, start, count):
+    """
+    Ajoute au site `count` produits (numérotés à partir de `start`) et leur historique,
+    en insertions groupées : catégories sur 3 niveaux, marques, codes-barres, copies
+    depuis `source`, clients, ventes, mouvements de stock, crédit et fidélité
+    """
+    now = timezone.now()
+    prefix = f"{site.id:03d}"
+
+    rayons = Category.objects.bulk_create([
+        Category(name=f"Rayon {prefix}-{start + i}", slug=f"rayon-{prefix}-{start + i}", level=0,
+                 is_rayon=True, rayon_type='epicerie', site_configuration=site)
+        for i in range(max(1, count // 100))
+    ])
+    subcategories = Category.objects.bulk_create([
+        Category(name=f"Famille {rayon.slug}-{i}", slug=f"famille-{rayon.slug}-{i}", level=1, parent=rayon,
+                 site_configuration=site)
+        for rayon in rayons for i in range(3)
+    ])
+    leaves = Category.objects.bulk_create([
+        Category(name=f"Sous-famille {sub.slug}-{i}", slug=f"sous-{sub.slug}-{i}", level=2, parent=sub,
+                 site_configuration=site)
+        for sub in subcategories for i in range(3)
+    ])
+    brands = Brand.objects.bulk_create([
+        Brand(name=f"Marque {prefix}-{start + i}", site_configuration=site)
+        for i in range(max(1, count // 10))
+    ])
+    Brand.rayons.through.objects.bulk_create([
+        Brand.rayons.through(brand_id=brand.id, category_id=rayons[i % len(rayons)].id)
+        for i, brand in enumerate(brands)
+    ])
+
+    def product(site_, number, quantity):
+        return Product(
+            name=f"Produit {site_.id:03d}-{number}", slug=f"produit-{site_.id:03d}-{number}",
+            cug=f"{site_.id:03d}{number:06d}", purchase_price=Decimal('100') + number % 50,
+            selling_price=Decimal('150') + number % 70, quantity=quantity, alert_threshold=5,
+            category=leaves[number % len(leaves)], brand=brands[number % len(brands)], site_configuration=site_,
+        )
+
+    # Stocks variés : ruptures, stocks faibles, backorders et stocks normaux
+    products = Product.objects.bulk_create([
+        product(site, start + i, (-2, 0, 3, 40, 120)[i % 5]) for i in range(count)
+    ])
+    barcodes = [
+        Barcode(product=p, ean=f"2{prefix}{p.id:09d}", is_primary=True) for p in products
+    ] + [
+        Barcode(product=p, ean=f"3{prefix}{p.id:09d}", is_primary=False) for p in products[::2]
+    ]
+    Barcode.objects.bulk_create(barcodes)
+
+    originals = Product.objects.bulk_create([
+        product(source, start + i, 10) for i in range(0, count, 5)
+    ])
+    ProductCopy.objects.bulk_create([
+        ProductCopy(original_product=original, copied_product=copied, source_site=source, destination_site=site)
+        for original, copied in zip(originals, products[::5])
+    ])
+
+    customers = Customer.objects.bulk_create([
+        Customer(name=f"Client {prefix}-{start + i}", phone=f"7{site.id:02d}{start + i:06d}",
+                 credit_balance=Decimal('-5000') if i % 2 else 0, is_loyalty_member=True,
+                 loyalty_points=Decimal('120'), loyalty_joined_at=now, site_configuration=site)
+        for i in range(max(2, count // 10))
+    ])
+
+    # Chaque vente reprend le premier produit du site : son historique grandit avec N
+    hero = Product.objects.filter(site_configuration=site).order_by('id').first()
+    sales = Sale.objects.bulk_create([
+        Sale(reference=f"V{prefix}-{start + i}", seller=user, customer=customers[i % len(customers)],
+             status='completed', payment_status='paid', payment_method=('cash', 'mobile', 'credit')[i % 3],
+             subtotal=Decimal('300'), total_amount=Decimal('300'), amount_paid=Decimal('300'),
+             loyalty_points_earned=Decimal('3'), site_configuration=site)
+        for i in range(count // 2)
+    ])
+    items = []
+    for i, sale in enumerate(sales):
+        for item_product in (hero, products[(2 * i + 1) % count]):
+            items.append(SaleItem(sale=sale, product=item_product, quantity=1,
+                                  unit_price=item_product.selling_price, amount=item_product.selling_price))
+    SaleItem.objects.bulk_create(items)
+
+    Transaction.objects.bulk_create([
+        Transaction(type='in', reason='reception', product=p, quantity=50, unit_price=p.purchase_price,
+                    total_amount=p.purchase_price * 50, user=user, site_configuration=site)
+        for p in products
+    ] + [
+        Transaction(type='out', reason='sale', product=item.product, quantity=1, sale=item.sale,
+                    unit_price=item.unit_price, total_amount=item.amount, user=user, site_configuration=site)
+        for item in items
+    ])
+    # Période close : une réception archivée par produit, datée de l'an dernier
+    TransactionArchive.objects.bulk_create([
+        TransactionArchive(id=10 ** 9 + p.id, type='in', reason='reception', product=p, quantity=10,
+                           transaction_date=now - timedelta(days=400), unit_price=p.purchase_price,
+                           total_amount=p.purchase_price * 10, user_id=user.id, site_configuration=site)
+        for p in products
+    ])
+
+    # Crédit et fidélité sur le premier client du site
+    first_customer = Customer.objects.filter(site_configuration=site).order_by('id').first()
+    credit_sales = [sale for sale in sales if sale.payment_method == 'credit']
+    CreditTransaction.objects.bulk_create([
+        CreditTransaction(customer=first_customer, sale=sale, type=kind, amount=Decimal('300'),
+                          balance_after=Decimal('-300') if kind == 'credit' else 0, user=user,
+                          site_configuration=site)
+        for sale in credit_sales for kind in ('credit', 'payment')
+    ])
+    LoyaltyTransaction.objects.bulk_create([
+        LoyaltyTransaction(customer=first_customer, sale=sale, type=kind, points=points,
+                           balance_after=Decimal('120'), site_configuration=site)
+        for sale in sales for kind, points in (('earned', Decimal('3')), ('redeemed', Decimal('-1')))
+    ])
+
+    # Dates étalées sur les dernières semaines (les champs auto_now_add sont posés à l'insertion)
+    for index, sale in enumerate(sales):
+        if index % 7 == 0:
+            Sale.objects.filter(pk=sale.pk).update(sale_date=now - timedelta(days=index % 28))
+    return products
+
+
+class QueryBudgetTest(TestCase):
+    """Nombre de requêtes constant et conforme au budget pour chaque route GET"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='budgets', password='testpass123')
+        # Plan propre au test (mêmes mesures avec ou sans les plans des migrations), dépassé
+        # à la grande taille : les produits excédentaires sont exclus des rapports
+        self.plan = Plan.objects.create(name='Budgets', slug='budgets', max_products=(SMALL + LARGE) // 2)
+        self.site = Configuration.objects.create(
+            site_name='Site Budgets',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+            subscription_plan=self.plan,
+        )
+        self.source = Configuration.objects.create(
+            site_name='Site Source Budgets',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='source@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.is_site_admin = True
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        LoyaltyProgram.objects.create(site_configuration=self.site)
+
+        seed_site(self.site, self.source, self.user, 0, SMALL)
+        self.product = Product.objects.filter(site_configuration=self.site).order_by('id').first()
+        self.barcode = self.product.barcodes.get(is_primary=True)
+        self.category = self.product.category
+        self.rayon = Category.objects.filter(site_configuration=self.site, is_rayon=True).order_by('id').first()
+        self.brand = self.product.brand
+        self.transaction = Transaction.objects.filter(product=self.product).order_by('id').first()
+        self.archived = TransactionArchive.objects.filter(product=self.product).first()
+        self.sale = Sale.objects.filter(site_configuration=self.site).order_by('id').first()
+        self.customer = Customer.objects.filter(site_configuration=self.site).order_by('id').first()
+        self.credit = CreditTransaction.objects.filter(customer=self.customer).order_by('id').first()
+        self.checkout_products = list(Product.objects.filter(site_configuration=self.site).order_by('id')[:2])
+        # Stock élevé : les mouvements des deux tailles ne franchissent pas le seuil d'alerte
+        self.stocked_product = Product.objects.filter(site_configuration=self.site, quantity__gte=100).first()
+        self.numbers = itertools.count()
+
+        self.template = LabelTemplate.objects.create(site_configuration=self.site, name='Étiquette 40x30')
+        self.batch = LabelBatch.objects.create(site_configuration=self.site, user=self.user, template=self.template)
+        self.session = InventoryCountSession.objects.create(
+            name='Inventaire budgets', site_configuration=self.site, created_by=self.user,
+        )
+        self.copy_job = ProductCopyJob.objects.create(user=self.user, source_site=self.source, destination_site=self.site)
+        self.reorder_job = ReorderJob.objects.create(user=self.user, site_configuration=self.site)
+        self._add_batch_lines()
+
+    def _add_batch_lines(self):
+        """Lignes d'étiquettes et de comptage pour tous les produits du site"""
+        products = Product.objects.filter(site_configuration=self.site).exclude(labelitem__batch=self.batch)
+        LabelItem.objects.bulk_create([
+            LabelItem(batch=self.batch, product=product, barcode_value=product.cug, position=product.id)
+            for product in products
+        ])
+        InventoryCountLine.objects.bulk_create([
+            InventoryCountLine(session=self.session, product=product, counted_quantity=1, expected_quantity=0,
+                               counted_by=self.user)
+            for product in products
+        ])
+
+    def _call(self, name):
+        if name in WRITE_ROUTES:
+            url, payload = WRITE_ROUTES[name]
+            method = name.split()[0].lower()
+            return getattr(self.client, method)(url(self), payload(self), format='json')
+        return self.client.get(ROUTES[name](self))
+
+    def _measure(self, routes):
+        """Requêtes SQL, durée (ms) et statut de chaque route, après un appel de chauffe"""
+        results = {}
+        for name in routes:
+            self._call(name)
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = self._call(name)
+                elapsed = (time.perf_counter() - start) * 1000
+            results[name] = {'queries': len(queries), 'ms': elapsed, 'status': response.status_code}
+        return results
+
+    def _check_budgets(self, routes):
+        small = self._measure(routes)
+        seed_site(self.site, self.source, self.user, SMALL, LARGE - SMALL)
+        self._add_batch_lines()
+        large = self._measure(routes)
+
+        if os.environ.get('UPDATE_QUERY_BUDGETS'):
+            with open(BUDGET_FILE) as handle:
+                budgets = json.load(handle)
+            budgets.update({
+                name: {
+                    'queries': large[name]['queries'],
+                    'ms': max(MS_FLOOR, int(large[name]['ms'] * 5 // 100 + 1) * 100),
+                }
+                for name in routes
+            })
+            with open(BUDGET_FILE, 'w') as handle:
+                json.dump(budgets, handle, indent=2, sort_keys=True)
+                handle.write('\n')
+
+        with open(BUDGET_FILE) as handle:
+            budgets = json.load(handle)
+        for name in routes:
+            with self.subTest(route=name):
+                self.assertIn(small[name]['status'], (200, 201))
+                self.assertIn(large[name]['status'], (200, 201))
+                self.assertEqual(
+                    large[name]['queries'], small[name]['queries'],
+                    f"{name} : {small[name]['queries']} requêtes pour {SMALL} produits, "
+                    f"{large[name]['queries']} pour {LARGE}",
+                )
+                self.assertIn(name, budgets, f"{name} : budget absent de {os.path.basename(BUDGET_FILE)}")
+                self.assertEqual(
+                    large[name]['queries'], budgets[name]['queries'],
+                    f"{name} : budget de requêtes modifié (UPDATE_QUERY_BUDGETS=1 pour l'enregistrer)",
+                )
+                self.assertLess(large[name]['ms'], budgets[name]['ms'])
+
+    def test_route_budgets(self):
+        self._check_budgets(list(ROUTES))
+
+    def test_write_route_budgets(self):
+        # Plan sans limite : la création de produits reste possible à la grande taille
+        self.plan.max_products = None
+        self.plan.save()
+        cache.clear()
+        self._check_budgets(list(WRITE_ROUTES))
+
+    def test_every_route_is_budgeted(self):
+        """Toute route de api/urls.py, pour chaque méthode, a un budget ou une exemption justifiée"""
+        with open(BUDGET_FILE) as handle:
+            budgets = json.load(handle)
+        self.assertEqual(sorted(budgets), sorted([*ROUTES, *WRITE_ROUTES]))
+
+        missing = []
+        for name in _route_methods():
+            if name not in ROUTES and name not in WRITE_ROUTES and name not in EXEMPT and name not in missing:
+                missing.append(name)
+        self.assertEqual(missing, [])
+
+
+def _route_methods():
+    """Routes de api/urls.py par méthode : 'route' pour GET, 'MÉTHODE route' pour les autres"""
+    def walk(patterns):
+        for pattern in patterns:
+            if hasattr(pattern, 'url_patterns'):
+                yield from walk(pattern.url_patterns)
+                continue
+            if not pattern.name:
+                continue
+            callback = pattern.callback
+            actions = getattr(callback, 'actions', None)
+            view_class = getattr(callback, 'view_class', getattr(callback, 'cls', None))
+            if actions is not None:
+                methods = list(actions)
+            elif view_class is None:
+                methods = ['get']
+            else:
+                methods = [method for method in ('get', 'post', 'put', 'patch', 'delete') if hasattr(view_class, method)]
+            for method in methods:
+                if method in ('head', 'options'):  # Servies par GET / par DRF (ajoutées à la première requête)
+                    continue
+                yield pattern.name if method == 'get' else f'{method.upper()} {pattern.name}'
+    return walk(get_resolver('api.urls').url_patterns)
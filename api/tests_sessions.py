@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+class PathAwareSessionTest(TestCase):
+    """Sessions du site web uniquement : l'API authentifiée par jeton ne lit ni n'écrit de session"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='caisse', password='testpass123')
+        self.client.force_login(self.user)  # Cookie de session conservé par le client
+
+    def _session_queries(self, path, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, **headers)
+        return response, [query['sql'] for query in queries if 'django_session' in query['sql']]
+
+    def test_token_request_ignores_session_cookie(self):
+        token = AccessToken.for_user(self.user)
+        response, session_queries = self._session_queries('/api/v1/products/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session_queries, [])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_browser_api_request_reads_but_does_not_save_session(self):
+        response, session_queries = self._session_queries('/api/v1/products/')
+        self.assertEqual(response.status_code, 200)  # SessionAuthentication
+        self.assertEqual(len(session_queries), 1)
+        self.assertTrue(session_queries[0].lstrip().upper().startswith('SELECT'))
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_web_pages_keep_saving_every_request(self):
+        self.assertFalse(settings.SESSION_SAVE_EVERY_REQUEST)  # Expiration glissante limitée au site web
+        response, session_queries = self._session_queries('/core/login/')
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertTrue(any(sql.lstrip().upper().startswith('UPDATE') for sql in session_queries))
+
+    @override_settings(SESSION_SAVE_EVERY_REQUEST=True)
+    def test_legacy_setting_still_skipped_for_api(self):
+        response, session_queries = self._session_queries('/api/v1/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(session_queries), 1)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
@@ -0,0 +1,178 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.tests_cache import redis_caches
+from apps.core.models import Configuration
+from apps.core.site_context import SiteContext, get_site_context, request_scope
+from apps.core.utils import get_configuration
+from apps.inventory.models import LabelSetting
+from apps.loyalty.services import LoyaltyService
+from apps.subscription.models import Plan, Subscription
+from apps.subscription.services import SubscriptionService
+
+User = get_user_model()
+
+
+class SiteContextTestMixin:
+
+    def setUp(self):
+        cache.clear()
+        self.starter = Plan.objects.create(name='Contexte Base', slug='contexte-base', max_products=100)
+        self.pro = Plan.objects.create(name='Contexte Pro', slug='contexte-pro', max_products=1000)
+        self.user = User.objects.create_user(username='caissier', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Contexte', site_owner=self.user, nom_societe='Test Company', adresse='Bamako',
+            telephone='123456789', email='test@example.com', devise='EUR', subscription_plan=self.starter,
+        )
+        self.user.site_configuration = self.site
+        self.user.is_site_admin = True
+        self.user.save()
+        # Programme créé d'avance : sa création invalide le contexte du site
+        self.program = LoyaltyService.load_program(self.site)
+        self.label_setting = LabelSetting.objects.create(site_configuration=self.site, default_copies=2)
+
+    def _context(self):
+        return SiteContext(user=User.objects.select_related('site_configuration').get(pk=self.user.pk))
+
+
+class SharedSiteContextTest(SiteContextTestMixin, TestCase):
+    """Avec Redis : valeurs servies par le cache partagé entre requêtes, invalidées après commit"""
+
+    def setUp(self):
+        overrides = override_settings(CACHES=redis_caches())
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        with self.captureOnCommitCallbacks(execute=True):
+            super().setUp()
+
+    def test_warm_cache_costs_no_query(self):
+        context = self._context()
+        self.assertEqual(context.limits['max_products'], 100)
+        self.assertEqual(context.label_settings.default_copies, 2)
+        self.assertEqual(context.loyalty_program.amount_for_points, 10)  # Valeurs par défaut EUR
+        self.assertEqual(context.currency['code'], 'EUR')
+
+        context = self._context()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(context.plan.slug, 'contexte-base')
+            self.assertEqual(context.label_settings.default_copies, 2)
+            self.assertIsNotNone(context.loyalty_program)
+            self.assertEqual(SubscriptionService.get_site_plan(self.site).slug, 'contexte-base')
+            self.assertEqual(LoyaltyService.get_program(self.site).pk, context.loyalty_program.pk)
+        self.assertEqual(len(queries), 0)
+
+    def test_changes_are_seen(self):
+        context = self._context()
+        context.plan, context.label_settings, context.loyalty_program
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.create(
+                site=self.site, plan=self.pro, status='active', current_period_end=timezone.now() + timedelta(days=30),
+            )
+            self.label_setting.default_copies = 5
+            self.label_setting.save()
+            self.program.amount_for_points = 50
+            self.program.save()
+            # Pas avant la validation : une lecture concurrente remettrait l'ancienne valeur en cache
+            self.assertEqual(self._context().label_settings.default_copies, 2)
+
+        context = self._context()
+        self.assertEqual(context.plan.slug, 'contexte-pro')
+        self.assertEqual(context.limits['max_products'], 1000)
+        self.assertEqual(context.label_settings.default_copies, 5)
+        self.assertEqual(context.loyalty_program.amount_for_points, 50)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pro.max_products = 2000
+            self.pro.save()
+        self.assertEqual(self._context().limits['max_products'], 2000)
+
+    def test_plan_deleted_is_forgotten(self):
+        self.assertEqual(self._context().plan, self.starter)
+        starter_pk = self.starter.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.starter.delete()  # Site sans plan assigné : plan gratuit (s'il existe)
+        plan = self._context().plan
+        self.assertTrue(plan is None or plan.pk != starter_pk)
+
+    def test_expired_subscription_plan_not_served(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.create(
+                site=self.site, plan=self.pro, status='active', current_period_end=timezone.now() + timedelta(hours=1),
+            )
+        self.assertEqual(self._context().plan, self.pro)
+        later = timezone.now() + timedelta(hours=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertEqual(self._context().plan, self.starter)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self._context().plan, self.starter)
+            self.assertEqual(len(queries), 1)  # Utilisateur seul : plan assigné de nouveau en cache
+
+    def test_superuser_default_site_cached(self):
+        admin = User.objects.create_superuser(username='admin', password='testpass123', email='admin@example.com')
+        self.assertEqual(SiteContext(user=admin).site, self.site)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(SiteContext(user=admin).require_site(), self.site)
+        self.assertEqual(len(queries), 0)
+
+        self.assertEqual(get_configuration(admin), self.site)
+        self.assertEqual(get_configuration(), self.site)
+
+        # Site supprimé : le site par défaut en cache est oublié, un nouveau est créé
+        with self.captureOnCommitCallbacks(execute=True):
+            self.site.delete()
+        self.assertEqual(SiteContext(user=admin).site.site_name, 'Site Principal')
+
+
+
+class LocalSiteContextTest(SiteContextTestMixin, TestCase):
+    """Sans Redis : rien n'est partagé entre requêtes, valeurs mémorisées pour la requête"""
+
+    def test_values_memoized_per_request_only(self):
+        self.assertEqual(self._context().plan.slug, 'contexte-base')
+        site = Configuration.objects.get(pk=self.site.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(SubscriptionService.get_site_plan(site).slug, 'contexte-base')
+        self.assertGreater(len(queries), 0)  # Pas de cache local entre requêtes
+
+        with request_scope():
+            plan = SubscriptionService.get_site_plan(site)
+            LoyaltyService.get_program(site)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertIs(SubscriptionService.get_site_plan(site), plan)
+                LoyaltyService.get_program(site)
+            self.assertEqual(len(queries), 0)
+
+            # Modification validée pendant la requête : relue
+            with self.captureOnCommitCallbacks(execute=True):
+                self.program.amount_for_points = 50
+                self.program.save()
+            self.assertEqual(LoyaltyService.get_program(site).amount_for_points, 50)
+
+    def test_resolved_once_per_request(self):
+        request = APIRequestFactory().get('/api/v1/products/')
+        request.user = self.user
+        context = get_site_context(request)
+        self.assertIs(get_site_context(request), context)
+        self.assertEqual(context.require_site(), self.site)
+
+        client = APIClient(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.assertEqual(client.get('/api/v1/configuration/').status_code, 200)
+
+    def test_web_configuration_uses_site_context(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/core/configuration/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['object'], self.site)
+        response = self.client.get('/core/configuration/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['nom_societe'], 'Test Company')
@@ -0,0 +1,101 @@
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.core.models import Configuration
+from apps.inventory.models import Barcode, Product
+
+User = get_user_model()
+
+
+class StockAlertListAPITest(TestCase):
+    """Tests des listes stock faible / rupture / backorders paginées par curseur"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='alerts', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Alertes',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        # Stocks : 3 faibles (1..3), 2 ruptures, 1 backorder, 4 normaux
+        for quantity in (1, 2, 3, 0, 0, -2, 10, 20, 30, 40):
+            self._product(quantity)
+
+    def _product(self, quantity):
+        product = Product.objects.create(
+            name=f'Produit {Product.objects.count()}', purchase_price=Decimal('100'), selling_price=Decimal('150'),
+            quantity=quantity, alert_threshold=5, site_configuration=self.site,
+        )
+        Barcode.objects.create(product=product, ean=f'{3000000000000 + product.id}', is_primary=True)
+        return product
+
+    def test_legacy_list_shape(self):
+        """Sans paramètre : liste complète, comme avant"""
+        response = self.client.get('/api/v1/products/out_of_stock/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(p['quantity'] for p in response.data), ['-2.000', '0.000', '0.000'])
+        self.assertTrue(all(p['primary_barcode'] for p in response.data))
+
+    def test_cursor_pagination_and_counts(self):
+        """Pages par curseur sans doublon, compteurs sur la première page"""
+        first = self.client.get('/api/v1/products/low_stock/', {'page_size': 2}).data
+        self.assertEqual(first['counts'], {'low_stock': 3, 'out_of_stock': 3, 'backorders': 1})
+        self.assertTrue(first['has_more'])
+        second = self.client.get('/api/v1/products/low_stock/', {'page_size': 2, 'cursor': first['next_cursor']}).data
+        self.assertNotIn('counts', second)
+        self.assertFalse(second['has_more'])
+        ids = [p['id'] for p in first['results'] + second['results']]
+        expected = list(
+            Product.objects.filter(quantity__gt=0, quantity__lte=F('alert_threshold')).order_by('id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(self.client.get('/api/v1/products/low_stock/', {'cursor': 'x'}).status_code, 400)
+
+    def test_query_count_independent_of_page_size(self):
+        """Ni code-barres ni copie interrogés produit par produit"""
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get('/api/v1/products/low_stock/', {'page_size': 100})
+            return len(ctx.captured_queries)
+
+        small = count_queries()
+        for _ in range(10):
+            self._product(1)
+        self.assertEqual(count_queries(), small)
+
+    def _plan(self, condition):
+        queryset = Product.objects.filter(site_configuration=self.site).filter(condition).order_by('id').values('id')
+        return queryset.explain()
+
+    @skipUnless(connection.vendor == 'postgresql', 'Plan PostgreSQL')
+    def test_postgres_uses_partial_indexes(self):
+        """Chaque liste est servie par son index partiel"""
+        from api.views import ProductViewSet
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        self.assertIn('inv_product_low_stock', self._plan(ProductViewSet.STOCK_ALERT_FILTERS['low_stock']))
+        self.assertIn('inv_product_out_of_stock', self._plan(ProductViewSet.STOCK_ALERT_FILTERS['out_of_stock']))
+        self.assertIn('inv_product_backorder', self._plan(ProductViewSet.STOCK_ALERT_FILTERS['backorders']))
+
+    @skipUnless(connection.vendor == 'sqlite', 'Plan SQLite')
+    def test_sqlite_fallback_plan(self):
+        """SQLite (requêtes paramétrées) : recherche par l'index du site, jamais de parcours complet"""
+        from api.views import ProductViewSet
+
+        for condition in ProductViewSet.STOCK_ALERT_FILTERS.values():
+            self.assertIn('SEARCH inventory_product USING', self._plan(condition))
@@ -11,14 +11,16 @@ from .views import (
     ConfigurationAPIView, CurrenciesAPIView, SitesAPIView, ParametresAPIView, ConfigurationResetAPIView,
     UserProfileAPIView, UserInfoAPIView, UserPermissionsAPIView, UserListAPIView, PublicSignUpAPIView, SimpleSignUpAPIView,
     DeleteAccountAPIView, ChangePasswordAPIView,
-    ProductViewSet, CategoryViewSet, BrandViewSet, TransactionViewSet, SaleViewSet,
+    ProductViewSet, CategoryViewSet, BrandViewSet, TransactionViewSet, TransactionArchiveViewSet, SaleViewSet,
     CustomerViewSet, CreditTransactionViewSet,
     RefreshTokenView, ForceLogoutAllView,
     PasswordResetRequestView, PasswordResetConfirmView,
     LabelTemplateViewSet, LabelBatchViewSet, BarcodeViewSet, LabelGeneratorAPIView,
-    CatalogPDFAPIView, LabelPrintAPIView, ReceiptPrintAPIView,
+    CatalogPDFAPIView, CatalogGenerationStatusAPIView, LabelPrintAPIView, ReceiptPrintAPIView,
     collect_static_files, GetRayonsView, GetSubcategoriesMobileView,
-    ProductCopyAPIView, ProductCopyManagementAPIView, BrandsByRayonAPIView,
+    ProductCopyAPIView, ProductCopyJobAPIView, ProductCopyManagementAPIView, BrandsByRayonAPIView,
+    ProductImportAPIView, ProductImportJobAPIView, InventoryCountSessionViewSet, StockValuationAPIView, ReorderAPIView, ReorderJobAPIView,
+    StockAlertAPIView,
     CategoryRecommendationAPIView,
     LoyaltyProgramAPIView, LoyaltyAccountAPIView, LoyaltyPointsAPIView
 )
@@ -43,12 +45,14 @@ router.register(r'products', ProductViewSet, basename='product')
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'brands', BrandViewSet, basename='brand')
 router.register(r'transactions', TransactionViewSet, basename='transaction')
+router.register(r'transactions-archive', TransactionArchiveViewSet, basename='transaction-archive')
 router.register(r'sales', SaleViewSet, basename='sale')
 router.register(r'customers', CustomerViewSet, basename='customer')
 router.register(r'credit-transactions', CreditTransactionViewSet, basename='credit-transaction')
 router.register(r'labels/templates', LabelTemplateViewSet, basename='label-template')
 router.register(r'labels/batches', LabelBatchViewSet, basename='label-batch')
 router.register(r'barcodes', BarcodeViewSet, basename='barcode')
+router.register(r'inventory/count-sessions', InventoryCountSessionViewSet, basename='inventory-count-session')
 
 urlpatterns = [
     # Documentation API
@@ -97,6 +101,8 @@ urlpatterns = [
     
     # Modes d'impression
     path('catalog/pdf/', CatalogPDFAPIView.as_view(), name='api_catalog_pdf'),
+    path('catalog/generations/<int:pk>/', CatalogGenerationStatusAPIView.as_view(), name='api_catalog_generation_status'),
+    path('catalog/generations/<int:pk>/download/', CatalogGenerationStatusAPIView.as_view(), {'download': True}, name='api_catalog_generation_download'),
     path('labels/print/', LabelPrintAPIView.as_view(), name='api_label_print'),
     path('receipts/print/', ReceiptPrintAPIView.as_view(), name='api_receipt_print'),
     
@@ -107,6 +113,15 @@ urlpatterns = [
     # Copie de produits entre sites
     path('inventory/copy/', ProductCopyAPIView.as_view(), name='api_product_copy'),
     path('inventory/copy/management/', ProductCopyManagementAPIView.as_view(), name='api_product_copy_management'),
+    path('inventory/copy/jobs/<int:pk>/', ProductCopyJobAPIView.as_view(), name='api_product_copy_job'),
+    
+    # Import de produits (CSV/XLSX)
+    path('inventory/import/', ProductImportAPIView.as_view(), name='api_product_import'),
+    path('inventory/import/<int:pk>/', ProductImportJobAPIView.as_view(), name='api_product_import_job'),
+    path('reports/stock-valuation/', StockValuationAPIView.as_view(), name='api_stock_valuation'),
+    path('inventory/reorder/', ReorderAPIView.as_view(), name='api_reorder'),
+    path('inventory/reorder/<int:pk>/', ReorderJobAPIView.as_view(), name='api_reorder_job'),
+    path('inventory/stock-alerts/', StockAlertAPIView.as_view(), name='api_stock_alerts'),
     
     # Marques par rayon
     path('brands/by-rayon/', BrandsByRayonAPIView.as_view(), name='api_brands_by_rayon'),
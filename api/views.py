@@ -7,17 +7,19 @@ from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Sum, F, Count
+from django.urls import reverse
+from django.db.models import Q, Sum, F, Count, Max, Prefetch, Subquery, OuterRef
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils import timezone
-from django.core.cache import cache
+import hashlib
 import unicodedata
 import re
 import requests
 import json
 from apps.core.forms import CustomUserUpdateForm, PublicSignUpForm
 from apps.core.models import User, Configuration, Parametre, Activite, PasswordResetToken
+from apps.core.site_context import default_site, get_site_context
 from apps.core.services import (
     PermissionService, UserInfoService,
     can_user_manage_brand_quick, can_user_create_brand_quick, can_user_delete_brand_quick,
@@ -28,7 +30,7 @@ from decimal import Decimal
 
 from .serializers import (
     ProductSerializer, ProductListSerializer, CategorySerializer, BrandSerializer,
-    TransactionSerializer, SaleSerializer, BarcodeSerializer,
+    TransactionSerializer, TransactionArchiveSerializer, SaleSerializer, BarcodeSerializer,
     CustomerSerializer, CreditTransactionSerializer,
     LabelTemplateSerializer, LabelBatchSerializer, UserSerializer,
     LoginSerializer, RefreshTokenSerializer, ProductScanSerializer,
@@ -72,6 +74,17 @@ import json
 import logging
 
 logger = logging.getLogger(__name__)
+
+
+def upload_summary(request):
+    """Champs, fichiers (taille, type) et origine d'une requête d'envoi, pour les logs DEBUG"""
+    return {
+        'fields': sorted(key for key in request.data.keys() if key not in request.FILES),
+        'files': {name: (f.size, f.content_type) for name, f in request.FILES.items()},
+        'origin': request.META.get('HTTP_ORIGIN'),
+        'user_agent': request.META.get('HTTP_USER_AGENT'),
+    }
+
 from django.http import Http404
 from apps.inventory.printing.pdf import render_label_batch_pdf
 from apps.inventory.printing.tsc import render_label_batch_tsc
@@ -143,16 +156,16 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             # Log de la déconnexion
-            print(f"🔐 Déconnexion de l'utilisateur: {request.user.username}")
+            logger.info("🔐 [LOGOUT] Déconnexion de l'utilisateur %s", request.user.username)
             
             # Invalider le token de rafraîchissement si fourni
             refresh_token = request.data.get('refresh')
             if refresh_token:
                 try:
                     RefreshToken(refresh_token).blacklist()
-                    print(f"✅ Token refresh invalidé pour: {request.user.username}")
+                    logger.debug("✅ [LOGOUT] Token refresh invalidé pour %s", request.user.username)
                 except Exception as e:
-                    print(f"⚠️ Erreur invalidation token: {e}")
+                    logger.warning("⚠️ [LOGOUT] Erreur invalidation token: %s", e)
             
             # Invalider tous les tokens de l'utilisateur (optionnel)
             # Cette option force la déconnexion sur tous les appareils
@@ -161,7 +174,11 @@ class LogoutView(APIView):
                 # Blacklister tous les tokens de l'utilisateur
                 from rest_framework_simplejwt.tokens import OutstandingToken
                 OutstandingToken.objects.filter(user=request.user).update(blacklisted=True)
-                print(f"🚫 Tous les tokens invalidés pour: {request.user.username}")
+                logger.info("🚫 [LOGOUT] Tous les tokens invalidés pour %s", request.user.username)
+            
+            # L'utilisateur authentifié en cache est relu en base à la prochaine requête
+            from apps.core.services import UserInfoService
+            UserInfoService.invalidate_user_cache(request.user.id)
             
             return Response({
                 'message': 'Déconnexion réussie',
@@ -171,7 +188,7 @@ class LogoutView(APIView):
                 'all_devices_logged_out': force_logout_all
             })
         except Exception as e:
-            print(f"❌ Erreur lors de la déconnexion: {e}")
+            logger.exception("❌ [LOGOUT] Erreur lors de la déconnexion: %s", e)
             return Response(
                 {'error': 'Erreur lors de la déconnexion'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -184,7 +201,7 @@ class ForceLogoutAllView(APIView):
     
     def post(self, request):
         try:
-            print(f"🚫 Force déconnexion tous appareils pour: {request.user.username}")
+            logger.info("🚫 [LOGOUT_ALL] Force déconnexion tous appareils pour %s", request.user.username)
             
             # Version robuste qui fonctionne avec la configuration actuelle
             tokens_count = 0
@@ -192,13 +209,12 @@ class ForceLogoutAllView(APIView):
             # Méthode 1 : Essayer OutstandingToken (si configuré)
             try:
                 from rest_framework_simplejwt.tokens import OutstandingToken
-                print("✅ OutstandingToken importé avec succès")
                 tokens_count = OutstandingToken.objects.filter(user=request.user).update(blacklisted=True)
-                print(f"✅ {tokens_count} tokens invalidés via OutstandingToken")
+                logger.debug("✅ [LOGOUT_ALL] %s tokens invalidés via OutstandingToken", tokens_count)
             except ImportError:
-                print("⚠️ OutstandingToken non disponible")
+                logger.warning("⚠️ [LOGOUT_ALL] OutstandingToken non disponible")
             except Exception as e:
-                print(f"⚠️ Erreur OutstandingToken: {e}")
+                logger.warning("⚠️ [LOGOUT_ALL] Erreur OutstandingToken: %s", e)
             
             # Méthode 2 : Blacklister le refresh token actuel
             refresh_token = request.data.get('refresh')
@@ -206,30 +222,30 @@ class ForceLogoutAllView(APIView):
                 try:
                     RefreshToken(refresh_token).blacklist()
                     tokens_count += 1
-                    print(f"✅ Refresh token blacklisté")
+                    logger.debug("✅ [LOGOUT_ALL] Refresh token blacklisté")
                 except Exception as e:
-                    print(f"⚠️ Erreur blacklist refresh token: {e}")
+                    logger.warning("⚠️ [LOGOUT_ALL] Erreur blacklist refresh token: %s", e)
             
             # Méthode 3 : Invalider la session Django (pour le desktop)
             try:
                 from django.contrib.auth import logout
                 logout(request)
-                print("✅ Session Django invalidée")
+                logger.debug("✅ [LOGOUT_ALL] Session Django invalidée")
             except Exception as e:
-                print(f"⚠️ Erreur invalidation session: {e}")
+                logger.warning("⚠️ [LOGOUT_ALL] Erreur invalidation session: %s", e)
             
             # Méthode 4 : Marquer l'utilisateur comme déconnecté
             try:
                 request.user.is_active = False
                 request.user.save()
-                print("✅ Utilisateur marqué comme inactif")
+                logger.debug("✅ [LOGOUT_ALL] Utilisateur marqué comme inactif")
                 # Remettre actif pour permettre les futures connexions
                 request.user.is_active = True
                 request.user.save()
             except Exception as e:
-                print(f"⚠️ Erreur marquage utilisateur: {e}")
+                logger.warning("⚠️ [LOGOUT_ALL] Erreur marquage utilisateur: %s", e)
             
-            print(f"✅ Total: {tokens_count} tokens invalidés pour: {request.user.username}")
+            logger.info("✅ [LOGOUT_ALL] %s tokens invalidés pour %s", tokens_count, request.user.username)
             
             return Response({
                 'message': 'Déconnexion forcée sur tous les appareils',
@@ -238,9 +254,7 @@ class ForceLogoutAllView(APIView):
                 'timestamp': timezone.now().isoformat()
             })
         except Exception as e:
-            print(f"❌ Erreur lors de la déconnexion forcée: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ [LOGOUT_ALL] Erreur lors de la déconnexion forcée: %s", e)
             return Response(
                 {'error': f'Erreur lors de la déconnexion forcée: {str(e)}'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -331,7 +345,7 @@ class PasswordResetRequestView(APIView):
                     site_config = user.site_configuration
                 else:
                     # Fallback vers la première configuration disponible
-                    site_config = Configuration.objects.first()
+                    site_config = default_site()
                 
                 # Déterminer l'email d'envoi (expéditeur)
                 # Priorité : email du site > EMAIL_HOST_USER (si ce n'est pas "apikey" pour SendGrid) > fallback
@@ -411,16 +425,13 @@ L'équipe {site_name}
                 # Envoyer l'email de manière asynchrone dans un thread séparé
                 # pour éviter de bloquer la requête HTTP (évite les timeouts Gunicorn)
                 def send_email_async():
-                    import sys
                     try:
-                        # Forcer l'affichage des logs immédiatement
-                        print(f"[EMAIL_THREAD] Tentative d'envoi d'email OTP à {user.email} depuis {from_email}", flush=True)
-                        logger.info(f"[EMAIL_THREAD] Tentative d'envoi d'email OTP à {user.email} depuis {from_email}")
+                        logger.info("[EMAIL_THREAD] Tentative d'envoi d'email OTP à %s depuis %s", user.email, from_email)
                         
                         # Vérifier si on utilise SendGrid Web API
                         # Vérifier d'abord dans settings, puis dans os.getenv
                         sendgrid_api_key = getattr(settings, 'SENDGRID_API_KEY', None) or os.getenv('SENDGRID_API_KEY', None)
-                        print(f"[EMAIL_THREAD] SENDGRID_API_KEY détectée: {'Oui' if sendgrid_api_key else 'Non'}", flush=True)
+                        logger.debug("[EMAIL_THREAD] SENDGRID_API_KEY détectée: %s", 'Oui' if sendgrid_api_key else 'Non')
                         
                         # Vérifier si sendgrid est disponible
                         sendgrid_available = False
@@ -431,7 +442,6 @@ L'équipe {site_name}
                                 sendgrid_available = True
                             except ImportError:
                                 # Le package sendgrid n'est pas installé - utiliser SMTP en fallback
-                                print(f"[EMAIL_THREAD] ⚠️ Package 'sendgrid' non installé, utilisation de SMTP en fallback", flush=True)
                                 logger.warning("Package 'sendgrid' non installé. Utilisation du fallback SMTP. Veuillez redéployer l'application pour installer le package depuis requirements.txt")
                                 sendgrid_available = False
                         
@@ -450,22 +460,20 @@ L'équipe {site_name}
                                 sg = SendGridAPIClient(sendgrid_api_key)
                                 response = sg.send(message)
                                 
-                                print(f"[EMAIL_THREAD] Résultat SendGrid API: {response.status_code}", flush=True)
-                                print(f"[EMAIL_THREAD] Response body: {response.body}", flush=True)
-                                print(f"[EMAIL_THREAD] Response headers: {response.headers}", flush=True)
+                                logger.debug(
+                                    "[EMAIL_THREAD] Résultat SendGrid API: %s", response.status_code,
+                                    extra={'response_body': response.body, 'response_headers': response.headers},
+                                )
                                 
                                 if response.status_code in [200, 202]:
-                                    print(f"[EMAIL_THREAD] ✅ Code OTP envoyé avec succès à {user.email}", flush=True)
                                     logger.info(f"✅ Code OTP envoyé avec succès à {user.email} pour {user.username} (SendGrid API)")
                                 else:
-                                    print(f"[EMAIL_THREAD] ⚠️ SendGrid API a retourné {response.status_code}", flush=True)
                                     logger.warning(f"⚠️ SendGrid API a retourné {response.status_code} pour {user.email}")
                                     logger.warning(f"   Response body: {response.body}")
                                     logger.warning(f"   Response headers: {response.headers}")
                             except Exception as sendgrid_error:
                                 # Gestion d'erreur SendGrid spécifique
                                 error_msg = str(sendgrid_error)
-                                print(f"[EMAIL_THREAD] ❌ Erreur SendGrid: {error_msg}", flush=True)
                                 logger.error(f"❌ Erreur SendGrid lors de l'envoi à {user.email}: {error_msg}", exc_info=True)
                                 # Ne pas lever l'exception, continuer avec le fallback SMTP si possible
                                 raise sendgrid_error
@@ -486,20 +494,11 @@ L'équipe {site_name}
                                 email.attach_alternative(message_html, "text/html")
                             
                             result = email.send()
-                            print(f"[EMAIL_THREAD] Résultat send(): {result}", flush=True)
-                            
                             if result == 1:
-                                print(f"[EMAIL_THREAD] ✅ Code OTP envoyé avec succès à {user.email}", flush=True)
                                 logger.info(f"✅ Code OTP envoyé avec succès à {user.email} pour {user.username}")
                             else:
-                                print(f"[EMAIL_THREAD] ⚠️ send() a retourné {result} (attendu: 1)", flush=True)
                                 logger.warning(f"⚠️ send_mail a retourné {result} (attendu: 1) pour {user.email}")
                     except Exception as email_error:
-                        # Logger l'erreur détaillée avec print pour forcer l'affichage
-                        error_msg = str(email_error)
-                        print(f"[EMAIL_THREAD] ❌ Erreur: {error_msg}", flush=True)
-                        import traceback
-                        traceback.print_exc()
                         logger.error(f"❌ Erreur lors de l'envoi de l'email à {user.email}: {email_error}", exc_info=True)
                         sendgrid_api_key_check = getattr(settings, 'SENDGRID_API_KEY', None)
                         if sendgrid_api_key_check:
@@ -507,7 +506,7 @@ L'équipe {site_name}
                         else:
                             logger.error(f"   SMTP Config - Host: {settings.EMAIL_HOST}, Port: {settings.EMAIL_PORT}, User: {settings.EMAIL_HOST_USER}, Timeout: {getattr(settings, 'EMAIL_TIMEOUT', 'Non défini')}")
                     finally:
-                        print(f"[EMAIL_THREAD] Thread terminé pour {user.email}", flush=True)
+                        logger.debug("[EMAIL_THREAD] Thread terminé pour %s", user.email)
                 
                 # Démarrer l'envoi d'email dans un thread séparé
                 email_thread = threading.Thread(target=send_email_async, daemon=True)
@@ -654,7 +653,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         else:
             # Utilisateur sans site configuré (comme mobile) voit tous les produits
             # C'est une solution temporaire pour permettre l'accès mobile
-            print(f"⚠️  Utilisateur {self.request.user.username} sans site configuré - accès à tous les produits")
+            logger.warning("⚠️ [PRODUCTS] Utilisateur %s sans site configuré - accès à tous les produits", self.request.user.username)
             return Product.objects.select_related('category', 'brand').all()
     
     def get_serializer_class(self):
@@ -668,57 +667,48 @@ class ProductViewSet(viewsets.ModelViewSet):
         context['request'] = self.request
         return context
 
+    @staticmethod
+    def _with_primary_ean(products):
+        """Code-barres principal annoté en SQL (ProductListSerializer.primary_barcode)"""
+        primary_ean = Barcode.objects.filter(
+            product=OuterRef('pk'), is_primary=True
+        ).order_by('-added_at').values('ean')[:1]
+        return products.annotate(primary_ean=Subquery(primary_ean))
+
+    def list(self, request, *args, **kwargs):
+        """Liste paginée : code-barres principal et originaux des copies sans requête par produit"""
+        queryset = self._with_primary_ean(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        products = list(queryset) if page is None else page
+        context = self.get_serializer_context()
+        context['copy_originals'] = get_copy_originals_map([p.id for p in products])
+        serializer = ProductListSerializer(products, many=True, context=context)
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
     def retrieve(self, request, *args, **kwargs):
-        """Récupérer un produit avec logs détaillés sur l'image"""
+        """Récupérer un produit (image journalisée en DEBUG)"""
         instance = self.get_object()
-        
-        # ✅ Logs détaillés sur l'image
-        print(f"🔍 DÉTAIL PRODUIT: {instance.name} (ID: {instance.id})")
-        print(f"   CUG: {instance.cug}")
-        print(f"   Site: {instance.site_configuration.site_name if instance.site_configuration else 'Aucun'}")
-        print(f"   Image field: {instance.image}")
-        if instance.image:
-            try:
-                print(f"   Image URL directe: {instance.image.url}")
-                # Tester l'URL via le serializer
-                serializer = self.get_serializer(instance)
-                image_url_from_serializer = serializer.data.get('image_url')
-                print(f"   Image URL via serializer: {image_url_from_serializer}")
-            except Exception as e:
-                print(f"   ❌ Erreur URL image: {e}")
-        else:
-            print("   ❌ Aucune image")
-        
-        return super().retrieve(request, *args, **kwargs)
+        data = self.get_serializer(instance).data
+        logger.debug(
+            "🔍 [PRODUCT_DETAIL] %s (ID %s, CUG %s) image %s -> %s",
+            instance.name, instance.id, instance.cug, instance.image or 'aucune', data.get('image_url'),
+        )
+        return Response(data)
 
     def create(self, request, *args, **kwargs):
         """Créer un produit avec gestion améliorée des images"""
-        try:
-            print(f"🆕 Création produit - Méthode: {request.method}")
-            print(f"📦 Données reçues: {dict(request.data)}")
-            print(f"📎 Fichiers reçus: {list(request.FILES.keys())}")
-            print(f"🌐 Origine: {request.META.get('HTTP_ORIGIN', 'Non spécifiée')}")
-            print(f"📱 User-Agent: {request.META.get('HTTP_USER_AGENT', 'Non spécifié')}")
-            
-            # Vérifier la taille des fichiers
-            for field_name, file_obj in request.FILES.items():
-                print(f"📏 Fichier {field_name}: {file_obj.size} bytes, type: {file_obj.content_type}")
-                if file_obj.size > 50 * 1024 * 1024:  # 50MB
-                    return Response(
-                        {'error': f'Fichier {field_name} trop volumineux (max 50MB)'},
-                        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
-                    )
-            
-            # Log spécifique pour l'image
-            if 'image' in request.FILES:
-                image_file = request.FILES['image']
-                print(f"🖼️ Image reçue: {image_file.name}, {image_file.size} bytes, {image_file.content_type}")
-                print(f"🎨 Image sera traitée automatiquement par Product.save()")
-            else:
-                print(f"❌ Aucune image reçue")
-            
-        except Exception as e:
-            print(f"⚠️  Erreur lors du logging de création: {e}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("🆕 [PRODUCT_CREATE] %s", upload_summary(request))
+
+        # Vérifier la taille des fichiers
+        for field_name, file_obj in request.FILES.items():
+            if file_obj.size > 50 * 1024 * 1024:  # 50MB
+                return Response(
+                    {'error': f'Fichier {field_name} trop volumineux (max 50MB)'},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                )
         
         # Vérifier la limite de produits (sauf pour les superusers)
         if not request.user.is_superuser:
@@ -741,36 +731,20 @@ class ProductViewSet(viewsets.ModelViewSet):
         
         # Vérifier si le produit a été créé avec succès
         if hasattr(response, 'data') and 'id' in response.data:
-            product_id = response.data['id']
-            print(f"✅ Produit créé avec ID: {product_id}")
-            print(f"🎨 Le traitement automatique de background devrait avoir été appliqué par Product.save()")
+            logger.info("✅ [PRODUCT_CREATE] Produit créé avec ID %s", response.data['id'])
         
         return response
 
     def update(self, request, *args, **kwargs):
-        # Log de debug pour suivre les mises à jour complètes (PUT)
-        try:
-            print("📝 Update Product (PUT) - payload:", request.data)
-            try:
-                print("📎 Fichiers reçus (PUT):", list(request.FILES.keys()))
-            except Exception:
-                pass
-        except Exception:
-            pass
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("📝 [PRODUCT_UPDATE] PUT %s", upload_summary(request))
         # Autoriser une mise à jour partielle même via PUT pour simplifier côté mobile
         kwargs['partial'] = True
         return super().update(request, *args, **kwargs)
 
     def partial_update(self, request, *args, **kwargs):
-        # Log de debug pour suivre les mises à jour partielles (PATCH)
-        try:
-            print("📝 Update Product (PATCH) - payload:", request.data)
-            try:
-                print("📎 Fichiers reçus (PATCH):", list(request.FILES.keys()))
-            except Exception:
-                pass
-        except Exception:
-            pass
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("📝 [PRODUCT_UPDATE] PATCH %s", upload_summary(request))
         return super().partial_update(request, *args, **kwargs)
 
     @action(detail=True, methods=['post'], url_path='upload_image')
@@ -781,54 +755,44 @@ class ProductViewSet(viewsets.ModelViewSet):
         import time
         start_time = time.time()
         
-        try:
-            print("🖼️  Upload image (POST) - payload:", dict(request.data))
-            print("📎 Fichiers reçus (POST):", list(request.FILES.keys()))
-            print(f"🌐 Origine: {request.META.get('HTTP_ORIGIN', 'Non spécifiée')}")
-            print(f"📱 User-Agent: {request.META.get('HTTP_USER_AGENT', 'Non spécifié')}")
-            
-            # Vérifier la taille des fichiers avec limite augmentée
-            for field_name, file_obj in request.FILES.items():
-                print(f"📏 Fichier {field_name}: {file_obj.size} bytes, type: {file_obj.content_type}")
-                if file_obj.size > 100 * 1024 * 1024:  # 100MB au lieu de 50MB
-                    return Response(
-                        {'error': f'Fichier {field_name} trop volumineux (max 100MB)'},
-                        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
-                    )
-                    
-        except Exception as e:
-            print(f"⚠️  Erreur lors du logging d'upload: {e}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("🖼️ [UPLOAD_IMAGE] %s", upload_summary(request))
+
+        # Vérifier la taille des fichiers avec limite augmentée
+        for field_name, file_obj in request.FILES.items():
+            if file_obj.size > 100 * 1024 * 1024:  # 100MB au lieu de 50MB
+                return Response(
+                    {'error': f'Fichier {field_name} trop volumineux (max 100MB)'},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                )
 
         product = get_object_or_404(Product, pk=pk)
         
         # ✅ Gestion explicite de l'image avec retry
         if 'image' in request.FILES:
-            print(f"🖼️  Gestion explicite de l'image pour le produit {product.name}")
-            
             try:
                 # Supprimer l'ancienne image si elle existe
                 if product.image:
-                    print(f"🗑️  Suppression de l'ancienne image: {product.image.name}")
+                    logger.debug("🗑️ [UPLOAD_IMAGE] Suppression de l'ancienne image %s", product.image.name)
                     try:
                         product.image.delete()
-                        print(f"✅ Ancienne image supprimée avec succès")
                     except Exception as e:
-                        print(f"⚠️  Erreur lors de la suppression de l'ancienne image: {e}")
-                        print(f"💡 L'upload continuera avec la nouvelle image")
+                        # L'upload continue avec la nouvelle image
+                        logger.warning("⚠️ [UPLOAD_IMAGE] Erreur lors de la suppression de l'ancienne image: %s", e)
                 
                 # Sauvegarder la nouvelle image avec gestion d'erreur
-                print(f"💾 Sauvegarde de la nouvelle image via le modèle")
                 serializer = self.get_serializer(product, data=request.data, partial=True)
                 serializer.is_valid(raise_exception=True)
                 self.perform_update(serializer)
                 
-                duration = time.time() - start_time
-                print(f"✅ Upload réussi en {duration:.2f}s")
+                logger.info(
+                    "✅ [UPLOAD_IMAGE] Image du produit %s enregistrée en %.2fs", product.id, time.time() - start_time
+                )
                 
                 return Response(serializer.data)
                 
             except Exception as e:
-                print(f"❌ Erreur lors de l'upload: {e}")
+                logger.exception("❌ [UPLOAD_IMAGE] Erreur lors de l'upload: %s", e)
                 return Response(
                     {'error': f'Erreur lors de l\'upload: {str(e)}'},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -892,7 +856,7 @@ class ProductViewSet(viewsets.ModelViewSet):
             else:
                 # Utilisateur normal ne peut scanner que ses produits
                 if not user_site:
-                    print("❌ Aucun site configuré pour l'utilisateur")
+                    logger.warning("❌ [SCAN] Aucun site configuré pour %s", request.user.username)
                     return Response(
                         {
                             'error': 'Aucun site configuré pour cet utilisateur',
@@ -1003,29 +967,86 @@ class ProductViewSet(viewsets.ModelViewSet):
             raise ValidationError({"detail": "Aucun site configuré pour cet utilisateur. Veuillez contacter l'administrateur."})
         serializer.save(site_configuration=user_site)
     
+    # Listes d'alerte de stock : conditions servies par les index partiels du modèle Product
+    STOCK_ALERT_FILTERS = {
+        'low_stock': Q(quantity__gt=0, quantity__lte=F('alert_threshold')),
+        'out_of_stock': Q(quantity__lte=0),
+        'backorders': Q(quantity__lt=0),
+    }
+    STOCK_ALERT_PAGE_SIZE = 50
+    STOCK_ALERT_MAX_PAGE_SIZE = 500
+
+    def _stock_alert_counts(self, products):
+        """Compteurs des trois listes en une requête (lignes lues via les index partiels)"""
+        return products.filter(
+            Q(quantity__lte=F('alert_threshold')) | Q(quantity__lte=0)
+        ).order_by().aggregate(**{
+            name: Count('id', filter=condition) for name, condition in self.STOCK_ALERT_FILTERS.items()
+        })
+
+    def _stock_alert_list(self, request, name):
+        """
+        Liste d'alerte de stock.
+
+        Sans paramètre : liste complète (format historique de l'écran mobile).
+        Avec `cursor` ou `page_size` : page triée par id (curseur = dernier id reçu),
+        et compteurs des trois listes sur la première page.
+        """
+        params = request.query_params
+        products = self.get_queryset().filter(self.STOCK_ALERT_FILTERS[name])
+        paginated = 'cursor' in params or 'page_size' in params
+        if paginated:
+            try:
+                page_size = int(params.get('page_size', self.STOCK_ALERT_PAGE_SIZE))
+                cursor = int(params['cursor']) if params.get('cursor') else None
+            except ValueError:
+                return Response(
+                    {'error': 'cursor et page_size doivent être des entiers'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            page_size = max(min(page_size, self.STOCK_ALERT_MAX_PAGE_SIZE), 1)
+            if cursor is not None:
+                products = products.filter(id__gt=cursor)
+            products = products.order_by('id')
+
+        # Code-barres principal en SQL, originaux des copies en une requête (pas de N+1)
+        products = self._with_primary_ean(products)
+        if paginated:
+            page = list(products[:page_size + 1])
+            has_more = len(page) > page_size
+            page = page[:page_size]
+        else:
+            page = list(products)
+
+        context = self.get_serializer_context()
+        context['copy_originals'] = get_copy_originals_map([p.id for p in page])
+        results = ProductListSerializer(page, many=True, context=context).data
+        if not paginated:
+            return Response(results)
+
+        data = {
+            'results': results,
+            'next_cursor': page[-1].id if has_more else None,
+            'has_more': has_more,
+        }
+        if cursor is None:
+            data['counts'] = self._stock_alert_counts(self.get_queryset())
+        return Response(data)
+
     @action(detail=False, methods=['get'])
     def low_stock(self, request):
         """Produits en stock faible"""
-        products = self.get_queryset().filter(
-            quantity__gt=0,
-            quantity__lte=F('alert_threshold')
-        )
-        serializer = ProductListSerializer(products, many=True)
-        return Response(serializer.data)
+        return self._stock_alert_list(request, 'low_stock')
     
     @action(detail=False, methods=['get'])
     def out_of_stock(self, request):
         """Produits en rupture de stock (quantité = 0) ET en backorder (quantité < 0)"""
-        products = self.get_queryset().filter(quantity__lte=0)
-        serializer = ProductListSerializer(products, many=True)
-        return Response(serializer.data)
+        return self._stock_alert_list(request, 'out_of_stock')
     
     @action(detail=False, methods=['get'])
     def backorders(self, request):
         """Produits en backorder (stock négatif) uniquement"""
-        products = self.get_queryset().filter(quantity__lt=0)
-        serializer = ProductListSerializer(products, many=True)
-        return Response(serializer.data)
+        return self._stock_alert_list(request, 'backorders')
     
     @action(detail=True, methods=['post'])
     def update_stock(self, request, pk=None):
@@ -1077,7 +1098,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         
         transactions = (
             transactions_query
-            .select_related('user')
+            .select_related('user', 'sale')
             .order_by('-transaction_date')[:50]
         )
         
@@ -1129,46 +1150,23 @@ class ProductViewSet(viewsets.ModelViewSet):
         quantity_raw = request.data.get('quantity')
         notes = request.data.get('notes', 'Ajout de stock')
         
-        # Log des données brutes reçues
-        logger.info(f"🔍 [BACKEND] add_stock - Requête complète: {request.data}")
-        logger.info(f"🔍 [BACKEND] add_stock - Product ID: {product.id}, Quantity: {quantity_raw}")
-        logger.info(f"🔍 [BACKEND] add_stock - Notes brutes (request.data.get): '{notes}'")
-        logger.info(f"🔍 [BACKEND] add_stock - Notes type: {type(notes)}, Notes repr: {repr(notes)}")
-        
         # Nouveaux paramètres de contexte métier
         context = request.data.get('context', 'manual')  # 'reception', 'inventory', 'manual'
         context_id = request.data.get('context_id')     # ID du contexte
         
-        logger.info(f"🔍 [BACKEND] add_stock - Context: '{context}', Context ID: {context_id}")
-        
         # Gestion du contexte métier
         context_notes = notes
         
         if context == 'reception':
-            logger.info(f"🔍 [BACKEND] add_stock RECEPTION - Notes reçues (type={type(notes)}): '{notes}'")
-            logger.info(f"🔍 [BACKEND] add_stock RECEPTION - Notes None? {notes is None}")
-            logger.info(f"🔍 [BACKEND] add_stock RECEPTION - Notes strip: '{notes.strip() if notes else None}'")
-            logger.info(f"🔍 [BACKEND] add_stock RECEPTION - Notes bool: {bool(notes and notes.strip())}")
             if notes and notes.strip():
                 notes_stripped = notes.strip()
-                notes_lower = notes_stripped.lower()
-                starts_with_prefix = notes_lower.startswith('réception marchandise')
-                logger.info(f"🔍 [BACKEND] add_stock RECEPTION - Notes stripped: '{notes_stripped}'")
-                logger.info(f"🔍 [BACKEND] add_stock RECEPTION - Notes lower: '{notes_lower}'")
-                logger.info(f"🔍 [BACKEND] add_stock RECEPTION - Starts with prefix? {starts_with_prefix}")
-                logger.info(f"🔍 [BACKEND] add_stock RECEPTION - Prefix check string: 'réception marchandise'")
-                logger.info(f"🔍 [BACKEND] add_stock RECEPTION - Prefix check result: {notes_lower[:22]} == 'réception marchandise'")
                 # Éviter la duplication si les notes commencent déjà par "Réception marchandise"
-                if starts_with_prefix:
+                if notes_stripped.lower().startswith('réception marchandise'):
                     context_notes = notes_stripped
-                    logger.info(f"🔍 [BACKEND] add_stock RECEPTION - ✅ Utilisation notes telles quelles: '{context_notes}'")
                 else:
                     context_notes = f'Réception marchandise - {notes_stripped}'
-                    logger.info(f"🔍 [BACKEND] add_stock RECEPTION - ✅ Ajout préfixe: '{context_notes}'")
             else:
                 context_notes = 'Réception marchandise'
-                logger.info(f"🔍 [BACKEND] add_stock RECEPTION - ✅ Notes vides, préfixe par défaut: '{context_notes}'")
-            logger.info(f"🔍 [BACKEND] add_stock RECEPTION - 📝 context_notes FINAL: '{context_notes}'")
         elif context == 'inventory':
             if notes and notes.strip():
                 # Éviter la duplication si les notes commencent déjà par "Ajustement inventaire"
@@ -1206,17 +1204,12 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
         
         # Utiliser une transaction atomique pour éviter les race conditions
+        from apps.inventory.services.stock_alerts import StockAlertService
         with transaction.atomic():
-            # Recharger le produit depuis la base pour avoir la dernière version
-            product.refresh_from_db()
-            
-            # Mettre à jour le stock
-            old_quantity = product.quantity
-            product.quantity += quantity
-            product.save()
+            # Incrément atomique (UPDATE ... RETURNING) et détection du seuil d'alerte
+            old_quantity, _ = StockAlertService.adjust_quantity(product, quantity)
             
             # Créer la transaction
-            logger.info(f"🔍 [BACKEND] Transaction.objects.create - notes à sauvegarder: '{context_notes}'")
             transaction_obj = Transaction.objects.create(
                 product=product,
                 type='in',
@@ -1226,10 +1219,10 @@ class ProductViewSet(viewsets.ModelViewSet):
                 user=request.user,
                 site_configuration=getattr(request.user, 'site_configuration', None)
             )
-            logger.info(f"🔍 [BACKEND] Transaction créée - ID: {transaction_obj.id}, notes sauvegardées (depuis DB): '{transaction_obj.notes}'")
-            # Vérifier si les notes ont changé après sauvegarde
-            transaction_obj.refresh_from_db()
-            logger.info(f"🔍 [BACKEND] Transaction après refresh - notes: '{transaction_obj.notes}'")
+        logger.debug(
+            "🔍 [ADD_STOCK] Produit %s: +%s (contexte %s/%s), transaction %s, notes %r",
+            product.id, quantity, context, context_id, transaction_obj.id, context_notes,
+        )
         
         return Response({
             'success': True,
@@ -1276,14 +1269,10 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
         
         # Utiliser une transaction atomique pour éviter les race conditions
+        from apps.inventory.services.stock_alerts import StockAlertService
         with transaction.atomic():
-            # Recharger le produit depuis la base pour avoir la dernière version
-            product.refresh_from_db()
-            
-            # Mettre à jour le stock
-            old_quantity = product.quantity
-            product.quantity -= quantity
-            product.save()
+            # Décrément atomique (UPDATE ... RETURNING) et détection du seuil d'alerte
+            old_quantity, _ = StockAlertService.adjust_quantity(product, -quantity)
             
             # Déterminer le type de transaction
             if requested_transaction_type:
@@ -1469,7 +1458,9 @@ class ProductViewSet(viewsets.ModelViewSet):
     def all_barcodes(self, request):
         """Récupérer tous les codes-barres de tous les produits"""
         # Récupérer tous les codes-barres avec les informations du produit
-        barcodes = Barcode.objects.select_related('product').all().order_by('product__name', '-is_primary', 'added_at')
+        barcodes = Barcode.objects.select_related(
+            'product', 'product__category', 'product__brand'
+        ).all().order_by('product__name', '-is_primary', 'added_at')
         
         # Sérialiser les codes-barres
         barcode_data = []
@@ -1782,31 +1773,25 @@ class CategoryViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filtrer les catégories par site de l'utilisateur en utilisant le service centralisé"""
-        print(f"🔍 CategoryViewSet.get_queryset - Utilisateur: {self.request.user.username}")
-        print(f"🔍 CategoryViewSet.get_queryset - Site utilisateur: {getattr(self.request.user, 'site_configuration', None)}")
-        
         # Utiliser le service centralisé pour obtenir les catégories accessibles
         queryset = PermissionService.get_user_accessible_resources(self.request.user, Category).select_related('parent')
         
-        print(f"🔍 CategoryViewSet.get_queryset - Queryset initial: {queryset.count()} catégories")
-        
         # Gérer les paramètres de filtrage du mobile
         site_only = self.request.GET.get('site_only', '').lower() == 'true'
         global_only = self.request.GET.get('global_only', '').lower() == 'true'
-        
-        print(f"🔍 CategoryViewSet.get_queryset - Filtres: site_only={site_only}, global_only={global_only}")
+        logger.debug(
+            "🔍 [CATEGORIES] Utilisateur %s - site_only=%s, global_only=%s",
+            self.request.user.username, site_only, global_only,
+        )
         
         # Appliquer les filtres supplémentaires
         if site_only:
             # Retourner seulement les rayons (is_rayon=True)
             queryset = queryset.filter(is_rayon=True)
-            print(f"🔍 CategoryViewSet.get_queryset - Après filtre site_only: {queryset.count()} rayons")
         elif global_only:
             # Retourner seulement les catégories globales
             queryset = queryset.filter(is_global=True)
-            print(f"🔍 CategoryViewSet.get_queryset - Après filtre global_only: {queryset.count()} catégories globales")
         
-        print(f"🔍 CategoryViewSet.get_queryset - Queryset final: {queryset.count()} catégories")
         return queryset
     
     def perform_create(self, serializer):
@@ -1833,24 +1818,11 @@ class CategoryViewSet(viewsets.ModelViewSet):
             serializer.save(site_configuration=user_site)
     
     def retrieve(self, request, *args, **kwargs):
-        """Récupérer une catégorie spécifique avec logs de débogage"""
+        """Récupérer une catégorie spécifique (données sérialisées journalisées en DEBUG)"""
         instance = self.get_object()
-        print(f"🔍 CategoryViewSet.retrieve - Catégorie ID {instance.id}: {instance.name}")
-        print(f"🔍 CategoryViewSet.retrieve - Données catégorie: {{")
-        print(f"            'id': {instance.id},")
-        print(f"            'name': '{instance.name}',")
-        print(f"            'is_global': {instance.is_global},")
-        print(f"            'is_rayon': {instance.is_rayon},")
-        print(f"            'parent': {instance.parent_id},")
-        print(f"            'level': {instance.level},")
-        print(f"            'rayon_type': '{instance.rayon_type}',")
-        print(f"            'created_at': '{instance.created_at}',")
-        print(f"            'updated_at': '{instance.updated_at}'")
-        print(f"        }}")
-        
-        serializer = self.get_serializer(instance)
-        print(f"🔍 CategoryViewSet.retrieve - Données sérialisées: {serializer.data}")
-        return Response(serializer.data)
+        data = self.get_serializer(instance).data
+        logger.debug("🔍 [CATEGORIES] Catégorie %s: %s", instance.id, data)
+        return Response(data)
 
     def perform_update(self, serializer):
         """Mettre à jour une catégorie avec gestion du site en utilisant le service centralisé"""
@@ -2089,6 +2061,26 @@ class TransactionViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
+class TransactionArchiveViewSet(viewsets.ReadOnlyModelViewSet):
+    """Historique des transactions archivées par les clôtures de période (lecture seule)"""
+    serializer_class = TransactionArchiveSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['type', 'product']
+    ordering_fields = ['transaction_date', 'quantity']
+    ordering = ['-transaction_date']
+
+    def get_queryset(self):
+        """Archives des produits du site de l'utilisateur (tous les sites pour un superuser)"""
+        from apps.inventory.services.ledger_archive import LedgerArchiveService
+
+        user_site = getattr(self.request.user, 'site_configuration', None)
+        if self.request.user.is_superuser:
+            return LedgerArchiveService.history()
+        if not user_site:
+            return LedgerArchiveService.history().none()
+        return LedgerArchiveService.history(site=user_site)
+
+
 class SaleViewSet(viewsets.ModelViewSet):
     """ViewSet pour les ventes"""
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -2109,7 +2101,9 @@ class SaleViewSet(viewsets.ModelViewSet):
         # Vérifier si un filtre par site est demandé dans les paramètres de requête
         site_filter = self.request.query_params.get('site_configuration')
         
-        queryset = Sale.objects.select_related('customer').prefetch_related('items')
+        queryset = Sale.objects.select_related('customer__site_configuration').prefetch_related(
+            'items__product', recent_credit_transactions('customer__credit_transactions')
+        )
         
         if self.request.user.is_superuser:
             # Superuser peut filtrer par site si demandé, sinon voit tout
@@ -2457,6 +2451,11 @@ class DashboardView(APIView):
             # Convertir en float pour la réponse JSON
             total_stock_value_float = float(total_stock_value)
             
+            # Ventes du jour lues dans les agrégats journaliers (ventes terminées)
+            from apps.inventory.services.rollups import RollupService
+            today = timezone.localdate()
+            today_sales = RollupService.get_sales_summary(request.user, today, today)
+            
             # Statistiques de base
             stats = {
                 'total_products': products.count(),
@@ -2468,14 +2467,8 @@ class DashboardView(APIView):
                 'total_stock_value': total_stock_value_float,
                 'total_categories': categories.count(),
                 'total_brands': brands.count(),
-                'total_sales_today': sales.filter(
-                    sale_date__date=timezone.now().date()
-                ).count(),
-                'total_revenue_today': sales.filter(
-                    sale_date__date=timezone.now().date()
-                ).aggregate(
-                    total=Sum('total_amount')
-                )['total'] or 0,
+                'total_sales_today': today_sales['sales_count'],
+                'total_revenue_today': today_sales['total_revenue'],
             }
             
             # Ventes récentes (limitées à 5)
@@ -2533,7 +2526,7 @@ class ConfigurationAPIView(APIView):
         
         try:
             # Utiliser la logique de la vue existante
-            config = get_user_site_configuration_api(request.user)
+            config = get_site_context(request).require_site()
             
             # Préparer les données pour l'API
             config_data = {
@@ -2569,7 +2562,7 @@ class ConfigurationAPIView(APIView):
                 'error': 'Aucun site configuré pour cet utilisateur'
             }, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération de la configuration: {e}")
+            logger.exception("❌ [CONFIGURATION] Erreur lors de la récupération de la configuration: %s", e)
             return Response({
                 'success': False,
                 'error': 'Erreur lors de la récupération de la configuration',
@@ -2586,7 +2579,7 @@ class ConfigurationAPIView(APIView):
             }, status=status.HTTP_403_FORBIDDEN)
         
         try:
-            config = get_user_site_configuration_api(request.user)
+            config = get_site_context(request).require_site()
             
             # Mettre à jour les champs fournis
             fields_to_update = [
@@ -2606,7 +2599,7 @@ class ConfigurationAPIView(APIView):
             config.updated_by = request.user
             config.save()
             
-            print(f"✅ Configuration mise à jour par: {request.user.username}")
+            logger.info("✅ [CONFIGURATION] Configuration mise à jour par %s", request.user.username)
             
             # Retourner la configuration mise à jour
             config_data = {
@@ -2635,7 +2628,7 @@ class ConfigurationAPIView(APIView):
             })
                 
         except Exception as e:
-            print(f"❌ Erreur lors de la mise à jour de la configuration: {e}")
+            logger.exception("❌ [CONFIGURATION] Erreur lors de la mise à jour de la configuration: %s", e)
             return Response({
                 'success': False,
                 'error': 'Erreur lors de la mise à jour de la configuration',
@@ -2730,7 +2723,7 @@ class ParametresAPIView(APIView):
             })
             
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des paramètres: {e}")
+            logger.exception("❌ [PARAMETRES] Erreur lors de la récupération des paramètres: %s", e)
             return Response({
                 'success': False,
                 'error': 'Erreur lors de la récupération des paramètres',
@@ -2762,7 +2755,7 @@ class ParametresAPIView(APIView):
             parametre.updated_by = request.user
             parametre.save()
             
-            print(f"✅ Paramètre '{parametre.cle}' mis à jour par: {request.user.username}")
+            logger.info("✅ [PARAMETRES] Paramètre '%s' mis à jour par %s", parametre.cle, request.user.username)
             
             parametre_data = {
                 'id': parametre.id,
@@ -2780,7 +2773,7 @@ class ParametresAPIView(APIView):
             })
             
         except Exception as e:
-            print(f"❌ Erreur lors de la mise à jour du paramètre: {e}")
+            logger.exception("❌ [PARAMETRES] Erreur lors de la mise à jour du paramètre: %s", e)
             return Response({
                 'success': False,
                 'error': 'Erreur lors de la mise à jour du paramètre',
@@ -2801,7 +2794,7 @@ class ConfigurationResetAPIView(APIView):
             }, status=status.HTTP_403_FORBIDDEN)
         
         try:
-            config = get_user_site_configuration_api(request.user)
+            config = get_site_context(request).require_site()
             
             # Valeurs par défaut
             config.nom_societe = 'BoliBana Stock'
@@ -3322,11 +3315,11 @@ class PublicSignUpAPIView(APIView):
                                     user_agent=request.META.get('HTTP_USER_AGENT', ''),
                                     url=request.path
                                 )
-                            print(f"✅ Activité journalisée pour l'utilisateur {user.username}")
+                            logger.info("✅ [SIGNUP] Activité journalisée pour l'utilisateur %s", user.username)
                         else:
-                            print(f"⚠️ Utilisateur {user.username} non trouvé lors de la journalisation")
+                            logger.warning("⚠️ [SIGNUP] Utilisateur %s non trouvé lors de la journalisation", user.username)
                     except Exception as e:
-                        print(f"⚠️ Erreur création activité: {e}")
+                        logger.warning("⚠️ [SIGNUP] Erreur création activité: %s", e)
                         # Continuer sans journaliser l'activité - ce n'est pas critique
                         # L'utilisateur et le site ont été créés avec succès
                         
@@ -3346,9 +3339,9 @@ class PublicSignUpAPIView(APIView):
                                         user_agent=request.META.get('HTTP_USER_AGENT', ''),
                                         url=request.path
                                     )
-                                print(f"✅ Activité journalisée de manière différée pour l'utilisateur {user.username}")
+                                logger.info("✅ [SIGNUP] Activité journalisée de manière différée pour l'utilisateur %s", user.username)
                         except Exception as retry_e:
-                            print(f"⚠️ Échec de la création différée de l'activité: {retry_e}")
+                            logger.warning("⚠️ [SIGNUP] Échec de la création différée de l'activité: %s", retry_e)
                             # Finalement, abandonner la journalisation de l'activité
                     
                     # Générer les tokens d'authentification
@@ -3392,7 +3385,7 @@ class PublicSignUpAPIView(APIView):
                 }, status=400)
                 
         except Exception as e:
-            print(f"❌ Erreur lors de la création du compte: {e}")
+            logger.exception("❌ [SIGNUP] Erreur lors de la création du compte: %s", e)
             return Response({
                 'success': False,
                 'error': f'Erreur lors de la création du compte: {str(e)}'
@@ -3561,19 +3554,14 @@ class LabelBatchViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def create_batch(self, request):
         """Créer un lot d'étiquettes"""
-        import logging
-        logger = logging.getLogger(__name__)
-        
         user_site = request.user.site_configuration
         if not user_site and not request.user.is_superuser:
-            logger.error(f"❌ [CREATE_BATCH] Aucun site configuré pour l'utilisateur {request.user.id}")
+            logger.error("❌ [CREATE_BATCH] Aucun site configuré pour l'utilisateur %s", request.user.id)
             raise ValidationError({"detail": "Aucun site configuré pour cet utilisateur"})
 
         # Créer un dictionnaire modifiable à partir de request.data
         request_data = dict(request.data)
-        logger.info(f"📥 [CREATE_BATCH] Données reçues: {request_data}")
-        logger.info(f"🔍 [CREATE_BATCH] Vérification include_price dans request_data: {request_data.get('include_price')}")
-        logger.info(f"🔍 [CREATE_BATCH] Toutes les clés de request_data: {list(request_data.keys())}")
+        logger.debug("📥 [CREATE_BATCH] Données reçues: %s", request_data)
         
         # Nettoyer la valeur 'channel' pour éviter les problèmes d'encodage
         if 'channel' in request_data:
@@ -3586,16 +3574,17 @@ class LabelBatchViewSet(viewsets.ModelViewSet):
             # Forcer les valeurs valides uniquement
             valid_channels = ['escpos', 'tsc', 'pdf']
             if channel_value not in valid_channels:
-                logger.warning(f"⚠️ [CREATE_BATCH] Channel invalide reçu: {repr(request_data['channel'])}, valeur nettoyée: {repr(channel_value)}, utilisation de 'escpos'")
+                logger.warning(
+                    "⚠️ [CREATE_BATCH] Channel invalide reçu: %r, valeur nettoyée: %r, utilisation de 'escpos'",
+                    request_data['channel'], channel_value,
+                )
                 channel_value = 'escpos'
             # Remplacer la valeur dans request_data
             request_data['channel'] = channel_value
-            logger.info(f"✅ [CREATE_BATCH] Channel nettoyé: {repr(request_data['channel'])} -> {repr(channel_value)}")
 
         data = LabelBatchCreateSerializer(data=request_data)
         if not data.is_valid():
-            logger.error(f"❌ [CREATE_BATCH] Erreur de validation: {data.errors}")
-            logger.error(f"❌ [CREATE_BATCH] Données reçues: {request_data}")
+            logger.error("❌ [CREATE_BATCH] Erreur de validation: %s (données reçues: %s)", data.errors, request_data)
         data.is_valid(raise_exception=True)
         payload = data.validated_data
 
@@ -3625,14 +3614,12 @@ class LabelBatchViewSet(viewsets.ModelViewSet):
 
         # Récupérer include_price depuis request_data (peut être passé depuis le mobile)
         include_price_from_request = request_data.get('include_price')
-        logger.info(f"🔍 [CREATE_BATCH] include_price reçu: {include_price_from_request} (type: {type(include_price_from_request)})")
         if include_price_from_request is not None:
             # Convertir en booléen si c'est une chaîne
             if isinstance(include_price_from_request, str):
                 include_price_from_request = include_price_from_request.lower() in ('true', '1', 'yes', 'on')
             elif not isinstance(include_price_from_request, bool):
                 include_price_from_request = bool(include_price_from_request)
-            logger.info(f"✅ [CREATE_BATCH] include_price converti: {include_price_from_request}")
 
         # Créer les items
         position = 0
@@ -3667,11 +3654,10 @@ class LabelBatchViewSet(viewsets.ModelViewSet):
             else:
                 barcode_source = 'provided'
             
-            print(f"🔍 [CREATE_BATCH] Produit {product.name} (ID: {product.id})")
-            print(f"   CUG: {product.cug}")
-            print(f"   generated_ean: {product.generated_ean}")
-            print(f"   primary_barcode: {primary_barcode.ean if primary_barcode else 'None'}")
-            print(f"   barcode_value utilisé: {barcode_value} (source: {barcode_source})")
+            logger.debug(
+                "🔍 [CREATE_BATCH] Produit %s (CUG %s): code-barres %s (source: %s)",
+                product.id, product.cug, barcode_value, barcode_source,
+            )
             
             # Stocker include_price dans data_snapshot du premier item pour pouvoir le récupérer plus tard
             data_snapshot = None
@@ -3717,7 +3703,6 @@ class LabelBatchViewSet(viewsets.ModelViewSet):
         if include_price_param is not None:
             # Convertir la chaîne en booléen
             include_price_override = include_price_param.lower() in ('true', '1', 'yes', 'on')
-            logger.info(f"🔍 [TSC] include_price depuis query_params: {include_price_override}")
         else:
             # Si non fourni dans l'URL, récupérer depuis data_snapshot du premier item
             first_item = batch.items.first()
@@ -3725,9 +3710,8 @@ class LabelBatchViewSet(viewsets.ModelViewSet):
                 include_price_from_snapshot = first_item.data_snapshot.get('include_price')
                 if include_price_from_snapshot is not None:
                     include_price_override = bool(include_price_from_snapshot)
-                    logger.info(f"🔍 [TSC] include_price depuis data_snapshot: {include_price_override}")
         
-        logger.info(f"🔍 [TSC] include_price_override final pour render_label_batch_tsc: {include_price_override}")
+        logger.debug("🔍 [TSC] Lot %s: include_price=%s", batch.id, include_price_override)
         
         tsc_text, filename = render_label_batch_tsc(batch, include_price_override=include_price_override)
         from django.http import HttpResponse
@@ -3738,6 +3722,7 @@ class LabelBatchViewSet(viewsets.ModelViewSet):
 
 class BarcodeViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet pour la consultation des codes-barres"""
+    serializer_class = BarcodeSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['is_primary', 'product__category', 'product__brand']
@@ -3828,10 +3813,100 @@ class BarcodeViewSet(viewsets.ReadOnlyModelViewSet):
         })
 
 
+def get_reference_data_version(categories, brands):
+    """
+    Version des données de référence (catégories/marques) d'un site.
+    Change dès qu'une catégorie ou marque est ajoutée, modifiée ou supprimée : le client
+    renvoie la version connue (`ref_version`) et ne retélécharge les tables que si elle a changé.
+    """
+    category_state = categories.aggregate(total=Count('id'), last=Max('updated_at'))
+    brand_state = brands.aggregate(total=Count('id'), last=Max('updated_at'))
+    raw = (
+        f"{category_state['total']}:{category_state['last']}|"
+        f"{brand_state['total']}:{brand_state['last']}"
+    )
+    return hashlib.md5(raw.encode()).hexdigest()[:12]
+
+
 class LabelGeneratorAPIView(APIView):
-    """API pour générer des étiquettes avec codes-barres CUG"""
+    """API pour générer des étiquettes avec codes-barres CUG
+    
+    GET sans paramètre : liste complète (format historique de l'écran mobile).
+    GET avec `cursor`, `page_size`, `fields` ou `ref_version` : pagination par curseur
+    (id croissant), charge utile réduite aux champs demandés et tables catégories/marques
+    envoyées uniquement si `ref_version` est absente ou périmée.
+    """
     permission_classes = [permissions.IsAuthenticated]
     
+    DEFAULT_PAGE_SIZE = 200
+    MAX_PAGE_SIZE = 1000
+    
+    # Champ exposé -> colonnes du modèle nécessaires (pour .only())
+    FIELD_COLUMNS = {
+        'id': ['id'],
+        'name': ['name'],
+        'cug': ['cug'],
+        'barcode_ean': ['generated_ean'],
+        'barcode_ean_from_model': ['generated_ean'],
+        'barcode_ean_generated': ['generated_ean'],
+        'has_ean': ['generated_ean'],
+        'has_barcode_ean': ['generated_ean'],
+        'has_generated_ean': ['generated_ean'],
+        'selling_price': ['selling_price'],
+        'quantity': ['quantity'],
+        'image_url': ['image'],
+        'category_id': ['category_id'],
+        'brand_id': ['brand_id'],
+        'barcodes': [],
+    }
+    DEFAULT_LEAN_FIELDS = [
+        'id', 'name', 'cug', 'barcode_ean', 'has_ean', 'selling_price', 'quantity',
+        'image_url', 'category_id', 'brand_id',
+    ]
+    
+    def _get_site_querysets(self, request):
+        user_site = request.user.site_configuration
+        if request.user.is_superuser:
+            return Product.objects.all(), Category.objects.all(), Brand.objects.all()
+        return (
+            Product.objects.filter(site_configuration=user_site),
+            Category.objects.filter(site_configuration=user_site) if user_site else Category.objects.all(),
+            Brand.objects.filter(site_configuration=user_site) if user_site else Brand.objects.all(),
+        )
+    
+    @staticmethod
+    def _annotate_primary_barcode(products):
+        """EAN du code-barres principal (sinon le premier) calculé en SQL"""
+        primary_ean = Barcode.objects.filter(
+            product=OuterRef('pk')
+        ).order_by('-is_primary', 'id').values('ean')[:1]
+        return products.annotate(primary_barcode_ean=Subquery(primary_ean))
+    
+    @staticmethod
+    def _barcode_fields(product):
+        barcode_ean_from_model = product.primary_barcode_ean
+        barcode_ean_generated = product.generated_ean
+        has_barcode_ean = bool(barcode_ean_from_model and barcode_ean_from_model.strip())
+        has_generated_ean = bool(barcode_ean_generated and barcode_ean_generated.strip())
+        return {
+            'barcode_ean': barcode_ean_from_model or barcode_ean_generated or '',
+            'barcode_ean_from_model': barcode_ean_from_model or '',
+            'barcode_ean_generated': barcode_ean_generated or '',
+            'has_ean': has_barcode_ean or has_generated_ean,
+            'has_barcode_ean': has_barcode_ean,
+            'has_generated_ean': has_generated_ean,
+        }
+    
+    @staticmethod
+    def _image_url(product, originals):
+        image_url = get_product_image_url(product, check_copy=False, original=originals.get(product.id))
+        # S'assurer que l'URL est valide (non vide et non None)
+        if image_url:
+            image_url = str(image_url).strip()
+            if image_url and image_url != 'None':
+                return image_url
+        return None
+    
     def get(self, request):
         """Récupérer la liste des produits avec codes-barres pour générer des étiquettes"""
         try:
@@ -3843,76 +3918,34 @@ class LabelGeneratorAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Récupérer tous les produits (avec ou sans codes-barres)
-            if request.user.is_superuser:
-                products = Product.objects.all().select_related('category', 'brand').prefetch_related('barcodes')
-            else:
-                products = Product.objects.filter(
-                    site_configuration=user_site
-                ).select_related('category', 'brand').prefetch_related('barcodes')
+            params = request.query_params
+            if any(key in params for key in ('cursor', 'page_size', 'fields', 'ref_version')):
+                return self._get_page(request)
             
-            # Organiser par catégorie et marque
-            if request.user.is_superuser:
-                categories = Category.objects.all()
-                brands = Brand.objects.all()
-            else:
-                categories = Category.objects.filter(
-                    site_configuration=user_site
-                ) if user_site else Category.objects.all()
-                brands = Brand.objects.filter(
-                    site_configuration=user_site
-                ) if user_site else Brand.objects.all()
+            products, categories, brands = self._get_site_querysets(request)
+            products = self._annotate_primary_barcode(products.select_related('category', 'brand'))
+            products = list(products)
+            originals = get_copy_originals_map([p.id for p in products])
             
             # Préparer les données pour le mobile
             label_data = {
                 'products': [],
-                'categories': CategorySerializer(categories, many=True).data,
-                'brands': BrandSerializer(brands, many=True).data,
-                'total_products': products.count(),
+                'categories': CategorySerializer(categories.select_related('parent'), many=True).data,
+                'brands': BrandSerializer(brands.prefetch_related('rayons'), many=True).data,
+                'total_products': len(products),
                 'generated_at': timezone.now().isoformat()
             }
             
             # Ajouter tous les produits (avec ou sans codes-barres)
             for product in products:
-                # Récupérer le code-barres principal du modèle Barcode
-                primary_barcode = product.barcodes.filter(is_primary=True).first()
-                if not primary_barcode:
-                    primary_barcode = product.barcodes.first()
-                
-                # Priorité 1 : EAN du modèle Barcode (manuel)
-                # Priorité 2 : EAN généré dans Product (automatique)
-                barcode_ean_from_model = primary_barcode.ean if primary_barcode else None
-                barcode_ean_generated = product.generated_ean
-                
-                # Utiliser l'EAN du modèle Barcode s'il existe, sinon l'EAN généré
-                barcode_ean = barcode_ean_from_model or barcode_ean_generated
-                has_barcode_ean = bool(barcode_ean_from_model and barcode_ean_from_model.strip())
-                has_generated_ean = bool(barcode_ean_generated and barcode_ean_generated.strip())
-                has_ean = has_barcode_ean or has_generated_ean
-                
-                # Récupérer l'URL de l'image
-                image_url = get_product_image_url(product)
-                # S'assurer que l'URL est valide (non vide et non None)
-                if image_url:
-                    image_url = str(image_url).strip()
-                    if not image_url or image_url == 'None':
-                        image_url = None
-                else:
-                    image_url = None
-                
                 label_data['products'].append({
                     'id': product.id,
                     'name': product.name,
                     'cug': product.cug,
-                    'barcode_ean': barcode_ean or '',  # EAN utilisé (priorité au modèle Barcode)
-                    'barcode_ean_from_model': barcode_ean_from_model or '',  # EAN du modèle Barcode
-                    'barcode_ean_generated': barcode_ean_generated or '',  # EAN généré
-                    'has_ean': has_ean,
-                    'has_barcode_ean': has_barcode_ean,  # A un EAN dans le modèle Barcode
-                    'has_generated_ean': has_generated_ean,  # A un EAN généré
+                    **self._barcode_fields(product),
                     'selling_price': product.selling_price,
                     'quantity': product.quantity,
-                    'image_url': image_url,
+                    'image_url': self._image_url(product, originals),
                     'category': {
                         'id': product.category.id,
                         'name': product.category.name
@@ -3931,6 +3964,88 @@ class LabelGeneratorAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def _get_page(self, request):
+        """Page de produits (pagination par curseur sur l'id) avec charge utile réduite"""
+        params = request.query_params
+        
+        requested = [f.strip() for f in params.get('fields', '').split(',') if f.strip()]
+        unknown = [f for f in requested if f not in self.FIELD_COLUMNS]
+        if unknown:
+            return Response(
+                {'error': f"Champs inconnus: {', '.join(unknown)}", 'available_fields': list(self.FIELD_COLUMNS)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        fields = ['id'] + [f for f in (requested or self.DEFAULT_LEAN_FIELDS) if f != 'id']
+        
+        try:
+            page_size = min(int(params.get('page_size', self.DEFAULT_PAGE_SIZE)), self.MAX_PAGE_SIZE)
+            cursor = int(params['cursor']) if params.get('cursor') else None
+        except ValueError:
+            return Response(
+                {'error': 'cursor et page_size doivent être des entiers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page_size = max(page_size, 1)
+        
+        products, categories, brands = self._get_site_querysets(request)
+        if cursor is None:
+            total_products = products.count()
+        else:
+            products = products.filter(id__gt=cursor)
+        
+        columns = {column for field in fields for column in self.FIELD_COLUMNS[field]}
+        products = products.only(*columns).order_by('id')
+        if {'barcode_ean', 'barcode_ean_from_model', 'has_ean', 'has_barcode_ean'} & set(fields):
+            products = self._annotate_primary_barcode(products)
+        if 'barcodes' in fields:
+            products = products.prefetch_related(
+                Prefetch('barcodes', queryset=Barcode.objects.only('id', 'product_id', 'ean', 'is_primary'))
+            )
+        
+        page = list(products[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        originals = get_copy_originals_map([p.id for p in page]) if 'image_url' in fields else {}
+        
+        items = []
+        for product in page:
+            barcode_data = self._barcode_fields(product) if hasattr(product, 'primary_barcode_ean') else {}
+            item = {}
+            for field in fields:
+                if field in barcode_data:
+                    item[field] = barcode_data[field]
+                elif field == 'image_url':
+                    item[field] = self._image_url(product, originals)
+                elif field == 'barcodes':
+                    item[field] = [
+                        {'id': b.id, 'ean': b.ean, 'is_primary': b.is_primary} for b in product.barcodes.all()
+                    ]
+                elif field == 'has_generated_ean':
+                    item[field] = bool(product.generated_ean and product.generated_ean.strip())
+                elif field == 'barcode_ean_generated':
+                    item[field] = product.generated_ean or ''
+                else:
+                    item[field] = getattr(product, field)
+            items.append(item)
+        
+        data = {
+            'products': items,
+            'next_cursor': page[-1].id if has_more else None,
+            'has_more': has_more,
+            'generated_at': timezone.now().isoformat(),
+        }
+        if cursor is None:
+            data['total_products'] = total_products
+        
+        # Tables de référence envoyées une seule fois (tant que la version n'a pas changé)
+        reference_version = get_reference_data_version(categories, brands)
+        data['reference_version'] = reference_version
+        if params.get('ref_version') != reference_version:
+            data['categories'] = list(categories.order_by('name').values('id', 'name'))
+            data['brands'] = list(brands.order_by('name').values('id', 'name'))
+        
+        return Response(data)
+    
     def post(self, request):
         """Générer des étiquettes pour des produits spécifiques"""
         try:
@@ -3949,20 +4064,16 @@ class LabelGeneratorAPIView(APIView):
             if request.user.is_superuser:
                 products = Product.objects.filter(
                     id__in=product_ids
-                ).select_related('category', 'brand').prefetch_related('barcodes')
+                ).select_related('category', 'brand')
             else:
                 products = Product.objects.filter(
                     id__in=product_ids,
                     site_configuration=user_site
-                ).select_related('category', 'brand').prefetch_related('barcodes')
+                ).select_related('category', 'brand')
             
             # Préparer les données des étiquettes
             labels = []
             for product in products:
-                primary_barcode = product.barcodes.filter(is_primary=True).first()
-                if not primary_barcode:
-                    primary_barcode = product.barcodes.first()
-                
                 # Utiliser l'EAN généré stocké (toujours disponible maintenant)
                 barcode_ean = product.generated_ean
                 
@@ -3998,20 +4109,43 @@ class LabelGeneratorAPIView(APIView):
             )
 
 
-def get_product_image_url(product):
+def get_copy_originals_map(product_ids):
+    """
+    Retourne {id produit copié: produit original} en une seule requête.
+    Permet d'appeler get_product_image_url(..., check_copy=False) dans une boucle sans N+1.
+    """
+    from apps.inventory.models import ProductCopy
+    copies = ProductCopy.objects.filter(
+        copied_product_id__in=product_ids
+    ).select_related('original_product').only(
+        'copied_product_id', 'original_product__id', 'original_product__image'
+    ).order_by('id')
+    originals = {}
+    for copy in copies:
+        originals.setdefault(copy.copied_product_id, copy.original_product)
+    return originals
+
+
+def get_product_image_url(product, check_copy=True, original=None):
     """Retourne l'URL complète de l'image du produit.
     Utilise le système de stockage Django pour générer l'URL correcte (signée si nécessaire).
+    
+    `check_copy=False` évite la requête ProductCopy : l'appelant fournit alors
+    `original` (voir get_copy_originals_map) pour les listes.
     """
     image_field = getattr(product, 'image', None)
     
     # Tenter d'utiliser l'image de l'original si ProductCopy existe et lie ce produit
-    try:
-        from apps.inventory.models import ProductCopy
-        copy = ProductCopy.objects.select_related('original_product').filter(copied_product=product).first()
-        if copy and getattr(copy.original_product, 'image', None):
-            image_field = copy.original_product.image
-    except Exception:
-        pass
+    if check_copy:
+        try:
+            from apps.inventory.models import ProductCopy
+            copy = ProductCopy.objects.select_related('original_product').filter(copied_product=product).first()
+            if copy:
+                original = copy.original_product
+        except Exception:
+            pass
+    if original is not None and getattr(original, 'image', None):
+        image_field = original.image
 
     if image_field:
         try:
@@ -4108,7 +4242,7 @@ def get_product_image_url(product):
                     return f"{media_url.rstrip('/')}/{image_path}"
                 return f"https://web-production-e896b.up.railway.app{url}"
         except (ValueError, AttributeError) as e:
-            print(f"⚠️ Erreur dans get_product_image_url: {e}")
+            logger.warning("⚠️ [IMAGE_URL] Erreur dans get_product_image_url: %s", e)
             try:
                 return image_field.url
             except Exception:
@@ -4280,7 +4414,7 @@ class CatalogPDFAPIView(APIView):
             
             # Récupérer la configuration du site de l'utilisateur
             try:
-                user_site = get_user_site_configuration_api(user)
+                user_site = get_site_context(request).require_site()
             except Exception as e:
                 return Response(
                     {'error': f'Erreur lors de la récupération de la configuration du site: {str(e)}'},
@@ -4325,6 +4459,20 @@ class CatalogPDFAPIView(APIView):
                         is_default=True
                     )
             
+            # Par défaut : ancien format (données + images base64), attendu par les versions
+            # déjà installées de l'app mobile (catalog.total_products, total_pages, id)
+            # Mode 'server' : rendu PDF côté serveur, le client télécharge le fichier
+            if request.data.get('mode') == 'server':
+                return self._generate_server_side(
+                    request, core_user, user_site, template, products,
+                    options={
+                        'include_prices': bool(include_prices),
+                        'include_stock': bool(include_stock),
+                        'include_descriptions': bool(include_descriptions),
+                        'include_images': bool(include_images),
+                    },
+                )
+            
             # Calculer le nombre de pages directement (pas de stockage)
             total_pages = (products.count() + template.products_per_page - 1) // template.products_per_page
             
@@ -4413,6 +4561,105 @@ class CatalogPDFAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def _generate_server_side(self, request, user, user_site, template, products, options):
+        """Crée une CatalogGeneration et rend le PDF (synchrone ou en arrière-plan selon la taille)"""
+        from apps.inventory.catalog_models import CatalogGeneration, CatalogItem
+        from apps.inventory.printing.catalog_pdf import (
+            CATALOG_ASYNC_THRESHOLD, generate_catalog, start_catalog_generation_async
+        )
+        
+        # Conserver l'ordre demandé par le client
+        product_ids = list(products.values_list('id', 'cug'))
+        order = {pk: index for index, pk in enumerate(request.data.get('product_ids', []))}
+        product_ids.sort(key=lambda row: order.get(row[0], len(order)))
+        
+        site = user_site or products.first().site_configuration
+        generation = CatalogGeneration.objects.create(
+            name=f"Catalogue - {timezone.now().strftime('%Y-%m-%d %H:%M')}",
+            template=template,
+            site_configuration=site,
+            user=user,
+            source='api',
+            total_products=len(product_ids),
+        )
+        per_page = max(1, template.products_per_page)
+        CatalogItem.objects.bulk_create([
+            CatalogItem(
+                batch=generation, product_id=pk, position=position,
+                page_number=position // per_page + 1, cug_value=cug, barcode_data=cug,
+            )
+            for position, (pk, cug) in enumerate(product_ids)
+        ], batch_size=500)
+        
+        if len(product_ids) > CATALOG_ASYNC_THRESHOLD:
+            start_catalog_generation_async(generation, options)
+            return Response(
+                self._serialize_generation(request, generation),
+                status=status.HTTP_202_ACCEPTED
+            )
+        
+        generate_catalog(generation, options)
+        if generation.status == 'failed':
+            return Response(
+                {'error': f'Erreur lors de la génération du catalogue: {generation.error_message}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return Response(self._serialize_generation(request, generation))
+
+    @staticmethod
+    def _serialize_generation(request, generation):
+        data = {
+            'success': generation.status != 'failed',
+            'generation_id': generation.id,
+            'status': generation.status,
+            'total_products': generation.total_products,
+            'total_pages': generation.total_pages,
+            'file_size_bytes': generation.file_size_bytes,
+            'status_url': request.build_absolute_uri(
+                reverse('api_catalog_generation_status', args=[generation.id])
+            ),
+        }
+        if generation.status == 'success':
+            data['download_url'] = request.build_absolute_uri(
+                reverse('api_catalog_generation_download', args=[generation.id])
+            )
+        if generation.status == 'failed':
+            data['error'] = generation.error_message
+        return data
+
+
+class CatalogGenerationStatusAPIView(APIView):
+    """Statut et téléchargement d'un catalogue PDF généré côté serveur"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def _get_generation(self, request, pk):
+        from apps.inventory.catalog_models import CatalogGeneration
+        
+        generations = CatalogGeneration.objects.all()
+        if not request.user.is_superuser:
+            generations = generations.filter(site_configuration=get_site_context(request).require_site())
+        return get_object_or_404(generations, pk=pk)
+    
+    def get(self, request, pk, download=False):
+        generation = self._get_generation(request, pk)
+        if not download:
+            return Response(CatalogPDFAPIView._serialize_generation(request, generation))
+        
+        if generation.status != 'success' or not generation.file_path:
+            return Response(
+                {'error': 'Catalogue non disponible', 'status': generation.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        from django.core.files.storage import default_storage
+        from django.http import FileResponse
+        # Streaming depuis le stockage : le PDF n'est pas chargé en mémoire
+        return FileResponse(
+            default_storage.open(generation.file_path, 'rb'),
+            as_attachment=True,
+            filename=f"catalogue_{generation.id}.pdf",
+            content_type='application/pdf'
+        )
+
 
 class LabelPrintAPIView(APIView):
     """API pour générer des étiquettes individuelles à coller"""
@@ -4433,7 +4680,7 @@ class LabelPrintAPIView(APIView):
             
             # Récupérer les produits
             user = request.user
-            user_site = get_user_site_configuration_api(user)
+            user_site = get_site_context(request).require_site()
             
             if user.is_superuser:
                 products = Product.objects.filter(id__in=product_ids).select_related('category', 'brand')
@@ -4501,11 +4748,10 @@ class LabelPrintAPIView(APIView):
                     barcode_value = generate_ean13_from_cug(product.cug) if product.cug else str(product.id)
                     barcode_source = 'generated_from_cug_fallback'
                 
-                print(f"🔍 [LABELS API] Produit {product.name} (ID: {product.id})")
-                print(f"   CUG: {product.cug}")
-                print(f"   generated_ean: {product.generated_ean}")
-                print(f"   primary_barcode: {primary_barcode.ean if primary_barcode else 'None'}")
-                print(f"   barcode_value utilisé: {barcode_value} (source: {barcode_source})")
+                logger.debug(
+                    "🔍 [LABELS API] Produit %s (CUG %s): code-barres %s (source: %s)",
+                    product.id, product.cug, barcode_value, barcode_source,
+                )
                 
                 LabelItem.objects.create(
                     batch=label_batch,
@@ -4590,7 +4836,7 @@ class ReceiptPrintAPIView(APIView):
             
             # Récupérer la vente
             user = request.user
-            user_site = get_user_site_configuration_api(user)
+            user_site = get_site_context(request).require_site()
             
             try:
                 if user.is_superuser:
@@ -4740,38 +4986,6 @@ class ReceiptPrintAPIView(APIView):
             )
 
 
-def get_user_site_configuration_api(user):
-    """
-    Récupère la configuration du site de l'utilisateur pour l'API
-    """
-    if user.is_superuser:
-        # Les superusers voient la première configuration ou peuvent en créer une
-        config = Configuration.objects.first()
-        if not config:
-            config = Configuration.objects.create(
-                site_name='Site Principal',
-                nom_societe='BoliBana Stock',
-                adresse='Adresse de votre entreprise',
-                telephone='+226 XX XX XX XX',
-                email='contact@votreentreprise.com',
-                devise='FCFA',
-                tva=0.00,
-                description='Système de gestion de stock',
-                site_owner=user,
-                created_by=user,
-                updated_by=user
-            )
-            # Assigner la configuration au superuser
-            user.site_configuration = config
-            user.is_site_admin = True
-            user.save()
-        return config
-    else:
-        # Les utilisateurs normaux voient leur configuration
-        if not user.site_configuration:
-            raise Http404("Aucun site configuré pour cet utilisateur")
-        return user.site_configuration
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def collect_static_files(request):
@@ -4808,25 +5022,20 @@ class GetRayonsView(APIView):
     
     def get(self, request):
         try:
-            print(f"🔍 GetRayonsView.get - Utilisateur: {request.user.username}")
-            print(f"🔍 GetRayonsView.get - Site utilisateur: {getattr(request.user, 'site_configuration', None)}")
-            
             # Utiliser le service centralisé pour obtenir les rayons accessibles
             from apps.core.services import PermissionService
             rayons_queryset = PermissionService.get_user_accessible_resources(request.user, Category)
             
-            print(f"🔍 GetRayonsView.get - Queryset initial: {rayons_queryset.count()} catégories")
-            
             # Récupérer tous les rayons principaux avec filtrage par site
             rayons = rayons_queryset.filter(
                 is_active=True,
                 is_rayon=True,
                 level=0
+            ).annotate(
+                active_children_count=Count('children', filter=Q(children__is_active=True))
             ).order_by('rayon_type', 'order', 'name')
             
-            print(f"🔍 GetRayonsView.get - Rayons trouvés: {rayons.count()}")
-            for rayon in rayons:
-                print(f"🔍 GetRayonsView.get - Rayon: ID={rayon.id}, Name={rayon.name}, is_rayon={rayon.is_rayon}, level={rayon.level}")
+            logger.debug("🔍 [RAYONS] Rayons de l'utilisateur %s", request.user.username)
             
             # Sérialiser les rayons avec permissions
             rayons_data = []
@@ -4842,8 +5051,8 @@ class GetRayonsView(APIView):
                     'rayon_type': rayon.rayon_type,
                     'rayon_type_display': dict(Category.RAYON_TYPE_CHOICES).get(rayon.rayon_type, ''),
                     'order': rayon.order,
-                    'subcategories_count': rayon.children.filter(is_active=True).count(),
-                    'site_configuration': rayon.site_configuration.id if rayon.site_configuration else None,
+                    'subcategories_count': rayon.active_children_count,
+                    'site_configuration': rayon.site_configuration_id,
                     'can_edit': can_edit,
                     'can_delete': can_delete
                 })
@@ -5045,30 +5254,18 @@ class ProductCopyAPIView(APIView):
                     destination_site=current_site
                 ).values_list('original_product_id', flat=True)
             
-            # Log pour débogage
-            import logging
-            logger = logging.getLogger(__name__)
-            if source_site:
-                logger.info(f"🔍 ProductCopyAPIView - Site source spécifique: {source_site.id} ({source_site.site_name}), Site destination: {current_site.id} ({current_site.site_name})")
-            else:
-                logger.info(f"🔍 ProductCopyAPIView - Tous les sites (sauf actuel), Site destination: {current_site.id} ({current_site.site_name})")
-            
-            logger.info(f"📦 Produits disponibles dans le(s) site(s) source: {source_products.count()}")
-            logger.info(f"📋 Produits déjà copiés vers le site actuel: {copied_products.count()}")
-            if copied_products:
-                logger.info(f"📋 IDs des produits déjà copiés: {list(copied_products)[:10]}...")  # Limiter à 10 pour éviter les logs trop longs
-            
             available_products = source_products.exclude(id__in=copied_products)
             
-            logger.info(f"✅ Produits disponibles pour copie: {available_products.count()}")
-            
-            # Log supplémentaire pour débogage : statistiques par site
-            if not source_site:
-                from django.db.models import Count
-                products_by_site = source_products.values('site_configuration__site_name', 'site_configuration__id').annotate(
-                    count=Count('id')
+            # Comptages réservés au DEBUG : chacun coûte une requête
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "🔍 [PRODUCT_COPY] Source %s -> site %s: %s produits source, %s déjà copiés, %s disponibles",
+                    source_site.id if source_site else 'tous', current_site.id,
+                    source_products.count(), copied_products.count(), available_products.count(),
                 )
-                logger.info(f"📊 Répartition par site: {list(products_by_site)}")
+                if not source_site:
+                    products_by_site = source_products.values('site_configuration__id').annotate(count=Count('id'))
+                    logger.debug("📊 [PRODUCT_COPY] Répartition par site: %s", list(products_by_site))
             
             # Recherche
             search_query = request.GET.get('search', '').strip()
@@ -5192,176 +5389,424 @@ class ProductCopyAPIView(APIView):
                             status=status.HTTP_403_FORBIDDEN
                         )
             
-            from apps.inventory.models import ProductCopy
-            copied_count = 0
-            errors = []
+            from apps.inventory.services.product_copy import ProductCopyService
             
-            for product_id in product_ids:
-                try:
-                    # Récupérer le produit original (peut venir de n'importe quel site si source_site est None)
-                    if source_site:
-                        original_product = Product.objects.get(
-                            id=product_id,
-                            site_configuration=source_site
-                        )
-                        # Vérifier si déjà copié depuis ce site source spécifique
-                        copy_filter = {
-                            'original_product': original_product,
-                            'destination_site': current_site,
-                            'source_site': source_site
-                        }
-                    else:
-                        # Produit peut venir de n'importe quel site (sauf actuel)
-                        original_product = Product.objects.get(id=product_id)
-                        if original_product.site_configuration == current_site:
-                            errors.append(f"Le produit {product_id} appartient déjà au site actuel")
-                            continue
-                        # Vérifier si déjà copié depuis n'importe quel site
-                        copy_filter = {
-                            'original_product': original_product,
-                            'destination_site': current_site
-                        }
-                    
-                    if ProductCopy.objects.filter(**copy_filter).exists():
-                        continue
-                    
-                    # Créer une copie du produit avec un CUG unique (contrainte globale)
-                    # Laisser le slug vide pour bénéficier de la génération/ajustement auto dans Product.save()
-                    from django.db import IntegrityError
-                    max_attempts = 3
-                    last_err = None
-                    copied_product = None
-                    for _ in range(max_attempts):
-                        try:
-                            copied_product = Product.objects.create(
-                                name=original_product.name,
-                                cug=Product.generate_unique_cug(),
-                                description=original_product.description,
-                                selling_price=original_product.selling_price,
-                                purchase_price=original_product.purchase_price,
-                                quantity=0,  # Commencer avec 0 en stock
-                                alert_threshold=original_product.alert_threshold,
-                                category=original_product.category,
-                                brand=original_product.brand,
-                                # ✅ Référence directement l'image d'origine pour conserver l'URL
-                                image=original_product.image,
-                                site_configuration=current_site,
-                                is_active=True
-                            )
-                            break
-                        except IntegrityError as ie:
-                            # En cas de collision rare, retenter avec un nouveau CUG
-                            last_err = ie
-                            continue
-                    if copied_product is None:
-                        raise last_err or Exception('Impossible de créer la copie du produit (CUG/slug)')
-                    
-                    # ✅ Conserver l'URL d'image d'origine (référence au même fichier)
-                    if original_product.image:
-                        print(f"🖼️ Image référencée pour le produit copié: {copied_product.image}")
-                    else:
-                        print("🖼️ Aucun fichier image à référencer pour le produit original")
-
-                    # ✅ Copier les codes-barres du produit original
-                    original_barcodes = original_product.barcodes.all()
-                    print(f"🔍 PRODUIT ORIGINAL: {original_product.name} (ID: {original_product.id})")
-                    print(f"   CUG: {original_product.cug}")
-                    print(f"   Generated EAN: {original_product.generated_ean}")
-                    print(f"   Image: {original_product.image}")
-                    print(f"   Image URL: {original_product.image.url if original_product.image else 'Aucune'}")
-                    print(f"   Site: {original_product.site_configuration.site_name if original_product.site_configuration else 'Aucun'}")
-                    print(f"   Codes-barres manuels ({original_barcodes.count()}):")
-                    for barcode in original_barcodes:
-                        print(f"     - {barcode.ean} {'(principal)' if barcode.is_primary else ''} - Notes: {barcode.notes or 'Aucune'}")
-                    
-                    copied_barcodes_count = 0
-                    for original_barcode in original_barcodes:
-                        try:
-                            Barcode.objects.create(
-                                product=copied_product,
-                                ean=original_barcode.ean,
-                                notes=original_barcode.notes,
-                                is_primary=original_barcode.is_primary
-                            )
-                            copied_barcodes_count += 1
-                            print(f"   ✅ Code-barres copié: {original_barcode.ean}")
-                        except Exception as e:
-                            # En cas d'erreur (EAN déjà utilisé), continuer sans ce code-barres
-                            print(f"   ❌ Impossible de copier le code-barres {original_barcode.ean}: {e}")
-                            continue
-                    
-                    print(f"🔍 PRODUIT COPIÉ: {copied_product.name} (ID: {copied_product.id})")
-                    print(f"   CUG: {copied_product.cug}")
-                    print(f"   Generated EAN: {copied_product.generated_ean}")
-                    print(f"   Image: {copied_product.image}")
-                    print(f"   Image URL: {copied_product.image.url if copied_product.image else 'Aucune'}")
-                    print(f"   Site: {copied_product.site_configuration.site_name if copied_product.site_configuration else 'Aucun'}")
-                    print(f"   Codes-barres copiés: {copied_barcodes_count}/{original_barcodes.count()}")
-                    
-                    # Vérifier les codes-barres finaux
-                    final_barcodes = copied_product.barcodes.all()
-                    print(f"   Codes-barres finaux dans la DB ({final_barcodes.count()}):")
-                    for barcode in final_barcodes:
-                        print(f"     - {barcode.ean} {'(principal)' if barcode.is_primary else ''} - Notes: {barcode.notes or 'Aucune'}")
-                    
-                    # Créer l'enregistrement de copie
-                    # Utiliser le site source du produit original si source_site n'est pas spécifié
-                    actual_source_site = source_site if source_site else original_product.site_configuration
-                    ProductCopy.objects.create(
-                        original_product=original_product,
-                        copied_product=copied_product,
-                        source_site=actual_source_site,
-                        destination_site=current_site
-                    )
-                    
-                    copied_count += 1
-
-                    # Si copie unitaire, retourner immédiatement les détails
-                    if single_copy:
-                        return Response({
-                            'success': True,
-                            'copied_count': copied_count,
-                            'errors': [],
-                            'message': f'{copied_count} produit(s) copié(s) avec succès',
-                            'copied_product': {
-                                'id': copied_product.id,
-                                'name': copied_product.name,
-                                'cug': copied_product.cug,
-                                'selling_price': float(copied_product.selling_price),
-                                'purchase_price': float(copied_product.purchase_price),
-                                'quantity': copied_product.quantity,
-                                'image_url': get_product_image_url(copied_product),
-                                'category': {
-                                    'id': copied_product.category.id,
-                                    'name': copied_product.category.name
-                                } if copied_product.category else None,
-                                'brand': {
-                                    'id': copied_product.brand.id,
-                                    'name': copied_product.brand.name
-                                } if copied_product.brand else None,
-                            },
-                            'redirect_to_edit': True
-                        })
-                    
-                except Product.DoesNotExist:
-                    errors.append(f'Produit ID {product_id} non trouvé')
-                except Exception as e:
-                    errors.append(f'Erreur lors de la copie du produit ID {product_id}: {str(e)}')
+            # Gros volumes : copie en arrière-plan, le client suit la progression
+            if not single_copy and len(product_ids) > ProductCopyService.ASYNC_THRESHOLD:
+                job = ProductCopyService.start_job_async(
+                    product_ids, current_site, source_site=source_site, user=request.user
+                )
+                return Response({
+                    'success': True,
+                    'async': True,
+                    'job_id': job.id,
+                    'status_url': request.build_absolute_uri(
+                        reverse('api_product_copy_job', args=[job.id])
+                    ),
+                    'message': f'Copie de {len(product_ids)} produit(s) lancée en arrière-plan'
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            # En copie unitaire, seul le premier produit est copié
+            result = ProductCopyService.copy_products(
+                product_ids[:1] if single_copy else product_ids,
+                current_site,
+                source_site=source_site
+            )
+            copied_count = result['copied_count']
             
-            # Si copie unitaire et aucune réponse immédiate (sécurité), ne rien faire ici
+            # Si copie unitaire, retourner immédiatement les détails
+            if single_copy and copied_count:
+                copied_product = Product.objects.select_related('category', 'brand').get(
+                    id=result['copied_product_ids'][0]
+                )
+                return Response({
+                    'success': True,
+                    'copied_count': copied_count,
+                    'errors': [],
+                    'message': f'{copied_count} produit(s) copié(s) avec succès',
+                    'copied_product': {
+                        'id': copied_product.id,
+                        'name': copied_product.name,
+                        'cug': copied_product.cug,
+                        'selling_price': float(copied_product.selling_price),
+                        'purchase_price': float(copied_product.purchase_price),
+                        'quantity': copied_product.quantity,
+                        'image_url': get_product_image_url(copied_product),
+                        'category': {
+                            'id': copied_product.category.id,
+                            'name': copied_product.category.name
+                        } if copied_product.category else None,
+                        'brand': {
+                            'id': copied_product.brand.id,
+                            'name': copied_product.brand.name
+                        } if copied_product.brand else None,
+                    },
+                    'redirect_to_edit': True
+                })
             
             return Response({
                 'success': True,
                 'copied_count': copied_count,
-                'errors': errors,
+                'errors': result['errors'],
                 'message': f'{copied_count} produit(s) copié(s) avec succès'
             })
             
         except Exception as e:
             return Response({'error': str(e)}, status=500)
+
+
+class ProductCopyJobAPIView(APIView):
+    """
+    Progression d'une copie de produits lancée en arrière-plan
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        from apps.inventory.models import ProductCopyJob
+        from apps.inventory.services.product_copy import ProductCopyService
+        
+        jobs = ProductCopyJob.objects.all()
+        if not request.user.is_superuser:
+            jobs = jobs.filter(destination_site=request.user.site_configuration)
+        job = get_object_or_404(jobs, pk=pk)
+        return Response(ProductCopyService.get_job_progress(job))
+
+
+class ProductImportAPIView(APIView):
+    """
+    Import en masse de produits depuis un fichier CSV ou XLSX (traité en arrière-plan)
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+    
+    def post(self, request):
+        from apps.inventory.models import ProductImportJob
+        from apps.inventory.services.product_import import ProductImportService
+        
+        site_configuration = get_site_context(request).require_site()
+        if not site_configuration:
+            return Response({'error': 'Aucune configuration de site trouvée'}, status=400)
+        
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'Fichier requis (champ "file")'}, status=400)
+        try:
+            ProductImportService.detect_format(upload.name)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        def as_bool(name, default):
+            value = request.data.get(name)
+            if value is None:
+                return default
+            return str(value).lower() in ('1', 'true', 'yes', 'oui')
+        
+        job = ProductImportJob.objects.create(
+            user=request.user,
+            site_configuration=site_configuration,
+            file=upload,
+            original_filename=upload.name,
+            create_missing=as_bool('create_missing', True),
+            dry_run=as_bool('dry_run', False),
+        )
+        ProductImportService.start_job_async(job)
+        return Response({
+            **ProductImportService.serialize_job(job),
+            'status_url': reverse('api_product_import_job', args=[job.id]),
+        }, status=202)
+
+
+class ProductImportJobAPIView(APIView):
+    """
+    Statut et rapport d'erreurs d'un import de produits
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        from apps.inventory.models import ProductImportJob
+        from apps.inventory.services.product_import import ProductImportService
+        
+        jobs = ProductImportJob.objects.all()
+        if not request.user.is_superuser:
+            jobs = jobs.filter(site_configuration=get_site_context(request).require_site())
+        job = get_object_or_404(jobs, pk=pk)
+        return Response(ProductImportService.serialize_job(job))
+
+
+
+class ReorderAPIView(APIView):
+    """
+    Suggestions de réapprovisionnement (calcul en arrière-plan, commandes brouillons par fournisseur)
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        from apps.inventory.models import ReorderJob
+        from apps.inventory.services.reorder import ReorderService
+        
+        site_configuration = get_site_context(request).require_site()
+        if not site_configuration:
+            return Response({'error': 'Aucune configuration de site trouvée'}, status=400)
+        
+        params = {}
+        for name, default, maximum in (
+            ('weeks', ReorderService.DEFAULT_WEEKS, 52),
+            ('lead_time_days', ReorderService.DEFAULT_LEAD_TIME_DAYS, 365),
+            ('coverage_days', ReorderService.DEFAULT_COVERAGE_DAYS, 365),
+        ):
+            try:
+                params[name] = int(request.data.get(name, default))
+            except (TypeError, ValueError):
+                return Response({'error': f'{name} doit être un entier'}, status=400)
+            if not 0 <= params[name] <= maximum or (name == 'weeks' and params[name] == 0):
+                return Response({'error': f'{name} hors limites (max {maximum})'}, status=400)
+        
+        job = ReorderJob.objects.create(
+            user=request.user,
+            site_configuration=site_configuration,
+            create_orders=str(request.data.get('create_orders', True)).lower() in ('1', 'true', 'yes', 'oui'),
+            **params,
+        )
+        ReorderService.start_job_async(job)
+        return Response({
+            **ReorderService.serialize_job(job),
+            'status_url': reverse('api_reorder_job', args=[job.id]),
+        }, status=202)
+
+
+class ReorderJobAPIView(APIView):
+    """
+    Statut et suggestions d'un calcul de réapprovisionnement
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        from apps.inventory.models import ReorderJob
+        from apps.inventory.services.reorder import ReorderService
+        
+        jobs = ReorderJob.objects.all()
+        if not request.user.is_superuser:
+            jobs = jobs.filter(site_configuration=get_site_context(request).require_site())
+        job = get_object_or_404(jobs, pk=pk)
+        return Response(ReorderService.serialize_job(job))
+
+class StockAlertAPIView(APIView):
+    """
+    Alertes de stock du site : compteur de non-lues (en cache), dernières alertes,
+    marquage comme lues (POST, `ids` optionnel)
+    """
+    permission_classes = [IsAuthenticated]
+    LIMIT = 50
+    
+    def get(self, request):
+        from apps.inventory.services.stock_alerts import StockAlertService
+        
+        site_configuration = get_site_context(request).require_site()
+        if not site_configuration:
+            return Response({'error': 'Aucune configuration de site trouvée'}, status=400)
+        
+        data = {'unread_count': StockAlertService.get_unread_count(site_configuration)}
+        if request.query_params.get('count_only') not in ('1', 'true'):
+            data['alerts'] = list(
+                StockAlertService.get_alerts(site_configuration)
+                .order_by('-created_at')
+                .values('id', 'type_notification', 'titre', 'message', 'cle_alerte', 'created_at')[:self.LIMIT]
+            )
+        return Response(data)
+    
+    def post(self, request):
+        from apps.inventory.services.stock_alerts import StockAlertService
+        
+        site_configuration = get_site_context(request).require_site()
+        if not site_configuration:
+            return Response({'error': 'Aucune configuration de site trouvée'}, status=400)
+        
+        ids = request.data.get('ids')
+        if ids is not None and (
+            not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)
+        ):
+            return Response({'error': 'ids doit être une liste d\'entiers'}, status=400)
+        marked = StockAlertService.mark_read(site_configuration, ids)
+        return Response({'marked_read': marked, 'unread_count': StockAlertService.get_unread_count(site_configuration)})
+
+class InventoryCountSessionViewSet(viewsets.ViewSet):
+    """
+    Sessions d'inventaire pour l'application mobile :
+    ouverture, envois de comptages (plusieurs appareils), gel, revue des écarts, application
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def _get_sessions(self):
+        from apps.inventory.models import InventoryCountSession
+        
+        sessions = InventoryCountSession.objects.select_related('created_by', 'site_configuration')
+        if self.request.user.is_superuser:
+            return sessions
+        return sessions.filter(site_configuration=get_site_context(self.request).require_site())
+    
+    def _get_session(self, pk):
+        return get_object_or_404(self._get_sessions(), pk=pk)
+    
+    def _run(self, operation, *args, **kwargs):
+        """Exécute une opération du service ; les erreurs métier deviennent des 400"""
+        from django.core.exceptions import ValidationError as DjangoValidationError
+        
+        try:
+            return operation(*args, **kwargs), None
+        except DjangoValidationError as e:
+            return None, Response({'error': e.messages[0]}, status=400)
+    
+    def list(self, request):
+        from apps.inventory.services.inventory_count import InventoryCountService
+        
+        sessions = self._get_sessions().annotate(lines_count=Count('lines'))
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            sessions = sessions.filter(status=status_filter)
+        return Response([InventoryCountService.serialize_session(s) for s in sessions[:100]])
+    
+    def create(self, request):
+        from apps.inventory.services.inventory_count import InventoryCountService
+        
+        site_configuration = get_site_context(request).require_site()
+        if not site_configuration:
+            return Response({'error': 'Aucune configuration de site trouvée'}, status=400)
+        session = InventoryCountService.start_session(
+            site_configuration,
+            user=request.user,
+            name=request.data.get('name'),
+            zero_uncounted=str(request.data.get('zero_uncounted', '')).lower() in ('1', 'true', 'yes', 'oui'),
+            notes=request.data.get('notes', ''),
+        )
+        return Response(InventoryCountService.serialize_session(session), status=201)
+    
+    def retrieve(self, request, pk=None):
+        from apps.inventory.services.inventory_count import InventoryCountService
+        
+        session = get_object_or_404(self._get_sessions().annotate(lines_count=Count('lines')), pk=pk)
+        return Response(InventoryCountService.serialize_session(session))
+    
+    @action(detail=True, methods=['post'])
+    def counts(self, request, pk=None):
+        """Envoi de comptages : {"items": [{"product_id"|"code", "quantity"}], "mode": "add"|"set", "device_id"}"""
+        from apps.inventory.services.inventory_count import InventoryCountService
+        
+        items = request.data.get('items')
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Liste "items" requise'}, status=400)
+        result, error = self._run(
+            InventoryCountService.record_counts,
+            self._get_session(pk),
+            items,
+            user=request.user,
+            device_id=str(request.data.get('device_id') or '')[:100],
+            mode=request.data.get('mode', 'add'),
+        )
+        return error or Response(result)
+    
+    @action(detail=True, methods=['post'])
+    def freeze(self, request, pk=None):
+        from apps.inventory.services.inventory_count import InventoryCountService
+        
+        session, error = self._run(InventoryCountService.freeze, self._get_session(pk))
+        return error or Response(InventoryCountService.serialize_session(session))
+    
+    @action(detail=True, methods=['get'])
+    def diff(self, request, pk=None):
+        """Écarts paginés : ?page=1&page_size=200&all=true pour inclure les lignes sans écart"""
+        from apps.inventory.services.inventory_count import InventoryCountService
+        
+        session = self._get_session(pk)
+        lines, summary = InventoryCountService.get_diff(
+            session, only_differences=request.query_params.get('all', '').lower() not in ('1', 'true')
+        )
+        try:
+            page_size = min(max(int(request.query_params.get('page_size', 200)), 1), 1000)
+            page_number = max(int(request.query_params.get('page', 1)), 1)
+        except ValueError:
+            return Response({'error': 'Paramètres de pagination invalides'}, status=400)
+        start = (page_number - 1) * page_size
+        page = list(lines[start:start + page_size + 1])
+        return Response({
+            'session': InventoryCountService.serialize_session(session),
+            'summary': summary,
+            'page': page_number,
+            'has_more': len(page) > page_size,
+            'lines': [
+                {
+                    'product_id': line.product_id,
+                    'name': line.product.name,
+                    'cug': line.product.cug,
+                    'expected_quantity': line.expected,
+                    'counted_quantity': line.counted_quantity,
+                    'delta': line.delta,
+                    'delta_value': line.delta_value,
+                    'device_id': line.device_id,
+                }
+                for line in page[:page_size]
+            ],
+        })
     
+    @action(detail=True, methods=['post'])
+    def apply(self, request, pk=None):
+        from apps.inventory.services.inventory_count import InventoryCountService
+        
+        result, error = self._run(InventoryCountService.apply, self._get_session(pk), user=request.user)
+        return error or Response(result)
+    
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        from apps.inventory.services.inventory_count import InventoryCountService
+        
+        session, error = self._run(InventoryCountService.cancel, self._get_session(pk))
+        return error or Response(InventoryCountService.serialize_session(session))
 
 
+
+class _Echo:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne écrite (export en flux)"""
+    
+    def write(self, value):
+        return value
+
+
+class StockValuationAPIView(APIView):
+    """
+    Valorisation du stock par catégorie / marque (ou par produit en CSV),
+    éventuellement à une date passée (?as_of=AAAA-MM-JJ)
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        import csv
+        from django.http import StreamingHttpResponse
+        from apps.inventory.services.stock_valuation import GROUPINGS, StockValuationService, parse_as_of
+        
+        try:
+            as_of = parse_as_of(request.query_params.get('as_of'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        
+        group_by = request.query_params.get('group_by')
+        allowed = list(GROUPINGS) + (['product'] if request.query_params.get('export') == 'csv' else [])
+        if group_by and group_by not in allowed:
+            return Response({'error': f"group_by doit être l'une des valeurs : {', '.join(allowed)}"}, status=400)
+        
+        if request.query_params.get('export') == 'csv':
+            group_by = group_by or 'category'
+            writer = csv.writer(_Echo(), delimiter=';')
+            rows = StockValuationService.iter_csv_rows(request.user, group_by, as_of)
+            suffix = as_of.date().isoformat() if as_of else timezone.localdate().isoformat()
+            response = StreamingHttpResponse(
+                (writer.writerow(row) for row in rows), content_type='text/csv; charset=utf-8'
+            )
+            response['Content-Disposition'] = f'attachment; filename="valorisation_stock_{group_by}_{suffix}.csv"'
+            return response
+        
+        groupings = [group_by] if group_by else list(GROUPINGS)
+        valuation = StockValuationService.build_valuation(request.user, groupings, as_of)
+        return Response(StockValuationService.serialize(valuation))
+
 class ProductCopyManagementAPIView(APIView):
     """
     Vue API pour gérer les produits copiés (synchronisation, désactivation, etc.)
@@ -5380,7 +5825,8 @@ class ProductCopyManagementAPIView(APIView):
             product_copies = ProductCopy.objects.filter(
                 destination_site=current_site
             ).select_related(
-                'original_product', 
+                'original_product__category',
+                'original_product__brand',
                 'copied_product', 
                 'source_site'
             ).order_by('-copied_at')
@@ -5410,6 +5856,8 @@ class ProductCopyManagementAPIView(APIView):
             paginator = Paginator(product_copies, 20)
             page_number = request.GET.get('page', 1)
             page_obj = paginator.get_page(page_number)
+            # Originaux des produits sources eux-mêmes copiés (une requête pour la page)
+            source_originals = get_copy_originals_map([copy.original_product_id for copy in page_obj])
             
             # Sérialiser les copies
             copies_data = []
@@ -5422,7 +5870,10 @@ class ProductCopyManagementAPIView(APIView):
                         'cug': copy.original_product.cug,
                         'selling_price': float(copy.original_product.selling_price),
                         'quantity': copy.original_product.quantity,
-                        'image_url': get_product_image_url(copy.original_product),
+                        'image_url': get_product_image_url(
+                            copy.original_product, check_copy=False,
+                            original=source_originals.get(copy.original_product_id)
+                        ),
                         'category': {
                             'id': copy.original_product.category.id,
                             'name': copy.original_product.category.name
@@ -5439,7 +5890,9 @@ class ProductCopyManagementAPIView(APIView):
                         'selling_price': float(copy.copied_product.selling_price),
                         'quantity': copy.copied_product.quantity,
                         'is_active': copy.copied_product.is_active,
-                        'image_url': get_product_image_url(copy.copied_product),
+                        'image_url': get_product_image_url(
+                            copy.copied_product, check_copy=False, original=copy.original_product
+                        ),
                     },
                     'source_site': {
                         'id': copy.source_site.id,
@@ -5492,26 +5945,11 @@ class ProductCopyManagementAPIView(APIView):
                 copied.save()
                 
                 # ✅ Synchroniser les codes-barres
-                print(f"🔄 SYNCHRONISATION - Produit original: {original.name} (ID: {original.id})")
-                print(f"   CUG original: {original.cug}")
-                print(f"   Generated EAN original: {original.generated_ean}")
-                print(f"   Image original: {original.image}")
-                print(f"   Image URL original: {original.image.url if original.image else 'Aucune'}")
-                print(f"   Site original: {original.site_configuration.site_name if original.site_configuration else 'Aucun'}")
-                
                 # Supprimer les codes-barres existants du produit copié
-                old_barcodes = copied.barcodes.all()
-                print(f"   Codes-barres existants à supprimer ({old_barcodes.count()}):")
-                for barcode in old_barcodes:
-                    print(f"     - {barcode.ean} {'(principal)' if barcode.is_primary else ''}")
                 copied.barcodes.all().delete()
                 
                 # Copier les codes-barres de l'original
-                original_barcodes = original.barcodes.all()
-                print(f"   Codes-barres originaux à copier ({original_barcodes.count()}):")
-                for barcode in original_barcodes:
-                    print(f"     - {barcode.ean} {'(principal)' if barcode.is_primary else ''} - Notes: {barcode.notes or 'Aucune'}")
-                
+                original_barcodes = list(original.barcodes.all())
                 synced_barcodes_count = 0
                 for original_barcode in original_barcodes:
                     try:
@@ -5522,25 +5960,17 @@ class ProductCopyManagementAPIView(APIView):
                             is_primary=original_barcode.is_primary
                         )
                         synced_barcodes_count += 1
-                        print(f"   ✅ Code-barres synchronisé: {original_barcode.ean}")
                     except Exception as e:
                         # En cas d'erreur (EAN déjà utilisé), continuer sans ce code-barres
-                        print(f"   ❌ Impossible de synchroniser le code-barres {original_barcode.ean}: {e}")
+                        logger.warning(
+                            "❌ [COPY_SYNC] Impossible de synchroniser le code-barres %s: %s", original_barcode.ean, e
+                        )
                         continue
                 
-                print(f"🔄 SYNCHRONISATION - Produit copié: {copied.name} (ID: {copied.id})")
-                print(f"   CUG copié: {copied.cug}")
-                print(f"   Generated EAN copié: {copied.generated_ean}")
-                print(f"   Image copié: {copied.image}")
-                print(f"   Image URL copié: {copied.image.url if copied.image else 'Aucune'}")
-                print(f"   Site copié: {copied.site_configuration.site_name if copied.site_configuration else 'Aucun'}")
-                print(f"   Codes-barres synchronisés: {synced_barcodes_count}/{original_barcodes.count()}")
-                
-                # Vérifier les codes-barres finaux
-                final_barcodes = copied.barcodes.all()
-                print(f"   Codes-barres finaux après sync ({final_barcodes.count()}):")
-                for barcode in final_barcodes:
-                    print(f"     - {barcode.ean} {'(principal)' if barcode.is_primary else ''} - Notes: {barcode.notes or 'Aucune'}")
+                logger.info(
+                    "🔄 [COPY_SYNC] Produit %s synchronisé depuis %s: %s/%s codes-barres",
+                    copied.id, original.id, synced_barcodes_count, len(original_barcodes),
+                )
                 
                 return Response({
                     'success': True,
@@ -5578,6 +6008,18 @@ class ProductCopyManagementAPIView(APIView):
             return Response({'error': str(e)}, status=500)
 
 
+def recent_credit_transactions(lookup='credit_transactions'):
+    """
+    Prefetch des 5 dernières transactions de crédit de chaque client
+    (CustomerSerializer.recent_credit_transactions), en une requête pour la page
+    """
+    return Prefetch(
+        lookup,
+        queryset=CreditTransaction.objects.select_related('sale', 'user')[:5],
+        to_attr='recent_credit_transactions',
+    )
+
+
 class CustomerViewSet(viewsets.ModelViewSet):
     """ViewSet pour la gestion des clients avec crédit"""
     serializer_class = CustomerSerializer
@@ -5595,7 +6037,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
         # Vérifier si un filtre par site est demandé dans les paramètres de requête
         site_filter = self.request.query_params.get('site_configuration')
         
-        queryset = Customer.objects.all()
+        queryset = Customer.objects.select_related('site_configuration').prefetch_related(recent_credit_transactions())
         
         if self.request.user.is_superuser:
             # Superuser peut filtrer par site si demandé, sinon voit tout
@@ -5645,7 +6087,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
         else:
             loyalty_transactions = LoyaltyTransaction.objects.filter(
                 customer=customer
-            ).select_related('sale', 'site_configuration').order_by('-transaction_date')[:limit]
+            ).select_related('sale', 'customer', 'site_configuration').order_by('-transaction_date')[:limit]
             loyalty_serializer = LoyaltyTransactionSerializer(loyalty_transactions, many=True, context={'request': request}) if LOYALTY_SERIALIZERS_AVAILABLE else None
         
         # Debug: logger le nombre de transactions
@@ -5776,7 +6218,9 @@ class CustomerViewSet(viewsets.ModelViewSet):
     def with_debt(self, request):
         """Récupérer les clients ayant une dette"""
         user_site = getattr(request.user, 'site_configuration', None)
-        customers = CreditService.get_customers_with_debt(user_site)
+        customers = CreditService.get_customers_with_debt(user_site).select_related(
+            'site_configuration'
+        ).prefetch_related(recent_credit_transactions())
         serializer = CustomerSerializer(customers, many=True, context={'request': request})
         return Response(serializer.data)
     
@@ -5859,14 +6303,14 @@ class CreditTransactionViewSet(viewsets.ReadOnlyModelViewSet):
         
         if self.request.user.is_superuser:
             # Superuser voit tout
-            return CreditTransaction.objects.select_related('customer', 'sale', 'user').all()
+            return CreditTransaction.objects.select_related('customer__site_configuration', 'sale', 'user').all()
         else:
             # Utilisateur normal voit seulement son site
             if not user_site:
                 return CreditTransaction.objects.none()
             return CreditTransaction.objects.filter(
                 site_configuration=user_site
-            ).select_related('customer', 'sale', 'user')
+            ).select_related('customer__site_configuration', 'sale', 'user')
 
 
 class CategoryRecommendationAPIView(APIView):
@@ -5938,6 +6382,25 @@ class CategoryRecommendationAPIView(APIView):
             logger.debug(f'⚠️ Erreur embedding IA (fallback utilisé): {str(e)}')
             return None
     
+    def get_category_embeddings(self, categories):
+        """
+        Embeddings des catégories {id: embedding}, partagés entre workers pendant 1h : une
+        seule lecture du cache pour toutes les catégories, indexés par nom (un renommage
+        n'utilise pas l'ancien embedding). Les échecs (None) ne sont pas mis en cache.
+        """
+        from apps.core.cache import Namespace
+        embeddings = Namespace('category_embeddings', timeout=3600)
+        found = embeddings.get_many([(category.id, category.name) for category in categories])
+        computed = {}
+        for category in categories:
+            if (category.id, category.name) not in found:
+                embedding = self.get_semantic_embedding(category.name)
+                if embedding:
+                    computed[(category.id, category.name)] = embedding
+        if computed:
+            embeddings.set_many(computed)
+        return {category_id: embedding for (category_id, _), embedding in {**found, **computed}.items()}
+    
     def cosine_similarity(self, vec1, vec2):
         """Calcule la similarité cosinus entre deux vecteurs (0.0 à 1.0)"""
         try:
@@ -6120,16 +6583,17 @@ class CategoryRecommendationAPIView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Vérifier le cache (TTL de 5 minutes)
-            cache_key = f'category_recommendations_{request.user.id}_{product_name.lower()}'
-            cached_result = cache.get(cache_key)
+            from apps.core.cache import Namespace
+            # Obtenir le site de l'utilisateur
+            user_site = getattr(request.user, 'site_configuration', None)
+            
+            # Vérifier le cache (TTL de 5 minutes), invalidé quand une catégorie du site change
+            recommendations_cache = Namespace('categories', user_site.id if user_site else None, timeout=300)
+            cached_result = recommendations_cache.get('recommendations', request.user.id, product_name.lower())
             if cached_result:
                 logger.info(f'✅ Recommandations servies depuis le cache pour: {product_name}')
                 return Response(cached_result)
             
-            # Obtenir le site de l'utilisateur
-            user_site = getattr(request.user, 'site_configuration', None)
-            
             # Utiliser le service centralisé pour obtenir les catégories accessibles
             categories_queryset = PermissionService.get_user_accessible_resources(request.user, Category)
             categories_queryset = categories_queryset.filter(is_active=True).select_related('parent')
@@ -6152,7 +6616,17 @@ class CategoryRecommendationAPIView(APIView):
                 pass  # Utiliser le fallback si l'IA échoue
             
             # PRIORITÉ 1 : Rechercher dans les sous-catégories (level 1)
-            subcategories = categories_queryset.filter(level=1).select_related('parent')
+            subcategories = list(categories_queryset.filter(level=1).select_related('parent'))
+            # PRIORITÉ 2 : Si aucune sous-catégorie pertinente, rechercher dans les rayons (level 0)
+            rayons = list(categories_queryset.filter(level=0, is_rayon=True))
+            
+            # IA : Embeddings des catégories (en cache si possible)
+            category_embeddings = {}
+            if product_embedding:
+                try:
+                    category_embeddings = self.get_category_embeddings(subcategories + rayons)
+                except Exception:
+                    pass
             
             # Rechercher les produits similaires pour calculer la fréquence
             products_queryset = PermissionService.get_user_accessible_resources(request.user, Product)
@@ -6178,22 +6652,9 @@ class CategoryRecommendationAPIView(APIView):
                 frequency = category_frequency.get(subcat.id, 0)
                 parent_rayon_type = subcat.parent.rayon_type if subcat.parent else None
                 
-                # IA : Obtenir l'embedding de la catégorie (en cache si possible)
-                category_embedding = None
-                if product_embedding:
-                    try:
-                        cache_key_embedding = f'category_embedding_{subcat.id}'
-                        category_embedding = cache.get(cache_key_embedding)
-                        if not category_embedding:
-                            category_embedding = self.get_semantic_embedding(subcat.name)
-                            if category_embedding:
-                                cache.set(cache_key_embedding, category_embedding, 3600)  # Cache 1h
-                    except:
-                        pass
-                
                 score = self.calculate_match_score(
                     keywords, subcat.name, subcat.level, frequency, parent_rayon_type,
-                    product_name, product_embedding, category_embedding
+                    product_name, product_embedding, category_embeddings.get(subcat.id)
                 )
                 
                 if score > 0:
@@ -6206,29 +6667,13 @@ class CategoryRecommendationAPIView(APIView):
             # TRIER par score décroissant
             subcategory_scores.sort(key=lambda x: x['score'], reverse=True)
             
-            # PRIORITÉ 2 : Si aucune sous-catégorie pertinente, rechercher dans les rayons (level 0)
-            rayons = categories_queryset.filter(level=0, is_rayon=True)
-            
             rayon_scores = []
             for rayon in rayons:
                 frequency = category_frequency.get(rayon.id, 0)
                 
-                # IA : Obtenir l'embedding de la catégorie (en cache si possible)
-                category_embedding = None
-                if product_embedding:
-                    try:
-                        cache_key_embedding = f'category_embedding_{rayon.id}'
-                        category_embedding = cache.get(cache_key_embedding)
-                        if not category_embedding:
-                            category_embedding = self.get_semantic_embedding(rayon.name)
-                            if category_embedding:
-                                cache.set(cache_key_embedding, category_embedding, 3600)  # Cache 1h
-                    except:
-                        pass
-                
                 score = self.calculate_match_score(
                     keywords, rayon.name, rayon.level, frequency, rayon.rayon_type,
-                    product_name, product_embedding, category_embedding
+                    product_name, product_embedding, category_embeddings.get(rayon.id)
                 )
                 
                 if score > 0:
@@ -6286,7 +6731,7 @@ class CategoryRecommendationAPIView(APIView):
             }
             
             # Mettre en cache (TTL de 5 minutes = 300 secondes)
-            cache.set(cache_key, result, 300)
+            recommendations_cache.set('recommendations', request.user.id, product_name.lower(), value=result)
             
             # Logger pour analyse
             logger.info(f'📊 Recommandations générées pour "{product_name}": {len(recommendations)} catégories')
@@ -93,8 +93,8 @@ class ActiviteAdmin(admin.ModelAdmin):
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ('destinataire', 'type_notification', 'titre', 'lu', 'created_at')
-    list_filter = ('type_notification', 'lu', 'created_at')
+    list_display = ('destinataire', 'type_notification', 'titre', 'site_configuration', 'lu', 'created_at')
+    list_filter = ('type_notification', 'lu', 'site_configuration', 'created_at')
     search_fields = ('destinataire__username', 'titre', 'message')
     readonly_fields = ('created_at', 'updated_at', 'created_by', 'updated_by')
     ordering = ('-created_at',)
@@ -0,0 +1,187 @@
+"""
+Cache partagé entre les workers : configuration, espaces de noms versionnés par site,
+protection contre les ruées et compteurs de succès/échecs.
+
+- CACHE_URL choisit le backend : redis://… (RedisCache de Django, partagé entre workers
+  et instances, conservé au redémarrage), locmem:// (mémoire du processus : développement,
+  tests, instance unique) ou file:///chemin (FileBasedCache, propre à la machine).
+  L'invalidation entre instances (bump() vu par tous les conteneurs) exige Redis : avec
+  un cache local, chaque instance garde ses entrées jusqu'à leur expiration, et sur
+  FileBasedCache incr() n'est pas atomique entre processus.
+- Namespace('cadencier', site_id) préfixe les clés par la version de l'espace du site et
+  par celle de l'espace global : bump() invalide d'un coup tout l'espace d'un site, ou de
+  tous les sites s'il est appelé sans site. Les versions démarrent à l'horodatage en ms
+  pour qu'une version évincée du cache ne ressuscite pas d'anciennes entrées.
+- get_or_compute() sert la valeur en cache, la recalcule de façon anticipée avec une
+  probabilité croissante à l'approche de l'expiration (XFetch) et ne laisse qu'un seul
+  processus la recalculer (verrou cache.add) : les autres servent l'ancienne valeur ou
+  attendent brièvement la nouvelle. Sur FileBasedCache, add() n'est pas atomique entre
+  processus : le verrou y est indicatif.
+- Les caches locaux gardent jusqu'à LOCAL_MAX_ENTRIES entrées (300 par défaut dans
+  Django) : au-delà, l'éviction emporte aussi des versions d'espaces, ce qui les vide.
+- Chaque accès incrémente bolibana_cache_events_total{namespace, result} (hit, miss,
+  stale, early, wait) dans le registre de métriques.
+"""
+import hashlib
+import logging
+import math
+import random
+import time
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 30  # Durée maximale d'un recalcul protégé par le verrou
+LOCK_WAIT = 2.0  # Attente d'une valeur recalculée par un autre processus
+MAX_KEY_PART = 64
+LOCAL_MAX_ENTRIES = 10000  # Caches locmem / fichiers (éviction d'un tiers au-delà)
+
+
+def cache_settings(url='', timeout=300, key_prefix='bolibana'):
+    """Dictionnaire CACHES pour CACHE_URL (redis://, rediss://, file://, locmem:// ou vide)"""
+    parsed = urlparse(url or 'locmem://')
+    if parsed.scheme in ('redis', 'rediss'):
+        backend = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    elif parsed.scheme == 'file':
+        backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': parsed.path,
+                   'OPTIONS': {'MAX_ENTRIES': LOCAL_MAX_ENTRIES}}
+    elif parsed.scheme == 'locmem':
+        backend = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': parsed.netloc or 'bolibana',
+                   'OPTIONS': {'MAX_ENTRIES': LOCAL_MAX_ENTRIES}}
+    else:
+        raise ImproperlyConfigured(f"CACHE_URL non reconnu : {url}")
+    return {'default': {**backend, 'TIMEOUT': timeout, 'KEY_PREFIX': key_prefix}}
+
+
+def is_shared():
+    """Vrai si le cache par défaut est Redis, donc partagé et invalidé entre instances"""
+    return 'redis' in settings.CACHES['default']['BACKEND'].lower()
+
+
+def _key_part(value):
+    """Segment de clé lisible, ou son empreinte s'il est long ou contient des caractères à risque"""
+    text = str(value)
+    if len(text) <= MAX_KEY_PART and text.replace('-', '').replace('_', '').replace('.', '').isalnum():
+        return text
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+class Namespace:
+    """Clés versionnées d'un espace de noms, globales ou propres à un site"""
+
+    def __init__(self, name, site_id=None, timeout=300):
+        self.name = name
+        self.site_id = site_id
+        self.timeout = timeout
+
+    def _version_key(self, site_id):
+        return f"ns:{self.name}:{'global' if site_id is None else site_id}"
+
+    def versions(self):
+        """Version globale et version du site (une seule lecture du cache), créées au besoin"""
+        keys = [self._version_key(None)] + ([self._version_key(self.site_id)] if self.site_id is not None else [])
+        found = cache.get_many(keys)
+        versions = []
+        for key in keys:
+            if key not in found:
+                cache.add(key, int(time.time() * 1000), None)
+                found[key] = cache.get(key)
+            versions.append(found[key])
+        return versions
+
+    def key(self, *parts):
+        versions = '.'.join(str(version) for version in self.versions())
+        site = 'global' if self.site_id is None else self.site_id
+        return ':'.join([self.name, str(site), f"v{versions}"] + [_key_part(part) for part in parts])
+
+    def bump(self):
+        """Invalide l'espace du site (de tous les sites si l'espace est global)"""
+        key = self._version_key(self.site_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), None)
+
+    def get(self, *parts, default=None):
+        envelope = cache.get(self.key(*parts))
+        registry.cache_event(self.name, 'miss' if envelope is None else 'hit')
+        return default if envelope is None else envelope[0]
+
+    def set(self, *parts, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        cache.set(self.key(*parts), (value, time.time() + timeout, 0.0), timeout)
+
+    def delete(self, *parts):
+        cache.delete(self.key(*parts))
+
+    def get_many(self, keys):
+        """{parts: valeur} des clés présentes, `keys` étant une liste de tuples (une lecture du cache)"""
+        prefix = self.key()
+        names = {f"{prefix}:{':'.join(_key_part(part) for part in parts)}": parts for parts in keys}
+        found = cache.get_many(list(names))
+        for result, count in (('hit', len(found)), ('miss', len(names) - len(found))):
+            if count:
+                registry.cache_event(self.name, result, count)
+        return {names[name]: envelope[0] for name, envelope in found.items()}
+
+    def set_many(self, values, timeout=None):
+        """Enregistre {parts: valeur} en une écriture"""
+        timeout = self.timeout if timeout is None else timeout
+        prefix, expires_at = self.key(), time.time() + timeout
+        cache.set_many({
+            f"{prefix}:{':'.join(_key_part(part) for part in parts)}": (value, expires_at, 0.0)
+            for parts, value in values.items()
+        }, timeout)
+
+    def get_or_compute(self, *parts, compute, timeout=None, beta=1.0):
+        """
+        Valeur en cache (None compris) ou calculée par compute() ; recalcul anticipé et
+        verrou : un seul processus recalcule une clé à la fois
+        """
+        timeout = self.timeout if timeout is None else timeout
+        key = self.key(*parts)
+        envelope = cache.get(key)
+        if envelope is not None:
+            value, expires_at, delta = envelope
+            # XFetch : recalcul anticipé d'autant plus probable que le calcul est long
+            if time.time() - delta * beta * math.log(1.0 - random.random()) < expires_at:
+                registry.cache_event(self.name, 'hit')
+                return value
+            if not cache.add(f"{key}:lock", 1, LOCK_TIMEOUT):
+                registry.cache_event(self.name, 'stale')
+                return value
+            registry.cache_event(self.name, 'early')
+            return self._compute(key, compute, timeout)
+
+        if cache.add(f"{key}:lock", 1, LOCK_TIMEOUT):
+            registry.cache_event(self.name, 'miss')
+            return self._compute(key, compute, timeout)
+        # Un autre processus calcule la même valeur : attendre brièvement son résultat
+        registry.cache_event(self.name, 'wait')
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            envelope = cache.get(key)
+            if envelope is not None:
+                return envelope[0]
+        return self._compute(key, compute, timeout, locked=False)
+
+    def _compute(self, key, compute, timeout, locked=True):
+        started = time.monotonic()
+        try:
+            value = compute()
+            delta = time.monotonic() - started
+            try:
+                cache.set(key, (value, time.time() + timeout, delta), timeout)
+            except Exception as exc:  # Valeur non sérialisable : servie sans être mise en cache
+                logger.warning("⚠️ [CACHE] %s non mis en cache: %s", key, exc)
+            return value
+        finally:
+            if locked:
+                cache.delete(f"{key}:lock")
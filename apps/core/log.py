@@ -0,0 +1,247 @@
+"""
+Journalisation structurée et non bloquante.
+
+- Chaque requête HTTP reçoit un identifiant (en-tête X-Request-ID repris ou généré par
+  RequestIdMiddleware) ajouté à tous ses enregistrements.
+- Les événements DEBUG à fort volume sont échantillonnés par ligne de code appelante
+  (LOG_SAMPLING : 1 sur N), avant toute mise en forme.
+- Le thread de la requête ne fait que résoudre le message (%-formatage paresseux) et le
+  déposer dans une file ; la mise en forme JSON et l'écriture sur stdout sont faites
+  par un QueueListener. File pleine : l'enregistrement est abandonné et compté plutôt
+  que de bloquer la requête.
+
+Ce module n'importe pas Django : logging_config() est appelé depuis les settings.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+# Attributs standard d'un LogRecord : tout le reste vient de `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+
+def new_request_id(incoming=None):
+    """Identifiant reçu du client ou du proxy s'il est raisonnable, sinon généré"""
+    if incoming and len(incoming) <= 64 and incoming.replace('-', '').isalnum():
+        return incoming
+    return uuid.uuid4().hex[:16]
+
+
+class RequestIdFilter(logging.Filter):
+    """Ajoute request_id (requête HTTP en cours, '-' hors requête) à chaque enregistrement"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get() or '-'
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Ne garde qu'un enregistrement DEBUG sur N par ligne appelante. `rates` associe un
+    préfixe de logger à N ('api.views': 100) ; le préfixe le plus long l'emporte, les
+    loggers absents ne sont pas échantillonnés. Les niveaux INFO et au-delà passent tous.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def _rate(self, name):
+        best, rate = -1, 1
+        for prefix, value in self.rates.items():
+            if (name == prefix or name.startswith(prefix + '.')) and len(prefix) > best:
+                best, rate = len(prefix), value
+        return rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self._rate(record.name)
+        if rate <= 1:
+            return True
+        key = (record.pathname, record.lineno)
+        with self.lock:
+            seen = self.counters.get(key, 0)
+            self.counters[key] = seen + 1
+        if seen % rate:
+            return False
+        record.sampled = rate  # Un enregistrement représente `rate` événements
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement : horodatage, niveau, logger, message, request_id, contexte"""
+
+    def format(self, record):
+        payload = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None) or '-',
+            'where': f"{record.module}:{record.lineno}",
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exc'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Format lisible du développement, avec l'identifiant de requête"""
+
+    def __init__(self):
+        super().__init__('{levelname} {asctime} [{request_id}] {name} {message}', style='{')
+
+
+class _OpenStreamHandler(logging.StreamHandler):
+    """StreamHandler qui ignore son flux une fois fermé (fin d'interpréteur, capture de pytest)"""
+
+    def emit(self, record):
+        if not getattr(self.stream, 'closed', False):
+            super().emit(record)
+
+    def flush(self):
+        if getattr(self.stream, 'closed', False):
+            return
+        try:
+            super().flush()
+        except (OSError, ValueError):  # Flux fermé entre-temps
+            pass
+
+
+class AsyncStreamHandler(QueueHandler):
+    """
+    Dépose les enregistrements dans une file bornée vidée par un QueueListener écrivant
+    sur `stream`. Le listener est (re)démarré dans chaque processus : les workers
+    gunicorn forkés après la configuration ont chacun le leur.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = _OpenStreamHandler(stream or sys.stdout)
+        self.target.setFormatter(JsonFormatter())
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        # Le formatage a lieu dans le listener, pas dans le thread appelant
+        self.target.setFormatter(fmt)
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self.queue = queue.Queue(self.queue.maxsize)  # File héritée du parent : abandonnée
+            self._listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.flush_and_stop)
+
+    def prepare(self, record):
+        """Message résolu dans le thread appelant (arguments mutables), sans mise en forme"""
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # Reconfiguration (dictConfig) : les enregistrements en file sont écrits avant l'arrêt
+        self.flush_and_stop()
+        atexit.unregister(self.flush_and_stop)
+        super().close()
+
+    def flush_and_stop(self):
+        """Vide la file puis arrête le listener (fin de processus, tests)"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+        # À la sortie (atexit), le flux peut déjà être fermé
+        if getattr(getattr(self.target, 'stream', None), 'closed', False):
+            return
+        try:
+            self.target.flush()
+        except (OSError, ValueError):
+            pass
+
+
+def parse_levels(value):
+    """'api.views=DEBUG,apps.sales=WARNING' -> {'api.views': 'DEBUG', 'apps.sales': 'WARNING'}"""
+    levels = {}
+    for item in (value or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def parse_sampling(value):
+    """'api.views=100,apps.sales=10' -> {'api.views': 100, 'apps.sales': 10}"""
+    return {name: int(rate) for name, rate in parse_levels(value).items()}
+
+
+def logging_config(level='INFO', levels=None, json_format=True, asynchronous=True, sampling=None,
+                   stream='ext://sys.stdout'):
+    """
+    Dictionnaire LOGGING : racine au niveau `level`, niveaux par logger (`levels`),
+    JSON ou texte, écriture via la file (`asynchronous`) ou directe, échantillonnage DEBUG
+    """
+    handler = {
+        'class': 'apps.core.log.AsyncStreamHandler' if asynchronous else 'logging.StreamHandler',
+        'formatter': 'json' if json_format else 'text',
+        'filters': ['request_id', 'sampling'],
+        'stream': stream,
+    }
+    loggers = {
+        'django': {'level': 'INFO'},
+        'django.request': {'level': 'ERROR'},
+        'django.db.backends': {'level': 'ERROR'},
+    }
+    for name, logger_level in (levels or {}).items():
+        loggers[name] = {'level': logger_level}
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'filters': {
+            'request_id': {'()': 'apps.core.log.RequestIdFilter'},
+            'sampling': {'()': 'apps.core.log.SamplingFilter', 'rates': sampling or {}},
+        },
+        'formatters': {
+            'json': {'()': 'apps.core.log.JsonFormatter'},
+            'text': {'()': 'apps.core.log.TextFormatter'},
+        },
+        'handlers': {'console': handler},
+        'root': {'handlers': ['console'], 'level': level},
+        'loggers': loggers,
+    }
@@ -0,0 +1,256 @@
+"""
+Métriques des requêtes HTTP par route : durée, nombre et temps des requêtes SQL,
+taille et statut des réponses. Compteurs du cache applicatif (apps.core.cache) par
+espace de noms et résultat.
+
+Chaque processus (worker gunicorn) agrège en mémoire puis écrit périodiquement ses
+cumuls dans un fichier JSON du répertoire partagé METRICS_DIR (écriture atomique,
+un fichier par processus). L'export Prometheus additionne les fichiers de tous les
+workers, y compris ceux déjà arrêtés : les compteurs restent croissants.
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250)
+PREFIX = 'bolibana_http'
+CACHE_PREFIX = 'bolibana_cache'
+BOUNDARY = os.path.join(os.path.dirname(__file__), 'middlewares.py')
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None) or os.path.join(tempfile.gettempdir(), 'bolibana_metrics')
+
+
+def _observe(buckets, bounds, value):
+    for index, bound in enumerate(bounds):
+        if value <= bound:
+            buckets[index] += 1
+
+
+def _new_route():
+    return {
+        'count': 0,
+        'duration_sum': 0.0,
+        'duration_buckets': [0] * len(DURATION_BUCKETS),
+        'queries_sum': 0,
+        'queries_buckets': [0] * len(QUERY_BUCKETS),
+        'db_seconds': 0.0,
+        'response_bytes': 0,
+        'status': {},
+    }
+
+
+def _frame_label(frame, base):
+    filename = frame.f_code.co_filename
+    path = os.path.relpath(filename, base) if filename.startswith(base) else '/'.join(filename.split(os.sep)[-3:])
+    return f"{path}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+def call_site():
+    """
+    Appelant d'une requête SQL : premier cadre du projet hors middlewares (sinon premier
+    cadre hors de l'ORM, par exemple la vue générique DRF) — 'fichier:ligne fonction'.
+    La recherche s'arrête au middleware de mesure (limite de la requête).
+    """
+    base = str(settings.BASE_DIR)
+    orm = os.sep.join(('', 'django', 'db', ''))
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None and frame.f_code.co_filename != BOUNDARY:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and 'site-packages' not in filename and not filename.endswith(
+            ('middleware.py', 'middlewares.py', 'metrics.py')
+        ):
+            return _frame_label(frame, base)
+        if fallback is None and orm not in filename and filename != __file__:
+            fallback = frame
+        frame = frame.f_back
+    return _frame_label(fallback, base) if fallback else None
+
+
+class QueryRecorder:
+    """
+    Wrapper d'exécution SQL (connection.execute_wrapper) : nombre et durée des requêtes,
+    et pour le journal des requêtes lentes, SQL et durée de chacune. L'appelant (remontée
+    de la pile) n'est relevé qu'au-delà de site_seconds : les requêtes courantes n'en paient
+    pas le coût.
+    """
+
+    def __init__(self, capture=False, site_seconds=0.0):
+        self.capture = capture
+        self.site_seconds = site_seconds
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            if self.capture:
+                site = call_site() if elapsed >= self.site_seconds else None
+                self.queries.append({'sql': sql, 'seconds': elapsed, 'site': site})
+
+    def top(self, limit):
+        return sorted(self.queries, key=lambda query: query['seconds'], reverse=True)[:limit]
+
+
+class MetricsRegistry:
+    """Cumuls du processus par (route, méthode) et écriture dans le répertoire partagé"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.cache = {}
+        self.last_flush = 0.0
+
+    def observe(self, route, method, status, duration, queries, db_seconds, response_bytes):
+        with self.lock:
+            data = self.routes.setdefault(f"{route}|{method}", _new_route())
+            data['count'] += 1
+            data['duration_sum'] += duration
+            _observe(data['duration_buckets'], DURATION_BUCKETS, duration)
+            data['queries_sum'] += queries
+            _observe(data['queries_buckets'], QUERY_BUCKETS, queries)
+            data['db_seconds'] += db_seconds
+            data['response_bytes'] += response_bytes
+            data['status'][str(status)] = data['status'].get(str(status), 0) + 1
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if time.monotonic() - self.last_flush >= interval:
+            self.flush()
+
+    def cache_event(self, namespace, result, count=1):
+        """Accès au cache applicatif : hit, miss, stale, early ou wait"""
+        with self.lock:
+            key = f"{namespace}|{result}"
+            self.cache[key] = self.cache.get(key, 0) + count
+
+    def flush(self):
+        """Écrit les cumuls du processus (remplacement atomique du fichier du worker)"""
+        directory = metrics_dir()
+        with self.lock:
+            payload = json.dumps({'routes': self.routes, 'cache': self.cache})
+            self.last_flush = time.monotonic()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as handle:
+                handle.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning(f"⚠️ [METRICS] Écriture impossible dans {directory}: {exc}")
+
+    def reset(self):
+        with self.lock:
+            self.routes = {}
+            self.cache = {}
+            self.last_flush = 0.0
+
+
+registry = MetricsRegistry()
+
+
+def _merge():
+    """Cumuls de tous les workers : routes {(route, méthode): données} et cache {(espace, résultat): n}"""
+    registry.flush()
+    merged, cache_events = {}, {}
+    directory = metrics_dir()
+    for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        if not (name.startswith('metrics-') and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as handle:
+                payload = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        if 'routes' not in payload:
+            payload = {'routes': payload, 'cache': {}}  # Fichier d'un worker antérieur aux compteurs de cache
+        for key, count in payload['cache'].items():
+            event = tuple(key.rsplit('|', 1))
+            cache_events[event] = cache_events.get(event, 0) + count
+        for key, data in payload['routes'].items():
+            total = merged.setdefault(tuple(key.rsplit('|', 1)), _new_route())
+            for field in ('count', 'duration_sum', 'queries_sum', 'db_seconds', 'response_bytes'):
+                total[field] += data[field]
+            for field in ('duration_buckets', 'queries_buckets'):
+                total[field] = [a + b for a, b in zip(total[field], data[field])]
+            for status, count in data['status'].items():
+                total['status'][status] = total['status'].get(status, 0) + count
+    return merged, cache_events
+
+
+def collect():
+    """Cumuls de tous les workers : {(route, méthode): données additionnées}"""
+    return _merge()[0]
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram(lines, name, labels, bounds, buckets, total_sum, count):
+    for bound, cumulative in zip(bounds, buckets):
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+    lines.append(f'{name}_sum{{{labels}}} {total_sum}')
+    lines.append(f'{name}_count{{{labels}}} {count}')
+
+
+def render_prometheus(merged=None, cache_events=None):
+    """Export au format texte Prometheus (version 0.0.4)"""
+    if merged is None:
+        merged, cache_events = _merge()
+    lines = [
+        f'# HELP {PREFIX}_request_duration_seconds Durée des requêtes par route',
+        f'# TYPE {PREFIX}_request_duration_seconds histogram',
+    ]
+    for (route, method), data in sorted(merged.items()):
+        labels = f'route="{_label(route)}",method="{method}"'
+        _histogram(lines, f'{PREFIX}_request_duration_seconds', labels, DURATION_BUCKETS,
+                   data['duration_buckets'], round(data['duration_sum'], 6), data['count'])
+
+    lines += [
+        f'# HELP {PREFIX}_request_queries Requêtes SQL par requête HTTP',
+        f'# TYPE {PREFIX}_request_queries histogram',
+    ]
+    for (route, method), data in sorted(merged.items()):
+        labels = f'route="{_label(route)}",method="{method}"'
+        _histogram(lines, f'{PREFIX}_request_queries', labels, QUERY_BUCKETS,
+                   data['queries_buckets'], data['queries_sum'], data['count'])
+
+    for name, field, help_text in (
+        ('db_seconds_total', 'db_seconds', 'Temps passé en base'),
+        ('response_bytes_total', 'response_bytes', 'Octets de réponse'),
+    ):
+        lines += [f'# HELP {PREFIX}_{name} {help_text}', f'# TYPE {PREFIX}_{name} counter']
+        for (route, method), data in sorted(merged.items()):
+            value = round(data[field], 6) if isinstance(data[field], float) else data[field]
+            lines.append(f'{PREFIX}_{name}{{route="{_label(route)}",method="{method}"}} {value}')
+
+    lines += [f'# HELP {PREFIX}_requests_total Requêtes par statut', f'# TYPE {PREFIX}_requests_total counter']
+    for (route, method), data in sorted(merged.items()):
+        for status, count in sorted(data['status'].items()):
+            lines.append(f'{PREFIX}_requests_total{{route="{_label(route)}",method="{method}",status="{status}"}} {count}')
+
+    lines += [
+        f'# HELP {CACHE_PREFIX}_events_total Accès au cache applicatif par espace de noms et résultat',
+        f'# TYPE {CACHE_PREFIX}_events_total counter',
+    ]
+    for (namespace, result), count in sorted((cache_events or {}).items()):
+        lines.append(f'{CACHE_PREFIX}_events_total{{namespace="{_label(namespace)}",result="{result}"}} {count}')
+    return '\n'.join(lines) + '\n'
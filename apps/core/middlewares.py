@@ -1,6 +1,22 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+
+from .log import new_request_id, request_id_var
+from .metrics import QueryRecorder, registry
+from .nplusone import QueryDetector, format_report
+from .site_context import SiteContext, request_scope
 from .utils import log_activity
 
+logger = logging.getLogger(__name__)
+
 class ActivityLogMiddleware:
     """
     Middleware pour enregistrer automatiquement les activités
@@ -70,4 +86,137 @@ class NotificationMiddleware:
             request.unread_notifications = []
 
         response = self.get_response(request)
-        return response 
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    Middleware mesurant chaque requête par route résolue : durée, nombre et temps des
+    requêtes SQL, taille et statut de la réponse (export Prometheus : apps.core.metrics).
+    Au-delà de SLOW_REQUEST_MS, journalise les requêtes SQL les plus longues, avec leur appelant
+    pour celles d'au moins SLOW_QUERY_MS.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slow_ms = getattr(settings, 'SLOW_REQUEST_MS', 1000)
+        recorder = QueryRecorder(
+            capture=bool(slow_ms), site_seconds=getattr(settings, 'SLOW_QUERY_MS', 100) / 1000
+        )
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        route = (match.view_name or match.route) if match else '<non résolue>'
+        if response.has_header('Content-Length'):
+            size = int(response['Content-Length'])
+        else:
+            size = 0 if response.streaming else len(response.content)
+        registry.observe(route, request.method, response.status_code, duration, recorder.count, recorder.seconds, size)
+
+        if slow_ms and duration * 1000 >= slow_ms:
+            top = recorder.top(getattr(settings, 'SLOW_REQUEST_TOP_QUERIES', 5))
+            details = ''.join(
+                f"\n  {query['seconds'] * 1000:.1f} ms  {query['site'] or '?'}  {query['sql'][:300]}" for query in top
+            )
+            logger.warning(
+                f"🐢 [SLOW_REQUEST] {request.method} {request.path} ({route}) {duration * 1000:.0f} ms, "
+                f"{recorder.count} requête(s) SQL en {recorder.seconds * 1000:.0f} ms{details}"
+            )
+        return response
+
+
+class QueryPatternMiddleware:
+    """
+    Middleware de développement (DEBUG) : signale les requêtes SQL répétées (N+1) d'une
+    requête HTTP, avec champ de serializer et ligne de vue concernés
+    """
+    def __init__(self, get_response):
+        # Inactif hors DEBUG (les tests passent DEBUG à False : le runner fait la détection)
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        detector = QueryDetector()
+        with detector.watch():
+            response = self.get_response(request)
+        offenders = detector.offenders()
+        if offenders:
+            logger.warning(format_report(
+                offenders, f"🔁 [N+1] {request.method} {request.path} : {len(offenders)} requête(s) répétée(s)"
+            ))
+        return response
+
+
+class RequestIdMiddleware:
+    """
+    Identifiant de corrélation de la requête (X-Request-ID du proxy ou généré) : ajouté
+    à tous les enregistrements de journal émis pendant la requête et renvoyé au client
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.request_id = new_request_id(request.META.get('HTTP_X_REQUEST_ID'))
+        token = request_id_var.set(request.request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id_var.reset(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+
+class PathAwareSessionMiddleware(SessionMiddleware):
+    """
+    Sessions réservées au site web. Sur les chemins SESSIONLESS_PATHS (API mobile) :
+    - requête authentifiée par jeton (en-tête Authorization) : session vide, jamais lue
+      ni enregistrée, même si le client renvoie un cookie de session ;
+    - autre requête (navigateur connecté) : session chargée à la demande et enregistrée
+      seulement si elle a été modifiée, malgré SESSION_SAVE_EVERY_REQUEST.
+    Ailleurs (pages web), SESSION_SAVE_EVERY_WEB_REQUEST réenregistre toute session non vide
+    (expiration glissante), comme SESSION_SAVE_EVERY_REQUEST mais hors API.
+    """
+    def _sessionless_path(self, request):
+        return request.path.startswith(tuple(getattr(settings, 'SESSIONLESS_PATHS', ('/api/',))))
+
+    def process_request(self, request):
+        if self._sessionless_path(request) and request.META.get('HTTP_AUTHORIZATION'):
+            request.session = self.SessionStore(None)
+            request.session_bypassed = True
+            return
+        super().process_request(request)
+
+    def process_response(self, request, response):
+        if getattr(request, 'session_bypassed', False):
+            if request.session.modified:
+                logger.warning("⚠️ [SESSION] Session modifiée sur %s (jeton) : non enregistrée", request.path)
+            return response
+        if self._sessionless_path(request) and hasattr(request, 'session') and not request.session.modified:
+            if request.session.accessed:
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        if (not self._sessionless_path(request) and getattr(settings, 'SESSION_SAVE_EVERY_WEB_REQUEST', False)
+                and hasattr(request, 'session') and not request.session.is_empty()):
+            request.session.modified = True
+        return super().process_response(request, response)
+
+
+class SiteContextMiddleware:
+    """
+    Attache request.site_context : site, plan, limites, devise, réglages d'étiquettes et
+    programme de fidélité de l'utilisateur, résolus au premier accès (apps.core.site_context)
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.site_context = SiteContext(request)
+        with request_scope():
+            return self.get_response(request)
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_alter_configuration_subscription_plan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='cle_alerte',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name="Clé d'alerte"),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='site_configuration',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='core.configuration', verbose_name='Site'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['site_configuration', 'lu', 'created_at'], name='core_notif_site_unread'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('lu', False)), fields=('site_configuration', 'cle_alerte'), name='core_notification_unread_alert_unique'),
+        ),
+    ]
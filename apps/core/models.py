@@ -45,6 +45,16 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.get_full_name() or self.username}"
     
+    def refresh_from_db(self, using=None, fields=None):
+        """
+        Premier accès à un champ différé (utilisateur construit depuis le principal JWT,
+        api.authentication) : toute la ligne est lue en une requête, pas une par champ
+        """
+        deferred = self.get_deferred_fields()
+        if fields and deferred and set(fields) <= deferred:
+            fields = list(deferred)
+        super().refresh_from_db(using=using, fields=fields)
+
     def save(self, *args, **kwargs):
         """Synchroniser est_actif avec is_active (est_actif suit is_active)"""
         # Synchroniser est_actif avec is_active (pour compatibilité avec le code existant)
@@ -336,11 +346,11 @@ class Configuration(BaseModel):
         except Plan.DoesNotExist:
             return None
     
-    def get_plan_limits(self):
+    def get_plan_limits(self, plan=None):
         """
-        Retourne les limites du plan actuel du site
+        Retourne les limites du plan actuel du site (ou de `plan`, déjà résolu)
         """
-        plan = self.get_subscription_plan()
+        plan = plan or self.get_subscription_plan()
         if plan:
             return {
                 'max_sites': plan.max_sites,
@@ -436,11 +446,26 @@ class Notification(BaseModel):
     date_lecture = models.DateTimeField(null=True, blank=True)
     lien = models.URLField(blank=True, null=True)
     priorite = models.IntegerField(default=0)
+    # Alertes générées automatiquement (ex: seuil de stock franchi) : une seule non lue par clé et par site
+    site_configuration = models.ForeignKey(
+        'Configuration', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='notifications', verbose_name="Site"
+    )
+    cle_alerte = models.CharField(max_length=100, blank=True, null=True, verbose_name="Clé d'alerte")
 
     class Meta:
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
         ordering = ['-created_at', '-priorite']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['site_configuration', 'cle_alerte'], condition=models.Q(lu=False),
+                name='core_notification_unread_alert_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['site_configuration', 'lu', 'created_at'], name='core_notif_site_unread'),
+        ]
 
     def __str__(self):
         return f"{self.titre} - {self.destinataire}"
@@ -2,7 +2,7 @@ import os
 import psutil
 import logging
 from django.conf import settings
-from django.core.cache import cache
+from .cache import Namespace
 from django.db import models
 from django.contrib.auth import get_user_model
 
@@ -75,16 +75,12 @@ class QuotaMiddleware:
         return self.get_response(request)
 
 def get_storage_stats():
-    """Récupère les statistiques de stockage"""
-    cache_key = 'storage_stats'
-    stats = cache.get(cache_key)
-    
-    if not stats:
+    """Récupère les statistiques de stockage (cache de 5 minutes, un seul calcul à la fois)"""
+    def compute():
         monitor = StorageMonitor()
-        stats = {
+        return {
             'disk_usage': monitor.check_disk_usage(),
             'user_quotas': monitor.check_user_quotas()
         }
-        cache.set(cache_key, stats, 300)  # Cache pour 5 minutes
-    
-    return stats 
+
+    return Namespace('storage_stats', timeout=300).get_or_compute('stats', compute=compute) 
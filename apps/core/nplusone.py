@@ -0,0 +1,165 @@
+"""
+Détection des requêtes N+1 (développement et tests).
+
+Chaque requête SQL est ramenée à un gabarit (littéraux et listes IN normalisés) et à
+la pile d'appels du projet qui l'a émise. Un même couple (gabarit, pile) répété au
+moins NPLUSONE_THRESHOLD fois dans une requête HTTP ou un test est signalé, avec le
+champ de serializer DRF en cours de rendu et la ligne de vue concernée.
+
+Activé par QueryPatternMiddleware en DEBUG et par CustomTestRunner (rapport en fin
+de run, échec des tests concernés avec --nplusone-fail) ; assert_no_n_plus_one()
+vérifie un bloc de code dans un test.
+"""
+import os
+import re
+import sys
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import _frame_label
+
+DEFAULT_THRESHOLD = 5
+STACK_DEPTH = 6
+SKIPPED_FILES = ('middleware.py', 'middlewares.py', 'metrics.py', 'nplusone.py', 'test_runner.py')
+
+_IN_LIST = re.compile(r'IN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+
+
+class NPlusOneError(AssertionError):
+    """Requêtes répétées au-delà du seuil"""
+
+
+def normalize_sql(sql):
+    """Gabarit d'une requête : littéraux remplacés, listes IN de toute longueur confondues"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('N', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def _is_project_frame(filename, base):
+    return filename.startswith(base) and 'site-packages' not in filename and not filename.endswith(SKIPPED_FILES)
+
+
+def _serializer_field(frame):
+    """Champ DRF en cours de rendu (Serializer.champ) d'après la pile, le plus interne"""
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'to_representation' and code.co_filename.endswith(
+            ('rest_framework/serializers.py', 'rest_framework\\serializers.py')
+        ):
+            field = frame.f_locals.get('field')
+            serializer = frame.f_locals.get('self')
+            if field is not None and serializer is not None:
+                return f"{type(serializer).__name__}.{field.field_name}"
+        frame = frame.f_back
+    return None
+
+
+def in_test_method(frame):
+    """
+    Requête émise pendant une méthode test_* : la préparation des données (setUp, aides
+    de fixtures) n'est pas surveillée
+    """
+    while frame is not None:
+        name = os.path.basename(frame.f_code.co_filename)
+        if name.startswith('test') and name.endswith('.py') and name != 'test_runner.py':
+            return frame.f_code.co_name.startswith('test')
+        frame = frame.f_back
+    return False
+
+
+class QueryDetector:
+    """
+    Wrapper d'exécution SQL (connection.execute_wrapper) comptant les requêtes par
+    (gabarit, pile d'appels du projet)
+    """
+
+    def __init__(self, threshold=None, scope=None):
+        self.threshold = threshold or getattr(settings, 'NPLUSONE_THRESHOLD', DEFAULT_THRESHOLD)
+        self.scope = scope  # Filtre optionnel sur le cadre appelant (requêtes hors périmètre ignorées)
+        self.base = str(settings.BASE_DIR)
+        self.groups = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        frame = sys._getframe(1)
+        if self.scope is not None and not self.scope(frame):
+            return execute(sql, params, many, context)
+        stack = []
+        cursor = frame
+        while cursor is not None and len(stack) < STACK_DEPTH:
+            if _is_project_frame(cursor.f_code.co_filename, self.base):
+                stack.append((cursor.f_code.co_filename, cursor.f_lineno))
+            cursor = cursor.f_back
+        key = (normalize_sql(sql), tuple(stack))
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = {
+                'template': key[0],
+                'count': 0,
+                'site': self._site(frame),
+                'field': _serializer_field(frame),
+                'view': self._view(frame),
+            }
+        group['count'] += 1
+        return execute(sql, params, many, context)
+
+    def _site(self, frame):
+        while frame is not None:
+            if _is_project_frame(frame.f_code.co_filename, self.base):
+                return _frame_label(frame, self.base)
+            frame = frame.f_back
+        return None
+
+    def _view(self, frame):
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if _is_project_frame(filename, self.base) and filename.endswith('views.py'):
+                return _frame_label(frame, self.base)
+            frame = frame.f_back
+        return None
+
+    def offenders(self):
+        """Groupes répétés au moins `threshold` fois, les plus fréquents d'abord"""
+        return sorted(
+            (group for group in self.groups.values() if group['count'] >= self.threshold),
+            key=lambda group: group['count'], reverse=True,
+        )
+
+    @contextmanager
+    def watch(self):
+        """Installe le détecteur sur toutes les connexions configurées"""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+
+def format_report(offenders, title=None):
+    lines = [title] if title else []
+    for group in offenders:
+        lines.append(f"  {group['count']}x {group['template'][:200]}")
+        details = [
+            f"{label} {value}"
+            for label, value in (('champ', group['field']), ('vue', group['view']), ('appel', group['site']))
+            if value
+        ]
+        if details:
+            lines.append(f"     {' | '.join(details)}")
+    return '\n'.join(lines)
+
+
+@contextmanager
+def assert_no_n_plus_one(threshold=None):
+    """Échoue (NPlusOneError) si le bloc répète une requête au-delà du seuil"""
+    detector = QueryDetector(threshold)
+    with detector.watch():
+        yield detector
+    offenders = detector.offenders()
+    if offenders:
+        raise NPlusOneError(format_report(offenders, f"{len(offenders)} requête(s) N+1 détectée(s) :"))
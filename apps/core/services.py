@@ -3,9 +3,10 @@ Services centralisés pour la gestion des utilisateurs et des permissions
 """
 
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from django.db.models import Q
+from .cache import Namespace
 from .models import Configuration
 from .utils import (
     get_user_status_summary,
@@ -20,6 +21,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
+USER_INFO_CACHE = Namespace('user_info', timeout=900)
+# Principal des jetons (id, is_active, site, version du jeton) : api.authentication
+AUTH_PRINCIPAL_CACHE = Namespace('auth_principals', timeout=300)
 
 
 class UserInfoService:
@@ -35,12 +39,9 @@ class UserInfoService:
         if not user:
             return None
         
-        # Utiliser le cache pour éviter les requêtes répétées
-        cache_key = f'user_complete_info_{user.id}'
-        cached_info = cache.get(cache_key)
-        
-        if cached_info is None:
-            cached_info = {
+        # Utiliser le cache pour éviter les requêtes répétées (15 minutes, un seul calcul à la fois)
+        def compute():
+            return {
                 'basic_info': user.get_user_status_info(),
                 'status_summary': get_user_status_summary(user),
                 'permissions': get_user_permissions(user),
@@ -53,11 +54,8 @@ class UserInfoService:
                     'site_name': user.site_configuration.site_name,
                 } if user.site_configuration else None,
             }
-            
-            # Mettre en cache pour 15 minutes
-            cache.set(cache_key, cached_info, 900)
         
-        return cached_info
+        return USER_INFO_CACHE.get_or_compute(user.id, compute=compute)
     
     @staticmethod
     def get_user_permissions_summary(user):
@@ -122,10 +120,19 @@ class UserInfoService:
         """
         Invalide le cache d'un utilisateur spécifique
         """
-        cache_key = f'user_complete_info_{user_id}'
-        cache.delete(cache_key)
+        USER_INFO_CACHE.delete(user_id)
+        # Après la validation : une requête concurrente ne remet pas l'ancienne ligne en cache
+        transaction.on_commit(lambda: AUTH_PRINCIPAL_CACHE.delete(user_id))
         logger.info(f"Cache invalidé pour l'utilisateur {user_id}")
     
+    @staticmethod
+    def invalidate_site_users_cache(site_id):
+        """
+        Invalide le cache des utilisateurs d'un site (site, abonnement ou plan modifié)
+        """
+        for user_id in User.objects.filter(site_configuration_id=site_id).values_list('id', flat=True):
+            USER_INFO_CACHE.delete(user_id)
+    
     @staticmethod
     def get_users_by_permission_level(permission_level):
         """
@@ -276,18 +283,19 @@ class PermissionService:
         
         # Si une marque spécifique est fournie, vérifier l'accès au site
         if brand:
-            brand_site = brand.site_configuration
-            user_site = user.site_configuration
+            # Comparaison par identifiant : pas de requête par ligne dans les listes (can_edit)
+            brand_site_id = brand.site_configuration_id
+            user_site_id = user.site_configuration_id
             
-            logger.info(f"🏢 Vérification site - Brand site: {brand_site.site_name if brand_site else 'GLOBALE'}, User site: {user_site.site_name if user_site else 'None'}")
+            logger.info(f"🏢 Vérification site - Brand site: {brand_site_id or 'GLOBALE'}, User site: {user_site_id}")
             
-            if brand_site is None:
+            if brand_site_id is None:
                 # Marque globale - accessible à tous les utilisateurs autorisés
                 logger.info(f"✅ Marque globale accessible - User: {user.username}")
                 return True
             else:
                 # Vérifier que l'utilisateur appartient au même site
-                can_manage = user_site == brand_site
+                can_manage = user_site_id == brand_site_id
                 logger.info(f"{'✅' if can_manage else '❌'} Accès site - User: {user.username}, Brand: {brand.name}")
                 return can_manage
         
@@ -359,18 +367,18 @@ class PermissionService:
             return False
         
         # Vérifier l'accès au site de la marque
-        brand_site = brand.site_configuration
-        user_site = user.site_configuration
+        brand_site_id = brand.site_configuration_id
+        user_site_id = user.site_configuration_id
         
-        logger.info(f"🏢 Vérification site - Brand site: {brand_site.site_name if brand_site else 'GLOBALE'}, User site: {user_site.site_name if user_site else 'None'}")
+        logger.info(f"🏢 Vérification site - Brand site: {brand_site_id or 'GLOBALE'}, User site: {user_site_id}")
         
-        if brand_site is None:
+        if brand_site_id is None:
             # Marque globale - accessible à tous les utilisateurs autorisés
             logger.info(f"✅ Marque globale accessible pour suppression - User: {user.username}")
             return True
         else:
             # Vérifier que l'utilisateur appartient au même site
-            can_delete = user_site == brand_site
+            can_delete = user_site_id == brand_site_id
             logger.info(f"{'✅' if can_delete else '❌'} Suppression site - User: {user.username}, Brand: {brand.name}")
             return can_delete
     
@@ -400,18 +408,19 @@ class PermissionService:
         
         # Si une catégorie spécifique est fournie, vérifier l'accès au site
         if category:
-            category_site = category.site_configuration
-            user_site = user.site_configuration
+            # Comparaison par identifiant : pas de requête par ligne dans les listes (can_edit)
+            category_site_id = category.site_configuration_id
+            user_site_id = user.site_configuration_id
             
-            logger.info(f"🏢 Vérification site - Category site: {category_site.site_name if category_site else 'GLOBALE'}, User site: {user_site.site_name if user_site else 'None'}")
+            logger.info(f"🏢 Vérification site - Category site: {category_site_id or 'GLOBALE'}, User site: {user_site_id}")
             
-            if category_site is None:
+            if category_site_id is None:
                 # Catégorie globale - accessible à tous les utilisateurs autorisés
                 logger.info(f"✅ Catégorie globale accessible - User: {user.username}")
                 return True
             else:
                 # Vérifier que l'utilisateur appartient au même site
-                can_manage = user_site == category_site
+                can_manage = user_site_id == category_site_id
                 logger.info(f"{'✅' if can_manage else '❌'} Accès site - User: {user.username}, Category: {category.name}")
                 return can_manage
         
@@ -483,18 +492,18 @@ class PermissionService:
             return False
         
         # Vérifier l'accès au site de la catégorie
-        category_site = category.site_configuration
-        user_site = user.site_configuration
+        category_site_id = category.site_configuration_id
+        user_site_id = user.site_configuration_id
         
-        logger.info(f"🏢 Vérification site - Category site: {category_site.site_name if category_site else 'GLOBALE'}, User site: {user_site.site_name if user_site else 'None'}")
+        logger.info(f"🏢 Vérification site - Category site: {category_site_id or 'GLOBALE'}, User site: {user_site_id}")
         
-        if category_site is None:
+        if category_site_id is None:
             # Catégorie globale - accessible à tous les utilisateurs autorisés
             logger.info(f"✅ Catégorie globale accessible pour suppression - User: {user.username}")
             return True
         else:
             # Vérifier que l'utilisateur appartient au même site
-            can_delete = user_site == category_site
+            can_delete = user_site_id == category_site_id
             logger.info(f"{'✅' if can_delete else '❌'} Suppression site - User: {user.username}, Category: {category.name}")
             return can_delete
 
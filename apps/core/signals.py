@@ -4,9 +4,13 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.utils import timezone
 from django.db import transaction
-from .models import Activite, Notification
+from .models import Activite, Configuration, Notification
+from .services import UserInfoService
+from .site_context import invalidate_default_site, invalidate_site
+import logging
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 # TEMPORAIREMENT DÉSACTIVÉ - Cause des problèmes de contrainte de clé étrangère
 # @receiver(post_save, sender=User)
@@ -34,6 +38,28 @@ User = get_user_model()
 #         print(f"⚠️ Erreur lors de la journalisation de l'activité utilisateur: {e}")
 #         # Ne pas faire échouer la création/modification de l'utilisateur
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_caches(sender, instance, raw=False, **kwargs):
+    """
+    Utilisateur créé, modifié ou supprimé : informations et principal des jetons en cache
+    """
+    if not raw:
+        UserInfoService.invalidate_user_cache(instance.id)
+
+@receiver(post_save, sender=Configuration)
+@receiver(post_delete, sender=Configuration)
+def invalidate_site_users_caches(sender, instance, raw=False, **kwargs):
+    """
+    Site modifié : les utilisateurs et le contexte de site en cache portent une copie du site
+    (contexte invalidé après validation, pour ne pas remettre en cache l'ancienne valeur)
+    """
+    if not raw:
+        UserInfoService.invalidate_site_users_cache(instance.id)
+        site_id = instance.id
+        transaction.on_commit(lambda: invalidate_site(site_id))
+        transaction.on_commit(invalidate_default_site)
+
 @receiver(post_delete, sender=User)
 def user_deletion_log(sender, instance, **kwargs):
     """
@@ -47,7 +73,7 @@ def user_deletion_log(sender, instance, **kwargs):
                 description=f'Suppression du compte utilisateur {instance.username}'
             )
     except Exception as e:
-        print(f"⚠️ Erreur lors de la journalisation de la suppression: {e}")
+        logger.warning("⚠️ Erreur lors de la journalisation de la suppression: %s", e)
 
 @receiver(post_save, sender=Notification)
 def notification_created(sender, instance, created, **kwargs):
@@ -63,7 +89,7 @@ def notification_created(sender, instance, created, **kwargs):
                     description=f'Création de la notification: {instance.titre}'
                 )
     except Exception as e:
-        print(f"⚠️ Erreur lors de la journalisation de la notification: {e}")
+        logger.warning("⚠️ Erreur lors de la journalisation de la notification: %s", e)
 
 @receiver(user_logged_in)
 def update_last_login(sender, user, request, **kwargs):
@@ -85,7 +111,7 @@ def update_last_login(sender, user, request, **kwargs):
                 url=request.path
             )
     except Exception as e:
-        print(f"⚠️ Erreur lors de la mise à jour de la dernière connexion: {e}")
+        logger.warning("⚠️ Erreur lors de la mise à jour de la dernière connexion: %s", e)
 
 @receiver(user_logged_out)
 def log_user_logout(sender, user, request, **kwargs):
@@ -103,4 +129,4 @@ def log_user_logout(sender, user, request, **kwargs):
                 url=request.path
             )
     except Exception as e:
-        print(f"⚠️ Erreur lors de la journalisation de la déconnexion: {e}") 
+        logger.warning("⚠️ Erreur lors de la journalisation de la déconnexion: %s", e) 
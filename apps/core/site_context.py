@@ -0,0 +1,205 @@
+"""
+Contexte de site d'une requête : site, plan, limites, devise, réglages d'étiquettes et
+programme de fidélité, résolus au premier accès puis mémorisés jusqu'à la fin de la requête.
+
+SiteContextMiddleware attache request.site_context sans requête SQL ; l'utilisateur est
+lu au premier accès, donc après l'authentification DRF (JWT compris). Avec Redis, les
+valeurs partagées entre requêtes (site par défaut des superusers, plan effectif, réglages
+d'étiquettes, programme de fidélité) viennent de l'espace de noms 'site_context' du site
+dans le cache partagé (apps.core.cache), invalidé après la validation de l'enregistrement
+du site, de l'abonnement, d'un plan, des réglages d'étiquettes ou du programme de fidélité.
+Le plan d'un abonnement est en outre relu à son échéance (current_period_end).
+
+Sans Redis, ces valeurs ne sont mémorisées que pour la requête en cours (request_scope) :
+un cache local à chaque worker ne verrait pas les invalidations des autres.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.http import Http404
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .cache import Namespace, is_shared
+from .models import Configuration
+from .utils import get_decimal_places_for_currency
+
+SITE_CONTEXT_TIMEOUT = 600  # 10 minutes
+
+# Valeurs de la requête en cours sans cache partagé : {(site_id, clé): valeur}
+_request_values = contextvars.ContextVar('site_context_values', default=None)
+
+
+def site_cache(site_id=None):
+    """Espace de noms du site (global sans site : site par défaut, plans)"""
+    return Namespace('site_context', site_id, timeout=SITE_CONTEXT_TIMEOUT)
+
+
+@contextmanager
+def request_scope():
+    """Durée de vie des valeurs mémorisées sans cache partagé (une requête, SiteContextMiddleware)"""
+    token = _request_values.set({})
+    try:
+        yield
+    finally:
+        _request_values.reset(token)
+
+
+def _get_or_compute(site_id, key, compute):
+    """Valeur du cache partagé ; sans Redis, mémorisée pour la requête en cours seulement"""
+    if is_shared():
+        return site_cache(site_id).get_or_compute(key, compute=compute)
+    values = _request_values.get()
+    if values is None:
+        return compute()
+    if (site_id, key) not in values:
+        values[(site_id, key)] = compute()
+    return values[(site_id, key)]
+
+
+def _store(site_id, key, value):
+    if is_shared():
+        site_cache(site_id).set(key, value=value)
+    elif _request_values.get() is not None:
+        _request_values.get()[(site_id, key)] = value
+
+
+def default_site():
+    """Premier site, vu par les superusers (None s'il n'en existe aucun)"""
+    return _get_or_compute(None, 'default_site', lambda: Configuration.objects.order_by('pk').first())
+
+
+def _load_plan(site):
+    """Plan effectif et échéance de l'abonnement actif qui le fournit (None sans abonnement)"""
+    from apps.subscription.services import SubscriptionService
+    plan = SubscriptionService.load_site_plan(site)
+    subscription = getattr(site, 'subscription', None)
+    until = subscription.current_period_end if subscription is not None and subscription.is_active() else None
+    return plan, until
+
+
+def site_plan(site):
+    """
+    Plan effectif du site (abonnement actif, plan assigné ou plan gratuit), relu dès
+    l'échéance de l'abonnement : aucun signal ne marque son expiration
+    """
+    plan, until = _get_or_compute(site.pk, 'plan_until', lambda: _load_plan(site))
+    if until is not None and timezone.now() >= until:
+        plan, until = _load_plan(site)
+        _store(site.pk, 'plan_until', (plan, until))
+    return plan
+
+
+def label_settings(site):
+    """Réglages d'étiquettes du site (None s'il n'en a pas)"""
+    from apps.inventory.models import LabelSetting
+    return _get_or_compute(site.pk, 'label_settings', lambda: LabelSetting.objects.filter(site_configuration=site).first())
+
+
+def loyalty_program(site):
+    """Programme de fidélité du site, créé avec les valeurs par défaut de sa devise au besoin"""
+    from apps.loyalty.services import LoyaltyService
+    return _get_or_compute(site.pk, 'loyalty_program', lambda: LoyaltyService.load_program(site))
+
+
+class SiteContext:
+    """
+    Site de l'utilisateur et ce qui en dépend, calculés une fois par requête. `request`
+    (utilisateur lu au premier accès) ou `user` direct hors requête.
+    """
+
+    def __init__(self, request=None, user=None):
+        self.request = request
+        self._user = user
+
+    @property
+    def user(self):
+        return self._user if self._user is not None else getattr(self.request, 'user', None)
+
+    @cached_property
+    def site(self):
+        """Site de l'utilisateur ; pour un superuser le premier site, créé s'il n'en existe aucun"""
+        user = self.user
+        if user is None or not user.is_authenticated:
+            return None
+        if not user.is_superuser:
+            return user.site_configuration
+        site = default_site()
+        if site is None:
+            site = Configuration.objects.create(
+                site_name='Site Principal',
+                nom_societe='BoliBana Stock',
+                adresse='Adresse de votre entreprise',
+                telephone='+226 XX XX XX XX',
+                email='contact@votreentreprise.com',
+                devise='FCFA',
+                tva=0.00,
+                description='Système de gestion de stock',
+                site_owner=user,
+                created_by=user,
+                updated_by=user
+            )
+            # Assigner la configuration au superuser
+            user.site_configuration = site
+            user.is_site_admin = True
+            user.save()
+        return site
+
+    def require_site(self):
+        """Site de l'utilisateur, Http404 s'il n'en a pas"""
+        if self.site is None:
+            raise Http404("Aucun site configuré pour cet utilisateur")
+        return self.site
+
+    @cached_property
+    def plan(self):
+        return site_plan(self.site) if self.site else None
+
+    @cached_property
+    def limits(self):
+        """Limites du plan effectif (Configuration.get_plan_limits)"""
+        return self.site.get_plan_limits(self.plan) if self.site and self.plan else None
+
+    @cached_property
+    def currency(self):
+        """Devise du site, nombre de décimales et TVA"""
+        code = self.site.devise if self.site else 'FCFA'
+        return {
+            'code': code,
+            'decimal_places': get_decimal_places_for_currency(code),
+            'tva': self.site.tva if self.site else 0,
+        }
+
+    @cached_property
+    def label_settings(self):
+        return label_settings(self.site) if self.site else None
+
+    @cached_property
+    def loyalty_program(self):
+        return loyalty_program(self.site) if self.site else None
+
+
+def get_site_context(request):
+    """Contexte de site de la requête (attaché par SiteContextMiddleware, sinon créé ici)"""
+    request = getattr(request, '_request', request)  # Request DRF : la requête Django
+    context = getattr(request, 'site_context', None)
+    if context is None:
+        context = request.site_context = SiteContext(request)
+    return context
+
+
+def invalidate_site(site_id):
+    """Valeurs en cache d'un site (None : de tous les sites et site par défaut)"""
+    site_cache(site_id).bump()
+    values = _request_values.get()
+    if values:
+        for key in [key for key in values if site_id is None or key[0] == site_id]:
+            del values[key]
+
+
+def invalidate_default_site():
+    """Site par défaut des superusers (site créé ou supprimé)"""
+    site_cache().delete('default_site')
+    values = _request_values.get()
+    if values:
+        values.pop((None, 'default_site'), None)
@@ -1,14 +1,13 @@
 from django.utils import timezone
 from django.conf import settings
 from django.core.cache import cache
-from .models import Configuration, Activite, Notification
+from .models import Activite, Notification
 from django.db import models
 from datetime import datetime, timedelta
 import logging
 import os
 from functools import wraps
 import hashlib
-import pickle
 from django.urls import reverse
 
 logger = logging.getLogger(__name__)
@@ -18,27 +17,12 @@ def get_configuration(user=None):
     Récupère la configuration avec mise en cache
     Si un utilisateur est fourni, retourne sa configuration de site
     Sinon, retourne la première configuration (pour compatibilité)
+    Premier site servi par le cache du contexte de site, invalidé à chaque modification
     """
-    if user:
-        # Cache spécifique à l'utilisateur
-        cache_key = f'user_config_{user.id}'
-        config = cache.get(cache_key)
-        if config is None:
-            if user.is_superuser:
-                config = Configuration.objects.first()
-            else:
-                config = user.site_configuration
-            if config:
-                cache.set(cache_key, config, timeout=3600)  # Cache pour 1 heure
-        return config
-    else:
-        # Cache global (pour compatibilité)
-        config = cache.get('global_config')
-        if config is None:
-            config = Configuration.objects.first()
-            if config:
-                cache.set('global_config', config, timeout=3600)  # Cache pour 1 heure
-        return config
+    from .site_context import default_site
+    if user and not user.is_superuser:
+        return user.site_configuration
+    return default_site()
 
 def log_activity(user, action_type, description, ip_address=None):
     """
@@ -161,27 +145,20 @@ def cache_key_generator(prefix, *args, **kwargs):
     key_parts.extend([f"{k}:{v}" for k, v in sorted(kwargs.items())])
     return ":".join(key_parts)
 
-def cache_result(timeout=300):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # Créer une clé de cache unique
-            key_parts = [
-                func.__module__,
-                func.__name__,
-                str(args),
-                str(sorted(kwargs.items()))
-            ]
-            cache_key = hashlib.md5(''.join(key_parts).encode()).hexdigest()
+def cache_result(timeout=300, namespace=None):
+    """
+    Met en cache le résultat de la fonction dans un espace de noms partagé (apps.core.cache),
+    avec protection contre les ruées. La clé dépend du repr des arguments : à réserver aux
+    fonctions dont les arguments sont des valeurs (pas aux méthodes de vues, dont `self`
+    change à chaque requête). `fonction.invalidate()` invalide tous ses résultats.
+    """
+    from .cache import Namespace
 
-            # Essayer de récupérer le résultat du cache
-            result = cache.get(cache_key)
-            if result is not None:
-                return result
+    def decorator(func):
+        space = Namespace(namespace or f"result.{func.__module__}.{func.__qualname__}", timeout=timeout)
 
-            # Exécuter la fonction
+        def compute(args, kwargs):
             result = func(*args, **kwargs)
-
             # Nettoyer le résultat pour la mise en cache
             if isinstance(result, dict):
                 cleaned_result = {}
@@ -191,15 +168,14 @@ def cache_result(timeout=300):
                     elif hasattr(value, 'pk'):
                         cleaned_result[key] = value.pk
                 result = cleaned_result
+            return result
 
-            # Mettre en cache le résultat nettoyé
-            try:
-                cache.set(cache_key, result, timeout)
-            except (TypeError, pickle.PickleError):
-                # Si la sérialisation échoue, ne pas mettre en cache
-                pass
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            arguments = hashlib.md5(f"{args!r}{sorted(kwargs.items())!r}".encode()).hexdigest()
+            return space.get_or_compute(arguments, compute=lambda: compute(args, kwargs))
 
-            return result
+        wrapper.invalidate = space.bump
         return wrapper
     return decorator
 
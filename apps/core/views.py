@@ -5,6 +5,7 @@ from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from .models import User, Configuration, Activite, Notification, Parametre
+from .site_context import get_site_context
 from .forms import CustomUserCreationForm, CustomUserUpdateForm, PublicSignUpForm
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.shortcuts import render, redirect, get_object_or_404
@@ -28,41 +29,10 @@ from django.utils.decorators import method_decorator
 from django.db import connections
 from django.db.utils import OperationalError
 from django.http import HttpResponse
+import logging
 
 User = get_user_model()
-
-def get_user_site_configuration(user):
-    """
-    Récupère la configuration du site de l'utilisateur
-    """
-    if user.is_superuser:
-        # Les superusers voient la première configuration ou peuvent en créer une
-        config = Configuration.objects.first()
-        if not config:
-            # Le plan gratuit sera assigné automatiquement par Configuration.save()
-            config = Configuration.objects.create(
-                site_name='Site Principal',
-                nom_societe='BoliBana Stock',
-                adresse='Adresse de votre entreprise',
-                telephone='+226 XX XX XX XX',
-                email='contact@votreentreprise.com',
-                devise='FCFA',
-                tva=0.00,
-                description='Système de gestion de stock',
-                site_owner=user,
-                created_by=user,
-                updated_by=user
-            )
-            # Assigner la configuration au superuser
-            user.site_configuration = config
-            user.is_site_admin = True
-            user.save()
-        return config
-    else:
-        # Les utilisateurs normaux voient leur configuration
-        if not user.site_configuration:
-            raise Http404("Aucun site configuré pour cet utilisateur")
-        return user.site_configuration
+logger = logging.getLogger(__name__)
 
 def is_manager(user):
     """Vérifie si l'utilisateur peut gérer les utilisateurs de son site"""
@@ -175,11 +145,9 @@ class PublicSignUpView(CreateView):
         
         # Vérifier que l'utilisateur est bien connecté
         if self.request.user.is_authenticated:
-            print(f"✅ Utilisateur {user.username} connecté avec succès")
-            print(f"📋 Session ID: {self.request.session.session_key}")
-            print(f"👤 User ID: {self.request.user.id}")
+            logger.info("✅ [SIGNUP] Utilisateur %s (ID %s) connecté", user.username, self.request.user.id)
         else:
-            print(f"❌ Erreur: Utilisateur {user.username} n'est pas connecté")
+            logger.error("❌ [SIGNUP] Utilisateur %s non connecté après inscription", user.username)
         
         # Sauvegarder la session
         self.request.session.save()
@@ -438,39 +406,16 @@ class ConfigurationUpdateView(LoginRequiredMixin, SiteAdminRequiredMixin, Update
 
     def get_object(self, queryset=None):
         """Récupère la configuration du site de l'utilisateur connecté"""
-        if self.request.user.is_superuser:
-            # Les superusers peuvent modifier leur configuration ou la première disponible
-            # Utiliser la configuration assignée à l'utilisateur si elle existe
-            if self.request.user.site_configuration:
-                config = self.request.user.site_configuration
-            else:
-                # Sinon, utiliser la première configuration disponible
-                config = Configuration.objects.first()
-                if not config:
-                    # Créer une nouvelle configuration si aucune n'existe
-                    # Le plan gratuit sera assigné automatiquement par Configuration.save()
-                    config = Configuration.objects.create(
-                        site_name='Site Principal',
-                        nom_societe='BoliBana Stock',
-                        adresse='Adresse de votre entreprise',
-                        telephone='+226 XX XX XX XX',
-                        email='contact@votreentreprise.com',
-                        devise='FCFA',
-                        tva=0.00,
-                        description='Système de gestion de stock',
-                        site_owner=self.request.user,
-                        created_by=self.request.user,
-                        updated_by=self.request.user
-                    )
-                    # Assigner la configuration au superuser
-                self.request.user.site_configuration = config
-                self.request.user.is_site_admin = True
-                self.request.user.save()
-        else:
-            # Les utilisateurs normaux ne peuvent modifier que leur propre configuration
-            if not self.request.user.site_configuration:
-                raise Http404("Aucun site configuré pour cet utilisateur")
-            config = self.request.user.site_configuration
+        user = self.request.user
+        # Les superusers modifient leur configuration assignée, sinon le premier site
+        if user.is_superuser and user.site_configuration:
+            return user.site_configuration
+        config = get_site_context(self.request).require_site()  # Http404 sans site
+        if user.is_superuser and user.site_configuration_id != config.pk:
+            # Assigner la configuration au superuser
+            user.site_configuration = config
+            user.is_site_admin = True
+            user.save()
         return config
 
     def form_valid(self, form):
@@ -530,7 +475,7 @@ class ParametreUpdateView(LoginRequiredMixin, UpdateView):
 def settings(request):
     """Page de paramètres principale avec configuration simple"""
     try:
-        config = get_user_site_configuration(request.user)
+        config = get_site_context(request).require_site()
     except Http404:
         messages.error(request, "Aucun site configuré pour votre compte.")
         return redirect('home')
@@ -557,7 +502,7 @@ def configuration_quick_edit(request):
     """Édition rapide de la configuration via AJAX"""
     if request.method == 'POST':
         try:
-            config = get_user_site_configuration(request.user)
+            config = get_site_context(request).require_site()
             
             data = json.loads(request.body)
             field = data.get('field')
@@ -587,7 +532,7 @@ def configuration_quick_edit(request):
     
     # GET request - afficher la page d'édition rapide
     try:
-        config = get_user_site_configuration(request.user)
+        config = get_site_context(request).require_site()
     except Http404:
         messages.error(request, "Aucun site configuré pour votre compte.")
         return redirect('home')
@@ -602,7 +547,7 @@ def configuration_reset_defaults(request):
     """Réinitialiser la configuration avec des valeurs par défaut"""
     if request.method == 'POST':
         try:
-            config = get_user_site_configuration(request.user)
+            config = get_site_context(request).require_site()
         except Http404:
             messages.error(request, "Aucun site configuré pour votre compte.")
             return redirect('home')
@@ -627,7 +572,7 @@ def configuration_reset_defaults(request):
 def configuration_export(request):
     """Exporter la configuration au format JSON"""
     try:
-        config = get_user_site_configuration(request.user)
+        config = get_site_context(request).require_site()
     except Http404:
         messages.error(request, 'Aucun site configuré pour votre compte.')
         return redirect('core:configuration')
@@ -663,7 +608,7 @@ def configuration_history(request):
         return redirect('home')
     
     try:
-        config = get_user_site_configuration(request.user)
+        config = get_site_context(request).require_site()
     except Http404:
         messages.error(request, 'Aucun site configuré pour votre compte.')
         return redirect('core:configuration')
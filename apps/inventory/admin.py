@@ -7,7 +7,8 @@ from .models import (
 from .catalog_models import CatalogTemplate, CatalogGeneration, CatalogItem
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
-from .models import ProductCopy
+from .models import ProductCopy, ProductCopyJob, ProductImportJob, InventoryCountSession, InventoryCountLine, ReorderJob
+from .models import DailySiteRollup, DailyProductRollup, TransactionArchive, LedgerClosing
 
 class CategoryResource(resources.ModelResource):
     class Meta:
@@ -53,8 +54,8 @@ class OrderItemInline(admin.TabularInline):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'customer', 'order_date', 'status', 'total_amount')
-    search_fields = ('id', 'customer__name')
+    list_display = ('id', 'reference', 'customer', 'supplier', 'order_date', 'status', 'total_amount')
+    search_fields = ('id', 'reference', 'customer__name', 'supplier__name')
     list_filter = ('status', 'order_date')
     inlines = [OrderItemInline]
     readonly_fields = ('order_date',)
@@ -285,3 +286,78 @@ class ProductCopyAdmin(admin.ModelAdmin):
             message = f"{updated} copies ont été désactivées."
         self.message_user(request, message)
     desactiver_copies.short_description = "Désactiver les copies sélectionnées"
+
+
+@admin.register(ProductCopyJob)
+class ProductCopyJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'destination_site', 'source_site', 'status', 'total', 'copied_count', 'user', 'created_at', 'completed_at')
+    list_filter = ('status', 'destination_site')
+    readonly_fields = ('product_ids', 'total', 'processed', 'copied_count', 'errors', 'created_at', 'completed_at')
+
+
+@admin.register(ProductImportJob)
+class ProductImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'site_configuration', 'original_filename', 'status', 'total_rows', 'created_count', 'error_count', 'dry_run', 'user', 'created_at', 'completed_at')
+    list_filter = ('status', 'dry_run', 'site_configuration')
+    readonly_fields = ('total_rows', 'created_count', 'error_count', 'errors', 'error_message', 'created_at', 'completed_at')
+
+
+@admin.register(InventoryCountSession)
+class InventoryCountSessionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'site_configuration', 'status', 'zero_uncounted', 'adjusted_count', 'created_by', 'created_at', 'applied_at')
+    list_filter = ('status', 'site_configuration')
+    readonly_fields = ('adjusted_count', 'created_at', 'frozen_at', 'applied_at', 'applied_by')
+
+
+@admin.register(InventoryCountLine)
+class InventoryCountLineAdmin(admin.ModelAdmin):
+    # Pas d'inline : une session peut compter plusieurs milliers de lignes
+    list_display = ('session', 'product', 'counted_quantity', 'expected_quantity', 'counted_by', 'device_id', 'updated_at')
+    list_filter = ('session__status',)
+    search_fields = ('product__name', 'product__cug', 'session__name')
+    raw_id_fields = ('session', 'product', 'counted_by')
+
+
+@admin.register(ReorderJob)
+class ReorderJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'site_configuration', 'status', 'weeks', 'product_count', 'suggestion_count', 'create_orders', 'user', 'created_at', 'completed_at')
+    list_filter = ('status', 'site_configuration')
+    readonly_fields = ('product_count', 'suggestion_count', 'order_ids', 'suggestions', 'error_message', 'created_at', 'completed_at')
+
+
+@admin.register(DailySiteRollup)
+class DailySiteRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'site_configuration', 'sales_count', 'revenue', 'margin', 'movement_count', 'updated_at')
+    list_filter = ('site_configuration',)
+    date_hierarchy = 'date'
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(DailyProductRollup)
+class DailyProductRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'product', 'site_configuration', 'quantity_sold', 'revenue', 'margin', 'quantity_in', 'quantity_out')
+    list_filter = ('site_configuration',)
+    date_hierarchy = 'date'
+    raw_id_fields = ('product',)
+
+
+@admin.register(TransactionArchive)
+class TransactionArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product', 'type', 'quantity', 'transaction_date', 'site_configuration')
+    list_filter = ('type', 'site_configuration')
+    search_fields = ('product__name', 'product__cug')
+    date_hierarchy = 'transaction_date'
+    raw_id_fields = ('product',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LedgerClosing)
+class LedgerClosingAdmin(admin.ModelAdmin):
+    list_display = ('site_configuration', 'cutoff', 'archived_count', 'opening_count', 'closed_by', 'created_at')
+    list_filter = ('site_configuration',)
+    readonly_fields = ('archived_count', 'opening_count', 'created_at')
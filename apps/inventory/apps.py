@@ -3,4 +3,11 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.inventory'
-    verbose_name = 'Gestion du Stock' 
+    verbose_name = 'Gestion du Stock'
+
+    def ready(self):
+        """
+        Configuration initiale de l'application
+        """
+        # Importer les signaux
+        import apps.inventory.signals
@@ -460,6 +460,8 @@ class OrderForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['customer'].queryset = Customer.objects.all()
+        # Le client reste obligatoire pour les commandes saisies (seules les commandes fournisseur n'en ont pas)
+        self.fields['customer'].required = True
         self.fields['status'].choices = Order.STATUS_CHOICES
 
 class OrderItemForm(forms.ModelForm):
@@ -0,0 +1,83 @@
+"""
+Commande Django pour rejouer le trafic des caisses mobiles contre l'API
+Run with: python manage.py benchmark_api --prefix synth --registers 8 [--live] [--baseline api_baseline.json]
+
+Les sites mesurés sont ceux créés par generate_synthetic_data (préfixe) ou donnés par
+identifiant. Les ventes, sorties de stock, lots d'étiquettes et catalogues créés par
+les scénarios sont conservés dans la base.
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.models import Configuration
+from apps.inventory.services.api_benchmark import (
+    SCENARIOS, ApiBenchmark, baseline_key, compare, load_baseline, save_baseline,
+)
+
+
+class Command(BaseCommand):
+    help = 'Mesure latences (p50/p95/p99), débit et requêtes SQL de l\'API sur des parcours de caisse'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='synth', help='Préfixe des sites de generate_synthetic_data')
+        parser.add_argument('--site', type=int, action='append', dest='site_ids', help='Site mesuré (répétable)')
+        parser.add_argument('--registers', type=int, default=4, help='Caisses simulées en parallèle')
+        parser.add_argument('--iterations', type=int, default=20, help='Parcours par caisse et par scénario')
+        parser.add_argument('--scenario', action='append', dest='scenarios', choices=SCENARIOS,
+                            help='Scénario à rejouer (répétable, tous par défaut)')
+        parser.add_argument('--live', action='store_true', help='Passer par un serveur HTTP local (127.0.0.1)')
+        parser.add_argument('--seed', type=int, default=42, help='Graine des paniers et produits tirés')
+        parser.add_argument('--output', help='Fichier JSON du rapport (sortie standard sinon)')
+        parser.add_argument('--baseline', help='Fichier de référence (une entrée par moteur et transport)')
+        parser.add_argument('--save-baseline', action='store_true', help='Enregistrer le rapport comme référence')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Écart toléré sur p95 et débit (0.2 = 20%%)')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Code de sortie non nul si régression')
+
+    def handle(self, *args, **options):
+        if options['site_ids']:
+            sites = list(Configuration.objects.filter(id__in=options['site_ids']).order_by('id'))
+        else:
+            sites = list(Configuration.objects.filter(site_name__startswith=f"{options['prefix']} ").order_by('id'))
+        if not sites:
+            raise CommandError("Aucun site à mesurer : lancer generate_synthetic_data ou préciser --site")
+
+        benchmark = ApiBenchmark(
+            sites, registers=options['registers'], iterations=options['iterations'],
+            scenarios=options['scenarios'] or SCENARIOS, live=options['live'], seed=options['seed'],
+            log=lambda message: self.stderr.write(f"  {message}"),
+        )
+        try:
+            report = benchmark.run()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        baseline_path = options['baseline']
+        regressions = []
+        if baseline_path:
+            key = baseline_key(report)
+            baseline = load_baseline(baseline_path, key)
+            if baseline is None:
+                self.stderr.write(f"Aucune référence {key} dans {baseline_path}")
+            else:
+                regressions = compare(report, baseline, options['tolerance'])
+                report['regressions'] = regressions
+            if options['save_baseline']:
+                save_baseline(baseline_path, report)
+                self.stderr.write(self.style.SUCCESS(f"✅ Référence {key} enregistrée : {baseline_path}"))
+
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(payload + '\n')
+        else:
+            self.stdout.write(payload)
+
+        for regression in regressions:
+            self.stderr.write(self.style.WARNING(
+                f"⚠️ {regression['scenario']} {regression['metric']} : "
+                f"{regression['baseline']} -> {regression['current']}"
+            ))
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} régression(s) par rapport à la référence")
@@ -0,0 +1,82 @@
+"""
+Commande Django pour mesurer le rendu serveur d'un catalogue PDF
+Run with: python manage.py benchmark_catalog_pdf --products 1000
+"""
+
+import time
+import tracemalloc
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+
+from apps.core.models import Configuration
+from apps.inventory.catalog_models import CatalogTemplate
+from apps.inventory.models import Product
+from apps.inventory.printing.catalog_pdf import render_catalog_pdf
+
+
+class Command(BaseCommand):
+    help = 'Mesure le temps et la mémoire du rendu PDF d\'un catalogue (1 000 produits par défaut)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000, help='Nombre de produits à rendre')
+        parser.add_argument('--per-page', type=int, default=12, help='Produits par page')
+        parser.add_argument('--format', default='A4', choices=['A4', 'A5', 'A6'], help='Format de page')
+        parser.add_argument('--site', type=int, help='Utiliser les produits réels de ce site (ID) au lieu de produits synthétiques')
+        parser.add_argument('--images', action='store_true', help='Inclure les vignettes (produits réels uniquement)')
+        parser.add_argument('--runs', type=int, default=3, help='Nombre de mesures')
+        parser.add_argument('--trace-memory', action='store_true', help='Mesurer le pic mémoire (ralentit le rendu)')
+
+    def handle(self, *args, **options):
+        template = CatalogTemplate(
+            name='Benchmark',
+            format=options['format'],
+            products_per_page=options['per_page'],
+            show_images=options['images'],
+        )
+        count = options['products']
+
+        if options['site']:
+            site = Configuration.objects.get(pk=options['site'])
+            products_qs = Product.objects.filter(site_configuration=site, is_active=True).select_related(
+                'category', 'brand'
+            ).prefetch_related('barcodes').order_by('name')[:count]
+            get_products = lambda: products_qs.iterator(chunk_size=200)
+            count = products_qs.count()
+        else:
+            # Produits non sauvegardés : aucun accès base, on mesure uniquement le rendu
+            synthetic = [
+                Product(
+                    name=f'Produit benchmark {i:05d}',
+                    cug=f'{10000 + i}',
+                    selling_price=Decimal(500 + i),
+                    quantity=i % 50,
+                    generated_ean=None,
+                )
+                for i in range(count)
+            ]
+            get_products = lambda: iter(synthetic)
+
+        self.stdout.write(f"[INFO] Rendu de {count} produits ({options['format']}, {options['per_page']}/page), {options['runs']} mesure(s)")
+
+        timings = []
+        for run in range(options['runs']):
+            buffer = BytesIO()
+            if options['trace_memory']:
+                tracemalloc.start()
+            start = time.perf_counter()
+            pages = render_catalog_pdf(template, get_products(), buffer, total_products=count)
+            elapsed = time.perf_counter() - start
+            timings.append(elapsed)
+            line = f"  Mesure {run + 1}: {elapsed:.2f}s - {pages} pages - {buffer.tell() / 1024:.0f} Ko"
+            if options['trace_memory']:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                line += f" - pic mémoire {peak / 1024 / 1024:.1f} Mo"
+            self.stdout.write(line)
+
+        best = min(timings)
+        self.stdout.write(self.style.SUCCESS(
+            f"[OK] Meilleur temps: {best:.2f}s ({count / best:.0f} produits/s, {best / max(count, 1) * 1000:.2f} ms/produit)"
+        ))
@@ -0,0 +1,75 @@
+"""
+Commande Django pour mesurer une session d'inventaire de bout en bout
+Run with: python manage.py benchmark_inventory_count --lines 10000
+
+Les données de test sont créées dans une transaction annulée à la fin : la base
+n'est pas modifiée.
+"""
+
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.core.models import Configuration
+from apps.inventory.models import Product
+from apps.inventory.services.inventory_count import InventoryCountService
+
+
+class Command(BaseCommand):
+    help = 'Mesure temps et requêtes d\'une session d\'inventaire (10 000 lignes par défaut)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=10000, help='Nombre de produits comptés')
+        parser.add_argument('--devices', type=int, default=4, help='Nombre d\'appareils (envois de comptages)')
+        parser.add_argument('--upload-size', type=int, default=500, help='Lignes par envoi')
+
+    def _measure(self, label, func):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:<12} {elapsed:8.3f}s  {len(ctx.captured_queries):6d} requête(s)")
+        return result
+
+    def handle(self, *args, **options):
+        count = options['lines']
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(username='benchmark_inventory_count')
+            site = Configuration.objects.create(
+                site_name='Benchmark inventaire', site_owner=user, nom_societe='Benchmark',
+                adresse='-', telephone='-', email='benchmark@example.com',
+            )
+            products = Product.objects.bulk_create([
+                Product(
+                    name=f'Produit {i}', slug=f'benchmark-inventaire-{site.id}-{i}', cug=f'BI{site.id}-{i}',
+                    purchase_price=Decimal('500'), selling_price=Decimal('750'), quantity=10,
+                    site_configuration=site,
+                )
+                for i in range(count)
+            ], batch_size=1000)
+
+            # Deux tiers des produits présentent un écart
+            items = [{'product_id': p.id, 'quantity': 10 + (i % 3) - 1} for i, p in enumerate(products)]
+            upload_size = options['upload_size']
+            uploads = [items[i:i + upload_size] for i in range(0, len(items), upload_size)]
+
+            session = InventoryCountService.start_session(site, user=user)
+
+            def record():
+                for index, upload in enumerate(uploads):
+                    InventoryCountService.record_counts(
+                        session, upload, user=user, device_id=f'device-{index % options["devices"]}'
+                    )
+
+            self.stdout.write(f"{count} ligne(s), {len(uploads)} envoi(s)")
+            self._measure('Comptages', record)
+            self._measure('Gel', lambda: InventoryCountService.freeze(session))
+            self._measure('Écarts', lambda: InventoryCountService.get_diff(session)[1])
+            result = self._measure('Application', lambda: InventoryCountService.apply(session, user=user))
+            self.stdout.write(self.style.SUCCESS(f"{result['adjusted_count']} produit(s) ajusté(s)"))
+
+            transaction.set_rollback(True)
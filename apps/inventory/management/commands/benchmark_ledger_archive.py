@@ -0,0 +1,133 @@
+"""
+Commande Django pour mesurer les requêtes du journal avant / après clôture de période
+Run with: python manage.py benchmark_ledger_archive --rows 5000000 [--months 24] [--keep-months 3]
+
+Les données de test sont créées dans une transaction annulée à la fin : la base
+n'est pas modifiée.
+"""
+
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core.models import Configuration
+from apps.inventory.models import Product, Transaction
+from apps.inventory.services.ledger_archive import LedgerArchiveService
+from apps.inventory.services.stock_valuation import StockValuationService
+
+
+class Command(BaseCommand):
+    help = 'Mesure les requêtes du journal des mouvements avant et après archivage (5 000 000 lignes par défaut)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000000, help='Nombre de mouvements')
+        parser.add_argument('--products', type=int, default=2000, help='Nombre de produits')
+        parser.add_argument('--months', type=int, default=24, help='Profondeur du journal (mois)')
+        parser.add_argument('--keep-months', type=int, default=3, help='Mois conservés dans le journal actif')
+        parser.add_argument('--batch-size', type=int, default=LedgerArchiveService.BATCH_SIZE,
+                            help='Mouvements archivés par transaction')
+        parser.add_argument('--seed', type=int, default=42, help='Graine du journal synthétique')
+
+    def _measure(self, label, func):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:<28} {elapsed:8.3f}s  {len(ctx.captured_queries):6d} requête(s)")
+        return result
+
+    def _seed(self, site, options):
+        rng = np.random.default_rng(options['seed'])
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Produit {i}', slug=f'benchmark-journal-{site.id}-{i}', cug=f'BJ{site.id}-{i}',
+                purchase_price=Decimal('500'), selling_price=Decimal('750'), quantity=100, site_configuration=site,
+            )
+            for i in range(options['products'])
+        ], batch_size=2000)
+
+        # Un lot par jour, du plus ancien au plus récent : identifiants croissants avec la date
+        days = options['months'] * 30
+        per_day = np.bincount(rng.integers(0, days, size=options['rows']), minlength=days)
+        noon = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        for offset in range(days - 1, -1, -1):
+            count = int(per_day[offset])
+            if not count:
+                continue
+            picks = rng.integers(0, len(products), size=count)
+            kinds = rng.choice(['in', 'out', 'out', 'out', 'loss'], size=count)
+            created = Transaction.objects.bulk_create([
+                Transaction(
+                    product=products[pick], type=kind, quantity=int(quantity), site_configuration=site,
+                    reason='sale' if kind == 'out' else None,
+                )
+                for pick, kind, quantity in zip(picks.tolist(), kinds.tolist(), (rng.poisson(3, size=count) + 1).tolist())
+            ], batch_size=5000)
+            # transaction_date est en auto_now_add : dater le lot après insertion
+            Transaction.objects.filter(pk__gte=created[0].pk, pk__lte=created[-1].pk).update(
+                transaction_date=noon - timedelta(days=offset)
+            )
+        return products
+
+    def _queries(self, site, product):
+        """Requêtes représentatives des écrans : (libellé, fonction)"""
+        month_ago = timezone.now() - timedelta(days=30)
+        products = Product.objects.filter(site_configuration=site)
+        return [
+            ('Mouvements récents (50)', lambda: list(
+                Transaction.objects.filter(site_configuration=site).order_by('-transaction_date')[:50]
+            )),
+            ('Historique produit (50)', lambda: list(
+                Transaction.objects.filter(product=product).order_by('-transaction_date')[:50]
+            )),
+            ('Mouvements 30 jours / type', lambda: list(
+                Transaction.objects.filter(site_configuration=site, transaction_date__gte=month_ago)
+                .order_by().values('type').annotate(total=Count('id'))
+            )),
+            ('Journal complet (count)', lambda: Transaction.objects.filter(product__site_configuration=site).count()),
+            ('Valorisation il y a 30 jours', lambda: StockValuationService.get_groups(products, 'category', month_ago)),
+        ]
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(username='benchmark_ledger')
+            site = Configuration.objects.create(
+                site_name='Benchmark journal', site_owner=user, nom_societe='Benchmark',
+                adresse='-', telephone='-', email='benchmark@example.com',
+            )
+            started = time.perf_counter()
+            products = self._seed(site, options)
+            self.stdout.write(
+                f"{options['rows']} mouvement(s) sur {options['months']} mois, {len(products)} produit(s) "
+                f"(création {time.perf_counter() - started:.1f}s)"
+            )
+            queries = self._queries(site, products[0])
+
+            self.stdout.write(self.style.MIGRATE_HEADING('Avant clôture'))
+            before = {label: self._measure(label, func) for label, func in queries}
+
+            cutoff = timezone.localdate() - timedelta(days=options['keep_months'] * 30)
+            closing = self._measure('Clôture de période', lambda: LedgerArchiveService.close_period(
+                site, cutoff, batch_size=options['batch_size']
+            ))
+            self.stdout.write(
+                f"{closing.archived_count} mouvement(s) archivé(s), {closing.opening_count} solde(s) d'ouverture"
+            )
+
+            self.stdout.write(self.style.MIGRATE_HEADING('Après clôture'))
+            after = {label: self._measure(label, func) for label, func in queries}
+            label = 'Valorisation il y a 30 jours'
+            if before[label] == after[label]:
+                self.stdout.write(self.style.SUCCESS('Valorisation identique avant et après clôture'))
+            else:
+                self.stdout.write(self.style.ERROR('Valorisation différente après clôture'))
+
+            transaction.set_rollback(True)
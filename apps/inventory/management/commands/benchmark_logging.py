@@ -0,0 +1,64 @@
+"""
+Commande Django mesurant le coût de la journalisation par requête API
+Run with: python manage.py benchmark_logging --prefix synth --iterations 10 --rounds 3
+
+Rejoue les scénarios de benchmark_api sous chaque configuration LOGGING (voir
+apps.inventory.services.logging_benchmark) et affiche l'écart par requête à la
+configuration muette.
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.models import Configuration
+from apps.inventory.services.api_benchmark import SCENARIOS
+from apps.inventory.services.logging_benchmark import MODES, LoggingBenchmark
+
+
+class Command(BaseCommand):
+    help = 'Compare le coût par requête API des configurations de journalisation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='synth', help='Préfixe des sites de generate_synthetic_data')
+        parser.add_argument('--site', type=int, action='append', dest='site_ids', help='Site mesuré (répétable)')
+        parser.add_argument('--registers', type=int, default=1, help='Caisses simulées en parallèle')
+        parser.add_argument('--iterations', type=int, default=10, help='Parcours par caisse et par scénario')
+        parser.add_argument('--rounds', type=int, default=3, help='Tours alternant les configurations')
+        parser.add_argument('--mode', action='append', dest='modes', choices=list(MODES),
+                            help='Configuration mesurée (répétable, toutes par défaut)')
+        parser.add_argument('--scenario', action='append', dest='scenarios', choices=SCENARIOS,
+                            help='Scénario à rejouer (répétable, tous par défaut)')
+        parser.add_argument('--output', help='Fichier JSON du rapport (sortie standard sinon)')
+
+    def handle(self, *args, **options):
+        if options['site_ids']:
+            sites = list(Configuration.objects.filter(id__in=options['site_ids']).order_by('id'))
+        else:
+            sites = list(Configuration.objects.filter(site_name__startswith=f"{options['prefix']} ").order_by('id'))
+        if not sites:
+            raise CommandError("Aucun site à mesurer : lancer generate_synthetic_data ou préciser --site")
+
+        benchmark = LoggingBenchmark(
+            sites, modes=options['modes'] or tuple(MODES), registers=options['registers'],
+            iterations=options['iterations'], scenarios=options['scenarios'] or SCENARIOS,
+            rounds=options['rounds'], log=lambda message: self.stderr.write(f"  {message}"),
+        )
+        try:
+            report = benchmark.run()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(payload + '\n')
+        else:
+            self.stdout.write(payload)
+
+        for mode, summary in report['modes'].items():
+            self.stderr.write(
+                f"{mode:12} {summary['ms_per_request']:8.2f} ms/requête "
+                f"({summary.get('overhead_ms_per_request', 0):+.2f}), "
+                f"{summary['bytes_per_request']} octets/requête, {summary['dropped']} abandonné(s)"
+            )
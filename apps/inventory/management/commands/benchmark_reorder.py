@@ -0,0 +1,98 @@
+"""
+Commande Django pour mesurer le moteur de réapprovisionnement sur un journal synthétique
+Run with: python manage.py benchmark_reorder --products 50000
+
+Les données de test sont créées dans une transaction annulée à la fin : la base
+n'est pas modifiée.
+"""
+
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core.models import Configuration
+from apps.inventory.models import Product, Supplier, Transaction
+from apps.inventory.services.reorder import ReorderService
+
+
+class Command(BaseCommand):
+    help = 'Mesure temps et requêtes du calcul de réapprovisionnement (50 000 produits par défaut)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50000, help='Nombre de produits')
+        parser.add_argument('--suppliers', type=int, default=20, help='Nombre de fournisseurs')
+        parser.add_argument('--weeks', type=int, default=ReorderService.DEFAULT_WEEKS, help='Semaines de sorties')
+        parser.add_argument('--sales-days', type=int, default=10, help='Jours avec sorties par produit')
+        parser.add_argument('--seed', type=int, default=42, help='Graine du journal synthétique')
+
+    def _measure(self, label, func):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:<22} {elapsed:8.3f}s  {len(ctx.captured_queries):6d} requête(s)")
+        return result
+
+    def _seed(self, site, options):
+        rng = np.random.default_rng(options['seed'])
+        count = options['products']
+        days = options['weeks'] * 7
+        suppliers = Supplier.objects.bulk_create([
+            Supplier(name=f'Fournisseur {i}', site_configuration=site) for i in range(options['suppliers'])
+        ])
+        stocks = rng.integers(0, 200, size=count)
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Produit {i}', slug=f'benchmark-reappro-{site.id}-{i}', cug=f'BR{site.id}-{i}',
+                purchase_price=Decimal('500'), selling_price=Decimal('750'), quantity=int(stocks[i]),
+                supplier=suppliers[i % len(suppliers)] if i % 10 else None, site_configuration=site,
+            )
+            for i in range(count)
+        ], batch_size=2000)
+
+        # Sorties : quelques jours tirés au hasard par produit, quantités de Poisson
+        offsets = rng.integers(0, days, size=(count, options['sales_days']))
+        quantities = rng.poisson(4, size=(count, options['sales_days'])) + 1
+        noon = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        for offset in range(days):
+            rows, cols = np.nonzero(offsets == offset)
+            created = Transaction.objects.bulk_create([
+                Transaction(
+                    product=products[row], type='out', quantity=int(quantities[row, col]),
+                    reason='sale', site_configuration=site,
+                )
+                for row, col in zip(rows.tolist(), cols.tolist())
+            ], batch_size=5000)
+            if created:
+                # transaction_date est en auto_now_add : dater le lot après insertion
+                Transaction.objects.filter(pk__in=[t.pk for t in created]).update(
+                    transaction_date=noon - timedelta(days=offset)
+                )
+        return count * options['sales_days']
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(username='benchmark_reorder')
+            site = Configuration.objects.create(
+                site_name='Benchmark réapprovisionnement', site_owner=user, nom_societe='Benchmark',
+                adresse='-', telephone='-', email='benchmark@example.com',
+            )
+            movements = self._seed(site, options)
+            self.stdout.write(f"{options['products']} produit(s), {movements} sortie(s) sur {options['weeks']} semaine(s)")
+
+            report = self._measure('Suggestions', lambda: ReorderService.suggest(site, weeks=options['weeks']))
+            orders = self._measure('Suggestions + brouillons', lambda: ReorderService.suggest(
+                site, weeks=options['weeks'], create_orders=True
+            ))
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(report['suggestions'])} produit(s) à commander, {len(orders['order_ids'])} commande(s) brouillon"
+            ))
+
+            transaction.set_rollback(True)
@@ -0,0 +1,63 @@
+"""
+Commande Django mesurant le coût des sessions sur les requêtes API authentifiées par jeton
+Run with: python manage.py benchmark_sessions --prefix synth --iterations 10 --rounds 3
+
+Rejoue les scénarios de caisse avec un jeton JWT et un cookie de session, sous les
+réglages de session d'origine puis sous les réglages actuels (voir
+apps.inventory.services.session_benchmark), et affiche les écritures par requête.
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.models import Configuration
+from apps.inventory.services.api_benchmark import SCENARIOS as API_SCENARIOS
+from apps.inventory.services.session_benchmark import MODES, SCENARIOS, SessionBenchmark
+
+
+class Command(BaseCommand):
+    help = 'Compare les requêtes SQL et écritures de session par requête API avant / après'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='synth', help='Préfixe des sites de generate_synthetic_data')
+        parser.add_argument('--site', type=int, action='append', dest='site_ids', help='Site mesuré (répétable)')
+        parser.add_argument('--iterations', type=int, default=10, help='Parcours par scénario')
+        parser.add_argument('--rounds', type=int, default=3, help='Tours alternant les configurations')
+        parser.add_argument('--mode', action='append', dest='modes', choices=MODES,
+                            help='Configuration mesurée (répétable, toutes par défaut)')
+        parser.add_argument('--scenario', action='append', dest='scenarios', choices=API_SCENARIOS,
+                            help=f"Scénario à rejouer (répétable, défaut : {', '.join(SCENARIOS)})")
+        parser.add_argument('--output', help='Fichier JSON du rapport (sortie standard sinon)')
+
+    def handle(self, *args, **options):
+        if options['site_ids']:
+            sites = list(Configuration.objects.filter(id__in=options['site_ids']).order_by('id'))
+        else:
+            sites = list(Configuration.objects.filter(site_name__startswith=f"{options['prefix']} ").order_by('id'))
+        if not sites:
+            raise CommandError("Aucun site à mesurer : lancer generate_synthetic_data ou préciser --site")
+
+        benchmark = SessionBenchmark(
+            sites, modes=options['modes'] or MODES, iterations=options['iterations'],
+            scenarios=options['scenarios'] or SCENARIOS, rounds=options['rounds'],
+            log=lambda message: self.stderr.write(f"  {message}"),
+        )
+        try:
+            report = benchmark.run()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(payload + '\n')
+        else:
+            self.stdout.write(payload)
+
+        for mode, summary in report['modes'].items():
+            self.stderr.write(
+                f"{mode:7} {summary['ms_per_request']:8.2f} ms/requête, "
+                f"{summary['queries_per_request']} requête(s) SQL dont {summary['writes_per_request']} écriture(s), "
+                f"{summary['session_writes_per_request']} écriture(s) de session / requête"
+            )
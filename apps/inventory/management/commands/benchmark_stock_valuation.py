@@ -0,0 +1,95 @@
+"""
+Commande Django pour mesurer la valorisation du stock sur un gros catalogue
+Run with: python manage.py benchmark_stock_valuation --products 50000
+
+Les données de test sont créées dans une transaction annulée à la fin : la base
+n'est pas modifiée.
+"""
+
+import csv
+import io
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core.models import Configuration
+from apps.inventory.models import Brand, Category, Product, Transaction
+from apps.inventory.services.stock_valuation import StockValuationService
+
+
+class Command(BaseCommand):
+    help = 'Mesure temps et requêtes de la valorisation du stock (50 000 produits par défaut)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50000, help='Nombre de produits')
+        parser.add_argument('--categories', type=int, default=50, help='Nombre de catégories')
+        parser.add_argument('--brands', type=int, default=200, help='Nombre de marques')
+        parser.add_argument('--transactions', type=int, default=2, help='Mouvements par produit')
+
+    def _measure(self, label, func):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:<22} {elapsed:8.3f}s  {len(ctx.captured_queries):6d} requête(s)")
+        return result
+
+    def handle(self, *args, **options):
+        count = options['products']
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(username='benchmark_stock_valuation')
+            site = Configuration.objects.create(
+                site_name='Benchmark valorisation', site_owner=user, nom_societe='Benchmark',
+                adresse='-', telephone='-', email='benchmark@example.com',
+            )
+            user.site_configuration = site
+            user.is_superuser = True
+            user.save()
+            categories = Category.objects.bulk_create([
+                Category(name=f'Catégorie {i}', slug=f'benchmark-valorisation-{site.id}-{i}', site_configuration=site)
+                for i in range(options['categories'])
+            ])
+            brands = Brand.objects.bulk_create([
+                Brand(name=f'Marque {i}', site_configuration=site) for i in range(options['brands'])
+            ])
+            products = Product.objects.bulk_create([
+                Product(
+                    name=f'Produit {i}', slug=f'benchmark-valorisation-{site.id}-{i}', cug=f'BV{site.id}-{i}',
+                    purchase_price=Decimal(100 + i % 900), selling_price=Decimal(200 + i % 900), quantity=i % 50,
+                    category=categories[i % len(categories)], brand=brands[i % len(brands)] if i % 7 else None,
+                    site_configuration=site,
+                )
+                for i in range(count)
+            ], batch_size=2000)
+            Transaction.objects.bulk_create([
+                Transaction(
+                    product=product, type=('in', 'out', 'adjustment')[(i + j) % 3], quantity=Decimal(1 + j),
+                    reason='other', site_configuration=site,
+                )
+                for i, product in enumerate(products)
+                for j in range(options['transactions'])
+            ], batch_size=5000)
+            as_of = timezone.now() - timedelta(days=1)
+
+            def export_csv():
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, delimiter=';')
+                for row in StockValuationService.iter_csv_rows(user, 'product'):
+                    writer.writerow(row)
+                return buffer.tell()
+
+            self.stdout.write(f"{count} produit(s), {count * options['transactions']} transaction(s)")
+            valuation = self._measure('Valorisation actuelle', lambda: StockValuationService.build_valuation(user))
+            self._measure('Valorisation passée', lambda: StockValuationService.build_valuation(user, as_of=as_of))
+            size = self._measure('Export CSV produits', export_csv)
+            self.stdout.write(self.style.SUCCESS(
+                f"Valeur totale : {valuation['total']['value']} — CSV : {size / 1024:.0f} Ko"
+            ))
+
+            transaction.set_rollback(True)
@@ -0,0 +1,48 @@
+"""
+Commande Django pour vérifier les agrégats journaliers par rapport aux données brutes
+Run with: python manage.py check_rollups --start 2025-01-01 [--end 2025-01-31] [--site 3] [--fix]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.inventory.management.commands.rebuild_rollups import parse_day
+from apps.inventory.services.rollups import RollupService
+
+
+class Command(BaseCommand):
+    help = 'Compare les agrégats journaliers aux ventes et transactions (et les reconstruit avec --fix)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help='Premier jour (AAAA-MM-JJ)')
+        parser.add_argument('--end', help="Dernier jour inclus (AAAA-MM-JJ, aujourd'hui par défaut)")
+        parser.add_argument('--site', type=int, action='append', help='ID du site (répétable, tous par défaut)')
+        parser.add_argument('--fix', action='store_true', help='Reconstruire la période en cas d\'écart')
+        parser.add_argument('--limit', type=int, default=50, help='Nombre d\'écarts affichés')
+
+    def handle(self, *args, **options):
+        start_day = parse_day(options['start'])
+        end_day = parse_day(options['end']) if options['end'] else timezone.localdate()
+        if end_day < start_day:
+            raise CommandError('La date de fin précède la date de début')
+
+        differences = RollupService.check(start_day, end_day, site_ids=options['site'])
+        if not differences:
+            self.stdout.write(self.style.SUCCESS(f"Agrégats cohérents du {start_day} au {end_day}"))
+            return
+
+        for difference in differences[:options['limit']]:
+            key, day = difference['key']
+            self.stdout.write(
+                f"{difference['level']:<8} {key!s:>8} {day}  {difference['field']:<18} "
+                f"attendu {difference['expected']}  enregistré {difference['stored']}"
+            )
+        self.stdout.write(self.style.WARNING(f"{len(differences)} écart(s) du {start_day} au {end_day}"))
+
+        if options['fix']:
+            written = RollupService.rebuild(start_day, end_day, site_ids=options['site'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Période reconstruite : {written['site_rows']} ligne(s) site, {written['product_rows']} ligne(s) produit"
+            ))
+        else:
+            raise CommandError('Agrégats incohérents (relancer avec --fix pour reconstruire)')
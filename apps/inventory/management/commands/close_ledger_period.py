@@ -0,0 +1,48 @@
+"""
+Commande Django pour clôturer le journal des mouvements d'un site
+Run with: python manage.py close_ledger_period --site 3 --before 2025-01-01 [--batch-size 5000] [--dry-run]
+
+Les mouvements antérieurs à la date sont archivés (TransactionArchive) et remplacés
+par un solde d'ouverture par produit.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.models import Configuration
+from apps.inventory.management.commands.rebuild_rollups import parse_day
+from apps.inventory.services.ledger_archive import LedgerArchiveService
+
+
+class Command(BaseCommand):
+    help = "Archive les mouvements de stock d'un site antérieurs à une date (soldes d'ouverture par produit)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--site', type=int, required=True, help='ID du site (Configuration)')
+        parser.add_argument('--before', required=True, help='Date de clôture (AAAA-MM-JJ, début de journée)')
+        parser.add_argument('--batch-size', type=int, default=LedgerArchiveService.BATCH_SIZE,
+                            help='Mouvements archivés par transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Afficher le nombre de mouvements concernés')
+
+    def handle(self, *args, **options):
+        try:
+            site = Configuration.objects.get(pk=options['site'])
+        except Configuration.DoesNotExist:
+            raise CommandError(f"Site {options['site']} introuvable")
+        cutoff = parse_day(options['before'])
+
+        if options['dry_run']:
+            count = LedgerArchiveService.closable(site, cutoff).count()
+            self.stdout.write(f"{count} mouvement(s) à archiver avant le {cutoff}")
+            return
+
+        started = time.perf_counter()
+        try:
+            closing = LedgerArchiveService.close_period(site, cutoff, batch_size=options['batch_size'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"{closing.archived_count} mouvement(s) archivé(s), {closing.opening_count} solde(s) d'ouverture "
+            f"créé(s) en {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,55 @@
+"""
+Commande Django pour vérifier les plans d'exécution des requêtes chaudes d'un site
+Run with: python manage.py explain_hot_queries --site 3 [--query sales_site_period] [--verbose] [--fail]
+
+PostgreSQL : EXPLAIN (ANALYZE, BUFFERS) — les requêtes sont réellement exécutées.
+Avec --fail, la commande échoue si un problème est détecté (régression en CI).
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.core.models import Configuration
+from apps.inventory.services.query_advisor import HOT_QUERIES, QueryAdvisorService
+
+
+class Command(BaseCommand):
+    help = "Analyse les plans d'exécution des requêtes multi-sites fréquentes et signale les parcours séquentiels"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--site', type=int, required=True, help='ID du site (Configuration)')
+        parser.add_argument('--query', action='append', choices=sorted(HOT_QUERIES), help='Requête à analyser (répétable)')
+        parser.add_argument('--min-scan-rows', type=int, default=QueryAdvisorService.MIN_SCAN_ROWS,
+                            help='Lignes lues à partir desquelles un parcours séquentiel est signalé')
+        parser.add_argument('--estimate-ratio', type=float, default=QueryAdvisorService.ESTIMATE_RATIO,
+                            help='Écart estimé / réel signalé (PostgreSQL)')
+        parser.add_argument('--verbose', action='store_true', help='Afficher les plans complets')
+        parser.add_argument('--fail', action='store_true', help='Code de sortie non nul si un problème est détecté')
+
+    def handle(self, *args, **options):
+        try:
+            site = Configuration.objects.get(pk=options['site'])
+        except Configuration.DoesNotExist:
+            raise CommandError(f"Site {options['site']} introuvable")
+
+        results = QueryAdvisorService.run(
+            site, options['query'], options['min_scan_rows'], options['estimate_ratio']
+        )
+        problems = 0
+        for name, result in results.items():
+            issues = result['issues']
+            problems += len(issues)
+            status = self.style.WARNING(f"{len(issues)} problème(s)") if issues else self.style.SUCCESS('OK')
+            self.stdout.write(f"{name:<32} {status}")
+            for issue in issues:
+                self.stdout.write(f"    - [{issue['type']}] {issue['detail']}")
+            if options['verbose']:
+                plan = result['plan']
+                self.stdout.write(json.dumps(plan, indent=2) if isinstance(plan, dict) else plan)
+
+        summary = f"{len(results)} requête(s) analysée(s) ({connection.vendor}), {problems} problème(s)"
+        if problems and options['fail']:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary) if not problems else self.style.WARNING(summary))
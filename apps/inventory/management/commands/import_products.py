@@ -0,0 +1,56 @@
+"""
+Commande Django pour importer des produits depuis un fichier CSV ou XLSX
+Run with: python manage.py import_products catalogue.xlsx --site 3 [--dry-run]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.models import Configuration
+from apps.inventory.services.product_import import ProductImportService
+
+
+class Command(BaseCommand):
+    help = 'Importe des produits en masse depuis un fichier CSV ou XLSX (rapport d\'erreurs par ligne)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Chemin du fichier CSV ou XLSX')
+        parser.add_argument('--site', type=int, required=True, help='ID du site (Configuration) destination')
+        parser.add_argument('--dry-run', action='store_true', help='Valider le fichier sans rien écrire')
+        parser.add_argument('--no-create-missing', action='store_true', help='Rejeter les lignes dont la catégorie ou la marque est inconnue')
+        parser.add_argument('--ignore-limit', action='store_true', help='Ne pas appliquer la limite de produits du plan')
+        parser.add_argument('--max-errors', type=int, default=50, help='Nombre d\'erreurs affichées')
+
+    def handle(self, *args, **options):
+        try:
+            site = Configuration.objects.get(pk=options['site'])
+        except Configuration.DoesNotExist:
+            raise CommandError(f"Site {options['site']} introuvable")
+
+        try:
+            file_format = ProductImportService.detect_format(options['file'])
+            start = time.perf_counter()
+            with open(options['file'], 'rb') as fileobj:
+                report = ProductImportService.import_file(
+                    fileobj,
+                    file_format,
+                    site,
+                    create_missing=not options['no_create_missing'],
+                    dry_run=options['dry_run'],
+                    enforce_limit=not options['ignore_limit'],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        for error in report['errors'][:options['max_errors']]:
+            self.stdout.write(self.style.WARNING(f"Ligne {error['row']}: {'; '.join(error['errors'])}"))
+        if report['error_count'] > options['max_errors']:
+            self.stdout.write(f"... {report['error_count'] - options['max_errors']} autre(s) ligne(s) en erreur")
+
+        action = 'valide(s)' if options['dry_run'] else 'créé(s)'
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['created_count']} produit(s) {action}, {report['error_count']} ligne(s) en erreur "
+            f"sur {report['total_rows']} en {elapsed:.2f}s"
+        ))
@@ -0,0 +1,33 @@
+"""
+Commande Django pour partitionner par mois l'archive des mouvements (PostgreSQL)
+Run with: python manage.py partition_ledger_archive [--until 2026-12-31]
+
+Transforme la table au premier passage, puis crée les partitions mensuelles manquantes.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.inventory.management.commands.rebuild_rollups import parse_day
+from apps.inventory.models import TransactionArchive
+from apps.inventory.services.ledger_archive import LedgerArchiveService
+
+
+class Command(BaseCommand):
+    help = "Partitionne par mois la table d'archive des mouvements de stock (PostgreSQL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help="Dernier jour couvert par les partitions (AAAA-MM-JJ, aujourd'hui par défaut)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Le partitionnement natif nécessite PostgreSQL')
+        until = parse_day(options['until']) if options['until'] else timezone.localdate()
+
+        if LedgerArchiveService.convert_to_partitioned():
+            self.stdout.write(self.style.SUCCESS(f"Table {TransactionArchive._meta.db_table} partitionnée par mois"))
+        oldest = TransactionArchive.objects.order_by('transaction_date').values_list('transaction_date', flat=True).first()
+        start = oldest.date() if oldest else until
+        created = LedgerArchiveService.ensure_partitions(start, until)
+        self.stdout.write(self.style.SUCCESS(f"{created} partition(s) mensuelle(s) vérifiée(s) jusqu'au {until}"))
@@ -0,0 +1,41 @@
+"""
+Commande Django pour reconstruire les agrégats journaliers depuis les ventes et transactions
+Run with: python manage.py rebuild_rollups --start 2025-01-01 [--end 2025-01-31] [--site 3]
+"""
+
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.inventory.services.rollups import RollupService
+
+
+def parse_day(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Date invalide : {value} (format attendu AAAA-MM-JJ)")
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les agrégats journaliers (site et produit) sur une période'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help='Premier jour (AAAA-MM-JJ)')
+        parser.add_argument('--end', help="Dernier jour inclus (AAAA-MM-JJ, aujourd'hui par défaut)")
+        parser.add_argument('--site', type=int, action='append', help='ID du site (répétable, tous par défaut)')
+
+    def handle(self, *args, **options):
+        start_day = parse_day(options['start'])
+        end_day = parse_day(options['end']) if options['end'] else timezone.localdate()
+        if end_day < start_day:
+            raise CommandError('La date de fin précède la date de début')
+
+        started = time.perf_counter()
+        written = RollupService.rebuild(start_day, end_day, site_ids=options['site'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{written['site_rows']} ligne(s) site et {written['product_rows']} ligne(s) produit "
+            f"reconstruites du {start_day} au {end_day} en {time.perf_counter() - started:.2f}s"
+        ))
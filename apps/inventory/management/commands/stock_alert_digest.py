@@ -0,0 +1,26 @@
+"""
+Commande Django pour résumer par site les alertes de stock non lues
+Run with: python manage.py stock_alert_digest [--hours 24]
+
+À planifier une fois par jour (cron) : une notification de résumé par site ayant
+des alertes récentes, sans parcourir les produits.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.inventory.services.stock_alerts import StockAlertService
+
+
+class Command(BaseCommand):
+    help = 'Regroupe les alertes de stock non lues des dernières heures en un résumé par site'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Alertes créées depuis N heures')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours'])
+        sites = StockAlertService.send_digests(since)
+        self.stdout.write(self.style.SUCCESS(f"Résumé des alertes envoyé à {sites} site(s)"))
@@ -0,0 +1,50 @@
+"""
+Commande Django pour calculer les suggestions de réapprovisionnement d'un site
+Run with: python manage.py suggest_reorders --site 3 [--weeks 8] [--create-orders]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.models import Configuration
+from apps.inventory.services.reorder import ReorderService
+
+
+class Command(BaseCommand):
+    help = 'Suggère les quantités à commander à partir des sorties récentes (commandes brouillons par fournisseur)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--site', type=int, required=True, help='ID du site (Configuration)')
+        parser.add_argument('--weeks', type=int, default=ReorderService.DEFAULT_WEEKS, help='Semaines de sorties analysées')
+        parser.add_argument('--lead-time', type=int, default=ReorderService.DEFAULT_LEAD_TIME_DAYS, help='Délai de livraison (jours)')
+        parser.add_argument('--coverage', type=int, default=ReorderService.DEFAULT_COVERAGE_DAYS, help='Couverture visée après livraison (jours)')
+        parser.add_argument('--create-orders', action='store_true', help='Créer une commande brouillon par fournisseur')
+        parser.add_argument('--limit', type=int, default=20, help='Nombre de suggestions affichées')
+
+    def handle(self, *args, **options):
+        try:
+            site = Configuration.objects.get(pk=options['site'])
+        except Configuration.DoesNotExist:
+            raise CommandError(f"Site {options['site']} introuvable")
+
+        start = time.perf_counter()
+        report = ReorderService.suggest(
+            site,
+            weeks=options['weeks'],
+            lead_time_days=options['lead_time'],
+            coverage_days=options['coverage'],
+            create_orders=options['create_orders'],
+        )
+        elapsed = time.perf_counter() - start
+
+        for line in report['suggestions'][:options['limit']]:
+            cover = '-' if line['days_of_cover'] is None else f"{line['days_of_cover']} j"
+            self.stdout.write(
+                f"Produit {line['product_id']:>8}  stock {line['current_stock']:>10}  "
+                f"demande/j {line['avg_daily_demand']:>8}  couverture {cover:>8}  à commander {line['suggested_quantity']}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(report['suggestions'])} produit(s) à commander sur {report['product_count']}, "
+            f"{len(report['order_ids'])} commande(s) brouillon créée(s) en {elapsed:.2f}s"
+        ))
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_alter_configuration_subscription_plan'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0040_add_weight_support_to_products'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCopyJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_ids', models.JSONField(default=list, verbose_name='Produits demandés')),
+                ('status', models.CharField(choices=[('queued', 'En attente'), ('processing', 'En cours'), ('success', 'Succès'), ('failed', 'Échec')], default='queued', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Traités')),
+                ('copied_count', models.PositiveIntegerField(default=0, verbose_name='Copiés')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Erreurs')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('destination_site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_copy_jobs', to='core.configuration', verbose_name='Site destination')),
+                ('source_site', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='product_copy_jobs_as_source', to='core.configuration', verbose_name='Site source')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Tâche de copie de produits',
+                'verbose_name_plural': 'Tâches de copie de produits',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_alter_configuration_subscription_plan'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0041_product_copy_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='imports/products/', verbose_name='Fichier')),
+                ('original_filename', models.CharField(blank=True, max_length=255, verbose_name='Nom du fichier')),
+                ('create_missing', models.BooleanField(default=True, verbose_name='Créer les catégories et marques manquantes')),
+                ('dry_run', models.BooleanField(default=False, verbose_name='Simulation (aucune écriture)')),
+                ('status', models.CharField(choices=[('queued', 'En attente'), ('processing', 'En cours'), ('success', 'Succès'), ('failed', 'Échec')], default='queued', max_length=20)),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='Lignes lues')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='Produits créés')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='Lignes en erreur')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Erreurs par ligne')),
+                ('error_message', models.TextField(blank=True, verbose_name="Message d'erreur")),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('site_configuration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_import_jobs', to='core.configuration', verbose_name='Configuration du site')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Import de produits',
+                'verbose_name_plural': 'Imports de produits',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
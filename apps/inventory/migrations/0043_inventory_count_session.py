@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_alter_configuration_subscription_plan'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0042_product_import_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryCountSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=150, verbose_name='Nom')),
+                ('status', models.CharField(choices=[('open', 'En cours de comptage'), ('frozen', 'Figée (revue des écarts)'), ('applied', 'Appliquée'), ('cancelled', 'Annulée')], default='open', max_length=20, verbose_name='Statut')),
+                ('zero_uncounted', models.BooleanField(default=False, help_text='Au gel de la session, les produits non comptés sont considérés à 0', verbose_name='Inventaire complet')),
+                ('notes', models.TextField(blank=True, verbose_name='Notes')),
+                ('adjusted_count', models.PositiveIntegerField(default=0, verbose_name='Produits ajustés')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créée le')),
+                ('frozen_at', models.DateTimeField(blank=True, null=True, verbose_name='Figée le')),
+                ('applied_at', models.DateTimeField(blank=True, null=True, verbose_name='Appliquée le')),
+                ('applied_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='applied_inventory_count_sessions', to=settings.AUTH_USER_MODEL, verbose_name='Appliquée par')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_count_sessions', to=settings.AUTH_USER_MODEL, verbose_name='Créée par')),
+                ('site_configuration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_count_sessions', to='core.configuration', verbose_name='Configuration du site')),
+            ],
+            options={
+                'verbose_name': "Session d'inventaire",
+                'verbose_name_plural': "Sessions d'inventaire",
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventoryCountLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counted_quantity', models.DecimalField(decimal_places=3, default=0, max_digits=10, verbose_name='Quantité comptée')),
+                ('expected_quantity', models.DecimalField(blank=True, decimal_places=3, max_digits=10, null=True, verbose_name='Quantité théorique (au gel)')),
+                ('device_id', models.CharField(blank=True, max_length=100, verbose_name='Appareil')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Modifiée le')),
+                ('counted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Compté par')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='count_lines', to='inventory.product', verbose_name='Produit')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.inventorycountsession', verbose_name='Session')),
+            ],
+            options={
+                'verbose_name': "Ligne d'inventaire",
+                'verbose_name_plural': "Lignes d'inventaire",
+                'unique_together': {('session', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:20
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+# Copie figée de Transaction.INVENTORY_NOTE_KEYWORDS / classify_reason
+INVENTORY_NOTE_KEYWORDS = ('inventaire', 'correction stock', 'régularisation comptage')
+
+
+def backfill_transaction_reason(apps, schema_editor):
+    """
+    Renseigner le motif des transactions existantes, une fois, par quelques UPDATE
+    (mêmes règles que Transaction.classify_reason, par ordre de priorité)
+    """
+    Transaction = apps.get_model('inventory', 'Transaction')
+    pending = Transaction.objects.filter(reason__isnull=True)
+
+    inventory_notes = Q()
+    for keyword in INVENTORY_NOTE_KEYWORDS:
+        inventory_notes |= Q(notes__icontains=keyword)
+    pending.filter(Q(type='adjustment') | (Q(type__in=['in', 'out']) & inventory_notes)).update(reason='inventory')
+    pending.filter(type='loss').update(reason='loss')
+    pending.filter(sale__isnull=False).update(reason='sale')
+    pending.filter(type='in', notes__istartswith='réception').update(reason='reception')
+    pending.update(reason='other')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0043_inventory_count_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='reason',
+            field=models.CharField(blank=True, choices=[('inventory', 'Inventaire / correction de stock'), ('loss', 'Casse'), ('sale', 'Vente'), ('reception', 'Réception marchandise'), ('other', 'Autre')], db_index=True, max_length=20, null=True, verbose_name='Motif'),
+        ),
+        migrations.RunPython(backfill_transaction_reason, migrations.RunPython.noop),
+    ]
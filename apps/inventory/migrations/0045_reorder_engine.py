@@ -0,0 +1,67 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_alter_configuration_subscription_plan'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0044_transaction_reason'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='reference',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Référence'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='supplier',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='inventory.supplier', verbose_name='Fournisseur'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='supplier',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='products', to='inventory.supplier', verbose_name='Fournisseur principal'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='inventory.customer'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Brouillon'), ('pending', 'En attente'), ('confirmed', 'Validée'), ('cancelled', 'Annulée')], default='pending', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='ReorderJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weeks', models.PositiveIntegerField(default=8, verbose_name='Semaines analysées')),
+                ('lead_time_days', models.PositiveIntegerField(default=7, verbose_name='Délai de livraison (jours)')),
+                ('coverage_days', models.PositiveIntegerField(default=14, verbose_name='Couverture visée (jours)')),
+                ('create_orders', models.BooleanField(default=True, verbose_name='Créer les commandes brouillons')),
+                ('status', models.CharField(choices=[('queued', 'En attente'), ('processing', 'En cours'), ('success', 'Succès'), ('failed', 'Échec')], default='queued', max_length=20)),
+                ('product_count', models.PositiveIntegerField(default=0, verbose_name='Produits analysés')),
+                ('suggestion_count', models.PositiveIntegerField(default=0, verbose_name='Produits à commander')),
+                ('order_ids', models.JSONField(blank=True, default=list, verbose_name='Commandes créées')),
+                ('suggestions', models.JSONField(blank=True, default=list, verbose_name='Suggestions')),
+                ('error_message', models.TextField(blank=True, verbose_name="Message d'erreur")),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('site_configuration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_jobs', to='core.configuration', verbose_name='Configuration du site')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Calcul de réapprovisionnement',
+                'verbose_name_plural': 'Calculs de réapprovisionnement',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_alter_configuration_subscription_plan'),
+        ('inventory', '0045_reorder_engine'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySiteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Jour')),
+                ('sales_count', models.PositiveIntegerField(default=0, verbose_name='Ventes')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name="Chiffre d'affaires")),
+                ('margin', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Marge')),
+                ('revenue_cash', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='CA espèces')),
+                ('revenue_card', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='CA carte')),
+                ('revenue_mobile', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='CA mobile money')),
+                ('revenue_transfer', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='CA virement')),
+                ('revenue_sarali', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='CA Sarali')),
+                ('revenue_credit', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='CA crédit')),
+                ('movement_count', models.PositiveIntegerField(default=0, verbose_name='Mouvements')),
+                ('quantity_in', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='Quantité entrée')),
+                ('quantity_out', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='Quantité sortie')),
+                ('quantity_loss', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='Quantité cassée')),
+                ('quantity_adjusted', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='Ajustements (net)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Mis à jour le')),
+                ('site_configuration', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='core.configuration', verbose_name='Configuration du site')),
+            ],
+            options={
+                'verbose_name': 'Agrégat journalier de site',
+                'verbose_name_plural': 'Agrégats journaliers de site',
+                'ordering': ['-date'],
+                'unique_together': {('site_configuration', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Jour')),
+                ('quantity_sold', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='Quantité vendue')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name="Chiffre d'affaires")),
+                ('margin', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Marge')),
+                ('quantity_in', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='Quantité entrée')),
+                ('quantity_out', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='Quantité sortie')),
+                ('quantity_loss', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='Quantité cassée')),
+                ('quantity_adjusted', models.DecimalField(decimal_places=3, default=0, max_digits=16, verbose_name='Ajustements (net)')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='inventory.product', verbose_name='Produit')),
+                ('site_configuration', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_product_rollups', to='core.configuration', verbose_name='Configuration du site')),
+            ],
+            options={
+                'verbose_name': 'Agrégat journalier de produit',
+                'verbose_name_plural': 'Agrégats journaliers de produit',
+                'indexes': [models.Index(fields=['site_configuration', 'date'], name='inv_prod_rollup_site_date')],
+                'unique_together': {('product', 'date')},
+            },
+        ),
+    ]
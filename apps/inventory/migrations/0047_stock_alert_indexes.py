@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0046_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('quantity__lte', models.F('alert_threshold'))), fields=['site_configuration', 'id'], name='inv_product_low_stock'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('quantity__lte', 0)), fields=['site_configuration', 'id'], name='inv_product_out_of_stock'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('quantity__lt', 0)), fields=['site_configuration', 'id'], name='inv_product_backorder'),
+        ),
+    ]
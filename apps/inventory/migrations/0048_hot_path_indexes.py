@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0047_stock_alert_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='barcode',
+            index=models.Index(fields=['ean', 'product'], name='inv_barcode_ean_product'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['site_configuration', 'is_active', 'name'], name='inv_product_site_active_name'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['site_configuration', '-transaction_date'], name='inv_tx_site_date'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['product', '-transaction_date'], name='inv_tx_product_date'),
+        ),
+    ]
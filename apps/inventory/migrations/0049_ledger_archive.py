@@ -0,0 +1,64 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('sales', '0009_hot_path_indexes'),
+        ('core', '0015_notification_site_alerts'),
+        ('inventory', '0048_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='type',
+            field=models.CharField(choices=[('in', 'Achat'), ('out', 'Vente'), ('loss', 'Casse'), ('backorder', 'Backorder'), ('adjustment', 'Ajustement'), ('opening', "Solde d'ouverture")], default='in', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='LedgerClosing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff', models.DateTimeField(verbose_name='Date de clôture')),
+                ('archived_count', models.PositiveIntegerField(default=0, verbose_name='Mouvements archivés')),
+                ('opening_count', models.PositiveIntegerField(default=0, verbose_name="Soldes d'ouverture")),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Clôturé par')),
+                ('site_configuration', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_closings', to='core.configuration', verbose_name='Configuration du site')),
+            ],
+            options={
+                'verbose_name': 'Clôture de période',
+                'verbose_name_plural': 'Clôtures de période',
+                'ordering': ['-cutoff'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TransactionArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type', models.CharField(choices=[('in', 'Achat'), ('out', 'Vente'), ('loss', 'Casse'), ('backorder', 'Backorder'), ('adjustment', 'Ajustement'), ('opening', "Solde d'ouverture")], max_length=10)),
+                ('reason', models.CharField(blank=True, choices=[('inventory', 'Inventaire / correction de stock'), ('loss', 'Casse'), ('sale', 'Vente'), ('reception', 'Réception marchandise'), ('other', 'Autre')], max_length=20, null=True)),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=10)),
+                ('transaction_date', models.DateTimeField()),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('unit_price', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('order', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='inventory.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_transactions', to='inventory.product')),
+                ('sale', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='sales.sale')),
+                ('site_configuration', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to='core.configuration', verbose_name='Configuration du site')),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Transaction archivée',
+                'verbose_name_plural': 'Transactions archivées',
+                'ordering': ['-transaction_date'],
+                'indexes': [models.Index(fields=['site_configuration', '-transaction_date'], name='inv_txarch_site_date'), models.Index(fields=['product', '-transaction_date'], name='inv_txarch_product_date')],
+            },
+        ),
+    ]
@@ -9,8 +9,11 @@ from django.urls import reverse
 import random
 from django.utils.translation import gettext_lazy as _
 from decimal import Decimal
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 # ===== FONCTIONS DYNAMIQUES POUR UPLOAD_TO =====
 
 def get_product_image_path(instance, filename):
@@ -318,6 +321,10 @@ class Product(models.Model):
     
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Catégorie")
     brand = models.ForeignKey(Brand, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Marque")
+    supplier = models.ForeignKey(
+        'Supplier', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='products', verbose_name="Fournisseur principal"
+    )
     image = models.ImageField(
         upload_to=get_product_image_path, 
         # ✅ Stockage automatique selon l'environnement (local ou S3)
@@ -424,6 +431,43 @@ class Product(models.Model):
         """Returns the primary barcode of the product"""
         return self.barcodes.filter(is_primary=True).first()
 
+    # Champs propagés aux copies (ProductCopy) : on garde leur valeur chargée depuis la base
+    SYNC_TRACKED_FIELDS = ('purchase_price', 'selling_price', 'description', 'image', 'quantity')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._sync_snapshot = {
+            name: value for name, value in zip(field_names, values) if name in cls.SYNC_TRACKED_FIELDS
+        }
+        return instance
+
+    def get_sync_changes(self):
+        """
+        Retourne {champ: (ancienne valeur, nouvelle valeur)} pour les champs suivis
+        modifiés depuis le chargement (vide pour un objet non chargé depuis la base)
+        """
+        snapshot = getattr(self, '_sync_snapshot', None)
+        if not snapshot:
+            return {}
+        changes = {}
+        for name, old_value in snapshot.items():
+            new_value = getattr(self, name)
+            if name == 'image':
+                new_value = new_value.name if new_value else None
+                old_value = old_value or None
+            if new_value != old_value:
+                changes[name] = (old_value, new_value)
+        return changes
+
+    def reset_sync_snapshot(self):
+        """Après sauvegarde : les valeurs actuelles deviennent la référence"""
+        snapshot = getattr(self, '_sync_snapshot', None)
+        if snapshot:
+            for name in snapshot:
+                value = getattr(self, name)
+                snapshot[name] = (value.name or None) if name == 'image' else value
+
     @classmethod
     def generate_unique_cug(cls):
         """Génère un CUG unique à 5 chiffres"""
@@ -522,7 +566,7 @@ class Product(models.Model):
             import cv2
             self._auto_process_background()
         except ImportError:
-            print(f"⚠️ [AUTO] OpenCV non disponible - traitement de background ignoré pour produit {self.id}")
+            logger.debug("⚠️ [AUTO] OpenCV non disponible - traitement de background ignoré pour produit %s", self.id)
 
     @property
     def category_path(self):
@@ -619,21 +663,14 @@ class Product(models.Model):
         """
         # Vérifier si l'image existe et n'a pas encore été traitée
         if not self.image or not self.image.name:
-            print(f"⚠️ [AUTO] Produit {self.id}: Aucune image à traiter")
             return
         
         # Vérifier si l'image a déjà été traitée (éviter les boucles infinies)
         if hasattr(self, '_background_processed'):
-            print(f"⚠️ [AUTO] Produit {self.id}: Image déjà traitée, skip")
             return
         
         try:
-            import logging
-            logger = logging.getLogger(__name__)
-            
-            print(f"🎨 [AUTO] Début traitement automatique background pour produit {self.id}")
-            print(f"📁 Image: {self.image.name}")
-            logger.info(f"🎨 [AUTO] Traitement automatique background pour produit {self.id}")
+            logger.info("🎨 [AUTO] Traitement automatique background pour produit %s (%s)", self.id, self.image.name)
             
             # Marquer comme en cours de traitement pour éviter les boucles
             self._background_processed = True
@@ -642,17 +679,12 @@ class Product(models.Model):
             success, message = self.process_background_removal()
             
             if success:
-                print(f"✅ [AUTO] Background retiré avec succès: {message}")
-                logger.info(f"✅ [AUTO] Background retiré automatiquement: {message}")
+                logger.info("✅ [AUTO] Background retiré automatiquement: %s", message)
             else:
-                print(f"⚠️ [AUTO] Échec traitement: {message}")
-                logger.warning(f"⚠️ [AUTO] Échec traitement automatique: {message}")
+                logger.warning("⚠️ [AUTO] Échec traitement automatique: %s", message)
                 
         except Exception as e:
-            print(f"❌ [AUTO] Erreur traitement automatique: {str(e)}")
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"❌ [AUTO] Erreur traitement automatique: {str(e)}")
+            logger.exception("❌ [AUTO] Erreur traitement automatique: %s", e)
         finally:
             # Réinitialiser le flag
             if hasattr(self, '_background_processed'):
@@ -666,6 +698,22 @@ class Product(models.Model):
             models.Index(fields=['slug']),
             models.Index(fields=['cug']),
             models.Index(fields=['name']),
+            # Index partiels des listes d'alerte : seuls les produits concernés y figurent,
+            # triés par id pour la pagination par curseur
+            models.Index(
+                fields=['site_configuration', 'id'], name='inv_product_low_stock',
+                condition=models.Q(quantity__lte=models.F('alert_threshold')),
+            ),
+            models.Index(
+                fields=['site_configuration', 'id'], name='inv_product_out_of_stock',
+                condition=models.Q(quantity__lte=0),
+            ),
+            models.Index(
+                fields=['site_configuration', 'id'], name='inv_product_backorder',
+                condition=models.Q(quantity__lt=0),
+            ),
+            # Liste des produits actifs d'un site triée par nom
+            models.Index(fields=['site_configuration', 'is_active', 'name'], name='inv_product_site_active_name'),
         ]
 
 class Barcode(models.Model):
@@ -680,6 +728,8 @@ class Barcode(models.Model):
         verbose_name = "Code-barres"
         verbose_name_plural = "Codes-barres"
         ordering = ['-is_primary', '-added_at']
+        # Recherche par EAN (scan caisse) : le site se vérifie via product_id sans relire la table
+        indexes = [models.Index(fields=['ean', 'product'], name='inv_barcode_ean_product')]
         # ✅ Contrainte d'unicité par site : un EAN unique par site
         # Note: La contrainte sera gérée dans la méthode clean() car unique_together ne supporte pas les relations indirectes
 
@@ -862,12 +912,17 @@ class Supplier(models.Model):
 
 class Order(models.Model):
     STATUS_CHOICES = [
+        ('draft', 'Brouillon'),  # Commande fournisseur proposée par le réapprovisionnement
         ('pending', 'En attente'),
         ('confirmed', 'Validée'),
         ('cancelled', 'Annulée'),
     ]
 
-    customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
+    customer = models.ForeignKey(Customer, on_delete=models.PROTECT, null=True, blank=True)
+    supplier = models.ForeignKey(
+        Supplier, on_delete=models.PROTECT, null=True, blank=True, related_name='orders', verbose_name="Fournisseur"
+    )
+    reference = models.CharField(max_length=50, blank=True, verbose_name="Référence")
     order_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
@@ -883,7 +938,7 @@ class Order(models.Model):
     )
 
     def __str__(self):
-        return f"Order #{self.id} - {self.customer}"
+        return f"Order #{self.id} - {self.customer or self.supplier or ''}"
 
     class Meta:
         verbose_name = "Commande"
@@ -932,9 +987,25 @@ class Transaction(models.Model):
         ('loss', 'Casse'),
         ('backorder', 'Backorder'),  # Nouveau type pour les stocks négatifs
         ('adjustment', 'Ajustement'),  # Pour les corrections manuelles
+        ('opening', "Solde d'ouverture"),  # Mouvements archivés à la clôture d'une période
+    ]
+
+    # Motif du mouvement, stocké à l'écriture (les rapports ne filtrent plus sur les notes)
+    REASON_INVENTORY = 'inventory'
+    REASON_CHOICES = [
+        (REASON_INVENTORY, 'Inventaire / correction de stock'),
+        ('loss', 'Casse'),
+        ('sale', 'Vente'),
+        ('reception', 'Réception marchandise'),
+        ('other', 'Autre'),
     ]
+    # Mots-clés historiques des notes identifiant une correction d'inventaire
+    INVENTORY_NOTE_KEYWORDS = ('inventaire', 'correction stock', 'régularisation comptage')
 
     type = models.CharField(max_length=10, choices=TYPE_CHOICES, default='in')
+    reason = models.CharField(
+        max_length=20, choices=REASON_CHOICES, blank=True, null=True, db_index=True, verbose_name="Motif"
+    )
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     quantity = models.DecimalField(max_digits=10, decimal_places=3)  # Permet les valeurs négatives et décimales pour les ajustements
     transaction_date = models.DateTimeField(auto_now_add=True)
@@ -961,10 +1032,28 @@ class Transaction(models.Model):
         verbose_name=_('Configuration du site')
     )
 
+    @classmethod
+    def classify_reason(cls, type, notes=None, sale_id=None):
+        """Motif d'un mouvement d'après son type et ses notes (mêmes règles que la reprise des données)"""
+        notes_lower = (notes or '').lower()
+        if type == 'adjustment' or (
+            type in ('in', 'out') and any(keyword in notes_lower for keyword in cls.INVENTORY_NOTE_KEYWORDS)
+        ):
+            return cls.REASON_INVENTORY
+        if type == 'loss':
+            return 'loss'
+        if sale_id:
+            return 'sale'
+        if type == 'in' and notes_lower.startswith('réception'):
+            return 'reception'
+        return 'other'
+
     def save(self, *args, **kwargs):
         from decimal import Decimal
         # Calculer le montant total
         self.total_amount = Decimal(str(self.quantity)) * Decimal(str(self.unit_price))
+        if not self.reason:
+            self.reason = self.classify_reason(self.type, self.notes, self.sale_id)
         
         # ✅ NOUVELLE APPROCHE: Ne plus modifier le stock automatiquement
         # Le stock doit être modifié uniquement par les endpoints de gestion de stock
@@ -998,7 +1087,84 @@ class Transaction(models.Model):
     class Meta:
         verbose_name = "Transaction"
         verbose_name_plural = "Transactions"
-        ordering = ['-transaction_date'] 
+        ordering = ['-transaction_date']
+        indexes = [
+            models.Index(fields=['site_configuration', '-transaction_date'], name='inv_tx_site_date'),
+            models.Index(fields=['product', '-transaction_date'], name='inv_tx_product_date'),
+        ]
+
+
+class TransactionArchive(models.Model):
+    """
+    Mouvements de stock archivés à la clôture d'une période (copie conforme des lignes
+    de Transaction, identifiants d'origine conservés). Remplacés dans le journal actif
+    par une ligne de solde d'ouverture par produit.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    type = models.CharField(max_length=10, choices=Transaction.TYPE_CHOICES)
+    reason = models.CharField(max_length=20, choices=Transaction.REASON_CHOICES, blank=True, null=True)
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='archived_transactions')
+    quantity = models.DecimalField(max_digits=10, decimal_places=3)
+    transaction_date = models.DateTimeField()
+    notes = models.TextField(blank=True, null=True)
+    # Références figées : la vente ou la commande peut être supprimée après archivage
+    sale = models.ForeignKey(
+        'sales.Sale', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+    order = models.ForeignKey(
+        'Order', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+    unit_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+        related_name='+'
+    )
+    site_configuration = models.ForeignKey(
+        'core.Configuration',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='archived_transactions',
+        verbose_name=_('Configuration du site')
+    )
+
+    def __str__(self):
+        return f"{self.get_type_display()} - {self.product_id} ({self.quantity}) archivé"
+
+    class Meta:
+        verbose_name = "Transaction archivée"
+        verbose_name_plural = "Transactions archivées"
+        ordering = ['-transaction_date']
+        indexes = [
+            models.Index(fields=['site_configuration', '-transaction_date'], name='inv_txarch_site_date'),
+            models.Index(fields=['product', '-transaction_date'], name='inv_txarch_product_date'),
+        ]
+
+
+class LedgerClosing(models.Model):
+    """Clôture de période du journal des mouvements d'un site"""
+    site_configuration = models.ForeignKey(
+        'core.Configuration',
+        on_delete=models.CASCADE,
+        related_name='ledger_closings',
+        verbose_name=_('Configuration du site')
+    )
+    cutoff = models.DateTimeField(verbose_name="Date de clôture")
+    archived_count = models.PositiveIntegerField(default=0, verbose_name="Mouvements archivés")
+    opening_count = models.PositiveIntegerField(default=0, verbose_name="Soldes d'ouverture")
+    closed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Clôturé par"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+
+    def __str__(self):
+        return f"Clôture {self.site_configuration_id} au {self.cutoff:%Y-%m-%d}"
+
+    class Meta:
+        verbose_name = "Clôture de période"
+        verbose_name_plural = "Clôtures de période"
+        ordering = ['-cutoff']
 
 
 class LabelTemplate(models.Model):
@@ -1199,6 +1365,14 @@ class ProductCopy(models.Model):
     sync_images = models.BooleanField(default=True, verbose_name=_('Synchroniser les images'))
     sync_description = models.BooleanField(default=True, verbose_name=_('Synchroniser la description'))
     
+    # Option de synchronisation -> champs du produit concernés
+    SYNC_FIELDS = {
+        'sync_prices': ('purchase_price', 'selling_price'),
+        'sync_stock': ('quantity',),
+        'sync_images': ('image',),
+        'sync_description': ('description',),
+    }
+    
     class Meta:
         verbose_name = _('Copie de produit')
         verbose_name_plural = _('Copies de produits')
@@ -1242,7 +1416,7 @@ class ProductCopy(models.Model):
             return True
             
         except Exception as e:
-            print(f"Erreur lors de la synchronisation: {e}")
+            logger.warning("⚠️ [COPY_SYNC] Erreur lors de la synchronisation: %s", e)
             return False
     
     def get_sync_status(self):
@@ -1259,3 +1433,278 @@ class ProductCopy(models.Model):
             return f"Synchronisé il y a {days_since_sync} jours"
         else:
             return f"Synchronisé il y a {days_since_sync} jours (ancien)"
+
+
+class ProductCopyJob(models.Model):
+    """
+    Copie en masse de produits vers un site, exécutée en arrière-plan au-delà d'un seuil.
+    La progression intermédiaire est publiée dans le cache (la copie se fait dans une seule
+    transaction, invisible des autres connexions avant le commit).
+    """
+    STATUS_CHOICES = [
+        ('queued', _('En attente')),
+        ('processing', _('En cours')),
+        ('success', _('Succès')),
+        ('failed', _('Échec')),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_('Utilisateur'))
+    source_site = models.ForeignKey(
+        'core.Configuration',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='product_copy_jobs_as_source',
+        verbose_name=_('Site source')
+    )
+    destination_site = models.ForeignKey(
+        'core.Configuration',
+        on_delete=models.CASCADE,
+        related_name='product_copy_jobs',
+        verbose_name=_('Site destination')
+    )
+    product_ids = models.JSONField(default=list, verbose_name=_('Produits demandés'))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total = models.PositiveIntegerField(default=0, verbose_name=_('Total'))
+    processed = models.PositiveIntegerField(default=0, verbose_name=_('Traités'))
+    copied_count = models.PositiveIntegerField(default=0, verbose_name=_('Copiés'))
+    errors = models.JSONField(default=list, blank=True, verbose_name=_('Erreurs'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Créé le'))
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Terminé le'))
+
+    class Meta:
+        verbose_name = _('Tâche de copie de produits')
+        verbose_name_plural = _('Tâches de copie de produits')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Copie de {self.total} produit(s) → {self.destination_site} - {self.get_status_display()}"
+
+
+class ProductImportJob(models.Model):
+    """
+    Import en masse de produits depuis un fichier CSV ou XLSX, avec rapport d'erreurs par ligne
+    """
+    STATUS_CHOICES = [
+        ('queued', _('En attente')),
+        ('processing', _('En cours')),
+        ('success', _('Succès')),
+        ('failed', _('Échec')),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_('Utilisateur'))
+    site_configuration = models.ForeignKey(
+        'core.Configuration',
+        on_delete=models.CASCADE,
+        related_name='product_import_jobs',
+        verbose_name=_('Configuration du site')
+    )
+    file = models.FileField(upload_to='imports/products/', verbose_name=_('Fichier'))
+    original_filename = models.CharField(max_length=255, blank=True, verbose_name=_('Nom du fichier'))
+    create_missing = models.BooleanField(default=True, verbose_name=_('Créer les catégories et marques manquantes'))
+    dry_run = models.BooleanField(default=False, verbose_name=_('Simulation (aucune écriture)'))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total_rows = models.PositiveIntegerField(default=0, verbose_name=_('Lignes lues'))
+    created_count = models.PositiveIntegerField(default=0, verbose_name=_('Produits créés'))
+    error_count = models.PositiveIntegerField(default=0, verbose_name=_('Lignes en erreur'))
+    errors = models.JSONField(default=list, blank=True, verbose_name=_('Erreurs par ligne'))
+    error_message = models.TextField(blank=True, verbose_name=_('Message d\'erreur'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Créé le'))
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Terminé le'))
+
+    class Meta:
+        verbose_name = _('Import de produits')
+        verbose_name_plural = _('Imports de produits')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import {self.original_filename or self.file.name} - {self.get_status_display()}"
+
+
+class InventoryCountSession(models.Model):
+    """
+    Session d'inventaire : comptages envoyés par un ou plusieurs appareils,
+    figés puis appliqués en une seule fois au stock
+    """
+    STATUS_CHOICES = [
+        ('open', _('En cours de comptage')),
+        ('frozen', _('Figée (revue des écarts)')),
+        ('applied', _('Appliquée')),
+        ('cancelled', _('Annulée')),
+    ]
+
+    name = models.CharField(max_length=150, verbose_name=_('Nom'))
+    site_configuration = models.ForeignKey(
+        'core.Configuration',
+        on_delete=models.CASCADE,
+        related_name='inventory_count_sessions',
+        verbose_name=_('Configuration du site')
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open', verbose_name=_('Statut'))
+    zero_uncounted = models.BooleanField(
+        default=False,
+        verbose_name=_('Inventaire complet'),
+        help_text=_('Au gel de la session, les produits non comptés sont considérés à 0')
+    )
+    notes = models.TextField(blank=True, verbose_name=_('Notes'))
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='inventory_count_sessions', verbose_name=_('Créée par')
+    )
+    applied_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='applied_inventory_count_sessions', verbose_name=_('Appliquée par')
+    )
+    adjusted_count = models.PositiveIntegerField(default=0, verbose_name=_('Produits ajustés'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Créée le'))
+    frozen_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Figée le'))
+    applied_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Appliquée le'))
+
+    class Meta:
+        verbose_name = _('Session d\'inventaire')
+        verbose_name_plural = _('Sessions d\'inventaire')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} - {self.get_status_display()}"
+
+
+class InventoryCountLine(models.Model):
+    """
+    Quantité comptée pour un produit dans une session d'inventaire.
+    `expected_quantity` est le stock théorique photographié au gel de la session.
+    """
+    session = models.ForeignKey(
+        InventoryCountSession, on_delete=models.CASCADE, related_name='lines', verbose_name=_('Session')
+    )
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='count_lines', verbose_name=_('Produit'))
+    counted_quantity = models.DecimalField(max_digits=10, decimal_places=3, default=0, verbose_name=_('Quantité comptée'))
+    expected_quantity = models.DecimalField(
+        max_digits=10, decimal_places=3, null=True, blank=True, verbose_name=_('Quantité théorique (au gel)')
+    )
+    counted_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_('Compté par')
+    )
+    device_id = models.CharField(max_length=100, blank=True, verbose_name=_('Appareil'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Modifiée le'))
+
+    class Meta:
+        verbose_name = _('Ligne d\'inventaire')
+        verbose_name_plural = _('Lignes d\'inventaire')
+        unique_together = ['session', 'product']
+
+    def __str__(self):
+        return f"{self.product} : {self.counted_quantity}"
+
+
+class ReorderJob(models.Model):
+    """
+    Calcul des suggestions de réapprovisionnement d'un site à partir du journal des sorties,
+    avec création optionnelle d'une commande brouillon par fournisseur
+    """
+    STATUS_CHOICES = [
+        ('queued', _('En attente')),
+        ('processing', _('En cours')),
+        ('success', _('Succès')),
+        ('failed', _('Échec')),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_('Utilisateur'))
+    site_configuration = models.ForeignKey(
+        'core.Configuration',
+        on_delete=models.CASCADE,
+        related_name='reorder_jobs',
+        verbose_name=_('Configuration du site')
+    )
+    weeks = models.PositiveIntegerField(default=8, verbose_name=_('Semaines analysées'))
+    lead_time_days = models.PositiveIntegerField(default=7, verbose_name=_('Délai de livraison (jours)'))
+    coverage_days = models.PositiveIntegerField(default=14, verbose_name=_('Couverture visée (jours)'))
+    create_orders = models.BooleanField(default=True, verbose_name=_('Créer les commandes brouillons'))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    product_count = models.PositiveIntegerField(default=0, verbose_name=_('Produits analysés'))
+    suggestion_count = models.PositiveIntegerField(default=0, verbose_name=_('Produits à commander'))
+    order_ids = models.JSONField(default=list, blank=True, verbose_name=_('Commandes créées'))
+    suggestions = models.JSONField(default=list, blank=True, verbose_name=_('Suggestions'))
+    error_message = models.TextField(blank=True, verbose_name=_('Message d\'erreur'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Créé le'))
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Terminé le'))
+
+    class Meta:
+        verbose_name = _('Calcul de réapprovisionnement')
+        verbose_name_plural = _('Calculs de réapprovisionnement')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Réapprovisionnement {self.site_configuration} - {self.get_status_display()}"
+
+
+class DailySiteRollup(models.Model):
+    """
+    Agrégats journaliers d'un site (ventes terminées et mouvements de stock), tenus à jour
+    à chaque vente / mouvement et reconstructibles depuis les données brutes
+    """
+    site_configuration = models.ForeignKey(
+        'core.Configuration',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='daily_rollups',
+        verbose_name=_('Configuration du site')
+    )
+    date = models.DateField(verbose_name=_('Jour'))
+    sales_count = models.PositiveIntegerField(default=0, verbose_name=_('Ventes'))
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('Chiffre d\'affaires'))
+    margin = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('Marge'))
+    revenue_cash = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('CA espèces'))
+    revenue_card = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('CA carte'))
+    revenue_mobile = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('CA mobile money'))
+    revenue_transfer = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('CA virement'))
+    revenue_sarali = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('CA Sarali'))
+    revenue_credit = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('CA crédit'))
+    movement_count = models.PositiveIntegerField(default=0, verbose_name=_('Mouvements'))
+    quantity_in = models.DecimalField(max_digits=16, decimal_places=3, default=0, verbose_name=_('Quantité entrée'))
+    quantity_out = models.DecimalField(max_digits=16, decimal_places=3, default=0, verbose_name=_('Quantité sortie'))
+    quantity_loss = models.DecimalField(max_digits=16, decimal_places=3, default=0, verbose_name=_('Quantité cassée'))
+    quantity_adjusted = models.DecimalField(max_digits=16, decimal_places=3, default=0, verbose_name=_('Ajustements (net)'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Mis à jour le'))
+
+    class Meta:
+        verbose_name = _('Agrégat journalier de site')
+        verbose_name_plural = _('Agrégats journaliers de site')
+        unique_together = ['site_configuration', 'date']
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.site_configuration} - {self.date}"
+
+
+class DailyProductRollup(models.Model):
+    """
+    Agrégats journaliers d'un produit (ventes terminées et mouvements de stock)
+    """
+    site_configuration = models.ForeignKey(
+        'core.Configuration',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='daily_product_rollups',
+        verbose_name=_('Configuration du site')
+    )
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_rollups', verbose_name=_('Produit'))
+    date = models.DateField(verbose_name=_('Jour'))
+    quantity_sold = models.DecimalField(max_digits=16, decimal_places=3, default=0, verbose_name=_('Quantité vendue'))
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('Chiffre d\'affaires'))
+    margin = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('Marge'))
+    quantity_in = models.DecimalField(max_digits=16, decimal_places=3, default=0, verbose_name=_('Quantité entrée'))
+    quantity_out = models.DecimalField(max_digits=16, decimal_places=3, default=0, verbose_name=_('Quantité sortie'))
+    quantity_loss = models.DecimalField(max_digits=16, decimal_places=3, default=0, verbose_name=_('Quantité cassée'))
+    quantity_adjusted = models.DecimalField(max_digits=16, decimal_places=3, default=0, verbose_name=_('Ajustements (net)'))
+
+    class Meta:
+        verbose_name = _('Agrégat journalier de produit')
+        verbose_name_plural = _('Agrégats journaliers de produit')
+        unique_together = ['product', 'date']
+        indexes = [models.Index(fields=['site_configuration', 'date'], name='inv_prod_rollup_site_date')]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.date}"
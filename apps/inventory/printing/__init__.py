@@ -1,9 +1,10 @@
 from .pdf import render_label_batch_pdf
 from .tsc import render_label_batch_tsc
+from .catalog_pdf import render_catalog_pdf, generate_catalog
 
 __all__ = [
     'render_label_batch_pdf',
     'render_label_batch_tsc',
+    'render_catalog_pdf',
+    'generate_catalog',
 ]
-
-
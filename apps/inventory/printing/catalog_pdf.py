@@ -1,18 +1,54 @@
+import hashlib
+import logging
+import math
 import os
+import tempfile
+import threading
+from io import BytesIO
+from decimal import Decimal
 from typing import Tuple, List
 from reportlab.lib.pagesizes import A4, A5, A6
 from reportlab.lib.units import mm
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.graphics.barcode import code128, code39, ean13, ean8, upca
+from reportlab.graphics.barcode import code128, code39, createBarcodeDrawing
+from reportlab.pdfgen import canvas
 from reportlab.graphics.shapes import Drawing
 from reportlab.graphics import renderPDF
 from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
 from apps.inventory.catalog_models import CatalogGeneration, CatalogItem
 from apps.inventory.models import Product
 
+logger = logging.getLogger(__name__)
+
+# Au-delà de ce nombre de produits, la génération est lancée en arrière-plan
+CATALOG_ASYNC_THRESHOLD = getattr(settings, 'CATALOG_ASYNC_THRESHOLD', 200)
+
+# Cache disque des vignettes (toujours local, même si le stockage média est sur S3)
+CATALOG_THUMBNAIL_DIR = getattr(
+    settings, 'CATALOG_THUMBNAIL_DIR', os.path.join(settings.MEDIA_ROOT, 'cache', 'catalog_thumbnails')
+)
+CATALOG_THUMBNAIL_SIZE_PX = 240
+
+# Dossier de stockage des PDF générés (default_storage : local ou S3)
+CATALOG_STORAGE_DIR = 'catalogs'
+
+# Nom des symbologies pour createBarcodeDrawing
+BARCODE_WIDGETS = {
+    'code128': 'Code128',
+    'code39': 'Standard39',
+    'ean13': 'EAN13',
+    'ean8': 'EAN8',
+    'upca': 'UPCA',
+}
+
 
 def mm_to_pt(mm_value):
     """Convertit des millimètres en points"""
@@ -22,21 +58,323 @@ def mm_to_pt(mm_value):
 def get_barcode_drawing(barcode_data: str, barcode_type: str, height_mm: float = 15.0):
     """Génère un code-barre selon le type spécifié"""
     height_pt = mm_to_pt(height_mm)
-    
-    if barcode_type == 'code128':
-        barcode = code128.Code128(barcode_data, barHeight=height_pt)
-    elif barcode_type == 'code39':
-        barcode = code39.Code39(barcode_data, barHeight=height_pt)
-    elif barcode_type == 'ean13':
-        barcode = ean13.Ean13(barcode_data, barHeight=height_pt)
-    elif barcode_type == 'ean8':
-        barcode = ean8.Ean8(barcode_data, barHeight=height_pt)
-    elif barcode_type == 'upca':
-        barcode = upca.Upca(barcode_data, barHeight=height_pt)
-    else:
-        # Fallback vers Code 128
-        barcode = code128.Code128(barcode_data, barHeight=height_pt)
-    
-    drawing = Drawing()
-    drawing.add(barcode)
+    widget_name = BARCODE_WIDGETS.get(barcode_type, 'Code128')
+
+    try:
+        return createBarcodeDrawing(widget_name, value=barcode_data, barHeight=height_pt, humanReadable=True)
+    except Exception:
+        # Fallback vers Code 128 (données incompatibles avec la symbologie, ex: EAN non numérique)
+        return createBarcodeDrawing('Code128', value=barcode_data, barHeight=height_pt, humanReadable=True)
+
+
+def get_barcode_flowable(barcode_data: str, barcode_type: str, height_mm: float, max_width_pt: float):
+    """
+    Code-barre prêt à placer dans une case de catalogue, limité à `max_width_pt`.
+    Code 128 / Code 39 utilisent les flowables natifs (environ 10x plus rapides à
+    dessiner que les widgets graphiques) ; les symbologies EAN/UPC passent par le Drawing.
+    """
+    height_pt = mm_to_pt(height_mm)
+    flowable_class = {'code128': code128.Code128, 'code39': code39.Standard39}.get(barcode_type)
+    if flowable_class:
+        barcode = flowable_class(barcode_data, barHeight=height_pt, humanReadable=True)
+        if barcode.width > max_width_pt:
+            bar_width = barcode.barWidth * max_width_pt / barcode.width
+            barcode = flowable_class(barcode_data, barHeight=height_pt, barWidth=bar_width, humanReadable=True)
+        barcode.hAlign = 'CENTER'
+        return barcode
+
+    drawing = get_barcode_drawing(barcode_data, barcode_type, height_mm)
+    if drawing.width > max_width_pt:
+        # Réduire horizontalement pour tenir dans la case
+        drawing.scale(max_width_pt / drawing.width, 1)
+        drawing.width = max_width_pt
+    drawing.hAlign = 'CENTER'
     return drawing
+
+
+def _get_page_size(template) -> Tuple[float, float]:
+    """Retourne la taille de page en points selon le modèle"""
+    width_mm, height_mm = template.get_dimensions_mm()
+    return mm_to_pt(width_mm), mm_to_pt(height_mm)
+
+
+def _get_grid(template) -> Tuple[int, int]:
+    """Calcule la grille (colonnes, lignes) adaptée au format et au nombre de produits par page"""
+    per_page = max(1, template.products_per_page)
+    width_mm, height_mm = template.get_dimensions_mm()
+    columns = max(1, min(per_page, round(math.sqrt(per_page * width_mm / height_mm))))
+    rows = int(math.ceil(per_page / columns))
+    return columns, rows
+
+
+def _get_primary_ean(product):
+    """EAN du code-barres principal (barcodes préchargés), sinon l'EAN généré"""
+    barcodes = list(product.barcodes.all()) if product.pk else []
+    primary = next((b for b in barcodes if b.is_primary), barcodes[0] if barcodes else None)
+    if primary and primary.ean:
+        return primary.ean
+    return product.generated_ean or ''
+
+
+def _format_price(value, currency: str) -> str:
+    """Formate un prix comme sur les étiquettes : 12 500 FCFA"""
+    if value is None:
+        return ''
+    amount = int(value) if isinstance(value, Decimal) else int(float(value))
+    return f"{amount:,}".replace(",", " ") + f" {currency}"
+
+
+def get_thumbnail_path(product, size_px: int = CATALOG_THUMBNAIL_SIZE_PX):
+    """
+    Retourne le chemin local d'une vignette JPEG du produit, en la générant si besoin.
+    La clé dépend du nom de fichier de l'image : un nouvel upload invalide la vignette.
+    """
+    if not product.image or not product.image.name:
+        return None
+
+    digest = hashlib.md5(f"{product.image.name}:{size_px}".encode()).hexdigest()
+    path = os.path.join(CATALOG_THUMBNAIL_DIR, f"{product.pk}_{digest}.jpg")
+    if os.path.exists(path):
+        return path
+
+    try:
+        from PIL import Image as PILImage
+
+        os.makedirs(CATALOG_THUMBNAIL_DIR, exist_ok=True)
+        with product.image.open('rb') as source:
+            img = PILImage.open(source)
+            img.thumbnail((size_px, size_px))
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            # Écriture atomique pour les générations concurrentes
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            img.save(tmp_path, 'JPEG', quality=80, optimize=True)
+            os.replace(tmp_path, path)
+        return path
+    except Exception as e:
+        logger.warning(f"⚠️ [CATALOG_PDF] Vignette impossible pour le produit {product.pk}: {e}")
+        return None
+
+
+def _build_cell(product, template, styles, cell_width_pt, options):
+    """Construit le contenu d'une case du catalogue (liste de flowables)"""
+    content = []
+    inner_width = cell_width_pt - 6
+
+    if options.get('include_images', template.show_images):
+        thumb = get_thumbnail_path(product)
+        if thumb:
+            size = min(inner_width, mm_to_pt(25))
+            img = Image(thumb, width=size, height=size, kind='proportional')
+            img.hAlign = 'CENTER'
+            content.append(img)
+
+    if template.show_product_names:
+        content.append(Paragraph(str(product.name)[:60], styles['name']))
+
+    barcode_value = _get_primary_ean(product) or product.cug
+    content.append(get_barcode_flowable(barcode_value, template.barcode_type, float(template.barcode_height_mm), inner_width))
+    content.append(Paragraph(f"CUG: {product.cug}", styles['meta']))
+
+    if options.get('include_prices', template.show_prices):
+        content.append(Paragraph(_format_price(product.selling_price, options['currency']), styles['price']))
+
+    if options.get('include_stock'):
+        content.append(Paragraph(f"Stock: {product.quantity}", styles['meta']))
+
+    if options.get('include_descriptions', template.show_descriptions) and product.description:
+        content.append(Paragraph(str(product.description)[:120], styles['meta']))
+
+    return content
+
+
+def _draw_page_decorations(c, template, page_width, page_height, page_number, total_pages):
+    """En-tête, pied de page et numérotation"""
+    c.setFont("Helvetica", 8)
+    if template.header_text:
+        c.drawCentredString(page_width / 2, page_height - mm_to_pt(float(template.margin_top_mm)) / 2, template.header_text)
+    if template.footer_text:
+        c.drawString(mm_to_pt(float(template.margin_left_mm)), mm_to_pt(float(template.margin_bottom_mm)) / 2, template.footer_text)
+    if template.show_page_numbers:
+        c.drawRightString(
+            page_width - mm_to_pt(float(template.margin_right_mm)),
+            mm_to_pt(float(template.margin_bottom_mm)) / 2,
+            f"Page {page_number}/{total_pages}",
+        )
+
+
+def render_catalog_pdf(template, products, output, total_products=None, options=None) -> int:
+    """
+    Rend le catalogue page par page dans `output` (fichier ou buffer binaire).
+
+    `products` peut être un itérateur : seules les cases de la page courante sont
+    gardées en mémoire, ce qui permet de rendre des catalogues de plusieurs milliers
+    de produits sans charger toutes les images.
+
+    Returns:
+        int: Nombre de pages générées
+    """
+    options = dict(options or {})
+    options.setdefault('currency', 'FCFA')
+
+    page_width, page_height = _get_page_size(template)
+    margin_left = mm_to_pt(float(template.margin_left_mm))
+    margin_right = mm_to_pt(float(template.margin_right_mm))
+    margin_top = mm_to_pt(float(template.margin_top_mm))
+    margin_bottom = mm_to_pt(float(template.margin_bottom_mm))
+    usable_width = page_width - margin_left - margin_right
+    usable_height = page_height - margin_top - margin_bottom
+
+    columns, rows = _get_grid(template)
+    per_page = columns * rows
+    cell_width = usable_width / columns
+    cell_height = usable_height / rows
+
+    base_styles = getSampleStyleSheet()
+    styles = {
+        'name': ParagraphStyle('CatalogName', parent=base_styles['Normal'], fontName='Helvetica-Bold',
+                               fontSize=8, leading=9, alignment=TA_CENTER),
+        'meta': ParagraphStyle('CatalogMeta', parent=base_styles['Normal'], fontSize=7, leading=8, alignment=TA_CENTER),
+        'price': ParagraphStyle('CatalogPrice', parent=base_styles['Normal'], fontName='Helvetica-Bold',
+                                fontSize=9, leading=10, alignment=TA_CENTER),
+    }
+    table_style = TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.lightgrey),
+        ('LEFTPADDING', (0, 0), (-1, -1), 3),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ])
+
+    total_pages = max(1, int(math.ceil(total_products / per_page))) if total_products else None
+    c = canvas.Canvas(output, pagesize=(page_width, page_height), pageCompression=1)
+    c.setTitle(options.get('title', 'Catalogue'))
+
+    def flush_page(page_cells, page_number):
+        # Compléter la grille pour garder des cases de taille fixe
+        page_cells = page_cells + [''] * (per_page - len(page_cells))
+        data = [page_cells[i:i + columns] for i in range(0, per_page, columns)]
+        table = Table(data, colWidths=[cell_width] * columns, rowHeights=[cell_height] * rows)
+        table.setStyle(table_style)
+        table.wrapOn(c, usable_width, usable_height)
+        table.drawOn(c, margin_left, margin_bottom)
+        _draw_page_decorations(c, template, page_width, page_height, page_number, total_pages or '?')
+        c.showPage()
+
+    page_number = 0
+    page_cells = []
+    for product in products:
+        page_cells.append(_build_cell(product, template, styles, cell_width, options))
+        if len(page_cells) == per_page:
+            page_number += 1
+            flush_page(page_cells, page_number)
+            page_cells = []
+
+    if page_cells or page_number == 0:
+        page_number += 1
+        flush_page(page_cells, page_number)
+
+    c.save()
+    return page_number
+
+
+def get_catalog_cache_key(template, products_qs, options=None) -> str:
+    """
+    Clé de cache du catalogue : (modèle, hash de l'ensemble des produits, max(updated_at)).
+    Toute modification d'un produit, du modèle ou des options produit une nouvelle clé.
+    """
+    product_ids = list(products_qs.values_list('id', flat=True))
+    max_updated_at = products_qs.aggregate(max_updated=Max('updated_at'))['max_updated']
+
+    digest = hashlib.sha1()
+    digest.update(','.join(str(pk) for pk in product_ids).encode())
+    digest.update(repr(sorted((options or {}).items())).encode())
+    products_hash = digest.hexdigest()[:16]
+
+    template_version = int(template.updated_at.timestamp()) if template.updated_at else 0
+    updated_version = int(max_updated_at.timestamp()) if max_updated_at else 0
+    return f"{template.pk}-{template_version}_{products_hash}_{updated_version}"
+
+
+def get_generation_products(generation):
+    """Produits d'une génération : éléments explicites (CatalogItem) sinon filtres du modèle"""
+    if generation.items.exists():
+        products = Product.objects.filter(catalogitem__batch=generation).order_by('catalogitem__position')
+    else:
+        products = generation.get_products_queryset()
+    return products.select_related('category', 'brand').prefetch_related('barcodes')
+
+
+def generate_catalog(generation, options=None):
+    """
+    Génère le PDF d'une CatalogGeneration et l'écrit dans le stockage.
+    Si un PDF identique existe déjà (même clé de cache), il est réutilisé.
+    """
+    options = dict(options or {})
+    site = generation.site_configuration
+    options.setdefault('currency', site.devise if site and site.devise else 'FCFA')
+
+    generation.status = 'processing'
+    generation.error_message = ''
+    generation.save(update_fields=['status', 'error_message', 'updated_at'])
+
+    try:
+        template = generation.template
+        products = get_generation_products(generation)
+        total_products = products.count()
+        cache_key = get_catalog_cache_key(template, products, options)
+        file_path = f"{CATALOG_STORAGE_DIR}/{site.pk if site else 'global'}/catalog_{cache_key}.pdf"
+        columns, rows = _get_grid(template)
+        total_pages = max(1, int(math.ceil(total_products / (columns * rows))))
+
+        if default_storage.exists(file_path):
+            logger.info(f"✅ [CATALOG_PDF] Catalogue {generation.pk} servi depuis le cache: {file_path}")
+        else:
+            options.setdefault('title', generation.name)
+            # Fichier temporaire sur disque : le PDF n'est jamais entièrement en mémoire
+            with tempfile.TemporaryFile(suffix='.pdf') as tmp:
+                total_pages = render_catalog_pdf(
+                    template, products.iterator(chunk_size=200), tmp,
+                    total_products=total_products, options=options,
+                )
+                tmp.seek(0)
+                file_path = default_storage.save(file_path, File(tmp))
+            logger.info(f"✅ [CATALOG_PDF] Catalogue {generation.pk} généré: {total_products} produits, {total_pages} pages")
+
+        generation.file_path = file_path
+        generation.file_size_bytes = default_storage.size(file_path)
+        generation.total_products = total_products
+        generation.total_pages = total_pages
+        generation.status = 'success'
+        generation.completed_at = timezone.now()
+        generation.save(update_fields=[
+            'file_path', 'file_size_bytes', 'total_products', 'total_pages',
+            'status', 'completed_at', 'updated_at',
+        ])
+    except Exception as e:
+        logger.error(f"❌ [CATALOG_PDF] Échec de la génération {generation.pk}: {e}", exc_info=True)
+        generation.status = 'failed'
+        generation.error_message = str(e)
+        generation.completed_at = timezone.now()
+        generation.save(update_fields=['status', 'error_message', 'completed_at', 'updated_at'])
+
+    return generation
+
+
+def start_catalog_generation_async(generation, options=None):
+    """Lance la génération dans un thread d'arrière-plan (le client interroge ensuite le statut)"""
+    generation_id = generation.pk
+
+    def run():
+        try:
+            job = CatalogGeneration.objects.select_related('template', 'site_configuration').get(pk=generation_id)
+            generate_catalog(job, options)
+        finally:
+            # Le thread ouvre sa propre connexion : la fermer explicitement
+            connection.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -5,6 +5,7 @@ from reportlab.lib.units import mm
 from reportlab.pdfgen import canvas
 from reportlab.graphics.barcode import code128, eanbc
 
+from apps.core.site_context import label_settings
 from apps.inventory.models import LabelBatch, LabelItem, LabelSetting
 
 
@@ -245,7 +246,7 @@ def render_label_batch_pdf(batch: LabelBatch, include_price_override: bool = Non
         if not batch.template:
             raise ValueError(f"Le lot {batch.id} n'a pas de template")
         
-        settings = LabelSetting.objects.filter(site_configuration=batch.site_configuration).first() if batch.site_configuration else None
+        settings = label_settings(batch.site_configuration) if batch.site_configuration else None
         
         # Récupérer include_price depuis data_snapshot du premier item si disponible (identique à TSC)
         if include_price_override is None:
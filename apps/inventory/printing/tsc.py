@@ -2,6 +2,7 @@ from typing import Tuple
 import unicodedata
 import re
 
+from apps.core.site_context import label_settings
 from apps.inventory.models import LabelBatch, LabelItem, LabelSetting
 
 
@@ -93,7 +94,7 @@ def render_label_batch_tsc(batch: LabelBatch, include_price_override: bool = Non
     
     from apps.inventory.models import LabelTemplate
     
-    settings = LabelSetting.objects.filter(site_configuration=batch.site_configuration).first()
+    settings = label_settings(batch.site_configuration) if batch.site_configuration else None
     template = batch.template
     
     # Récupérer include_price depuis data_snapshot du premier item si disponible
@@ -0,0 +1,370 @@
+"""
+Banc d'essai de l'API rejouant le trafic des caisses mobiles.
+
+Chaque caisse simulée (utilisateur d'un site, jeton JWT, échantillon de produits du
+site) rejoue les parcours de l'application : scan puis encaissement, défilement de la
+liste des produits, rafraîchissement du tableau de bord, impression d'un lot
+d'étiquettes, génération d'un catalogue. Les caisses tournent en parallèle (un thread
+chacune), scénario après scénario, soit via le client de test Django (en processus),
+soit via un serveur WSGI local lancé sur 127.0.0.1 (pile HTTP complète, sans réseau).
+
+Le rapport donne par scénario les latences p50/p95/p99, le débit et le nombre de
+requêtes SQL (compteurs de RequestMetricsMiddleware), et se compare à une référence
+enregistrée par moteur de base de données et transport.
+"""
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.test import Client
+from django.utils import timezone
+
+from apps.core.metrics import registry
+from apps.inventory.models import Barcode, Customer, LabelTemplate, Product
+
+logger = logging.getLogger(__name__)
+
+API = '/api/v1'
+SCENARIOS = ('scan_checkout', 'product_scroll', 'dashboard', 'label_batch', 'catalog')
+PRODUCT_SAMPLE = 200  # Produits connus de chaque caisse (codes scannés, paniers)
+
+
+def _json_number(value):
+    return int(value) if value == int(value) else float(value)
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)), 2) if values else None
+
+
+class ClientTransport:
+    """Requêtes via le client de test Django (middlewares et vues exécutés en processus)"""
+
+    def __init__(self, token):
+        self.client = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {token}',
+                             raise_request_exception=False)
+
+    def request(self, method, path, payload=None):
+        if method == 'GET':
+            response = self.client.get(path)
+        else:
+            response = self.client.generic(method, path, json.dumps(payload or {}), content_type='application/json')
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, body
+
+
+class LiveTransport:
+    """Requêtes HTTP vers le serveur local"""
+
+    def __init__(self, base_url, token):
+        self.base_url = base_url
+        self.headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, headers=self.headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read()
+
+
+@contextmanager
+def live_server():
+    """Serveur WSGI multi-thread de Django sur un port libre de 127.0.0.1"""
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+    server.set_app(get_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def _sql_totals():
+    """Requêtes HTTP et SQL cumulées par le registre de métriques du processus"""
+    with registry.lock:
+        routes = list(registry.routes.values())
+    return sum(route['count'] for route in routes), sum(route['queries_sum'] for route in routes)
+
+
+class Register:
+    """Caisse simulée : transport authentifié, produits et clients du site, mesures"""
+
+    def __init__(self, number, products, customers, label_template, transport, seed):
+        self.number = number
+        self.products = products
+        self.customers = customers
+        self.label_template = label_template
+        self.transport = transport
+        self.rng = np.random.default_rng(seed + number)
+        self.latencies = []
+        self.errors = {}
+
+    def call(self, method, path, payload=None):
+        start = time.perf_counter()
+        try:
+            status, body = self.transport.request(method, API + path, payload)
+        except Exception as exc:
+            status, body = type(exc).__name__, b''
+        self.latencies.append((time.perf_counter() - start) * 1000)
+        if not isinstance(status, int) or status >= 400:
+            key = f"{method} {path.split('?')[0]} -> {status}"
+            self.errors[key] = self.errors.get(key, 0) + 1
+            return None
+        try:
+            return json.loads(body) if body[:1] in (b'{', b'[') else {}
+        except ValueError:
+            return {}
+
+    def _pick(self, count):
+        picked = self.rng.choice(len(self.products), size=min(count, len(self.products)), replace=False)
+        return [self.products[index] for index in picked.tolist()]
+
+    # Scénarios : une itération = un parcours de l'application
+
+    def scan_checkout(self):
+        """Scan de 3 articles, vente au comptant (client fidélité 1 fois sur 3), sorties de stock"""
+        basket = self._pick(3)
+        for product in basket:
+            self.call('POST', '/products/scan/', {'code': product['ean'] or product['cug']})
+        total = sum(product['price'] for product in basket)
+        payload = {
+            'payment_method': 'cash', 'amount_given': total,
+            'items': [{'product_id': product['id'], 'quantity': 1, 'unit_price': product['price']} for product in basket],
+        }
+        if self.customers and self.rng.random() < 1 / 3:
+            payload['customer'] = int(self.rng.choice(self.customers))
+        sale = self.call('POST', '/sales/', payload)
+        if sale and sale.get('id'):
+            for product in basket:
+                self.call('POST', f"/products/{product['id']}/remove_stock/",
+                          {'quantity': 1, 'context': 'sale', 'context_id': sale['id']})
+
+    def product_scroll(self):
+        """Trois pages de la liste des produits"""
+        pages = max(1, min(3, len(self.products) // 20))
+        for page in range(1, pages + 1):
+            self.call('GET', f'/products/?page={page}')
+
+    def dashboard(self):
+        self.call('GET', '/dashboard/')
+
+    def label_batch(self):
+        """Lot de 10 étiquettes (2 exemplaires) puis rendu PDF"""
+        items = [{'product_id': product['id'], 'copies': 2} for product in self._pick(10)]
+        batch = self.call('POST', '/labels/batches/create_batch/', {
+            'template': self.label_template, 'channel': 'pdf', 'items': items,
+        })
+        if batch and batch.get('id'):
+            self.call('GET', f"/labels/batches/{batch['id']}/pdf/")
+
+    def catalog(self):
+        """Catalogue de 24 produits (rendu synchrone) puis téléchargement"""
+        ids = [product['id'] for product in self._pick(24)]
+        generation = self.call('POST', '/catalog/pdf/', {'product_ids': ids})
+        if generation and generation.get('status') == 'success':
+            self.call('GET', f"/catalog/generations/{generation['generation_id']}/download/")
+
+
+class ApiBenchmark:
+    """
+    Rejoue les scénarios depuis `registers` caisses réparties sur les sites donnés
+    (utilisateurs rattachés au site, administrateurs d'abord)
+    """
+
+    def __init__(self, sites, registers=4, iterations=20, scenarios=SCENARIOS, live=False, seed=42, log=None):
+        if not sites:
+            raise ValueError("Aucun site à mesurer")
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise ValueError(f"Scénario(s) inconnu(s) : {', '.join(sorted(unknown))}")
+        self.sites = list(sites)
+        self.registers = max(1, registers)
+        self.iterations = max(1, iterations)
+        self.scenarios = list(scenarios)
+        self.live = live
+        self.seed = seed
+        self.log = log or (lambda message: logger.info(f"⏱️ [API_BENCHMARK] {message}"))
+
+    def _site_fixtures(self, site):
+        """Jeton du caissier, échantillon de produits (EAN principal, prix), clients et modèle d'étiquette"""
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        user = get_user_model().objects.filter(
+            site_configuration=site, is_active=True
+        ).order_by('-is_site_admin', 'id').first()
+        if user is None:
+            raise ValueError(f"Aucun utilisateur rattaché au site {site.site_name}")
+        primary_ean = Barcode.objects.filter(product=OuterRef('pk'), is_primary=True).values('ean')[:1]
+        products = [
+            # Prix sérialisés comme par l'application (nombre JavaScript : 750 et non 750.0)
+            {'id': row['id'], 'cug': row['cug'], 'ean': row['ean'], 'price': _json_number(row['selling_price'])}
+            for row in Product.objects.filter(site_configuration=site, is_active=True).annotate(
+                ean=Subquery(primary_ean)
+            ).order_by('id').values('id', 'cug', 'ean', 'selling_price')[:PRODUCT_SAMPLE]
+        ]
+        if not products:
+            raise ValueError(f"Aucun produit sur le site {site.site_name}")
+        customers = list(Customer.objects.filter(site_configuration=site, is_active=True).order_by('id')
+                         .values_list('id', flat=True)[:50])
+        template = LabelTemplate.get_default_for_site(site)
+        if template is None and 'label_batch' in self.scenarios:
+            template = LabelTemplate.objects.create(site_configuration=site, name='Étiquette 40x30', is_default=True)
+        return str(AccessToken.for_user(user)), products, customers, template.id if template else None
+
+    def _run_phase(self, registers, scenario):
+        def work(register):
+            try:
+                step = getattr(register, scenario)
+                for _ in range(self.iterations):
+                    step()
+            finally:
+                if self.registers > 1:
+                    connection.close()  # Connexion propre au thread
+
+        for register in registers:
+            register.latencies, register.errors = [], {}
+        requests_before, queries_before = _sql_totals()
+        start = time.perf_counter()
+        if len(registers) == 1:
+            work(registers[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(registers)) as pool:
+                list(pool.map(work, registers))
+        wall = time.perf_counter() - start
+        requests_after, queries_after = _sql_totals()
+
+        latencies = [value for register in registers for value in register.latencies]
+        errors = {}
+        for register in registers:
+            for key, count in register.errors.items():
+                errors[key] = errors.get(key, 0) + count
+        served = requests_after - requests_before
+        queries = queries_after - queries_before
+        return {
+            'iterations': self.iterations * len(registers),
+            'requests': len(latencies),
+            'errors': sum(errors.values()),
+            'error_samples': dict(sorted(errors.items(), key=lambda item: -item[1])[:5]),
+            'wall_seconds': round(wall, 3),
+            'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+            'latency_ms': {
+                'p50': percentile(latencies, 50), 'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99), 'max': round(max(latencies), 2) if latencies else None,
+            },
+            # Compteurs du middleware de métriques (None s'il n'est pas installé)
+            'queries_per_request': round(queries / served, 2) if served else None,
+            'queries_per_iteration': round(queries / (self.iterations * len(registers)), 2) if served else None,
+        }
+
+    def _run(self, transport_factory):
+        fixtures = {site.id: self._site_fixtures(site) for site in self.sites}
+        registers = []
+        for number in range(self.registers):
+            token, products, customers, template = fixtures[self.sites[number % len(self.sites)].id]
+            registers.append(Register(number, products, customers, template, transport_factory(token), self.seed))
+        results = {}
+        for scenario in self.scenarios:
+            results[scenario] = self._run_phase(registers, scenario)
+            summary = results[scenario]
+            self.log(
+                f"{scenario}: p95 {summary['latency_ms']['p95']} ms, {summary['throughput_rps']} req/s, "
+                f"{summary['queries_per_request']} requête(s) SQL / requête, {summary['errors']} erreur(s)"
+            )
+        return results
+
+    def client_transport(self, token):
+        """Transport en processus d'une caisse (point d'extension des autres bancs d'essai)"""
+        return ClientTransport(token)
+
+    def run(self):
+        """Rejoue les scénarios et retourne le rapport (dictionnaire sérialisable en JSON)"""
+        started = timezone.now()
+        if self.live:
+            with live_server() as base_url:
+                results = self._run(lambda token: LiveTransport(base_url, token))
+        else:
+            results = self._run(self.client_transport)
+        return {
+            'database': connection.vendor,
+            'transport': 'live' if self.live else 'client',
+            'registers': self.registers,
+            'iterations': self.iterations,
+            'seed': self.seed,
+            'sites': [site.id for site in self.sites],
+            'started_at': started.isoformat(),
+            'scenarios': results,
+        }
+
+
+def compare(report, baseline, tolerance=0.2):
+    """
+    Régressions par rapport à une référence : p95 ou erreurs en hausse, débit en baisse
+    au-delà de `tolerance`, ou davantage de requêtes SQL par itération
+    """
+    regressions = []
+    for scenario, current in report['scenarios'].items():
+        reference = baseline.get('scenarios', {}).get(scenario)
+        if not reference:
+            continue
+        checks = [
+            ('latency_ms.p95', current['latency_ms']['p95'], reference['latency_ms']['p95'],
+             lambda now, ref: now > ref * (1 + tolerance)),
+            ('throughput_rps', current['throughput_rps'], reference['throughput_rps'],
+             lambda now, ref: now < ref * (1 - tolerance)),
+            ('queries_per_iteration', current['queries_per_iteration'], reference['queries_per_iteration'],
+             lambda now, ref: now > ref + 0.5),
+            ('errors', current['errors'], reference['errors'], lambda now, ref: now > ref),
+        ]
+        for metric, now, ref, worse in checks:
+            if now is not None and ref is not None and worse(now, ref):
+                regressions.append({'scenario': scenario, 'metric': metric, 'baseline': ref, 'current': now})
+    return regressions
+
+
+def baseline_key(report):
+    """Entrée de référence d'un rapport : moteur de base et transport ('sqlite-client', 'postgresql-live')"""
+    return f"{report['database']}-{report['transport']}"
+
+
+def load_baseline(path, key):
+    """Référence `key` du fichier (voir baseline_key), ou None"""
+    try:
+        with open(path) as handle:
+            return json.load(handle).get(key)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, report):
+    """Enregistre le rapport comme référence de son moteur et transport (les autres entrées sont conservées)"""
+    try:
+        with open(path) as handle:
+            baselines = json.load(handle)
+    except FileNotFoundError:
+        baselines = {}
+    baselines[baseline_key(report)] = report
+    with open(path, 'w') as handle:
+        json.dump(baselines, handle, indent=2, sort_keys=True)
+        handle.write('\n')
@@ -0,0 +1,149 @@
+"""
+Calcul du cadencier (entrées / sorties par produit et par semaine).
+
+Une seule requête groupée sur les transactions de la page de produits affichée
+(values('product', 'week').annotate(Sum(filter=...))), jointe en mémoire à la
+requête des produits ; le résultat est mis en cache par site, période et page
+(espace de noms 'cadencier' du site, apps.core.cache : un seul recalcul à la fois).
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.paginator import Paginator
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from apps.core.cache import Namespace
+from apps.inventory.models import Transaction
+from apps.inventory.services.stock_report import StockReportService
+
+ZERO = Decimal('0')
+
+
+class CadencierService:
+    """
+    Entrées, sorties, consommation moyenne et quantité à commander par produit
+    """
+    PAGE_SIZE = 50
+    CACHE_TIMEOUT = 300  # 5 minutes
+    DEFAULT_DAYS = 30
+    COVERAGE_DAYS = 7  # Stock minimum = consommation moyenne sur 7 jours
+
+    @staticmethod
+    def get_period(start_date=None, end_date=None):
+        """
+        Période analysée à partir des paramètres 'AAAA-MM-JJ' (fin de journée incluse).
+        Par défaut : les 30 derniers jours. ValueError si une date est invalide.
+        """
+        now = timezone.now()
+        if start_date:
+            start = timezone.make_aware(datetime.strptime(start_date, '%Y-%m-%d'))
+        else:
+            start = now - timedelta(days=CadencierService.DEFAULT_DAYS)
+        if end_date:
+            end = timezone.make_aware(datetime.combine(datetime.strptime(end_date, '%Y-%m-%d').date(), time.max))
+        else:
+            end = now
+        return start, end
+
+    @staticmethod
+    def cache_namespace(user):
+        """Espace de noms du site de l'utilisateur (tous les sites pour un superuser)"""
+        site_key = 'all' if user.is_superuser else (getattr(user, 'site_configuration_id', None) or 'none')
+        return Namespace('cadencier', site_key, timeout=CadencierService.CACHE_TIMEOUT)
+
+    @staticmethod
+    def get_weekly_movements(product_ids, start, end):
+        """
+        Entrées et sorties par produit et par semaine : une requête groupée.
+        Retourne {product_id: {semaine: {'incoming', 'outgoing'}}}
+        """
+        rows = (
+            Transaction.objects
+            .filter(product_id__in=product_ids, transaction_date__range=(start, end), type__in=['in', 'out'])
+            .annotate(week=TruncWeek('transaction_date'))
+            .order_by()
+            .values('product_id', 'week')
+            .annotate(
+                incoming=Sum('quantity', filter=Q(type='in')),
+                outgoing=Sum('quantity', filter=Q(type='out')),
+            )
+        )
+        movements = {}
+        for row in rows:
+            week = row['week'].date() if isinstance(row['week'], datetime) else row['week']
+            movements.setdefault(row['product_id'], {})[week] = {
+                'incoming': row['incoming'] or ZERO,
+                'outgoing': row['outgoing'] or ZERO,
+            }
+        return movements
+
+    @staticmethod
+    def get_weeks(start, end):
+        """Débuts de semaine (lundi) couverts par la période"""
+        current = timezone.localtime(start).date() if timezone.is_aware(start) else start.date()
+        last = timezone.localtime(end).date() if timezone.is_aware(end) else end.date()
+        current -= timedelta(days=current.weekday())
+        weeks = []
+        while current <= last:
+            weeks.append(current)
+            current += timedelta(weeks=1)
+        return weeks
+
+    @staticmethod
+    def compute(products, start, end, page=1):
+        """
+        Lignes du cadencier pour une page de produits (comptage, page de produits,
+        mouvements groupés : trois requêtes quel que soit le nombre de produits)
+        """
+        paginator = Paginator(products.order_by('name', 'id'), CadencierService.PAGE_SIZE)
+        page_obj = paginator.get_page(page)
+        page_products = list(page_obj.object_list)
+        movements = CadencierService.get_weekly_movements([p.id for p in page_products], start, end)
+        weeks = CadencierService.get_weeks(start, end)
+        days = Decimal((end - start).days + 1)
+
+        product_data = []
+        for product in page_products:
+            by_week = movements.get(product.id, {})
+            weekly = [
+                {'week': week, **by_week.get(week, {'incoming': ZERO, 'outgoing': ZERO})}
+                for week in weeks
+            ]
+            incoming = sum((week['incoming'] for week in by_week.values()), ZERO)
+            outgoing = sum((week['outgoing'] for week in by_week.values()), ZERO)
+            current_stock = Decimal(str(product.quantity))
+            daily_consumption = outgoing / days if days > 0 else ZERO
+            minimum_stock = daily_consumption * CadencierService.COVERAGE_DAYS
+            product_data.append({
+                'product': product,
+                'current_stock': current_stock,
+                'incoming': incoming,
+                'outgoing': outgoing,
+                'weekly': weekly,
+                'daily_consumption': daily_consumption,
+                'minimum_stock': minimum_stock,
+                'quantity_to_order': max(ZERO, minimum_stock - current_stock),
+            })
+
+        return {
+            'product_data': product_data,
+            'weeks': weeks,
+            'page_number': page_obj.number,
+            'num_pages': paginator.num_pages,
+            'total_products': paginator.count,
+        }
+
+    @staticmethod
+    def get_cadencier(user, start, end, product_id=None, page=1):
+        """Cadencier de l'utilisateur (produits de son site), mis en cache par site et période"""
+        def compute():
+            products = StockReportService.get_scope(user)[0]
+            if product_id:
+                products = products.filter(id=product_id)
+            return CadencierService.compute(products, start, end, page)
+
+        return CadencierService.cache_namespace(user).get_or_compute(
+            f"{start:%Y%m%d}", f"{end:%Y%m%d}", product_id or '', page, compute=compute,
+        )
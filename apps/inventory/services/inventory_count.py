@@ -0,0 +1,386 @@
+"""
+Sessions d'inventaire : comptages incrémentaux (plusieurs appareils), gel avec
+photographie du stock théorique, revue des écarts puis application en masse.
+
+L'application calcule tous les écarts en une requête, crée les transactions
+d'ajustement par bulk_create et met à jour les quantités par bulk_update, le tout
+dans une seule transaction (au lieu d'un get/create/save par produit compté).
+"""
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.inventory.models import Barcode, InventoryCountLine, InventoryCountSession, Product, Transaction
+from apps.inventory.services.product_copy import ProductCopySyncService
+from apps.inventory.services.rollups import RollupService
+from apps.inventory.services.stock_alerts import StockAlertService
+
+logger = logging.getLogger(__name__)
+
+
+def parse_quantity(value):
+    """Convertit une quantité saisie ('12', '1,5', 3) en Decimal ; None si invalide"""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        quantity = Decimal(str(value).strip().replace(',', '.'))
+    except InvalidOperation:
+        return None
+    return quantity if quantity.is_finite() else None
+
+
+class InventoryCountService:
+    """
+    Service des sessions d'inventaire
+    """
+
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def start_session(site_configuration, user=None, name=None, zero_uncounted=False, notes=''):
+        """Ouvre une nouvelle session de comptage pour un site"""
+        session = InventoryCountSession.objects.create(
+            site_configuration=site_configuration,
+            name=name or f"Inventaire du {timezone.localtime():%d/%m/%Y %H:%M}",
+            zero_uncounted=zero_uncounted,
+            notes=notes or '',
+            created_by=user,
+        )
+        logger.info(f"📋 [INVENTORY_COUNT] Session {session.id} ouverte pour le site {site_configuration.id}")
+        return session
+
+    @staticmethod
+    def _check_status(session, *allowed):
+        if session.status not in allowed:
+            raise ValidationError(
+                f"Opération impossible : la session est « {session.get_status_display()} »"
+            )
+
+    @staticmethod
+    def _lock(session):
+        """Verrouille la session (à appeler dans une transaction) et relit son statut"""
+        session.status = InventoryCountSession.objects.select_for_update().filter(
+            pk=session.pk
+        ).values_list('status', flat=True).get()
+
+    @staticmethod
+    def resolve_items(site_configuration, items):
+        """
+        Associe chaque ligne reçue à un produit du site (par ID, CUG ou code-barres).
+
+        Args:
+            items: [{'product_id' | 'code', 'quantity'}]
+
+        Returns:
+            tuple: ([(product_id, quantité)], erreurs)
+        """
+        errors = []
+        parsed = []
+        ids, codes = set(), set()
+        for index, item in enumerate(items):
+            quantity = parse_quantity(item.get('quantity'))
+            if quantity is None:
+                errors.append({'index': index, 'error': f"Quantité invalide : {item.get('quantity')!r}"})
+                continue
+            if quantity < 0:
+                errors.append({'index': index, 'error': 'La quantité comptée ne peut pas être négative'})
+                continue
+            product_id, code = item.get('product_id'), str(item.get('code') or '').strip()
+            if product_id not in (None, ''):
+                try:
+                    product_id = int(product_id)
+                except (TypeError, ValueError):
+                    errors.append({'index': index, 'error': f'Produit ID {product_id} non trouvé'})
+                    continue
+                ids.add(product_id)
+                parsed.append((index, ('id', product_id), quantity))
+            elif code:
+                codes.add(code)
+                parsed.append((index, ('code', code), quantity))
+            else:
+                errors.append({'index': index, 'error': 'product_id ou code requis'})
+
+        products = Product.objects.filter(site_configuration=site_configuration)
+        known = {('id', pk): pk for pk in products.filter(id__in=ids).values_list('id', flat=True)} if ids else {}
+        if codes:
+            for pk, cug, generated_ean in products.filter(
+                Q(cug__in=codes) | Q(generated_ean__in=codes)
+            ).values_list('id', 'cug', 'generated_ean'):
+                known.setdefault(('code', cug), pk)
+                known.setdefault(('code', generated_ean), pk)
+            for ean, pk in Barcode.objects.filter(
+                product__site_configuration=site_configuration, ean__in=codes
+            ).values_list('ean', 'product_id'):
+                known.setdefault(('code', ean), pk)
+
+        resolved = []
+        for index, key, quantity in parsed:
+            if key in known:
+                resolved.append((known[key], quantity))
+            else:
+                label = f'Produit ID {key[1]}' if key[0] == 'id' else f'Code {key[1]}'
+                errors.append({'index': index, 'error': f'{label} non trouvé sur ce site'})
+        errors.sort(key=lambda error: error['index'])
+        return resolved, errors
+
+    @classmethod
+    def record_counts(cls, session, items, user=None, device_id='', mode='add'):
+        """
+        Enregistre un envoi de comptages (scan incrémental d'un appareil).
+
+        Args:
+            mode: 'add' ajoute les quantités aux comptages existants (plusieurs zones,
+                  plusieurs appareils) ; 'set' remplace la quantité comptée
+
+        Returns:
+            dict: {'recorded', 'errors'}
+        """
+        cls._check_status(session, 'open')
+        if mode not in ('add', 'set'):
+            raise ValidationError("Mode invalide : 'add' ou 'set' attendu")
+
+        resolved, errors = cls.resolve_items(session.site_configuration, items)
+        counts = {}
+        for product_id, quantity in resolved:
+            counts[product_id] = counts.get(product_id, 0) + quantity if mode == 'add' else quantity
+
+        now = timezone.now()
+        product_ids = list(counts)
+        with transaction.atomic():
+            # Un gel concurrent attend la fin de cet envoi (et inversement)
+            cls._lock(session)
+            cls._check_status(session, 'open')
+            for start in range(0, len(product_ids), cls.BATCH_SIZE):
+                batch_ids = product_ids[start:start + cls.BATCH_SIZE]
+                # Créer les lignes manquantes, puis verrouiller toutes les lignes du lot :
+                # deux appareils qui envoient le même produit s'additionnent sans se perdre
+                InventoryCountLine.objects.bulk_create(
+                    [InventoryCountLine(session=session, product_id=pk) for pk in batch_ids],
+                    ignore_conflicts=True,
+                )
+                lines = list(InventoryCountLine.objects.select_for_update().filter(
+                    session=session, product_id__in=batch_ids
+                ))
+                for line in lines:
+                    quantity = counts[line.product_id]
+                    line.counted_quantity = line.counted_quantity + quantity if mode == 'add' else quantity
+                # Seule la quantité varie d'une ligne à l'autre : un seul champ en CASE WHEN
+                InventoryCountLine.objects.bulk_update(lines, ['counted_quantity'])
+                InventoryCountLine.objects.filter(session=session, product_id__in=batch_ids).update(
+                    counted_by=user, device_id=device_id or '', updated_at=now
+                )
+
+        logger.info(
+            f"📥 [INVENTORY_COUNT] Session {session.id}: {len(counts)} produit(s) compté(s)"
+            f"{f' depuis {device_id}' if device_id else ''}, {len(errors)} erreur(s)"
+        )
+        return {'recorded': len(counts), 'errors': errors}
+
+    @classmethod
+    def freeze(cls, session):
+        """
+        Fige la session : plus aucun comptage, et photographie du stock théorique
+        de chaque produit compté (une requête UPDATE ... SELECT)
+        """
+        cls._check_status(session, 'open')
+        with transaction.atomic():
+            cls._lock(session)
+            cls._check_status(session, 'open')
+            if session.zero_uncounted:
+                uncounted = Product.objects.filter(
+                    site_configuration=session.site_configuration, is_active=True
+                ).exclude(quantity=0).exclude(
+                    id__in=InventoryCountLine.objects.filter(session=session).values('product_id')
+                ).values_list('id', flat=True)
+                InventoryCountLine.objects.bulk_create(
+                    [InventoryCountLine(session=session, product_id=pk) for pk in uncounted],
+                    batch_size=cls.BATCH_SIZE,
+                    ignore_conflicts=True,
+                )
+            session.lines.update(expected_quantity=Subquery(
+                Product.objects.filter(pk=OuterRef('product_id')).values('quantity')[:1]
+            ))
+            session.status = 'frozen'
+            session.frozen_at = timezone.now()
+            session.save(update_fields=['status', 'frozen_at'])
+        return session
+
+    @staticmethod
+    def get_diff(session, only_differences=True):
+        """
+        Écarts de la session (comptée - théorique), valorisés au prix d'achat.
+        Avant le gel, le théorique est le stock courant (aperçu).
+
+        Returns:
+            tuple: (queryset des lignes annotées, résumé)
+        """
+        decimal = DecimalField(max_digits=14, decimal_places=3)
+        lines = session.lines.select_related('product').annotate(
+            expected=Coalesce('expected_quantity', 'product__quantity'),
+        ).annotate(
+            delta=ExpressionWrapper(F('counted_quantity') - F('expected'), output_field=decimal),
+        ).annotate(
+            delta_value=ExpressionWrapper(
+                F('delta') * F('product__purchase_price'), output_field=DecimalField(max_digits=16, decimal_places=2)
+            ),
+        ).order_by('product__name')
+
+        summary = lines.aggregate(
+            counted_products=Count('id'),
+            products_with_difference=Count('id', filter=~Q(delta=0)),
+            total_delta_value=Sum('delta_value'),
+        )
+        summary['total_delta_value'] = summary['total_delta_value'] or Decimal('0')
+        if only_differences:
+            lines = lines.exclude(delta=0)
+        return lines, summary
+
+    @staticmethod
+    def _write_adjustments(adjustments, user, signed=True):
+        """
+        Crée les transactions et met à jour les quantités en masse.
+
+        Args:
+            adjustments: [(produit verrouillé, nouvelle quantité, note)]
+            signed: True -> transactions 'adjustment' au delta signé ;
+                    False -> 'loss' / 'in' en valeur absolue (comptage rapide)
+        """
+        now = timezone.now()
+        transactions = []
+        changes = []
+        for product, new_quantity, note in adjustments:
+            delta = new_quantity - product.quantity
+            if signed:
+                tx_type, quantity = 'adjustment', delta
+            else:
+                tx_type, quantity = ('loss' if delta < 0 else 'in'), abs(delta)
+            transactions.append(Transaction(
+                product=product,
+                type=tx_type,
+                reason=Transaction.REASON_INVENTORY,
+                quantity=quantity,
+                unit_price=product.purchase_price,
+                # Même calcul que Transaction.save()
+                total_amount=quantity * product.purchase_price,
+                notes=note,
+                user=user,
+                site_configuration_id=product.site_configuration_id,
+            ))
+            changes.append((product, product.quantity, new_quantity))
+            product.quantity = new_quantity
+
+        batch_size = InventoryCountService.BATCH_SIZE
+        Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+        # Agrégats journaliers (bulk_create ne déclenche pas le signal des transactions)
+        RollupService.record_movements(transactions)
+        products = [product for product, _, _ in adjustments]
+        Product.objects.bulk_update(products, ['quantity'], batch_size=batch_size)
+        # Dates identiques pour tous les produits : UPDATE simple plutôt que CASE WHEN
+        for start in range(0, len(products), batch_size):
+            Product.objects.filter(id__in=[p.id for p in products[start:start + batch_size]]).update(
+                stock_updated_at=now, updated_at=now
+            )
+        new_quantities = {product.id: product.quantity for product, _, _ in adjustments}
+        # Copies synchronisées (le bulk_update ne déclenche pas le signal post_save)
+        transaction.on_commit(lambda: ProductCopySyncService.propagate_values('quantity', new_quantities))
+        # Alertes de stock (seuils franchis par l'inventaire)
+        StockAlertService.check_bulk(changes)
+
+    @classmethod
+    def apply(cls, session, user=None):
+        """
+        Applique les écarts de la session au stock, en une transaction.
+
+        Le delta (comptée - théorique au gel) est ajouté au stock courant : les
+        ventes enregistrées entre le gel et l'application sont conservées.
+
+        Returns:
+            dict: {'adjusted_count', 'total_delta_value'}
+        """
+        cls._check_status(session, 'frozen')
+        with transaction.atomic():
+            cls._lock(session)
+            cls._check_status(session, 'frozen')
+            lines = list(
+                session.lines.exclude(counted_quantity=F('expected_quantity'))
+                .select_related('product')
+                .select_for_update(of=('self', 'product'))
+            )
+            adjustments = []
+            total_value = Decimal('0')
+            for line in lines:
+                expected = line.expected_quantity or Decimal('0')
+                delta = line.counted_quantity - expected
+                product = line.product
+                adjustments.append((
+                    product,
+                    product.quantity + delta,
+                    f'Inventaire « {session.name} » : {expected} -> {line.counted_quantity}',
+                ))
+                total_value += delta * product.purchase_price
+            cls._write_adjustments(adjustments, user)
+
+            session.status = 'applied'
+            session.applied_at = timezone.now()
+            session.applied_by = user
+            session.adjusted_count = len(adjustments)
+            session.save(update_fields=['status', 'applied_at', 'applied_by', 'adjusted_count'])
+
+        logger.info(f"✅ [INVENTORY_COUNT] Session {session.id} appliquée : {len(adjustments)} produit(s) ajusté(s)")
+        return {'adjusted_count': len(adjustments), 'total_delta_value': total_value}
+
+    @classmethod
+    def cancel(cls, session):
+        """Annule une session non appliquée (les comptages sont conservés pour historique)"""
+        cls._check_status(session, 'open', 'frozen')
+        session.status = 'cancelled'
+        session.save(update_fields=['status'])
+        return session
+
+    @classmethod
+    def apply_direct_counts(cls, products, counts, user=None, note_label='Écart inventaire', signed=True):
+        """
+        Applique immédiatement des quantités comptées (formulaires web d'inventaire
+        et de comptage rapide), sans session.
+
+        Args:
+            products: Queryset des produits autorisés
+            counts: {product_id: quantité comptée}
+
+        Returns:
+            int: Nombre de produits ajustés
+        """
+        with transaction.atomic():
+            # Verrou sur une requête simple (sans jointure ni distinct hérités du queryset fourni)
+            locked = Product.objects.filter(
+                pk__in=products.filter(id__in=list(counts)).values('pk')
+            ).select_for_update()
+            adjustments = [
+                (product, counts[product.id], f'{note_label}: {product.quantity} -> {counts[product.id]}')
+                for product in locked
+                if counts[product.id] != product.quantity
+            ]
+            cls._write_adjustments(adjustments, user, signed=signed)
+        return len(adjustments)
+
+    @staticmethod
+    def serialize_session(session):
+        return {
+            'id': session.id,
+            'name': session.name,
+            'status': session.status,
+            'status_display': session.get_status_display(),
+            'zero_uncounted': session.zero_uncounted,
+            'notes': session.notes,
+            'lines_count': getattr(session, 'lines_count', None),
+            'adjusted_count': session.adjusted_count,
+            'created_by': session.created_by.username if session.created_by_id else None,
+            'created_at': session.created_at.isoformat() if session.created_at else None,
+            'frozen_at': session.frozen_at.isoformat() if session.frozen_at else None,
+            'applied_at': session.applied_at.isoformat() if session.applied_at else None,
+        }
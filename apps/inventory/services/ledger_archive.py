@@ -0,0 +1,268 @@
+"""
+Clôture de période du journal des mouvements (Transaction) d'un site.
+
+Les mouvements antérieurs à la date de clôture sont déplacés par lots vers
+TransactionArchive (INSERT ... SELECT puis DELETE, un lot par transaction) et
+remplacés par une ligne de solde d'ouverture (type 'opening') par produit, datée de
+la clôture. Chaque lot replie son solde net dans ces lignes avant de supprimer les
+mouvements : à tout moment, la somme des mouvements d'un produit est inchangée et
+le stock « avant / après » reste juste. L'historique archivé a sa propre lecture
+(history, API transactions-archive).
+
+Sur PostgreSQL, la table d'archive peut être partitionnée par mois
+(commande partition_ledger_archive) ; la clôture crée alors les partitions manquantes.
+"""
+import logging
+from datetime import date, datetime, time
+
+from django.db import connection, transaction
+from django.db.models import Case, F, Max, Sum, When
+from django.utils import timezone
+
+from apps.inventory.models import LedgerClosing, Transaction, TransactionArchive
+from apps.inventory.services.stock_report import QUANTITY
+from apps.inventory.services.stock_valuation import SIGNED_QUANTITY
+
+logger = logging.getLogger(__name__)
+
+OPENING = 'opening'
+
+# Effet sur le stock, solde d'ouverture compris (déjà signé)
+LEDGER_QUANTITY = Case(
+    When(type=OPENING, then=F('quantity')),
+    default=SIGNED_QUANTITY,
+    output_field=QUANTITY,
+)
+
+ARCHIVE_COLUMNS = [
+    'id', 'type', 'reason', 'product_id', 'quantity', 'transaction_date', 'notes', 'sale_id', 'order_id',
+    'unit_price', 'total_amount', 'user_id', 'site_configuration_id',
+]
+
+
+def month_ranges(start, end):
+    """Premiers jours des mois [début, fin[ couvrant start à end inclus"""
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        following = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        yield current, following
+        current = following
+
+
+class LedgerArchiveService:
+    """
+    Clôture de période, lecture de l'historique archivé et partitionnement PostgreSQL
+    """
+    BATCH_SIZE = 5000
+
+    # ------------------------------------------------------------------
+    # Clôture
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def last_cutoff(site):
+        return site.ledger_closings.order_by('-cutoff').values_list('cutoff', flat=True).first()
+
+    @staticmethod
+    def closable(site, cutoff):
+        """Mouvements du site (rattachés par le produit) antérieurs à la clôture"""
+        return Transaction.objects.filter(product__site_configuration=site, transaction_date__lt=cutoff)
+
+    @staticmethod
+    def _execute(sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    @classmethod
+    def _archive_batch(cls, site, cutoff, batch, user=None):
+        """
+        Archive un lot : soldes nets par produit, copie, suppression, repli dans les soldes
+        d'ouverture. Retourne (mouvements archivés, soldes créés).
+        """
+        nets = dict(batch.order_by().values('product_id').annotate(net=Sum(LEDGER_QUANTITY)).values_list(
+            'product_id', 'net'
+        ))
+
+        archive = connection.ops.quote_name(TransactionArchive._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(column) for column in ARCHIVE_COLUMNS)
+        select_sql, select_params = batch.exclude(type=OPENING).order_by().values_list(
+            *ARCHIVE_COLUMNS
+        ).query.sql_with_params()
+        archived = cls._execute(f"INSERT INTO {archive} ({columns}) {select_sql}", select_params)
+
+        # Le lot contient les mouvements et les soldes d'ouverture des clôtures précédentes
+        table = connection.ops.quote_name(Transaction._meta.db_table)
+        id_sql, id_params = batch.order_by().values('id').query.sql_with_params()
+        cls._execute(f"DELETE FROM {table} WHERE id IN ({id_sql})", id_params)
+
+        openings = {
+            opening.product_id: opening
+            for opening in Transaction.objects.filter(type=OPENING, product_id__in=nets, transaction_date=cutoff)
+        }
+        for product_id, opening in openings.items():
+            opening.quantity += nets[product_id]
+        Transaction.objects.bulk_update(openings.values(), ['quantity'])
+
+        created = Transaction.objects.bulk_create([
+            Transaction(
+                type=OPENING, product_id=product_id, quantity=net, site_configuration=site, user=user,
+                notes=f"Solde d'ouverture au {timezone.localtime(cutoff):%d/%m/%Y}",
+            )
+            for product_id, net in nets.items()
+            if product_id not in openings and net
+        ])
+        if created:
+            # transaction_date est en auto_now_add : dater les soldes après insertion
+            Transaction.objects.filter(pk__in=[opening.pk for opening in created]).update(transaction_date=cutoff)
+        return archived, len(created)
+
+    @classmethod
+    def close_period(cls, site, cutoff, user=None, batch_size=None):
+        """
+        Clôture le journal du site à `cutoff` (date : début de journée locale).
+
+        Returns:
+            LedgerClosing: Clôture enregistrée (mouvements archivés, soldes créés)
+
+        Raises:
+            ValueError: Clôture dans le futur ou antérieure à la dernière clôture du site
+        """
+        if isinstance(cutoff, date) and not isinstance(cutoff, datetime):
+            cutoff = timezone.make_aware(datetime.combine(cutoff, time.min))
+        if cutoff > timezone.now():
+            raise ValueError("La date de clôture ne peut pas être dans le futur")
+        last = cls.last_cutoff(site)
+        if last and cutoff <= last:
+            raise ValueError(f"Le journal est déjà clôturé au {timezone.localtime(last):%d/%m/%Y}")
+        batch_size = batch_size or cls.BATCH_SIZE
+        scope = cls.closable(site, cutoff)
+        if cls.is_partitioned():
+            oldest = scope.order_by('transaction_date').values_list('transaction_date', flat=True).first()
+            if oldest:
+                cls.ensure_partitions(oldest.date(), cutoff.date())
+
+        archived = opened = 0
+        last_id = 0
+        while True:
+            # Borne haute du lot : le `batch_size`-ième identifiant suivant, sinon le dernier
+            pending = scope.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)
+            upper = pending[batch_size - 1:batch_size].first() or pending.aggregate(last=Max('id'))['last']
+            if upper is None:
+                break
+            with transaction.atomic():
+                batch_archived, batch_opened = cls._archive_batch(
+                    site, cutoff, scope.filter(id__gt=last_id, id__lte=upper), user
+                )
+            archived += batch_archived
+            opened += batch_opened
+            last_id = upper
+            logger.info(f"🗄️ [LEDGER] Site {site.id}: {archived} mouvement(s) archivé(s)")
+
+        closing = LedgerClosing.objects.create(
+            site_configuration=site, cutoff=cutoff, archived_count=archived, opening_count=opened, closed_by=user,
+        )
+        logger.info(f"✅ [LEDGER] Site {site.id} clôturé au {cutoff:%Y-%m-%d} : {archived} archivé(s), {opened} solde(s)")
+        return closing
+
+    # ------------------------------------------------------------------
+    # Lecture de l'historique archivé
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def history(site=None, product=None, start=None, end=None):
+        """Mouvements archivés (site et / ou produit, période [start, end[), plus récents d'abord"""
+        archived = TransactionArchive.objects.select_related('product')
+        if site is not None:
+            archived = archived.filter(product__site_configuration=site)
+        if product is not None:
+            archived = archived.filter(product=product)
+        if start is not None:
+            archived = archived.filter(transaction_date__gte=start)
+        if end is not None:
+            archived = archived.filter(transaction_date__lt=end)
+        return archived.order_by('-transaction_date', '-id')
+
+    # ------------------------------------------------------------------
+    # Partitionnement mensuel (PostgreSQL)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def is_partitioned():
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+                "WHERE c.relname = %s)",
+                [TransactionArchive._meta.db_table],
+            )
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def partition_name(month):
+        return f"{TransactionArchive._meta.db_table}_{month:%Y%m}"
+
+    @classmethod
+    def partition_sql(cls, start, end):
+        """Instructions de création des partitions mensuelles manquantes de start à end"""
+        parent = connection.ops.quote_name(TransactionArchive._meta.db_table)
+        return [
+            f"CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(cls.partition_name(month))} "
+            f"PARTITION OF {parent} FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+            for month, following in month_ranges(start, end)
+        ]
+
+    @classmethod
+    def ensure_partitions(cls, start, end):
+        """
+        Crée les partitions mensuelles manquantes. Un mois déjà présent dans la partition
+        par défaut y reste (PostgreSQL refuserait la nouvelle partition).
+        """
+        default = connection.ops.quote_name(f"{TransactionArchive._meta.db_table}_default")
+        created = 0
+        with connection.cursor() as cursor:
+            for (month, following), statement in zip(month_ranges(start, end), cls.partition_sql(start, end)):
+                cursor.execute(
+                    f"SELECT EXISTS (SELECT 1 FROM {default} WHERE transaction_date >= %s AND transaction_date < %s)",
+                    [month, following],
+                )
+                if not cursor.fetchone()[0]:
+                    cursor.execute(statement)
+                    created += 1
+        return created
+
+    @classmethod
+    def convert_to_partitioned(cls):
+        """
+        Transforme la table d'archive en table partitionnée par mois (PARTITION BY RANGE) :
+        copie vers les partitions puis suppression de l'ancienne table, dans une transaction.
+        La clé primaire devient (id, transaction_date), exigence du partitionnement.
+        """
+        if connection.vendor != 'postgresql':
+            raise NotImplementedError("Le partitionnement natif nécessite PostgreSQL")
+        if cls.is_partitioned():
+            return False
+        table = TransactionArchive._meta.db_table
+        quote = connection.ops.quote_name
+        parent, legacy = quote(table), quote(f"{table}_legacy")
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {parent} RENAME TO {legacy}")
+            cursor.execute(
+                f"CREATE TABLE {parent} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (transaction_date)"
+            )
+            cursor.execute(f"ALTER TABLE {parent} ADD PRIMARY KEY (id, transaction_date)")
+            cursor.execute(f"CREATE TABLE {quote(f'{table}_default')} PARTITION OF {parent} DEFAULT")
+            cursor.execute(f"SELECT MIN(transaction_date), MAX(transaction_date) FROM {legacy}")
+            oldest, newest = cursor.fetchone()
+            if oldest:
+                for statement in cls.partition_sql(oldest.date(), newest.date()):
+                    cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {parent} SELECT * FROM {legacy}")
+            cursor.execute(f"DROP TABLE {legacy}")
+            # Index déclarés sur le modèle, recréés sur la table partitionnée (propagés aux partitions)
+            with connection.schema_editor(atomic=False) as editor:
+                for index in TransactionArchive._meta.indexes:
+                    editor.add_index(TransactionArchive, index)
+        logger.info(f"✅ [LEDGER] Table {table} partitionnée par mois")
+        return True
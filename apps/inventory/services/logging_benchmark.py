@@ -0,0 +1,172 @@
+"""
+Coût de la journalisation par requête API, configuration par configuration.
+
+Les scénarios de caisse d'ApiBenchmark sont rejoués sous plusieurs configurations
+LOGGING (apps.core.log.logging_config), écrites dans un fichier temporaire comme le
+serait la sortie standard de gunicorn :
+
+- silent : rien n'est écrit, référence des écarts ;
+- sync_debug : DEBUG de l'application, texte, écriture directe dans le thread de la
+  requête, sans échantillonnage (comportement des anciens print()) ;
+- async_debug : DEBUG de l'application, JSON, file + listener, échantillonnage ;
+- production : INFO, JSON, file + listener, échantillonnage (réglages par défaut).
+
+Les configurations sont alternées sur plusieurs tours pour que la croissance de la
+base (ventes, lots créés) ne favorise pas la dernière ; on garde la médiane des tours.
+La configuration en place avant la mesure (handlers de la racine, y compris ceux d'un
+lanceur de tests, niveaux et propagation des loggers) est rétablie telle quelle à la fin.
+"""
+import logging
+import logging.config
+import statistics
+import tempfile
+
+from django.conf import settings
+
+from apps.core.log import AsyncStreamHandler, logging_config
+from apps.inventory.services.api_benchmark import SCENARIOS, ApiBenchmark
+
+APP_DEBUG = {'api': 'DEBUG', 'apps': 'DEBUG'}
+MODES = {
+    'silent': dict(level='CRITICAL', levels={'django': 'CRITICAL'}, asynchronous=False),
+    'sync_debug': dict(level='INFO', levels=APP_DEBUG, json_format=False, asynchronous=False, sampling={}),
+    'async_debug': dict(level='INFO', levels=APP_DEBUG, json_format=True, asynchronous=True),
+    'production': dict(level='INFO', json_format=True, asynchronous=True),
+}
+
+
+def configured_sampling():
+    """Taux d'échantillonnage des settings (LOG_SAMPLING), appliqués aux modes qui n'en fixent pas"""
+    filters = getattr(settings, 'LOGGING', {}).get('filters', {})
+    return dict(filters.get('sampling', {}).get('rates', {}))
+
+
+def _reset_levels():
+    """
+    dictConfig laisse en place le niveau des loggers absents de la nouvelle configuration :
+    ceux qu'un mode a passés en DEBUG reviennent à NOTSET avant chaque reconfiguration
+    """
+    for mode in MODES.values():
+        for name in mode.get('levels', {}):
+            logging.getLogger(name).setLevel(logging.NOTSET)
+
+
+def _all_loggers():
+    return [logging.getLogger()] + [
+        logger for logger in logging.Logger.manager.loggerDict.values() if isinstance(logger, logging.Logger)
+    ]
+
+
+def _snapshot():
+    """État des loggers existants avant la première reconfiguration"""
+    return {
+        logger.name: (logger, logger.level, logger.handlers[:], logger.propagate, logger.disabled)
+        for logger in _all_loggers()
+    }
+
+
+def _restore(snapshot):
+    """
+    Rétablit l'état relevé par _snapshot. Seuls les handlers créés par le benchmark sont
+    fermés ; les loggers apparus entre-temps reprennent les valeurs par défaut.
+    """
+    kept = {id(handler) for _, _, handlers, _, _ in snapshot.values() for handler in handlers}
+    for logger in _all_loggers():
+        for handler in logger.handlers:
+            if id(handler) not in kept:
+                handler.close()
+        saved = snapshot.get(logger.name)
+        level, handlers, propagate, disabled = saved[1:] if saved else (logging.NOTSET, [], True, False)
+        logger.setLevel(level)
+        logger.handlers[:] = handlers
+        logger.propagate = propagate
+        logger.disabled = disabled
+
+
+class LoggingBenchmark:
+    """Rejoue `scenarios` sous chaque configuration de `modes`, `rounds` fois en alternance"""
+
+    def __init__(self, sites, modes=tuple(MODES), registers=1, iterations=10, scenarios=SCENARIOS, rounds=3,
+                 seed=42, log=None):
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise ValueError(f"Configuration(s) inconnue(s) : {', '.join(sorted(unknown))}")
+        self.sites = list(sites)
+        self.modes = list(modes)
+        self.registers = registers
+        self.iterations = iterations
+        self.scenarios = list(scenarios)
+        self.rounds = max(1, rounds)
+        self.seed = seed
+        self.log = log or (lambda message: None)
+
+    def _measure(self, mode, stream):
+        """Un passage des scénarios sous `mode` ; retourne (rapport, enregistrements abandonnés)"""
+        options = dict(MODES[mode])
+        options.setdefault('sampling', configured_sampling())
+        _reset_levels()
+        logging.config.dictConfig(logging_config(stream=stream, **options))
+        try:
+            report = ApiBenchmark(
+                self.sites, registers=self.registers, iterations=self.iterations,
+                scenarios=self.scenarios, seed=self.seed,
+            ).run()
+        finally:
+            handlers = logging.getLogger().handlers
+            dropped = sum(handler.dropped for handler in handlers if isinstance(handler, AsyncStreamHandler))
+            for handler in handlers:
+                handler.close()  # Vide la file du listener avant de compter les lignes écrites
+        return report, dropped
+
+    def run(self):
+        """Rapport par configuration : ms par requête, p50/p95 par scénario, volume écrit, écarts à 'silent'"""
+        samples = {mode: [] for mode in self.modes}
+        snapshot = _snapshot()
+        try:
+            for round_number in range(self.rounds):
+                for mode in self.modes:
+                    with tempfile.TemporaryFile('w+', encoding='utf-8') as stream:
+                        report, dropped = self._measure(mode, stream)
+                        written = stream.tell()
+                        stream.seek(0)
+                        records = sum(1 for _ in stream)
+                    samples[mode].append((report, records, written, dropped))
+                    self.log(f"tour {round_number + 1}, {mode} : {records} ligne(s) écrite(s)")
+        finally:
+            _restore(snapshot)
+
+        results = {mode: self._summarize(runs) for mode, runs in samples.items()}
+        reference = results.get('silent')
+        if reference:
+            for summary in results.values():
+                summary['overhead_ms_per_request'] = round(summary['ms_per_request'] - reference['ms_per_request'], 3)
+        return {
+            'registers': self.registers,
+            'iterations': self.iterations,
+            'rounds': self.rounds,
+            'sampling': configured_sampling(),
+            'modes': results,
+        }
+
+    def _summarize(self, runs):
+        requests = sum(scenario['requests'] for scenario in runs[0][0]['scenarios'].values())
+        per_request = [
+            1000 * sum(scenario['wall_seconds'] for scenario in report['scenarios'].values()) / requests
+            for report, _, _, _ in runs
+        ]
+        return {
+            'requests': requests,
+            'errors': max(sum(s['errors'] for s in report['scenarios'].values()) for report, _, _, _ in runs),
+            'ms_per_request': round(statistics.median(per_request), 3),
+            'scenarios': {
+                name: {
+                    quantile: round(statistics.median(report['scenarios'][name]['latency_ms'][quantile]
+                                                      for report, _, _, _ in runs), 2)
+                    for quantile in ('p50', 'p95')
+                }
+                for name in self.scenarios
+            },
+            'records_per_request': round(statistics.median(records for _, records, _, _ in runs) / requests, 2),
+            'bytes_per_request': round(statistics.median(written for _, _, written, _ in runs) / requests, 1),
+            'dropped': sum(dropped for _, _, _, dropped in runs),
+        }
@@ -0,0 +1,392 @@
+"""
+Moteur de copie de produits entre sites, et propagation des modifications
+des produits originaux vers leurs copies.
+
+Remplace la boucle produit par produit (Product.objects.create + retries sur CUG,
+slug vérifié en base, hook de traitement d'image) par :
+- une réservation en masse des CUG et des slugs,
+- des bulk_create par paquets (produits, codes-barres, liens ProductCopy) dans une
+  seule transaction,
+- des images partagées par référence (même fichier, aucun retraitement).
+"""
+import logging
+import threading
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.inventory.models import Barcode, Product, ProductCopy, ProductCopyJob
+from apps.inventory.services.rollups import RollupService, local_day
+from apps.inventory.utils import generate_ean13_from_cug, reserve_product_cugs, reserve_product_slugs
+
+logger = logging.getLogger(__name__)
+
+
+class ProductCopyService:
+    """
+    Service de copie en masse de produits vers un site destination
+    """
+
+    CHUNK_SIZE = 500
+    # Au-delà de ce nombre de produits, la copie est lancée en arrière-plan
+    ASYNC_THRESHOLD = 200
+    # Nouvelles tentatives si un CUG/slug réservé est pris entre-temps par une autre transaction
+    MAX_ATTEMPTS = 3
+
+    @staticmethod
+    def progress_cache_key(job_id):
+        return f"product_copy_job:{job_id}:processed"
+
+    @classmethod
+    def _build_copies(cls, originals, destination_site):
+        """Construit en mémoire les produits copiés (sans passer par Product.save())"""
+        cugs = reserve_product_cugs(len(originals))
+        slugs = reserve_product_slugs([p.name for p in originals], cugs)
+        return [
+            Product(
+                name=original.name,
+                slug=slug,
+                cug=cug,
+                generated_ean=generate_ean13_from_cug(cug),
+                description=original.description,
+                selling_price=original.selling_price,
+                purchase_price=original.purchase_price,
+                sale_unit_type=original.sale_unit_type,
+                weight_unit=original.weight_unit,
+                quantity=0,  # Commencer avec 0 en stock
+                alert_threshold=original.alert_threshold,
+                category_id=original.category_id,
+                brand_id=original.brand_id,
+                # Référence le même fichier que l'original (aucun retraitement d'image)
+                image=original.image.name if original.image else None,
+                site_configuration=destination_site,
+                is_active=True,
+            )
+            for original, cug, slug in zip(originals, cugs, slugs)
+        ]
+
+    @classmethod
+    def _copy_chunk(cls, originals, destination_site, source_site, used_eans):
+        """Copie un paquet de produits : 3 bulk_create (produits, codes-barres, liens)"""
+        copies = Product.objects.bulk_create(cls._build_copies(originals, destination_site))
+
+        barcodes = []
+        for original, copied in zip(originals, copies):
+            for original_barcode in original.barcodes.all():
+                # Un EAN est unique par site : ignorer ceux déjà présents (comme l'ancienne boucle)
+                if original_barcode.ean in used_eans:
+                    continue
+                used_eans.add(original_barcode.ean)
+                barcodes.append(Barcode(
+                    product=copied,
+                    ean=original_barcode.ean,
+                    notes=original_barcode.notes,
+                    is_primary=original_barcode.is_primary,
+                ))
+        Barcode.objects.bulk_create(barcodes)
+
+        ProductCopy.objects.bulk_create([
+            ProductCopy(
+                original_product=original,
+                copied_product=copied,
+                source_site=source_site or original.site_configuration,
+                destination_site=destination_site,
+            )
+            for original, copied in zip(originals, copies)
+        ])
+        return copies
+
+    @classmethod
+    def copy_products(cls, product_ids, destination_site, source_site=None, job=None):
+        """
+        Copie les produits demandés vers `destination_site`.
+
+        Returns:
+            dict: {'copied_count', 'errors', 'copied_product_ids'}
+        """
+        requested_ids = []
+        errors = []
+        for product_id in product_ids:
+            try:
+                requested_ids.append(int(product_id))
+            except (TypeError, ValueError):
+                errors.append(f'Produit ID {product_id} non trouvé')
+
+        originals_qs = Product.objects.filter(id__in=requested_ids).select_related(
+            'site_configuration'
+        ).prefetch_related('barcodes')
+        if source_site:
+            originals_qs = originals_qs.filter(site_configuration=source_site)
+        originals_by_id = {p.id: p for p in originals_qs}
+
+        already_copied = set(ProductCopy.objects.filter(
+            destination_site=destination_site,
+            original_product_id__in=requested_ids
+        ).values_list('original_product_id', flat=True))
+
+        to_copy = []
+        seen = set()
+        for product_id in requested_ids:
+            original = originals_by_id.get(product_id)
+            if original is None:
+                errors.append(f'Produit ID {product_id} non trouvé')
+            elif original.site_configuration_id == destination_site.id:
+                errors.append(f"Le produit {product_id} appartient déjà au site actuel")
+            elif product_id not in already_copied and product_id not in seen:
+                seen.add(product_id)
+                to_copy.append(original)
+
+        copied_ids = []
+        for attempt in range(1, cls.MAX_ATTEMPTS + 1):
+            try:
+                copied_ids = cls._copy_all(to_copy, destination_site, source_site, job)
+                break
+            except IntegrityError as e:
+                # Collision CUG/slug avec une copie concurrente : tout a été annulé, on recommence
+                logger.warning(f"⚠️ [PRODUCT_COPY] Collision lors de la copie (tentative {attempt}): {e}")
+                if attempt == cls.MAX_ATTEMPTS:
+                    raise
+
+        logger.info(f"✅ [PRODUCT_COPY] {len(copied_ids)} produit(s) copié(s) vers le site {destination_site.id}")
+        return {
+            'copied_count': len(copied_ids),
+            'errors': errors,
+            'copied_product_ids': copied_ids,
+        }
+
+    @classmethod
+    def _copy_all(cls, to_copy, destination_site, source_site, job):
+        copied_ids = []
+        with transaction.atomic():
+            all_eans = {b.ean for p in to_copy for b in p.barcodes.all()}
+            used_eans = set(Barcode.objects.filter(
+                product__site_configuration=destination_site,
+                ean__in=all_eans
+            ).values_list('ean', flat=True)) if all_eans else set()
+
+            for start in range(0, len(to_copy), cls.CHUNK_SIZE):
+                chunk = to_copy[start:start + cls.CHUNK_SIZE]
+                copies = cls._copy_chunk(chunk, destination_site, source_site, used_eans)
+                copied_ids.extend(p.id for p in copies)
+                if job is not None:
+                    cache.set(cls.progress_cache_key(job.id), start + len(chunk), 3600)
+        return copied_ids
+
+    @classmethod
+    def run_job(cls, job):
+        """Exécute une tâche de copie et enregistre son résultat"""
+        job.status = 'processing'
+        job.save(update_fields=['status'])
+        try:
+            result = cls.copy_products(job.product_ids, job.destination_site, job.source_site, job=job)
+            job.status = 'success'
+            job.copied_count = result['copied_count']
+            job.errors = result['errors']
+            job.processed = job.total
+        except Exception as e:
+            logger.error(f"❌ [PRODUCT_COPY] Échec de la tâche {job.id}: {e}", exc_info=True)
+            job.status = 'failed'
+            job.errors = list(job.errors or []) + [str(e)]
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'copied_count', 'errors', 'processed', 'completed_at'])
+        cache.delete(cls.progress_cache_key(job.id))
+        return job
+
+    @classmethod
+    def start_job_async(cls, product_ids, destination_site, source_site=None, user=None):
+        """Crée une tâche de copie et l'exécute dans un thread d'arrière-plan"""
+        job = ProductCopyJob.objects.create(
+            user=user,
+            source_site=source_site,
+            destination_site=destination_site,
+            product_ids=list(product_ids),
+            total=len(product_ids),
+        )
+        job_id = job.id
+
+        def run():
+            try:
+                cls.run_job(ProductCopyJob.objects.select_related('destination_site', 'source_site').get(pk=job_id))
+            finally:
+                # Le thread ouvre sa propre connexion : la fermer explicitement
+                connection.close()
+
+        threading.Thread(target=run, daemon=True).start()
+        return job
+
+    @classmethod
+    def get_job_progress(cls, job):
+        """Progression d'une tâche (cache pendant l'exécution, base ensuite)"""
+        processed = job.processed
+        if job.status == 'processing':
+            processed = cache.get(cls.progress_cache_key(job.id), processed)
+        return {
+            'job_id': job.id,
+            'status': job.status,
+            'total': job.total,
+            'processed': processed,
+            'progress': round(processed * 100 / job.total) if job.total else 100,
+            'copied_count': job.copied_count,
+            'errors': job.errors,
+            'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+        }
+
+
+class ProductCopySyncService:
+    """
+    Propagation des modifications d'un produit original vers toutes ses copies.
+
+    Déclenchée après la sauvegarde de l'original (signal post_save, après commit) :
+    seuls les champs réellement modifiés sont écrits, pour les copies dont l'option
+    de synchronisation correspondante est active, par UPDATE groupés.
+    """
+
+    BATCH_SIZE = 500
+
+    @classmethod
+    def schedule_propagation(cls, product):
+        """Calcule le diff du produit sauvegardé et planifie la propagation après commit"""
+        changes = product.get_sync_changes()
+        product.reset_sync_snapshot()
+        if not changes:
+            return
+        product_id = product.pk
+        transaction.on_commit(lambda: cls.propagate(product_id, changes))
+
+    @classmethod
+    def propagate(cls, original_id, changes):
+        """
+        Applique `changes` ({champ: (ancienne, nouvelle valeur)}) aux copies de l'original.
+
+        Returns:
+            int: Nombre de copies synchronisées
+        """
+        flags = [
+            flag for flag, fields in ProductCopy.SYNC_FIELDS.items()
+            if any(field in changes for field in fields)
+        ]
+        if not flags:
+            return 0
+
+        flag_filter = Q()
+        for flag in flags:
+            flag_filter |= Q(**{flag: True})
+        links = ProductCopy.objects.filter(
+            flag_filter, original_product_id=original_id, is_active=True
+        ).values_list('id', 'copied_product_id', *flags)
+
+        # Regrouper les copies par ensemble de champs à écrire (selon leurs options)
+        groups = defaultdict(list)
+        link_ids = []
+        for link_id, copied_id, *enabled in links:
+            fields = tuple(
+                field
+                for flag, is_enabled in zip(flags, enabled) if is_enabled
+                for field in ProductCopy.SYNC_FIELDS[flag] if field in changes
+            )
+            groups[fields].append(copied_id)
+            link_ids.append(link_id)
+
+        now = timezone.now()
+        for fields, copied_ids in groups.items():
+            values = {field: changes[field][1] for field in fields if field != 'image'}
+            if 'quantity' in values:
+                values['stock_updated_at'] = now
+            for start in range(0, len(copied_ids), cls.BATCH_SIZE):
+                batch_ids = copied_ids[start:start + cls.BATCH_SIZE]
+                batch = Product.objects.filter(id__in=batch_ids)
+                copies = cls._stock_snapshot(batch_ids) if 'quantity' in values else None
+                if values:
+                    batch.update(updated_at=now, **values)
+                if copies is not None:
+                    cls._after_stock_sync(copies, dict.fromkeys(batch_ids, values['quantity']), now)
+                if 'image' in fields:
+                    # Ne remplacer que les images encore partagées avec l'original (ou absentes)
+                    old_image, new_image = changes['image']
+                    shared = Q(image__isnull=True) | Q(image='')
+                    if old_image:
+                        shared |= Q(image=old_image)
+                    batch.filter(shared).update(image=new_image, updated_at=now)
+
+        for start in range(0, len(link_ids), cls.BATCH_SIZE):
+            ProductCopy.objects.filter(id__in=link_ids[start:start + cls.BATCH_SIZE]).update(last_sync=now)
+
+        if link_ids:
+            logger.info(
+                f"🔄 [PRODUCT_SYNC] Produit {original_id}: {', '.join(changes)} propagé(s) à {len(link_ids)} copie(s)"
+            )
+        return len(link_ids)
+
+    @classmethod
+    def propagate_values(cls, field, values_by_original):
+        """
+        Propage une nouvelle valeur de `field` pour plusieurs originaux à la fois
+        (mises à jour en masse qui ne passent pas par Product.save()).
+
+        Args:
+            field: Champ synchronisé (ex: 'quantity')
+            values_by_original: {id du produit original: nouvelle valeur}
+
+        Returns:
+            int: Nombre de copies synchronisées
+        """
+        flag = next((f for f, fields in ProductCopy.SYNC_FIELDS.items() if field in fields), None)
+        if flag is None or not values_by_original:
+            return 0
+
+        original_ids = list(values_by_original)
+        now = timezone.now()
+        synced = 0
+        for start in range(0, len(original_ids), cls.BATCH_SIZE):
+            batch_ids = original_ids[start:start + cls.BATCH_SIZE]
+            links = list(ProductCopy.objects.filter(
+                original_product_id__in=batch_ids, is_active=True, **{flag: True}
+            ).values_list('id', 'original_product_id', 'copied_product_id'))
+            if not links:
+                continue
+            updated_fields = [field, 'updated_at'] + (['stock_updated_at'] if field == 'quantity' else [])
+            copies = cls._stock_snapshot([link[2] for link in links]) if field == 'quantity' else None
+            Product.objects.bulk_update([
+                Product(id=copied_id, updated_at=now, stock_updated_at=now, **{field: values_by_original[original_id]})
+                for _, original_id, copied_id in links
+            ], updated_fields)
+            if copies is not None:
+                cls._after_stock_sync(copies, {
+                    copied_id: values_by_original[original_id] for _, original_id, copied_id in links
+                }, now)
+            ProductCopy.objects.filter(id__in=[link[0] for link in links]).update(last_sync=now)
+            synced += len(links)
+
+        if synced:
+            logger.info(f"🔄 [PRODUCT_SYNC] {field} propagé à {synced} copie(s) ({len(original_ids)} original(aux))")
+        return synced
+
+    @staticmethod
+    def _stock_snapshot(copied_ids):
+        """Copies avant la synchronisation du stock (quantités d'origine pour les alertes)"""
+        return list(Product.objects.filter(id__in=copied_ids).only(
+            'id', 'name', 'quantity', 'alert_threshold', 'site_configuration_id'
+        ))
+
+    @staticmethod
+    def _after_stock_sync(copies, new_quantities, now):
+        """
+        Les UPDATE groupés ne passent pas par Product.save() : agrégats journaliers et
+        alertes de stock des copies, comme après un inventaire (InventoryCountService)
+        """
+        from apps.inventory.services.stock_alerts import StockAlertService
+
+        changes = []
+        products_by_site = defaultdict(list)
+        for copy in copies:
+            new_quantity = new_quantities[copy.id]
+            if new_quantity == copy.quantity:
+                continue
+            changes.append((copy, copy.quantity, new_quantity))
+            products_by_site[copy.site_configuration_id].append(copy.id)
+        for site_id, product_ids in products_by_site.items():
+            RollupService.schedule(site_id, local_day(now), product_ids)
+        StockAlertService.check_bulk(changes)
@@ -0,0 +1,428 @@
+"""
+Import en masse de produits depuis un fichier CSV ou XLSX.
+
+Les lignes sont lues en flux (module csv / openpyxl en mode read_only), validées
+et normalisées une à une, puis insérées par lots :
+- catégories et marques résolues via des dictionnaires chargés une seule fois,
+- limite du plan vérifiée une seule fois pour tout l'import,
+- CUG et slugs réservés par blocs,
+- produits et codes-barres créés par bulk_create (une transaction par lot).
+Chaque ligne rejetée est reportée avec son numéro et ses erreurs.
+"""
+import csv
+import io
+import logging
+import os
+import threading
+import unicodedata
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from apps.inventory.models import Barcode, Brand, Category, Product, ProductImportJob
+from apps.inventory.utils import (
+    generate_ean13_from_cug, normalize_ean, reserve_product_cugs, reserve_product_slugs
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ProductImportService:
+    """
+    Service d'import de produits (API en arrière-plan et commande de gestion)
+    """
+
+    CHUNK_SIZE = 500
+    # Nombre maximum d'erreurs détaillées conservées dans le rapport
+    MAX_REPORTED_ERRORS = 1000
+    # Nouvelles tentatives si un CUG/slug réservé est pris entre-temps par une autre transaction
+    MAX_ATTEMPTS = 3
+
+    # En-tête normalisé -> champ
+    COLUMN_ALIASES = {
+        'name': 'name', 'nom': 'name', 'produit': 'name', 'designation': 'name',
+        'ean': 'ean', 'barcode': 'ean', 'code_barre': 'ean', 'code_barres': 'ean', 'code-barres': 'ean',
+        'category': 'category', 'categorie': 'category',
+        'brand': 'brand', 'marque': 'brand',
+        'purchase_price': 'purchase_price', 'prix_achat': 'purchase_price', 'prix_d_achat': 'purchase_price',
+        'selling_price': 'selling_price', 'prix_vente': 'selling_price', 'prix_de_vente': 'selling_price', 'prix': 'selling_price',
+        'quantity': 'quantity', 'quantite': 'quantity', 'stock': 'quantity',
+        'alert_threshold': 'alert_threshold', 'seuil_alerte': 'alert_threshold', 'seuil_d_alerte': 'alert_threshold',
+        'description': 'description',
+        'sale_unit_type': 'sale_unit_type', 'type_vente': 'sale_unit_type',
+        'weight_unit': 'weight_unit', 'unite_poids': 'weight_unit',
+    }
+
+    @staticmethod
+    def _normalize_header(value):
+        text = unicodedata.normalize('NFKD', str(value or '')).encode('ascii', 'ignore').decode()
+        return text.strip().lower().replace("'", '_').replace(' ', '_')
+
+    @classmethod
+    def iter_rows(cls, fileobj, file_format):
+        """
+        Lit le fichier en flux et renvoie (numéro de ligne, {champ: valeur}).
+        Les colonnes inconnues sont ignorées.
+        """
+        if file_format == 'xlsx':
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(fileobj, read_only=True, data_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                yield from cls._map_rows(rows)
+            finally:
+                workbook.close()
+        else:
+            text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+            sample = text.read(4096)
+            text.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            yield from cls._map_rows(csv.reader(text, dialect))
+
+    @classmethod
+    def _map_rows(cls, rows):
+        header = None
+        for row_number, row in enumerate(rows, start=1):
+            if header is None:
+                header = [cls.COLUMN_ALIASES.get(cls._normalize_header(cell)) for cell in row]
+                if 'name' not in header:
+                    raise ValueError("Colonne 'nom' (ou 'name') introuvable dans l'en-tête")
+                continue
+            if not any(cell not in (None, '') for cell in row):
+                continue  # Ligne vide
+            yield row_number, {field: value for field, value in zip(header, row) if field}
+
+    @staticmethod
+    def _parse_decimal(value, label, errors, default=Decimal('0')):
+        if value in (None, ''):
+            return default
+        if isinstance(value, (int, float, Decimal)):
+            return Decimal(str(value))
+        text = str(value).strip().replace(' ', '').replace(' ', '').replace(',', '.')
+        try:
+            return Decimal(text)
+        except InvalidOperation:
+            errors.append(f"{label} invalide : '{value}'")
+            return default
+
+    @classmethod
+    def _validate_row(cls, data, seen_eans):
+        """Valide et normalise une ligne ; retourne (ligne normalisée, erreurs)"""
+        errors = []
+        name = str(data.get('name') or '').strip()
+        if not name:
+            errors.append('Nom obligatoire')
+        elif len(name) > Product._meta.get_field('name').max_length:
+            errors.append('Nom trop long (100 caractères maximum)')
+
+        ean = None
+        try:
+            ean = normalize_ean(data.get('ean'))
+        except ValueError as e:
+            errors.append(str(e))
+        if ean and ean in seen_eans:
+            errors.append(f"Code-barres {ean} présent plusieurs fois dans le fichier")
+
+        purchase_price = cls._parse_decimal(data.get('purchase_price'), "Prix d'achat", errors)
+        selling_price = cls._parse_decimal(data.get('selling_price'), 'Prix de vente', errors)
+        if selling_price < 0:
+            errors.append('Le prix de vente ne peut pas être négatif')
+
+        sale_unit_type = str(data.get('sale_unit_type') or 'quantity').strip().lower()
+        weight_unit = str(data.get('weight_unit') or '').strip().lower() or None
+        if sale_unit_type not in ('quantity', 'weight'):
+            errors.append(f"Type de vente invalide : '{sale_unit_type}' (quantity ou weight)")
+        elif sale_unit_type == 'weight' and weight_unit not in ('kg', 'g'):
+            errors.append("Unité de poids (kg ou g) obligatoire pour les produits au poids")
+        elif sale_unit_type == 'quantity':
+            weight_unit = None
+
+        return {
+            'name': name,
+            'ean': ean,
+            'description': str(data.get('description') or '').strip() or None,
+            'category': str(data.get('category') or '').strip(),
+            'brand': str(data.get('brand') or '').strip(),
+            'purchase_price': purchase_price,
+            'selling_price': selling_price,
+            'quantity': cls._parse_decimal(data.get('quantity'), 'Quantité', errors),
+            'alert_threshold': cls._parse_decimal(data.get('alert_threshold'), "Seuil d'alerte", errors, Decimal('5')),
+            'sale_unit_type': sale_unit_type,
+            'weight_unit': weight_unit,
+        }, errors
+
+    @staticmethod
+    def _load_lookup_maps(site):
+        """Catégories (du site et globales) et marques du site, indexées par nom en minuscules"""
+        categories = {}
+        for category in Category.objects.filter(
+            Q(site_configuration=site) | Q(is_global=True)
+        ).order_by('-site_configuration_id').only('id', 'name', 'site_configuration_id'):
+            # Les catégories du site sont prioritaires sur les globales
+            categories.setdefault(category.name.lower(), category.id)
+        brands = {
+            brand.name.lower(): brand.id
+            for brand in Brand.objects.filter(site_configuration=site).only('id', 'name')
+        }
+        return categories, brands
+
+    @staticmethod
+    def _create_category(name, site):
+        slug = base_slug = f"{slugify(name)}-{site.id}"
+        counter = 1
+        while Category.objects.filter(slug=slug).exists():
+            counter += 1
+            slug = f"{base_slug}-{counter}"
+        return Category.objects.create(name=name, slug=slug, site_configuration=site).id
+
+    @classmethod
+    def _resolve_references(cls, rows, site, categories, brands, create_missing, dry_run=False):
+        """Associe catégorie/marque à chaque ligne ; crée les manquantes si demandé"""
+        for row in rows:
+            for field, lookup, label in (('category', categories, 'Catégorie'), ('brand', brands, 'Marque')):
+                name = row['data'][field]
+                if not name:
+                    row['data'][f'{field}_id'] = None
+                    continue
+                key = name.lower()
+                if key not in lookup:
+                    if not create_missing:
+                        row['errors'].append(f"{label} inconnue : '{name}'")
+                        continue
+                    if dry_run:
+                        # Simulation : la référence serait créée, sans rien écrire
+                        lookup[key] = None
+                    elif field == 'category':
+                        lookup[key] = cls._create_category(name, site)
+                    else:
+                        lookup[key] = Brand.objects.create(name=name, site_configuration=site).id
+                row['data'][f'{field}_id'] = lookup[key]
+
+    @staticmethod
+    def _is_reservation_collision(error):
+        """Vrai si la contrainte violée est celle du CUG ou du slug produit (réservés par l'import)"""
+        # SQLite : « inventory_product.cug » ; PostgreSQL : « inventory_product_cug_key »
+        text = str(error).lower()
+        table = Product._meta.db_table
+        return any(f'{table}.{column}' in text or f'{table}_{column}_' in text for column in ('cug', 'slug'))
+
+    @classmethod
+    def _insert_chunk(cls, rows, site, used_cugs, add_error):
+        """
+        Insère un lot de lignes valides, en réservant de nouveaux CUG/slugs en cas de collision.
+        Toute autre contrainte violée (code-barres inséré entre-temps…) : lot repris ligne par
+        ligne, les lignes refusées vont au rapport d'erreurs.
+        """
+        for attempt in range(1, cls.MAX_ATTEMPTS + 1):
+            try:
+                return cls._insert_rows(rows, site, used_cugs)
+            except IntegrityError as e:
+                if not cls._is_reservation_collision(e):
+                    if len(rows) == 1:
+                        logger.warning("⚠️ [PRODUCT_IMPORT] Ligne %s refusée: %s", rows[0]['row'], e)
+                        add_error(rows[0]['row'], [f"Enregistrement refusé par la base : {e}"])
+                        return 0
+                    logger.warning("⚠️ [PRODUCT_IMPORT] Lot refusé (%s), insertion ligne par ligne", e)
+                    return sum(cls._insert_chunk([row], site, used_cugs, add_error) for row in rows)
+                # Collision CUG/slug avec une création concurrente : le lot a été annulé, on recommence
+                logger.warning("⚠️ [PRODUCT_IMPORT] Collision lors de l'import (tentative %s): %s", attempt, e)
+                if attempt == cls.MAX_ATTEMPTS:
+                    raise
+                used_cugs.update(Product.objects.filter(cug__regex=r'^[0-9]{5}$').values_list('cug', flat=True))
+
+    @classmethod
+    def _insert_rows(cls, rows, site, used_cugs):
+        """Insère un lot de lignes valides : 2 bulk_create (produits, codes-barres)"""
+        cugs = reserve_product_cugs(len(rows), used=used_cugs)
+        slugs = reserve_product_slugs([row['data']['name'] for row in rows], cugs)
+        with transaction.atomic():
+            products = Product.objects.bulk_create([
+                Product(
+                    name=data['name'],
+                    slug=slug,
+                    cug=cug,
+                    generated_ean=generate_ean13_from_cug(cug),
+                    description=data['description'],
+                    purchase_price=data['purchase_price'],
+                    selling_price=data['selling_price'],
+                    quantity=data['quantity'],
+                    alert_threshold=data['alert_threshold'],
+                    sale_unit_type=data['sale_unit_type'],
+                    weight_unit=data['weight_unit'],
+                    category_id=data['category_id'],
+                    brand_id=data['brand_id'],
+                    site_configuration=site,
+                    is_active=True,
+                )
+                for data, cug, slug in ((row['data'], cug, slug) for row, cug, slug in zip(rows, cugs, slugs))
+            ])
+            Barcode.objects.bulk_create([
+                Barcode(product=product, ean=row['data']['ean'], is_primary=True)
+                for row, product in zip(rows, products) if row['data']['ean']
+            ])
+        return len(products)
+
+    @classmethod
+    def import_file(cls, fileobj, file_format, site, create_missing=True, dry_run=False,
+                    enforce_limit=True, job=None):
+        """
+        Importe les produits du fichier dans `site`.
+
+        Returns:
+            dict: {'total_rows', 'created_count', 'error_count', 'errors': [{'row', 'errors'}]}
+        """
+        from apps.subscription.services import SubscriptionService
+
+        # Limite du plan : une seule vérification pour tout l'import
+        remaining = None
+        if enforce_limit:
+            plan = SubscriptionService.get_site_plan(site)
+            if plan and plan.max_products is not None:
+                remaining = max(plan.max_products - SubscriptionService.get_site_product_count(site), 0)
+
+        categories, brands = cls._load_lookup_maps(site)
+        used_cugs = None
+        report = {'total_rows': 0, 'created_count': 0, 'error_count': 0, 'errors': []}
+
+        def add_error(row_number, messages):
+            report['error_count'] += 1
+            if len(report['errors']) < cls.MAX_REPORTED_ERRORS:
+                report['errors'].append({'row': row_number, 'errors': messages})
+
+        def flush(rows):
+            nonlocal used_cugs, remaining
+            # Codes-barres déjà utilisés sur le site : une requête par lot
+            eans = {row['data']['ean'] for row in rows if row['data']['ean']}
+            existing = set(Barcode.objects.filter(
+                product__site_configuration=site, ean__in=eans
+            ).values_list('ean', flat=True)) if eans else set()
+            for row in rows:
+                if row['data']['ean'] in existing:
+                    row['errors'].append(f"Code-barres {row['data']['ean']} déjà utilisé sur ce site")
+            cls._resolve_references(
+                [row for row in rows if not row['errors']], site, categories, brands, create_missing, dry_run
+            )
+
+            valid = []
+            for row in rows:
+                if row['errors']:
+                    add_error(row['row'], row['errors'])
+                elif remaining is not None and remaining <= 0:
+                    add_error(row['row'], ['Limite de produits du plan atteinte'])
+                else:
+                    valid.append(row)
+                    if remaining is not None:
+                        remaining -= 1
+
+            if valid and not dry_run:
+                if used_cugs is None:
+                    used_cugs = set(Product.objects.filter(cug__regex=r'^[0-9]{5}$').values_list('cug', flat=True))
+                report['created_count'] += cls._insert_chunk(valid, site, used_cugs, add_error)
+            elif valid:
+                report['created_count'] += len(valid)
+
+            if job is not None:
+                ProductImportJob.objects.filter(pk=job.pk).update(
+                    total_rows=report['total_rows'], created_count=report['created_count'],
+                    error_count=report['error_count'],
+                )
+
+        seen_eans = set()
+        pending = []
+        for row_number, data in cls.iter_rows(fileobj, file_format):
+            report['total_rows'] += 1
+            normalized, errors = cls._validate_row(data, seen_eans)
+            if normalized['ean']:
+                seen_eans.add(normalized['ean'])
+            pending.append({'row': row_number, 'data': normalized, 'errors': errors})
+            if len(pending) >= cls.CHUNK_SIZE:
+                flush(pending)
+                pending = []
+        if pending:
+            flush(pending)
+
+        logger.info(
+            f"✅ [PRODUCT_IMPORT] Site {site.id}: {report['created_count']} produit(s) créé(s), "
+            f"{report['error_count']} ligne(s) en erreur sur {report['total_rows']}"
+            f"{' (simulation)' if dry_run else ''}"
+        )
+        return report
+
+    @staticmethod
+    def detect_format(filename):
+        """Format d'après l'extension du fichier"""
+        extension = os.path.splitext(filename or '')[1].lower()
+        if extension in ('.xlsx', '.xlsm'):
+            return 'xlsx'
+        if extension in ('.csv', '.txt'):
+            return 'csv'
+        raise ValueError(f"Format de fichier non supporté : '{extension}' (CSV ou XLSX attendu)")
+
+    @classmethod
+    def run_job(cls, job):
+        """Exécute un import enregistré et enregistre son rapport"""
+        job.status = 'processing'
+        job.save(update_fields=['status'])
+        try:
+            with job.file.open('rb') as fileobj:
+                report = cls.import_file(
+                    fileobj,
+                    cls.detect_format(job.original_filename or job.file.name),
+                    job.site_configuration,
+                    create_missing=job.create_missing,
+                    dry_run=job.dry_run,
+                    job=job,
+                )
+            job.status = 'success'
+            job.total_rows = report['total_rows']
+            job.created_count = report['created_count']
+            job.error_count = report['error_count']
+            job.errors = report['errors']
+        except Exception as e:
+            logger.error(f"❌ [PRODUCT_IMPORT] Échec de l'import {job.id}: {e}", exc_info=True)
+            job.refresh_from_db(fields=['total_rows', 'created_count', 'error_count'])
+            job.status = 'failed'
+            job.error_message = str(e)
+        job.completed_at = timezone.now()
+        job.save(update_fields=[
+            'status', 'total_rows', 'created_count', 'error_count', 'errors', 'error_message', 'completed_at'
+        ])
+        return job
+
+    @classmethod
+    def start_job_async(cls, job):
+        """Exécute l'import dans un thread d'arrière-plan"""
+        job_id = job.id
+
+        def run():
+            try:
+                cls.run_job(ProductImportJob.objects.select_related('site_configuration').get(pk=job_id))
+            finally:
+                # Le thread ouvre sa propre connexion : la fermer explicitement
+                connection.close()
+
+        threading.Thread(target=run, daemon=True).start()
+        return job
+
+    @staticmethod
+    def serialize_job(job):
+        return {
+            'job_id': job.id,
+            'status': job.status,
+            'filename': job.original_filename,
+            'dry_run': job.dry_run,
+            'total_rows': job.total_rows,
+            'created_count': job.created_count,
+            'error_count': job.error_count,
+            'errors': job.errors,
+            'error_message': job.error_message,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+        }
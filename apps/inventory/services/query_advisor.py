@@ -0,0 +1,142 @@
+"""
+Conseiller d'index : plans d'exécution des requêtes chaudes multi-sites.
+
+Un registre de querysets représentatifs (ceux des listes, rapports et scans de caisse)
+est passé à EXPLAIN. Sur PostgreSQL : EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON), avec
+signalement des parcours séquentiels de tables volumineuses et des estimations de
+lignes très éloignées du réel. Sur SQLite : EXPLAIN QUERY PLAN, avec signalement des
+parcours complets (SCAN sans index). Utilisé par la commande explain_hot_queries.
+"""
+import json
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from apps.inventory.models import Barcode, Product, Transaction
+
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (\w+)\b(?! USING)')
+
+
+def _recent(days=30):
+    return timezone.now() - timedelta(days=days)
+
+
+def _sample_product_id(site):
+    return Product.objects.filter(site_configuration=site).order_by('id').values_list('id', flat=True).first() or 0
+
+
+def _sample_ean(site):
+    return Barcode.objects.filter(product__site_configuration=site).values_list('ean', flat=True).first() or ''
+
+
+def _sales_period(site):
+    from apps.sales.models import Sale
+    return Sale.objects.filter(site_configuration=site, sale_date__gte=_recent()).order_by('-sale_date')[:50]
+
+
+def _credit_period(site):
+    from apps.sales.models import CreditTransaction
+    return CreditTransaction.objects.filter(
+        site_configuration=site, transaction_date__gte=_recent()
+    ).order_by('-transaction_date')[:50]
+
+
+# Nom -> fonction(site) retournant le queryset à analyser
+HOT_QUERIES = {
+    'transactions_site_recent': lambda site: Transaction.objects.filter(
+        site_configuration=site
+    ).order_by('-transaction_date')[:50],
+    'transactions_site_period': lambda site: Transaction.objects.filter(
+        site_configuration=site, transaction_date__gte=_recent()
+    ).order_by('-transaction_date')[:50],
+    'transactions_product_history': lambda site: Transaction.objects.filter(
+        product_id=_sample_product_id(site)
+    ).order_by('-transaction_date')[:50],
+    'sales_site_period': _sales_period,
+    'credit_site_period': _credit_period,
+    'barcode_scan': lambda site: Barcode.objects.filter(
+        ean=_sample_ean(site), product__site_configuration=site
+    ),
+    'products_active_by_name': lambda site: Product.objects.filter(
+        site_configuration=site, is_active=True
+    ).order_by('name')[:20],
+    'products_low_stock': lambda site: Product.objects.filter(
+        site_configuration=site, quantity__gt=0, quantity__lte=F('alert_threshold')
+    ).order_by('id')[:50],
+}
+
+
+class QueryAdvisorService:
+    """
+    Plans d'exécution du registre HOT_QUERIES et problèmes détectés
+    """
+    MIN_SCAN_ROWS = 1000  # Parcours séquentiel toléré sous ce nombre de lignes
+    ESTIMATE_RATIO = 10  # Écart estimé / réel signalé au-delà de ce facteur
+    MIN_ESTIMATE_ROWS = 100  # Écarts ignorés quand les deux valeurs sont petites
+
+    @staticmethod
+    def walk(plan):
+        """Nœuds d'un plan PostgreSQL (JSON), en profondeur"""
+        yield plan
+        for child in plan.get('Plans', []):
+            yield from QueryAdvisorService.walk(child)
+
+    @classmethod
+    def analyze_postgres_plan(cls, plan, min_scan_rows=None, estimate_ratio=None):
+        """Problèmes d'un plan PostgreSQL (clé 'Plan' du JSON d'EXPLAIN ANALYZE)"""
+        min_scan_rows = cls.MIN_SCAN_ROWS if min_scan_rows is None else min_scan_rows
+        estimate_ratio = estimate_ratio or cls.ESTIMATE_RATIO
+        issues = []
+        for node in cls.walk(plan):
+            relation = node.get('Relation Name')
+            loops = node.get('Actual Loops') or 1
+            actual = node.get('Actual Rows', 0) * loops
+            estimated = node.get('Plan Rows', 0) * loops
+            scanned = actual + node.get('Rows Removed by Filter', 0) * loops
+            if node.get('Node Type') == 'Seq Scan' and scanned >= min_scan_rows:
+                issues.append({
+                    'type': 'seq_scan', 'relation': relation,
+                    'detail': f"parcours séquentiel de {relation} ({scanned} ligne(s) lue(s))",
+                })
+            if 'Actual Rows' in node and max(actual, estimated) >= cls.MIN_ESTIMATE_ROWS:
+                ratio = max(actual, 1) / max(estimated, 1)
+                if ratio >= estimate_ratio or 1 / ratio >= estimate_ratio:
+                    issues.append({
+                        'type': 'row_estimate', 'relation': relation,
+                        'detail': f"{node.get('Node Type')} : {estimated} ligne(s) estimée(s), {actual} réelle(s)",
+                    })
+        return issues
+
+    @staticmethod
+    def analyze_sqlite_plan(plan):
+        """Problèmes d'un plan SQLite (texte d'EXPLAIN QUERY PLAN) : parcours complets"""
+        return [
+            {'type': 'seq_scan', 'relation': table, 'detail': f"parcours complet de {table}"}
+            for table in SQLITE_FULL_SCAN.findall(plan)
+        ]
+
+    @classmethod
+    def explain(cls, queryset, min_scan_rows=None, estimate_ratio=None):
+        """Plan et problèmes d'un queryset : {'plan', 'issues'}"""
+        if connection.vendor == 'postgresql':
+            raw = queryset.explain(analyze=True, buffers=True, format='json')
+            root = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+            return {
+                'plan': root,
+                'issues': cls.analyze_postgres_plan(root['Plan'], min_scan_rows, estimate_ratio),
+            }
+        plan = queryset.explain()
+        issues = cls.analyze_sqlite_plan(plan) if connection.vendor == 'sqlite' else []
+        return {'plan': plan, 'issues': issues}
+
+    @classmethod
+    def run(cls, site, names=None, min_scan_rows=None, estimate_ratio=None):
+        """Analyse les requêtes du registre pour un site : {nom: {'plan', 'issues'}}"""
+        return {
+            name: cls.explain(build(site), min_scan_rows, estimate_ratio)
+            for name, build in HOT_QUERIES.items()
+            if not names or name in names
+        }
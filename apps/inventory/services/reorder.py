@@ -0,0 +1,271 @@
+"""
+Moteur de suggestions de réapprovisionnement.
+
+La demande journalière (sorties) de tous les produits d'un site sur les N dernières
+semaines est lue en une requête groupée ; moyenne, variabilité, jours de couverture
+et quantités à commander sont ensuite calculés pour tous les produits à la fois avec
+des tableaux NumPy. Les quantités suggérées sont regroupées en une commande
+brouillon par fournisseur.
+"""
+import logging
+import math
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.inventory.models import Order, OrderItem, Product, ReorderJob, Transaction
+
+logger = logging.getLogger(__name__)
+
+
+class ReorderService:
+    """
+    Demande moyenne, écart-type, stock de sécurité et quantité à commander par produit
+    """
+    DEFAULT_WEEKS = 8
+    DEFAULT_LEAD_TIME_DAYS = 7
+    DEFAULT_COVERAGE_DAYS = 14
+    SERVICE_LEVEL_Z = 1.65  # Taux de service visé d'environ 95 %
+    MAX_STORED_SUGGESTIONS = 1000  # Suggestions conservées dans le rapport du calcul
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def load_products(site):
+        """Produits actifs du site : une requête, colonnes nécessaires au calcul uniquement"""
+        return list(
+            Product.objects.filter(site_configuration=site, is_active=True)
+            .order_by('id')
+            .values_list('id', 'quantity', 'alert_threshold', 'purchase_price', 'supplier_id', 'sale_unit_type')
+        )
+
+    @staticmethod
+    def load_demand(site, start, days):
+        """
+        Sorties journalières par produit depuis `start` : une requête groupée.
+        Retourne trois tableaux alignés (id produit, indice du jour, quantité).
+        """
+        rows = (
+            Transaction.objects
+            .filter(product__site_configuration=site, type='out', transaction_date__gte=start)
+            .annotate(day=TruncDate('transaction_date'))
+            .order_by()
+            .values_list('product_id', 'day')
+            .annotate(total=Sum('quantity'))
+        )
+        first_day = timezone.localtime(start).date()
+        day_index = {first_day + timedelta(days=i): i for i in range(days)}
+        product_ids, indexes, quantities = [], [], []
+        for product_id, day, total in rows:
+            index = day_index.get(day)
+            if index is not None:
+                product_ids.append(product_id)
+                indexes.append(index)
+                quantities.append(float(total))
+        return (
+            np.array(product_ids, dtype=np.int64),
+            np.array(indexes, dtype=np.int64),
+            np.array(quantities, dtype=np.float64),
+        )
+
+    @classmethod
+    def compute(cls, products, demand, days, lead_time_days, coverage_days, service_level_z=None):
+        """
+        Calcul vectorisé pour tous les produits.
+        `products` : lignes de load_products ; `demand` : tableaux de load_demand.
+        Retourne un dict de tableaux NumPy alignés sur `products`.
+        """
+        z = cls.SERVICE_LEVEL_Z if service_level_z is None else service_level_z
+        count = len(products)
+        ids = np.fromiter((row[0] for row in products), dtype=np.int64, count=count)
+        stock = np.fromiter((float(row[1]) for row in products), dtype=np.float64, count=count)
+        threshold = np.fromiter((float(row[2]) for row in products), dtype=np.float64, count=count)
+        by_weight = np.fromiter((row[5] == 'weight' for row in products), dtype=bool, count=count)
+
+        # Matrice produits x jours de la demande (les produits sont triés par id)
+        matrix = np.zeros((count, days), dtype=np.float64)
+        product_ids, indexes, quantities = demand
+        if count and len(product_ids):
+            rows = np.searchsorted(ids, product_ids)
+            known = (rows < count) & (ids[np.minimum(rows, count - 1)] == product_ids)
+            np.add.at(matrix, (rows[known], indexes[known]), quantities[known])
+
+        mean = matrix.mean(axis=1) if days else np.zeros(count)
+        std = matrix.std(axis=1, ddof=1) if days > 1 else np.zeros(count)
+        safety_stock = z * std * math.sqrt(lead_time_days)
+        reorder_point = np.maximum(mean * lead_time_days + safety_stock, threshold)
+        target = np.maximum(mean * (lead_time_days + coverage_days) + safety_stock, threshold)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_of_cover = np.where(mean > 0, np.maximum(stock, 0) / mean, np.inf)
+
+        needed = np.where(stock <= reorder_point, np.maximum(target - stock, 0), 0)
+        # Unités entières pour les produits à la pièce, grammes pour les produits au poids
+        suggested = np.where(by_weight, np.ceil(needed * 1000) / 1000, np.ceil(needed - 1e-9))
+
+        return {
+            'ids': ids,
+            'stock': stock,
+            'mean': mean,
+            'std': std,
+            'safety_stock': safety_stock,
+            'reorder_point': reorder_point,
+            'days_of_cover': days_of_cover,
+            'suggested': suggested,
+        }
+
+    @staticmethod
+    def build_suggestions(products, result):
+        """Suggestions (produits à commander), les plus urgents d'abord"""
+        selected = np.flatnonzero(result['suggested'] > 0)
+        selected = selected[np.argsort(result['days_of_cover'][selected], kind='stable')]
+        suggestions = []
+        for index in selected.tolist():
+            product_id, _, _, purchase_price, supplier_id, _ = products[index]
+            cover = result['days_of_cover'][index]
+            suggestions.append({
+                'product_id': product_id,
+                'supplier_id': supplier_id,
+                'current_stock': round(float(result['stock'][index]), 3),
+                'avg_daily_demand': round(float(result['mean'][index]), 3),
+                'demand_std': round(float(result['std'][index]), 3),
+                'days_of_cover': None if math.isinf(cover) else round(float(cover), 1),
+                'reorder_point': round(float(result['reorder_point'][index]), 3),
+                'suggested_quantity': Decimal(str(result['suggested'][index])).quantize(Decimal('0.001')),
+                'unit_price': purchase_price,
+            })
+        return suggestions
+
+    @classmethod
+    def create_draft_orders(cls, site, suggestions, reference_prefix):
+        """Une commande brouillon par fournisseur (les produits sans fournisseur sont regroupés)"""
+        by_supplier = {}
+        for suggestion in suggestions:
+            by_supplier.setdefault(suggestion['supplier_id'], []).append(suggestion)
+        if not by_supplier:
+            return []
+
+        with transaction.atomic():
+            orders = Order.objects.bulk_create([
+                Order(
+                    supplier_id=supplier_id,
+                    site_configuration=site,
+                    status='draft',
+                    reference=f"{reference_prefix}-{supplier_id or 0}",
+                    total_amount=sum(
+                        (line['suggested_quantity'] * line['unit_price'] for line in lines), Decimal('0')
+                    ),
+                )
+                for supplier_id, lines in by_supplier.items()
+            ])
+            # bulk_create n'appelle pas OrderItem.save (recalcul du total à chaque ligne)
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product_id=line['product_id'],
+                    quantity=line['suggested_quantity'],
+                    unit_price=line['unit_price'],
+                    amount=line['suggested_quantity'] * line['unit_price'],
+                )
+                for order, lines in zip(orders, by_supplier.values())
+                for line in lines
+            ], batch_size=cls.BATCH_SIZE)
+        return [order.id for order in orders]
+
+    @classmethod
+    def suggest(cls, site, weeks=None, lead_time_days=None, coverage_days=None, create_orders=False,
+                reference_prefix=None):
+        """Suggestions de réapprovisionnement d'un site, avec commandes brouillons optionnelles"""
+        weeks = weeks or cls.DEFAULT_WEEKS
+        lead_time_days = cls.DEFAULT_LEAD_TIME_DAYS if lead_time_days is None else lead_time_days
+        coverage_days = cls.DEFAULT_COVERAGE_DAYS if coverage_days is None else coverage_days
+        days = weeks * 7
+        today = timezone.localtime(timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        start = today - timedelta(days=days - 1)
+
+        products = cls.load_products(site)
+        demand = cls.load_demand(site, start, days)
+        result = cls.compute(products, demand, days, lead_time_days, coverage_days)
+        suggestions = cls.build_suggestions(products, result)
+
+        order_ids = []
+        if create_orders:
+            prefix = reference_prefix or f"REAPPRO-{today:%Y%m%d}"
+            order_ids = cls.create_draft_orders(site, suggestions, prefix)
+        logger.info(
+            f"✅ [REORDER] Site {site.id}: {len(products)} produit(s), "
+            f"{len(suggestions)} à commander, {len(order_ids)} commande(s) brouillon"
+        )
+        return {
+            'product_count': len(products),
+            'suggestions': suggestions,
+            'order_ids': order_ids,
+        }
+
+    @classmethod
+    def run_job(cls, job):
+        """Exécute un calcul enregistré et enregistre son rapport"""
+        job.status = 'processing'
+        job.save(update_fields=['status'])
+        try:
+            report = cls.suggest(
+                job.site_configuration,
+                weeks=job.weeks,
+                lead_time_days=job.lead_time_days,
+                coverage_days=job.coverage_days,
+                create_orders=job.create_orders,
+                reference_prefix=f"REAPPRO-{job.id}",
+            )
+            job.status = 'success'
+            job.product_count = report['product_count']
+            job.suggestion_count = len(report['suggestions'])
+            job.order_ids = report['order_ids']
+            job.suggestions = [
+                {**line, 'suggested_quantity': str(line['suggested_quantity']), 'unit_price': str(line['unit_price'])}
+                for line in report['suggestions'][:cls.MAX_STORED_SUGGESTIONS]
+            ]
+        except Exception as e:
+            logger.error(f"❌ [REORDER] Échec du calcul {job.id}: {e}", exc_info=True)
+            job.status = 'failed'
+            job.error_message = str(e)
+        job.completed_at = timezone.now()
+        job.save(update_fields=[
+            'status', 'product_count', 'suggestion_count', 'order_ids', 'suggestions', 'error_message', 'completed_at'
+        ])
+        return job
+
+    @classmethod
+    def start_job_async(cls, job):
+        """Exécute le calcul dans un thread d'arrière-plan"""
+        job_id = job.id
+
+        def run():
+            try:
+                cls.run_job(ReorderJob.objects.select_related('site_configuration').get(pk=job_id))
+            finally:
+                # Le thread ouvre sa propre connexion : la fermer explicitement
+                connection.close()
+
+        threading.Thread(target=run, daemon=True).start()
+        return job
+
+    @staticmethod
+    def serialize_job(job):
+        return {
+            'job_id': job.id,
+            'status': job.status,
+            'weeks': job.weeks,
+            'lead_time_days': job.lead_time_days,
+            'coverage_days': job.coverage_days,
+            'product_count': job.product_count,
+            'suggestion_count': job.suggestion_count,
+            'order_ids': job.order_ids,
+            'suggestions': job.suggestions,
+            'error_message': job.error_message,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+        }
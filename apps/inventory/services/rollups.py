@@ -0,0 +1,626 @@
+"""
+Agrégats journaliers par site et par produit (DailySiteRollup, DailyProductRollup).
+
+Les rapports lisent une ligne par jour au lieu de rebalayer ventes, lignes de vente
+et transactions. Chaque vente, ligne de vente et mouvement de stock enregistré ou
+supprimé applique son écart (incréments F() sur la ligne du site et celles des
+produits, créées au besoin) dans la transaction qui l'écrit : le coût d'une vente ne
+dépend pas du nombre de ventes du jour, et l'agrégat est validé ou annulé avec elle.
+L'état précédent d'une ligne modifiée vient de l'instantané laissé par son dernier
+enregistrement, ou de la base.
+
+Le recalcul complet depuis les données brutes reste réservé à la reconstruction d'une
+période (commande rebuild_rollups), à la vérification (commande check_rollups) et aux
+écritures groupées sans écart par ligne (schedule, après commit). La marge d'une vente
+est prise au prix d'achat du moment : une modification ultérieure du prix d'achat
+n'apparaît qu'après reconstruction.
+"""
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from apps.inventory.models import DailyProductRollup, DailySiteRollup, Transaction, TransactionArchive
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+PAYMENT_METHODS = ('cash', 'credit', 'sarali', 'card', 'mobile', 'transfer')
+
+MOVEMENT_FIELDS = ('quantity_in', 'quantity_out', 'quantity_loss', 'quantity_adjusted')
+SITE_FIELDS = (
+    'sales_count', 'revenue', 'margin', *(f'revenue_{method}' for method in PAYMENT_METHODS),
+    'movement_count', *MOVEMENT_FIELDS,
+)
+PRODUCT_FIELDS = ('quantity_sold', 'revenue', 'margin', *MOVEMENT_FIELDS)
+
+# Marge d'une ligne de vente : (prix de caisse - prix d'achat) x quantité
+LINE_MARGIN = ExpressionWrapper(
+    (F('unit_price') - Coalesce(F('product__purchase_price'), Value(ZERO))) * F('quantity'),
+    output_field=DecimalField(max_digits=16, decimal_places=2),
+)
+
+# Colonne d'un mouvement selon son type (les soldes d'ouverture ne comptent pas)
+MOVEMENT_FIELD_BY_TYPE = {
+    'in': 'quantity_in', 'out': 'quantity_out', 'backorder': 'quantity_out',
+    'loss': 'quantity_loss', 'adjustment': 'quantity_adjusted',
+}
+
+MOVEMENT_AGGREGATES = {
+    'quantity_in': Sum('quantity', filter=Q(type='in')),
+    'quantity_out': Sum('quantity', filter=Q(type__in=['out', 'backorder'])),
+    'quantity_loss': Sum('quantity', filter=Q(type='loss')),
+    'quantity_adjusted': Sum('quantity', filter=Q(type='adjustment')),
+}
+
+# Jours à recalculer au prochain commit, par thread : {(site_id, jour): {'products', 'sales'}}
+_pending = threading.local()
+
+
+def day_bounds(start_day, end_day):
+    """Bornes [début, fin[ (heure locale) couvrant les jours start_day à end_day inclus"""
+    return (
+        timezone.make_aware(datetime.combine(start_day, time.min)),
+        timezone.make_aware(datetime.combine(end_day + timedelta(days=1), time.min)),
+    )
+
+
+def local_day(moment):
+    """Jour local d'une date-heure"""
+    return timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+
+
+def _in_sites(field, site_ids):
+    """Filtre sur une liste de sites (None = sans site) ; tous les sites si site_ids est None"""
+    if site_ids is None:
+        return Q()
+    ids = [site_id for site_id in site_ids if site_id is not None]
+    condition = Q(**{f'{field}__in': ids})
+    if len(ids) != len(site_ids):
+        condition |= Q(**{f'{field}__isnull': True})
+    return condition
+
+
+def _movement_models(include_archive):
+    """Journal actif, et archive des périodes clôturées pour une reconstruction"""
+    return (Transaction, TransactionArchive) if include_archive else (Transaction,)
+
+
+def _add(target, values):
+    """Cumule des agrégats (un même jour peut être à cheval sur le journal et l'archive)"""
+    for field, value in values.items():
+        target[field] = (target.get(field) or 0) + (value or 0)
+
+
+def _complete(values, fields):
+    return {field: values.get(field) or 0 for field in fields}
+
+
+def _payment_field(method):
+    """Colonne du chiffre d'affaires d'un mode de paiement (sans mode : espèces)"""
+    if not method:
+        return 'revenue_cash'
+    return f'revenue_{method}' if method in PAYMENT_METHODS else None
+
+
+class RollupDelta:
+    """Écarts à appliquer aux lignes (site, jour) et (produit, jour)"""
+
+    def __init__(self):
+        self.sites = defaultdict(lambda: defaultdict(int))
+        self.products = defaultdict(lambda: defaultdict(int))
+        self.product_sites = {}
+
+    def add_site(self, site_id, day, sign, **values):
+        for field, value in values.items():
+            self.sites[(site_id, day)][field] += sign * (value or 0)
+
+    def add_product(self, product_id, site_id, day, sign, **values):
+        self.product_sites[(product_id, day)] = site_id
+        for field, value in values.items():
+            self.products[(product_id, day)][field] += sign * (value or 0)
+
+
+class RollupService:
+    """
+    Calcul, tenue à jour et lecture des agrégats journaliers
+    """
+    BATCH_SIZE = 1000
+    REBUILD_WINDOW_DAYS = 31  # La reconstruction traite la période par tranches
+
+    # ------------------------------------------------------------------
+    # Calcul depuis les données brutes (requêtes groupées par jour)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def compute_site_rows(start_day, end_day, site_ids=None, include_archive=False):
+        """
+        Agrégats par (site, jour) recalculés depuis les ventes et transactions : trois requêtes
+        (une de plus avec include_archive, pour les jours de périodes clôturées)
+        """
+        from apps.sales.models import Sale, SaleItem
+
+        start, end = day_bounds(start_day, end_day)
+        rows = defaultdict(dict)
+
+        sales = Sale.objects.filter(
+            _in_sites('site_configuration_id', site_ids),
+            status='completed', sale_date__gte=start, sale_date__lt=end,
+        )
+        by_method = {
+            f'revenue_{method}': Sum('total_amount', filter=Q(payment_method=method))
+            for method in PAYMENT_METHODS if method != 'cash'
+        }
+        # Sans mode de paiement renseigné, la vente est comptée en espèces
+        by_method['revenue_cash'] = Sum(
+            'total_amount', filter=Q(payment_method='cash') | Q(payment_method__isnull=True) | Q(payment_method='')
+        )
+        for row in (
+            sales.annotate(day=TruncDate('sale_date')).order_by()
+            .values('site_configuration_id', 'day')
+            .annotate(sales_count=Count('id'), revenue=Sum('total_amount'), **by_method)
+        ):
+            rows[(row.pop('site_configuration_id'), row.pop('day'))].update(row)
+
+        for row in (
+            SaleItem.objects.filter(sale__in=sales)
+            .annotate(day=TruncDate('sale__sale_date')).order_by()
+            .values('sale__site_configuration_id', 'day')
+            .annotate(margin=Sum(LINE_MARGIN))
+        ):
+            rows[(row['sale__site_configuration_id'], row['day'])]['margin'] = row['margin']
+
+        for model in _movement_models(include_archive):
+            for row in (
+                model.objects.filter(
+                    _in_sites('product__site_configuration_id', site_ids),
+                    transaction_date__gte=start, transaction_date__lt=end,
+                )
+                .exclude(type='opening')
+                .annotate(day=TruncDate('transaction_date')).order_by()
+                .values('product__site_configuration_id', 'day')
+                .annotate(movement_count=Count('id'), **MOVEMENT_AGGREGATES)
+            ):
+                _add(rows[(row.pop('product__site_configuration_id'), row.pop('day'))], row)
+
+        return {key: _complete(values, SITE_FIELDS) for key, values in rows.items()}
+
+    @staticmethod
+    def compute_product_rows(start_day, end_day, site_ids=None, product_ids=None, include_archive=False):
+        """Agrégats par (produit, jour) : deux requêtes. Retourne {(produit, jour): valeurs}"""
+        from apps.sales.models import SaleItem
+
+        start, end = day_bounds(start_day, end_day)
+        product_filter = _in_sites('product__site_configuration_id', site_ids)
+        if product_ids is not None:
+            product_filter &= Q(product_id__in=product_ids)
+        rows = defaultdict(dict)
+        sites = {}
+
+        for row in (
+            SaleItem.objects.filter(
+                product_filter, sale__status='completed', sale__sale_date__gte=start, sale__sale_date__lt=end,
+            )
+            .annotate(day=TruncDate('sale__sale_date')).order_by()
+            .values('product_id', 'product__site_configuration_id', 'day')
+            .annotate(quantity_sold=Sum('quantity'), revenue=Sum('amount'), margin=Sum(LINE_MARGIN))
+        ):
+            key = (row.pop('product_id'), row.pop('day'))
+            sites[key] = row.pop('product__site_configuration_id')
+            rows[key].update(row)
+
+        for model in _movement_models(include_archive):
+            for row in (
+                model.objects.filter(product_filter, transaction_date__gte=start, transaction_date__lt=end)
+                .exclude(type='opening')
+                .annotate(day=TruncDate('transaction_date')).order_by()
+                .values('product_id', 'product__site_configuration_id', 'day')
+                .annotate(**MOVEMENT_AGGREGATES)
+            ):
+                key = (row.pop('product_id'), row.pop('day'))
+                sites[key] = row.pop('product__site_configuration_id')
+                _add(rows[key], row)
+
+        return {
+            key: {'site_configuration_id': sites[key], **_complete(values, PRODUCT_FIELDS)}
+            for key, values in rows.items()
+        }
+
+    # ------------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def refresh_day(cls, site_id, day, product_ids=()):
+        """
+        Recalcule la ligne (site, jour) et celles des produits indiqués, dans une transaction.
+        Le verrou sur la ligne du site sérialise les recalculs concurrents du même jour.
+        """
+        with transaction.atomic():
+            rollup, _ = DailySiteRollup.objects.get_or_create(site_configuration_id=site_id, date=day)
+            DailySiteRollup.objects.select_for_update().filter(pk=rollup.pk).first()
+            values = cls.compute_site_rows(day, day, [site_id]).get((site_id, day), _complete({}, SITE_FIELDS))
+            DailySiteRollup.objects.filter(pk=rollup.pk).update(updated_at=timezone.now(), **values)
+
+            if product_ids:
+                product_ids = list(product_ids)
+                rows = cls.compute_product_rows(day, day, product_ids=product_ids)
+                DailyProductRollup.objects.filter(product_id__in=product_ids, date=day).delete()
+                DailyProductRollup.objects.bulk_create([
+                    DailyProductRollup(product_id=product_id, date=row_day, **values)
+                    for (product_id, row_day), values in rows.items()
+                ], batch_size=cls.BATCH_SIZE)
+
+    @classmethod
+    def rebuild(cls, start_day, end_day, site_ids=None):
+        """
+        Reconstruit les agrégats d'une période (jours inclus), par tranches de REBUILD_WINDOW_DAYS.
+
+        Returns:
+            dict: nombre de lignes de site et de produit écrites
+        """
+        written = {'site_rows': 0, 'product_rows': 0}
+        window_start = start_day
+        while window_start <= end_day:
+            window_end = min(window_start + timedelta(days=cls.REBUILD_WINDOW_DAYS - 1), end_day)
+            site_rows = cls.compute_site_rows(window_start, window_end, site_ids, include_archive=True)
+            product_rows = cls.compute_product_rows(window_start, window_end, site_ids, include_archive=True)
+            with transaction.atomic():
+                DailySiteRollup.objects.filter(
+                    _in_sites('site_configuration_id', site_ids), date__range=(window_start, window_end)
+                ).delete()
+                DailyProductRollup.objects.filter(
+                    _in_sites('site_configuration_id', site_ids), date__range=(window_start, window_end)
+                ).delete()
+                DailySiteRollup.objects.bulk_create([
+                    DailySiteRollup(site_configuration_id=site_id, date=day, **values)
+                    for (site_id, day), values in site_rows.items()
+                ], batch_size=cls.BATCH_SIZE)
+                DailyProductRollup.objects.bulk_create([
+                    DailyProductRollup(product_id=product_id, date=day, **values)
+                    for (product_id, day), values in product_rows.items()
+                ], batch_size=cls.BATCH_SIZE)
+            written['site_rows'] += len(site_rows)
+            written['product_rows'] += len(product_rows)
+            window_start = window_end + timedelta(days=1)
+        logger.info(
+            f"✅ [ROLLUPS] Reconstruction {start_day} → {end_day}: "
+            f"{written['site_rows']} ligne(s) site, {written['product_rows']} ligne(s) produit"
+        )
+        return written
+
+    @classmethod
+    def check(cls, start_day, end_day, site_ids=None):
+        """
+        Compare les agrégats enregistrés aux données brutes de la période.
+
+        Returns:
+            list: écarts [{'level', 'key', 'field', 'expected', 'stored'}]
+        """
+        def compare(level, expected_rows, stored_rows, fields):
+            differences = []
+            for key in sorted(set(expected_rows) | set(stored_rows), key=str):
+                expected = expected_rows.get(key, {})
+                stored = stored_rows.get(key, {})
+                for field in fields:
+                    if (expected.get(field) or 0) != (stored.get(field) or 0):
+                        differences.append({
+                            'level': level, 'key': key, 'field': field,
+                            'expected': expected.get(field) or 0, 'stored': stored.get(field) or 0,
+                        })
+            return differences
+
+        stored_sites = {
+            (row.pop('site_configuration_id'), row.pop('date')): row
+            for row in DailySiteRollup.objects.filter(
+                _in_sites('site_configuration_id', site_ids), date__range=(start_day, end_day)
+            ).values('site_configuration_id', 'date', *SITE_FIELDS)
+        }
+        stored_products = {
+            (row.pop('product_id'), row.pop('date')): row
+            for row in DailyProductRollup.objects.filter(
+                _in_sites('site_configuration_id', site_ids), date__range=(start_day, end_day)
+            ).values('product_id', 'date', *PRODUCT_FIELDS)
+        }
+        return (
+            compare('site', cls.compute_site_rows(start_day, end_day, site_ids, include_archive=True),
+                    stored_sites, SITE_FIELDS)
+            + compare('product', cls.compute_product_rows(start_day, end_day, site_ids, include_archive=True),
+                      stored_products, PRODUCT_FIELDS)
+        )
+
+    # ------------------------------------------------------------------
+    # Tenue à jour par écarts (dans la transaction d'écriture)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def sale_state(sale):
+        """Ce qui compte d'une vente dans les agrégats (instantané)"""
+        return {
+            'site_id': sale.site_configuration_id,
+            'day': local_day(sale.sale_date) if sale.sale_date else None,
+            'status': sale.status,
+            'total_amount': sale.total_amount or ZERO,
+            'payment_method': sale.payment_method,
+        }
+
+    @staticmethod
+    def item_state(item):
+        """Ce qui compte d'une ligne de vente (marge au prix d'achat du moment)"""
+        quantity = Decimal(str(item.quantity or 0))
+        purchase_price = item.product.purchase_price or ZERO
+        return {
+            'product_id': item.product_id,
+            'product_site_id': item.product.site_configuration_id,
+            'quantity': quantity,
+            'amount': item.amount or ZERO,
+            'margin': (Decimal(str(item.unit_price or 0)) - purchase_price) * quantity,
+        }
+
+    @staticmethod
+    def movement_state(movement):
+        """Ce qui compte d'un mouvement de stock"""
+        return {
+            'product_id': movement.product_id,
+            'site_id': movement.product.site_configuration_id,
+            'day': local_day(movement.transaction_date) if movement.transaction_date else None,
+            'type': movement.type,
+            'quantity': movement.quantity or ZERO,
+        }
+
+    @staticmethod
+    def previous_state(instance, state_of, queryset):
+        """
+        État enregistré d'une instance avant sa sauvegarde : instantané de son dernier
+        enregistrement, sinon relu en base (None pour une création)
+        """
+        if instance._state.adding or instance.pk is None:
+            return None
+        if hasattr(instance, '_rollup_state'):
+            return instance._rollup_state
+        stored = queryset.filter(pk=instance.pk).first()
+        return state_of(stored) if stored else None
+
+    @classmethod
+    def stored_sale_state(cls, sale_id, sale=None):
+        """État enregistré de la vente d'une ligne : instantané de l'instance chargée, sinon la base"""
+        if sale is not None and hasattr(sale, '_rollup_state'):
+            return sale._rollup_state
+        from apps.sales.models import Sale
+
+        stored = Sale.objects.filter(pk=sale_id).first()
+        return cls.sale_state(stored) if stored else None
+
+    @staticmethod
+    def _counts(sale_state):
+        """(site, jour) d'une vente terminée, None si elle ne compte pas"""
+        if sale_state and sale_state['status'] == 'completed' and sale_state['day']:
+            return sale_state['site_id'], sale_state['day']
+        return None
+
+    @classmethod
+    def _add_sale(cls, delta, state, sign):
+        key = cls._counts(state)
+        if key:
+            values = {'sales_count': 1, 'revenue': state['total_amount']}
+            payment_field = _payment_field(state['payment_method'])
+            if payment_field:
+                values[payment_field] = state['total_amount']
+            delta.add_site(*key, sign, **values)
+
+    @classmethod
+    def _add_item(cls, delta, item, sale_state, sign):
+        key = cls._counts(sale_state)
+        if key and item:
+            delta.add_site(*key, sign, margin=item['margin'])
+            delta.add_product(
+                item['product_id'], item['product_site_id'], key[1], sign,
+                quantity_sold=item['quantity'], revenue=item['amount'], margin=item['margin'],
+            )
+
+    @classmethod
+    def _add_sale_items(cls, delta, sale_id, sale_state, sign):
+        """Lignes d'une vente qui entre dans les agrégats ou en sort : une requête groupée"""
+        from apps.sales.models import SaleItem
+
+        if not cls._counts(sale_state):
+            return
+        for row in (
+            SaleItem.objects.filter(sale_id=sale_id).order_by()
+            .values('product_id', 'product__site_configuration_id')
+            .annotate(sold=Sum('quantity'), line_amount=Sum('amount'), line_margin=Sum(LINE_MARGIN))
+        ):
+            cls._add_item(delta, {
+                'product_id': row['product_id'], 'product_site_id': row['product__site_configuration_id'],
+                'quantity': row['sold'], 'amount': row['line_amount'], 'margin': row['line_margin'],
+            }, sale_state, sign)
+
+    @staticmethod
+    def _add_movement(delta, state, sign):
+        if not state or not state['day'] or state['type'] == 'opening':
+            return
+        field = MOVEMENT_FIELD_BY_TYPE.get(state['type'])
+        quantities = {field: state['quantity']} if field else {}
+        delta.add_site(state['site_id'], state['day'], sign, movement_count=1, **quantities)
+        if quantities:
+            delta.add_product(state['product_id'], state['site_id'], state['day'], sign, **quantities)
+
+    @classmethod
+    def record_sale(cls, sale, previous=None, created=False, deleted=False):
+        """
+        Vente créée, modifiée ou supprimée. Les lignes suivent la vente quand elle entre dans
+        les agrégats ou en sort (terminée / annulée, jour ou site changé) ; à la suppression,
+        chaque ligne supprimée retire elle-même sa part (record_sale_item).
+        """
+        current = None if deleted else cls.sale_state(sale)
+        delta = RollupDelta()
+        cls._add_sale(delta, previous, -1)
+        cls._add_sale(delta, current, 1)
+        if not created and not deleted and cls._counts(previous) != cls._counts(current):
+            cls._add_sale_items(delta, sale.pk, previous, -1)
+            cls._add_sale_items(delta, sale.pk, current, 1)
+        cls.apply(delta)
+        sale._rollup_state = current
+
+    @classmethod
+    def record_sale_item(cls, item, sale_state, previous=None, deleted=False):
+        """Ligne de vente créée, modifiée ou supprimée (dans une vente terminée)"""
+        current = None if deleted else cls.item_state(item)
+        if deleted:
+            previous = getattr(item, '_rollup_state', None) or cls.item_state(item)
+        delta = RollupDelta()
+        cls._add_item(delta, previous, sale_state, -1)
+        cls._add_item(delta, current, sale_state, 1)
+        cls.apply(delta)
+        item._rollup_state = current
+
+    @classmethod
+    def record_movement(cls, movement, previous=None, deleted=False):
+        """Mouvement de stock créé, modifié ou supprimé"""
+        current = None if deleted else cls.movement_state(movement)
+        if deleted:
+            previous = getattr(movement, '_rollup_state', None) or cls.movement_state(movement)
+        delta = RollupDelta()
+        cls._add_movement(delta, previous, -1)
+        cls._add_movement(delta, current, 1)
+        cls.apply(delta)
+        movement._rollup_state = current
+
+    @classmethod
+    def record_movements(cls, movements):
+        """Mouvements créés par bulk_create (sans signal) : écarts regroupés, une application"""
+        delta = RollupDelta()
+        for movement in movements:
+            movement._rollup_state = cls.movement_state(movement)
+            cls._add_movement(delta, movement._rollup_state, 1)
+        cls.apply(delta)
+
+    @staticmethod
+    def _increment_site(site_id, day, values, now):
+        """Ajoute les écarts à la ligne du site (une requête), créée au premier écart du jour"""
+        values = {field: value for field, value in values.items() if value}
+        if not values:
+            return
+        increments = {field: F(field) + value for field, value in values.items()}
+        rows = DailySiteRollup.objects.filter(site_configuration_id=site_id, date=day)
+        if rows.update(updated_at=now, **increments):
+            return
+        _, created = DailySiteRollup.objects.get_or_create(
+            site_configuration_id=site_id, date=day, defaults={'updated_at': now, **values}
+        )
+        if not created:  # Créée entre-temps par une transaction concurrente
+            rows.update(updated_at=now, **increments)
+
+    @classmethod
+    def _increment_products(cls, delta):
+        """
+        Écarts des lignes produit en nombre fixe de requêtes : lignes existantes relues,
+        manquantes créées en masse, existantes incrémentées par un bulk_update d'expressions F()
+        """
+        deltas = {key: {f: v for f, v in values.items() if v} for key, values in delta.products.items()}
+        deltas = {key: values for key, values in deltas.items() if values}
+        if not deltas:
+            return
+        existing = {
+            (row.product_id, row.date): row
+            for row in DailyProductRollup.objects.filter(
+                product_id__in={product_id for product_id, _ in deltas}, date__in={day for _, day in deltas}
+            ).only('pk', 'product_id', 'date')
+        }
+        DailyProductRollup.objects.bulk_create([
+            DailyProductRollup(
+                product_id=product_id, date=day, site_configuration_id=delta.product_sites[(product_id, day)], **values
+            )
+            for (product_id, day), values in deltas.items() if (product_id, day) not in existing
+        ], batch_size=cls.BATCH_SIZE)
+        fields = sorted({field for key, values in deltas.items() if key in existing for field in values})
+        rows = []
+        for key, row in existing.items():
+            if key in deltas:
+                for field in fields:
+                    setattr(row, field, F(field) + deltas[key].get(field, 0))
+                rows.append(row)
+        if rows:
+            DailyProductRollup.objects.bulk_update(rows, fields, batch_size=cls.BATCH_SIZE)
+
+    @classmethod
+    def apply(cls, delta):
+        """
+        Applique les écarts. Une ligne incohérente (agrégats jamais construits pour ce jour :
+        compteur qui deviendrait négatif) est recalculée après commit à la place.
+        """
+        if not delta.sites and not delta.products:
+            return
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                for (site_id, day), values in delta.sites.items():
+                    cls._increment_site(site_id, day, values, now)
+                cls._increment_products(delta)
+        except IntegrityError as e:
+            logger.warning("⚠️ [ROLLUPS] Écart non applicable (%s) : recalcul des jours concernés", e)
+            products = defaultdict(set)
+            for (product_id, day) in delta.products:
+                products[(delta.product_sites[(product_id, day)], day)].add(product_id)
+            for site_id, day in set(delta.sites) | set(products):
+                cls.schedule(site_id, day, products[(site_id, day)])
+
+    # ------------------------------------------------------------------
+    # Recalcul après commit (écritures groupées sans écart par ligne)
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def schedule(cls, site_id, day, product_ids=()):
+        """Planifie le recalcul d'un jour ; les demandes d'une même transaction sont regroupées"""
+        if not hasattr(_pending, 'days'):
+            _pending.days = {}
+        _pending.days.setdefault((site_id, day), set()).update(product_ids)
+        transaction.on_commit(cls.flush)
+
+    @classmethod
+    def flush(cls):
+        """Recalcule les jours planifiés (appelé après commit, une fois par lot de demandes)"""
+        days = getattr(_pending, 'days', None)
+        if not days:
+            return
+        _pending.days = {}
+        for (site_id, day), product_ids in days.items():
+            try:
+                cls.refresh_day(site_id, day, product_ids)
+            except Exception as e:
+                # Les agrégats restent rattrapables par rebuild_rollups
+                logger.error(f"❌ [ROLLUPS] Échec du recalcul site {site_id} / {day}: {e}", exc_info=True)
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_site_rollups(user):
+        """Agrégats journaliers visibles par l'utilisateur"""
+        if user.is_superuser:
+            return DailySiteRollup.objects.all()
+        user_site = getattr(user, 'site_configuration', None)
+        if user_site:
+            return DailySiteRollup.objects.filter(site_configuration=user_site)
+        return DailySiteRollup.objects.none()
+
+    @classmethod
+    def get_sales_summary(cls, user, start_day, end_day):
+        """
+        Ventes terminées de la période (jours inclus) : une requête sur une ligne par jour.
+        Clés : sales_count, total_revenue, total_margin, {mode}_revenue
+        """
+        summary = cls.get_site_rollups(user).filter(date__range=(start_day, end_day)).aggregate(
+            sales_count=Sum('sales_count'),
+            total_revenue=Sum('revenue'),
+            total_margin=Sum('margin'),
+            **{f'{method}_revenue': Sum(f'revenue_{method}') for method in PAYMENT_METHODS},
+        )
+        return {key: value or (0 if key == 'sales_count' else ZERO) for key, value in summary.items()}
@@ -0,0 +1,142 @@
+"""
+Coût des sessions Django sur le trafic API des caisses mobiles.
+
+Les scénarios de caisse d'ApiBenchmark sont rejoués (une caisse, client de test) avec
+un jeton JWT et un cookie de session valide, comme le renvoie une application dont le
+gestionnaire de cookies a conservé la session d'une connexion web :
+
+- before : SessionMiddleware de Django, sessions en base, SESSION_SAVE_EVERY_REQUEST
+  (réglages d'origine) : chaque requête API relit et réenregistre la session ;
+- after : PathAwareSessionMiddleware et SESSION_ENGINE des settings.
+
+Les requêtes SQL de la connexion principale sont comptées par type : écritures
+(INSERT / UPDATE / DELETE) et accès à la table des sessions. Les configurations sont
+alternées sur plusieurs tours ; on garde la médiane des tours.
+"""
+import statistics
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.utils.module_loading import import_string
+
+from apps.inventory.services.api_benchmark import ApiBenchmark, ClientTransport
+
+SESSION_MIDDLEWARE = 'apps.core.middlewares.PathAwareSessionMiddleware'
+DJANGO_SESSION_MIDDLEWARE = 'django.contrib.sessions.middleware.SessionMiddleware'
+SCENARIOS = ('scan_checkout', 'product_scroll')
+MODES = ('before', 'after')
+
+
+def mode_settings(mode):
+    """Réglages de la configuration `mode` (before : ceux d'origine)"""
+    if mode == 'after':
+        return {}
+    return {
+        'MIDDLEWARE': [DJANGO_SESSION_MIDDLEWARE if name == SESSION_MIDDLEWARE else name
+                       for name in settings.MIDDLEWARE],
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'SESSION_SAVE_EVERY_REQUEST': True,
+    }
+
+
+class StatementCounter:
+    """execute_wrapper : requêtes, écritures et accès à la table des sessions"""
+
+    def __init__(self):
+        self.queries = self.writes = self.session_queries = self.session_writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        write = sql.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE')
+        session = 'django_session' in sql
+        self.queries += 1
+        self.writes += write
+        self.session_queries += session
+        self.session_writes += write and session
+        return execute(sql, params, many, context)
+
+
+class _SessionCookieApiBenchmark(ApiBenchmark):
+    """ApiBenchmark dont chaque caisse renvoie aussi le cookie d'une session connectée"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counter = StatementCounter()
+
+    def _run_phase(self, registers, scenario):
+        # Seules les requêtes des scénarios sont comptées (pas la préparation des caisses)
+        with connection.execute_wrapper(self.counter):
+            return super()._run_phase(registers, scenario)
+
+    def client_transport(self, token):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        user = get_user_model().objects.get(pk=AccessToken(token)['user_id'])
+        session = import_string(f"{settings.SESSION_ENGINE}.SessionStore")()
+        session.update({
+            SESSION_KEY: str(user.pk),
+            BACKEND_SESSION_KEY: settings.AUTHENTICATION_BACKENDS[0],
+            HASH_SESSION_KEY: user.get_session_auth_hash(),
+        })
+        session.save()
+        transport = ClientTransport(token)
+        transport.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        return transport
+
+
+class SessionBenchmark:
+    """Rejoue `scenarios` sous chaque configuration de `modes`, `rounds` fois en alternance"""
+
+    def __init__(self, sites, modes=MODES, iterations=10, scenarios=SCENARIOS, rounds=3, seed=42, log=None):
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise ValueError(f"Configuration(s) inconnue(s) : {', '.join(sorted(unknown))}")
+        self.sites = list(sites)
+        self.modes = list(modes)
+        self.iterations = iterations
+        self.scenarios = list(scenarios)
+        self.rounds = max(1, rounds)
+        self.seed = seed
+        self.log = log or (lambda message: None)
+
+    def _measure(self, mode):
+        benchmark = _SessionCookieApiBenchmark(
+            self.sites, registers=1, iterations=self.iterations, scenarios=self.scenarios, seed=self.seed,
+        )
+        with override_settings(**mode_settings(mode)):
+            report = benchmark.run()
+        return report, benchmark.counter
+
+    def run(self):
+        """Rapport par configuration : ms, requêtes SQL, écritures et accès aux sessions par requête API"""
+        samples = {mode: [] for mode in self.modes}
+        for round_number in range(self.rounds):
+            for mode in self.modes:
+                report, counter = self._measure(mode)
+                samples[mode].append((report, counter))
+                self.log(f"tour {round_number + 1}, {mode} : {counter.session_writes} écriture(s) de session")
+        return {
+            'iterations': self.iterations,
+            'rounds': self.rounds,
+            'session_engine': settings.SESSION_ENGINE,
+            'modes': {mode: self._summarize(runs) for mode, runs in samples.items()},
+        }
+
+    def _summarize(self, runs):
+        requests = sum(scenario['requests'] for scenario in runs[0][0]['scenarios'].values())
+
+        def per_request(value):
+            return round(statistics.median(value(report, counter) for report, counter in runs) / requests, 3)
+
+        return {
+            'requests': requests,
+            'errors': max(sum(s['errors'] for s in report['scenarios'].values()) for report, _ in runs),
+            'ms_per_request': per_request(
+                lambda report, _: 1000 * sum(s['wall_seconds'] for s in report['scenarios'].values())
+            ),
+            'queries_per_request': per_request(lambda _, counter: counter.queries),
+            'writes_per_request': per_request(lambda _, counter: counter.writes),
+            'session_queries_per_request': per_request(lambda _, counter: counter.session_queries),
+            'session_writes_per_request': per_request(lambda _, counter: counter.session_writes),
+        }
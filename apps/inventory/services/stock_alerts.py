@@ -0,0 +1,263 @@
+"""
+Alertes de stock déclenchées au franchissement d'un seuil.
+
+Chaque mouvement compare le stock avant / après (pour les ajouts et retraits : dans
+le même UPDATE ... RETURNING) ; une notification n'est écrite que lorsque la quantité
+passe sous le seuil d'alerte ou à zéro. Une seule alerte non lue par produit et par
+niveau (contrainte unique partielle sur Notification), compteur de non-lus par site
+dans le cache partagé (espace de noms 'stock_alerts' du site), résumé périodique par site : aucun parcours du catalogue.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from apps.core.cache import Namespace
+from apps.core.models import Configuration, Notification
+from apps.inventory.models import Product
+from apps.inventory.services.product_copy import ProductCopySyncService
+
+logger = logging.getLogger(__name__)
+
+QUANTITY_STEP = Decimal('0.001')
+
+LEVELS = {
+    'out_of_stock': ('error', 'Rupture de stock', 2),
+    'low_stock': ('warning', 'Stock faible', 1),
+}
+
+
+class StockAlertService:
+    """
+    Détection des franchissements de seuil, notifications dédoublonnées et compteur par site
+    """
+    ALERT_PREFIX = 'stock:'
+    DIGEST_PREFIX = 'digest:'
+    CACHE_TIMEOUT = 300  # 5 minutes
+    DIGEST_TOP_PRODUCTS = 10
+
+    @staticmethod
+    def crossing(old_quantity, new_quantity, threshold):
+        """Niveau franchi à la baisse ('out_of_stock', 'low_stock') ou None"""
+        if new_quantity <= 0 < old_quantity:
+            return 'out_of_stock'
+        if new_quantity <= threshold < old_quantity:
+            return 'low_stock'
+        return None
+
+    @classmethod
+    def alert_key(cls, level, product_id):
+        return f"{cls.ALERT_PREFIX}{level}:{product_id}"
+
+    @classmethod
+    def unread_cache(cls, site_id):
+        return Namespace('stock_alerts', site_id, timeout=cls.CACHE_TIMEOUT)
+
+    @classmethod
+    def invalidate_unread(cls, site_id):
+        cls.unread_cache(site_id).delete('unread')
+
+    # ------------------------------------------------------------------
+    # Mouvements
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def adjust_quantity(cls, product, delta):
+        """
+        Ajoute `delta` au stock en une requête (UPDATE ... RETURNING), sans relire le produit
+        ni passer par Product.save(). Met à jour l'instance et détecte le franchissement.
+
+        Returns:
+            tuple: (ancienne quantité, nouvelle quantité)
+        """
+        now = timezone.now()
+        table = connection.ops.quote_name(Product._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET quantity = quantity + %s, updated_at = %s, stock_updated_at = %s "
+                f"WHERE id = %s RETURNING quantity, alert_threshold, site_configuration_id",
+                [delta, now, now, product.pk],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise Product.DoesNotExist(f"Produit {product.pk} introuvable")
+
+        # SQLite renvoie des flottants : revenir à la précision du champ
+        new_quantity = Decimal(str(row[0])).quantize(QUANTITY_STEP)
+        threshold = Decimal(str(row[1])).quantize(QUANTITY_STEP)
+        old_quantity = new_quantity - Decimal(str(delta))
+        product.quantity = new_quantity
+        product.alert_threshold = threshold
+        product.updated_at = product.stock_updated_at = now
+        product.reset_sync_snapshot()
+
+        # Product.save() n'est pas appelé : propager le stock aux copies synchronisées
+        values = {product.pk: new_quantity}
+        transaction.on_commit(lambda: ProductCopySyncService.propagate_values('quantity', values))
+        cls.notify_crossing(row[2], product, old_quantity, new_quantity, threshold)
+        return old_quantity, new_quantity
+
+    @classmethod
+    def check_saved_product(cls, product):
+        """Après Product.save() : compare au stock chargé depuis la base (aucune requête)"""
+        change = product.get_sync_changes().get('quantity')
+        if change and change[0] is not None:
+            cls.notify_crossing(
+                product.site_configuration_id, product, change[0], change[1], product.alert_threshold
+            )
+
+    @classmethod
+    def check_bulk(cls, changes):
+        """
+        Mises à jour en masse : `changes` = [(produit, ancienne quantité, nouvelle quantité)].
+        Une requête pour les propriétaires des sites, une insertion groupée des alertes.
+        """
+        crossed = []
+        for product, old_quantity, new_quantity in changes:
+            level = cls.crossing(old_quantity, new_quantity, product.alert_threshold)
+            if level and product.site_configuration_id:
+                crossed.append((product, level, old_quantity, new_quantity))
+        if not crossed:
+            return 0
+        owners = dict(Configuration.objects.filter(
+            pk__in={product.site_configuration_id for product, *_ in crossed}
+        ).values_list('id', 'site_owner_id'))
+        return cls._write_alerts([
+            cls._build_alert(owners[product.site_configuration_id], product.site_configuration_id, product,
+                             level, old_quantity, new_quantity, product.alert_threshold)
+            for product, level, old_quantity, new_quantity in crossed
+            if owners.get(product.site_configuration_id)
+        ])
+
+    # ------------------------------------------------------------------
+    # Notifications
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _build_alert(cls, owner_id, site_id, product, level, old_quantity, new_quantity, threshold):
+        type_notification, title, priority = LEVELS[level]
+        return Notification(
+            destinataire_id=owner_id,
+            site_configuration_id=site_id,
+            cle_alerte=cls.alert_key(level, product.pk),
+            type_notification=type_notification,
+            titre=f"{title} : {product.name}",
+            message=f"Stock de {product.name} passé de {old_quantity} à {new_quantity} (seuil d'alerte : {threshold}).",
+            priorite=priority,
+        )
+
+    @classmethod
+    def _write_alerts(cls, alerts):
+        """Insère les alertes ; ignore_conflicts conserve telle quelle une alerte identique non lue"""
+        Notification.objects.bulk_create(alerts, ignore_conflicts=True)
+        site_ids = {alert.site_configuration_id for alert in alerts}
+
+        def invalidate():
+            for site_id in site_ids:
+                cls.invalidate_unread(site_id)
+
+        transaction.on_commit(invalidate)
+        for alert in alerts:
+            logger.info(f"⚠️ [STOCK_ALERT] Site {alert.site_configuration_id}: {alert.cle_alerte}")
+        return len(alerts)
+
+    @classmethod
+    def notify_crossing(cls, site_id, product, old_quantity, new_quantity, threshold):
+        """Écrit l'alerte du site si un seuil vient d'être franchi ; retourne le niveau ou None"""
+        level = cls.crossing(old_quantity, new_quantity, threshold)
+        if level is None or site_id is None:
+            return None
+        owner_id = Configuration.objects.filter(pk=site_id).values_list('site_owner_id', flat=True).first()
+        if owner_id is None:
+            return None
+        cls._write_alerts([cls._build_alert(owner_id, site_id, product, level, old_quantity, new_quantity, threshold)])
+        return level
+
+    @classmethod
+    def get_alerts(cls, site):
+        """Alertes de stock non lues du site"""
+        return Notification.objects.filter(
+            site_configuration=site, lu=False, cle_alerte__startswith=cls.ALERT_PREFIX
+        )
+
+    @classmethod
+    def get_unread_count(cls, site):
+        """Nombre d'alertes non lues du site, mis en cache jusqu'à la prochaine alerte ou lecture"""
+        return cls.unread_cache(site.id).get_or_compute('unread', compute=cls.get_alerts(site).count)
+
+    @classmethod
+    def mark_read(cls, site, ids=None):
+        """Marque comme lues les alertes du site (toutes ou celles indiquées) ; retourne leur nombre"""
+        alerts = cls.get_alerts(site)
+        if ids is not None:
+            alerts = alerts.filter(id__in=ids)
+        updated = alerts.update(lu=True, date_lecture=timezone.now(), updated_at=timezone.now())
+        cls.invalidate_unread(site.id)
+        return updated
+
+    # ------------------------------------------------------------------
+    # Résumé périodique
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build_digests(cls, since):
+        """
+        Regroupe par site les alertes non lues créées depuis `since` : deux requêtes
+        (compteurs par site et niveau, puis derniers produits concernés).
+
+        Returns:
+            dict: {site_id: {'counts': {niveau: n}, 'titles': [...], 'owner_id': id}}
+        """
+        digests = defaultdict(lambda: {'counts': {}, 'titles': [], 'owner_id': None})
+        alerts = Notification.objects.filter(
+            lu=False, cle_alerte__startswith=cls.ALERT_PREFIX, created_at__gte=since,
+            site_configuration__isnull=False,
+        )
+        for row in (
+            alerts.order_by().values('site_configuration_id', 'type_notification')
+            .annotate(total=Count('id'), owner_id=Max('destinataire_id'))
+        ):
+            digest = digests[row['site_configuration_id']]
+            level = next(name for name, spec in LEVELS.items() if spec[0] == row['type_notification'])
+            digest['counts'][level] = row['total']
+            digest['owner_id'] = row['owner_id']
+
+        for site_id, title in alerts.order_by('site_configuration_id', '-priorite', '-created_at').values_list(
+            'site_configuration_id', 'titre'
+        ):
+            titles = digests[site_id]['titles']
+            if len(titles) < cls.DIGEST_TOP_PRODUCTS:
+                titles.append(title)
+        return dict(digests)
+
+    @classmethod
+    def send_digests(cls, since, day=None):
+        """
+        Écrit une notification de résumé par site ayant des alertes (une par site et par jour).
+
+        Returns:
+            int: Nombre de sites résumés
+        """
+        day = day or timezone.localdate()
+        digests = cls.build_digests(since)
+        notifications = []
+        for site_id, digest in digests.items():
+            parts = [
+                f"{digest['counts'][level]} {LEVELS[level][1].lower()}"
+                for level in LEVELS if level in digest['counts']
+            ]
+            lines = '\n'.join(f"- {title}" for title in digest['titles'])
+            notifications.append(Notification(
+                destinataire_id=digest['owner_id'],
+                site_configuration_id=site_id,
+                cle_alerte=f"{cls.DIGEST_PREFIX}{day.isoformat()}",
+                type_notification='info',
+                titre=f"Résumé des alertes de stock : {', '.join(parts)}",
+                message=lines,
+            ))
+        Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+        logger.info(f"✅ [STOCK_ALERT] Résumé envoyé à {len(notifications)} site(s)")
+        return len(notifications)
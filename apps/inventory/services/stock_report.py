@@ -0,0 +1,262 @@
+"""
+Moteur du rapport de stock (vue web stock_report, tableau de bord).
+
+Chaque indicateur est un agrégat conditionnel calculé en base : un nombre fixe
+de requêtes par période, quel que soit le volume de produits, de mouvements et
+de ventes (plus de boucle Python sur les transactions ni sur sale.items.all()).
+Les chiffres de vente sont lus dans les agrégats journaliers (DailySiteRollup).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    Case, Count, DecimalField, ExpressionWrapper, F, Max, Q, Sum, Value, When
+)
+from django.db.models.functions import Abs, Coalesce
+from django.utils import timezone
+
+from apps.inventory.models import Product, Transaction
+from apps.inventory.services.rollups import PAYMENT_METHODS, RollupService, local_day
+
+ZERO = Decimal('0')
+
+AMOUNT = DecimalField(max_digits=16, decimal_places=2)
+QUANTITY = DecimalField(max_digits=14, decimal_places=3)
+
+# Ajustements d'inventaire : type 'adjustment', ou entrée/sortie marquée comme correction d'inventaire
+ADJUSTMENT_Q = Q(type='adjustment') | Q(type__in=['in', 'out'], reason=Transaction.REASON_INVENTORY)
+# Sens de l'ajustement (les 'out' sont toujours négatifs, les 'in' toujours positifs)
+POSITIVE_Q = ADJUSTMENT_Q & ((Q(type='in') & ~Q(quantity=0)) | Q(type='adjustment', quantity__gt=0))
+NEGATIVE_Q = ADJUSTMENT_Q & ((Q(type='out') & ~Q(quantity=0)) | Q(type='adjustment', quantity__lt=0))
+LOSS_Q = Q(type='loss')
+WEIGHT_Q = Q(product__sale_unit_type='weight')
+
+
+def get_period_range(period, now=None):
+    """Début et fin de la période ('today', 'week', 'month')"""
+    now = now or timezone.now()
+    if period == 'week':
+        start_date = now - timedelta(days=now.weekday())
+    elif period == 'month':
+        start_date = now.replace(day=1)
+    else:
+        start_date = now
+    return start_date.replace(hour=0, minute=0, second=0, microsecond=0), now
+
+
+class StockReportService:
+    """
+    Calcul des indicateurs du rapport de stock pour un utilisateur et une période
+    """
+
+    @staticmethod
+    def get_scope(user):
+        """Produits, transactions et ventes visibles par l'utilisateur"""
+        from apps.sales.models import Sale
+        from apps.subscription.services import SubscriptionService
+
+        user_site = getattr(user, 'site_configuration', None)
+        if user.is_superuser:
+            return Product.objects.all(), Transaction.objects.all(), Sale.objects.all()
+        if user_site:
+            return (
+                SubscriptionService.get_products_queryset(user_site, exclude_excess=True).select_related(None),
+                Transaction.objects.filter(product__site_configuration=user_site),
+                Sale.objects.filter(site_configuration=user_site),
+            )
+        return Product.objects.none(), Transaction.objects.none(), Sale.objects.none()
+
+    @staticmethod
+    def get_stock_summary(products):
+        """État actuel du stock : une requête"""
+        summary = products.aggregate(
+            total_products=Count('id'),
+            total_categories=Count('category', distinct=True),
+            total_brands=Count('brand', distinct=True),
+            total_value=Sum(ExpressionWrapper(F('purchase_price') * F('quantity'), output_field=AMOUNT)),
+            low_stock=Count('id', filter=Q(quantity__lte=F('alert_threshold'))),
+            out_of_stock=Count('id', filter=Q(quantity=0)),
+        )
+        summary['total_value'] = summary['total_value'] or ZERO
+        return summary
+
+    @staticmethod
+    def _unit_aggregates(prefix, condition, quantity, value):
+        """Quantités, nombres et unité d'affichage d'un groupe, séparés poids / quantité"""
+        return {
+            f'{prefix}_count': Count('id', filter=condition),
+            f'{prefix}_val': Sum(value, filter=condition),
+            f'{prefix}_qty_weight': Sum(quantity, filter=condition & WEIGHT_Q),
+            f'{prefix}_qty_quantity': Sum(quantity, filter=condition & ~WEIGHT_Q),
+            f'{prefix}_count_weight': Count('id', filter=condition & WEIGHT_Q),
+            f'{prefix}_count_quantity': Count('id', filter=condition & ~WEIGHT_Q),
+            # 'kg' si au moins un produit au kg, sinon 'g'
+            f'{prefix}_unit_weight': Max(Coalesce('product__weight_unit', Value('kg')), filter=condition & WEIGHT_Q),
+        }
+
+    @classmethod
+    def get_movement_summary(cls, period_transactions):
+        """Ajustements positifs/négatifs et casse de la période : une requête"""
+        stats = period_transactions.aggregate(
+            adjustments_count=Count('id', filter=ADJUSTMENT_Q),
+            **cls._unit_aggregates('pos', POSITIVE_Q, Abs('quantity'), Abs('total_amount')),
+            **cls._unit_aggregates('neg', NEGATIVE_Q, Abs('quantity'), Abs('total_amount')),
+            # La casse est sommée telle quelle (valeurs positives)
+            **cls._unit_aggregates('loss', LOSS_Q, F('quantity'), F('total_amount')),
+        )
+        for key, value in stats.items():
+            if value is None and not key.endswith('_unit_weight'):
+                stats[key] = ZERO
+        return stats
+
+    @staticmethod
+    def get_top_products(period_transactions, limit=10):
+        """Produits aux écarts les plus importants (en valeur) : deux requêtes"""
+        rows = list(
+            period_transactions.filter(ADJUSTMENT_Q | LOSS_Q)
+            .values('product_id')
+            .annotate(
+                adjustments_count=Count('id', filter=~LOSS_Q),
+                loss_count=Count('id', filter=LOSS_Q),
+                total_abs_qty=Sum(Abs('quantity')),
+                total_abs_val=Coalesce(Sum(Abs('total_amount')), Value(ZERO), output_field=AMOUNT),
+                net_qty=Sum(Case(
+                    When(Q(type__in=['loss', 'out']), then=-Abs('quantity')),
+                    default=F('quantity'),
+                    output_field=QUANTITY,
+                )),
+            )
+            .order_by('-total_abs_val', 'product_id')[:limit]
+        )
+        products = Product.objects.select_related('category', 'brand').in_bulk([row['product_id'] for row in rows])
+        return [{'product': products.get(row.pop('product_id')), **row} for row in rows]
+
+    @staticmethod
+    def _units(stats, prefix):
+        """Clés d'affichage par type d'unité, telles qu'attendues par les gabarits"""
+        return {
+            f'{prefix}_qty_weight': stats[f'{prefix}_qty_weight'],
+            f'{prefix}_qty_quantity': stats[f'{prefix}_qty_quantity'],
+            f'{prefix}_unit_weight': stats[f'{prefix}_unit_weight'] or 'kg',
+            f'{prefix}_unit_quantity': 'unité(s)',
+        }
+
+    @classmethod
+    def build_report(cls, user, period='today', include_stock=True, include_top_products=True):
+        """
+        Toutes les données du rapport de stock de la période.
+
+        Returns:
+            dict: contexte du gabarit inventory/stock_report.html
+        """
+        start_date, end_date = get_period_range(period)
+        products, transactions, _ = cls.get_scope(user)
+        period_transactions = transactions.filter(transaction_date__range=[start_date, end_date])
+
+        movements = cls.get_movement_summary(period_transactions)
+        # Ventes : agrégats journaliers (une ligne par jour) plutôt que les ventes brutes
+        finance = RollupService.get_sales_summary(user, local_day(start_date), local_day(end_date))
+        stock = cls.get_stock_summary(products) if include_stock else {}
+
+        # Écarts négatifs affichés = ajustements négatifs + casse
+        neg_display = {
+            'weight': movements['neg_qty_weight'] + abs(movements['loss_qty_weight']),
+            'quantity': movements['neg_qty_quantity'] + abs(movements['loss_qty_quantity']),
+        }
+        neg_display_unit_weight = movements['neg_unit_weight'] or movements['loss_unit_weight'] or 'kg'
+
+        total_losses = movements['loss_val']
+        total_shrinkage = movements['neg_val']
+        total_costs = total_losses + total_shrinkage
+        total_revenue = finance['total_revenue']
+        total_margin = finance['total_margin']
+        net_profit = total_margin - total_costs
+
+        report = {
+            'period': period,
+            'today': end_date,
+            'pos_adj_count': movements['pos_count'],
+            'neg_adj_count': movements['neg_count'] + movements['loss_count'],
+            'total_pos_val': movements['pos_val'],
+            'total_neg_val': movements['neg_val'] + movements['loss_val'],
+            **cls._units(movements, 'pos'),
+            'negative_qty_weight': neg_display['weight'],
+            'negative_qty_quantity': neg_display['quantity'],
+            'negative_unit_weight': neg_display_unit_weight,
+            'negative_unit_quantity': 'unité(s)',
+            'loss_count': movements['loss_count'],
+            'loss_val': movements['loss_val'],
+            **cls._units(movements, 'loss'),
+            'unknown_count': movements['neg_count'],
+            'unknown_val': movements['neg_val'],
+            'unknown_qty_weight': movements['neg_qty_weight'],
+            'unknown_qty_quantity': movements['neg_qty_quantity'],
+            'unknown_unit_weight': movements['neg_unit_weight'] or 'kg',
+            'unknown_unit_quantity': 'unité(s)',
+            'total_revenue': total_revenue,
+            'total_margin': total_margin,
+            'total_losses': total_losses,
+            'total_shrinkage': total_shrinkage,
+            'total_costs': total_costs,
+            'net_profit': net_profit,
+            'profit_margin': (net_profit / total_revenue * 100) if total_revenue > 0 else ZERO,
+            **{f'{method}_revenue': finance[f'{method}_revenue'] for method in PAYMENT_METHODS},
+        }
+        # Renommage vers les clés historiques du gabarit
+        for key in ('qty_weight', 'qty_quantity', 'unit_weight', 'unit_quantity'):
+            report[f'positive_{key}'] = report.pop(f'pos_{key}')
+
+        if not include_stock:
+            return report
+
+        total_value = stock['total_value']
+        has_positive_mixed = movements['pos_count_weight'] > 0 and movements['pos_count_quantity'] > 0
+        negative_has_weight = movements['neg_count_weight'] + movements['loss_count_weight'] > 0
+        negative_has_quantity = movements['neg_count_quantity'] + movements['loss_count_quantity'] > 0
+        has_negative_mixed = negative_has_weight and negative_has_quantity
+        has_loss_mixed = movements['loss_count_weight'] > 0 and movements['loss_count_quantity'] > 0
+
+        def single_unit(counts_quantity, counts_weight, qty_quantity, qty_weight, weight_unit):
+            """Quantité et unité uniques quand un seul type d'unité est présent"""
+            if counts_quantity:
+                return qty_quantity, 'unité(s)'
+            if counts_weight:
+                return qty_weight, weight_unit
+            return ZERO, 'unité(s)'
+
+        total_pos_qty, positive_unit = single_unit(
+            movements['pos_count_quantity'], movements['pos_count_weight'],
+            movements['pos_qty_quantity'], movements['pos_qty_weight'], report['positive_unit_weight'],
+        )
+        total_neg_qty, negative_unit = single_unit(
+            negative_has_quantity, negative_has_weight,
+            neg_display['quantity'], neg_display['weight'], neg_display_unit_weight,
+        )
+        loss_qty, loss_unit = single_unit(
+            movements['loss_count_quantity'], movements['loss_count_weight'],
+            movements['loss_qty_quantity'], movements['loss_qty_weight'], report['loss_unit_weight'],
+        )
+
+        report.update(stock)
+        report.update({
+            'adjustments_count': movements['adjustments_count'] + movements['loss_count'],
+            'total_pos_qty': ZERO if has_positive_mixed else total_pos_qty,
+            'total_neg_qty': ZERO if has_negative_mixed else total_neg_qty,
+            'has_positive_mixed': has_positive_mixed,
+            'has_negative_mixed': has_negative_mixed,
+            'positive_unit': positive_unit,
+            'negative_unit': negative_unit,
+            'loss_qty': ZERO if has_loss_mixed else loss_qty,
+            'has_loss_mixed': has_loss_mixed,
+            'loss_unit': loss_unit,
+            'unknown_qty': ZERO if has_negative_mixed else total_neg_qty,
+            'has_unknown_mixed': has_negative_mixed,
+            'unknown_unit': negative_unit,
+            'top_products': cls.get_top_products(period_transactions) if include_top_products else [],
+            'average_margin_percentage': (total_margin / total_revenue * 100) if total_revenue > 0 else ZERO,
+            'gross_profit': total_margin,
+            'stock_turnover_ratio': (total_revenue / total_value) if total_value > 0 else ZERO,
+            'loss_rate': (total_losses / total_value * 100) if total_value > 0 else ZERO,
+            'shrinkage_rate': (total_shrinkage / total_value * 100) if total_value > 0 else ZERO,
+        })
+        return report
@@ -0,0 +1,178 @@
+"""
+Valorisation du stock (vue web stock_valuation, API et export CSV).
+
+Les totaux par catégorie et par marque sont des agrégats groupés calculés en
+base (une requête par regroupement) ; le total général est le cumul des groupes,
+équivalent d'un GROUP BY ROLLUP. La valorisation à une date passée reconstitue
+les quantités à partir du journal des transactions (archives des périodes clôturées
+comprises).
+"""
+from datetime import datetime, time
+
+from django.db.models import Case, Count, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from apps.inventory.models import Transaction, TransactionArchive
+from apps.inventory.services.stock_report import AMOUNT, QUANTITY, ZERO, StockReportService
+
+# Regroupements disponibles : (clé, libellé, libellé des produits sans valeur)
+GROUPINGS = {
+    'category': ('category_id', 'category__name', "Non catégorisé"),
+    'brand': ('brand_id', 'brand__name', "Non spécifié"),
+}
+
+# Effet d'une transaction sur le stock (même convention que TransactionCreateView :
+# les ajustements stockent le delta signé). Les soldes d'ouverture d'une clôture ne
+# comptent pas : les mouvements qu'ils résument sont lus dans l'archive.
+SIGNED_QUANTITY = Case(
+    When(type='in', then=F('quantity')),
+    When(type__in=['out', 'loss', 'backorder'], then=-F('quantity')),
+    When(type='adjustment', then=F('quantity')),
+    default=Value(ZERO),
+    output_field=QUANTITY,
+)
+
+CSV_PRODUCT_HEADER = ['ID', 'CUG', 'Nom', 'Catégorie', 'Marque', 'Quantité', "Prix d'achat", 'Valeur']
+CSV_GROUP_HEADER = ['Groupe', 'Produits', 'Quantité', 'Valeur']
+
+
+def parse_as_of(value):
+    """
+    Date de valorisation depuis un paramètre ('AAAA-MM-JJ' = fin de journée, ou date-heure ISO).
+    Retourne None si la valeur est vide ; ValueError si elle est invalide.
+    """
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Date invalide : {value}")
+        moment = datetime.combine(day, time.max)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class StockValuationService:
+    """
+    Valeur du stock (quantité x prix d'achat) par groupe, au présent ou à une date passée
+    """
+
+    @staticmethod
+    def valued_products(products, as_of=None):
+        """
+        Annoter les produits avec la quantité valorisée et sa valeur.
+        À une date passée, la quantité est le stock actuel moins les mouvements postérieurs
+        (sous-requêtes corrélées sur le journal et son archive) ; le prix d'achat reste le prix actuel.
+        """
+        if as_of is None:
+            quantity = F('quantity')
+        else:
+            later = [
+                Coalesce(Subquery(
+                    model.objects.filter(product=OuterRef('pk'), transaction_date__gt=as_of)
+                    .order_by().values('product').annotate(total=Sum(SIGNED_QUANTITY)).values('total'),
+                    output_field=QUANTITY,
+                ), Value(ZERO))
+                for model in (Transaction, TransactionArchive)
+            ]
+            quantity = ExpressionWrapper(F('quantity') - later[0] - later[1], output_field=QUANTITY)
+        return products.annotate(
+            valued_quantity=quantity,
+            stock_value=ExpressionWrapper(F('valued_quantity') * F('purchase_price'), output_field=AMOUNT),
+        )
+
+    @staticmethod
+    def get_groups(products, group_by='category', as_of=None):
+        """Valeur par groupe, triée par valeur décroissante : une requête"""
+        if group_by not in GROUPINGS:
+            raise ValueError(f"Regroupement inconnu : {group_by}")
+        key, label, default_label = GROUPINGS[group_by]
+        rows = (
+            StockValuationService.valued_products(products, as_of)
+            .order_by()
+            .values(key, label)
+            .annotate(
+                product_count=Count('id'),
+                quantity=Coalesce(Sum('valued_quantity'), Value(ZERO), output_field=QUANTITY),
+                value=Coalesce(Sum('stock_value'), Value(ZERO), output_field=AMOUNT),
+            )
+            .order_by('-value', label)
+        )
+        return [
+            {
+                'id': row[key],
+                'name': row[label] or default_label,
+                'product_count': row['product_count'],
+                'quantity': row['quantity'],
+                'value': row['value'],
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def rollup(groups):
+        """Ligne de total (équivalent ROLLUP) à partir des groupes déjà agrégés"""
+        return {
+            'product_count': sum(group['product_count'] for group in groups),
+            'quantity': sum((group['quantity'] for group in groups), ZERO),
+            'value': sum((group['value'] for group in groups), ZERO),
+        }
+
+    @staticmethod
+    def build_valuation(user, group_by=('category', 'brand'), as_of=None):
+        """Valorisation complète : groupes demandés et total général"""
+        products = StockReportService.get_scope(user)[0]
+        groups = {name: StockValuationService.get_groups(products, name, as_of) for name in group_by}
+        first = next(iter(groups.values()), [])
+        return {
+            'as_of': as_of,
+            'groups': groups,
+            'total': StockValuationService.rollup(first),
+        }
+
+    @staticmethod
+    def iter_csv_rows(user, group_by='category', as_of=None, chunk_size=2000):
+        """
+        Lignes CSV (en-tête compris) de la valorisation : par groupe, ou par produit
+        (group_by='product', lecture par paquets avec iterator pour les gros catalogues)
+        """
+        products = StockReportService.get_scope(user)[0]
+        if group_by == 'product':
+            yield CSV_PRODUCT_HEADER
+            rows = (
+                StockValuationService.valued_products(products, as_of)
+                .order_by('id')
+                .values_list(
+                    'id', 'cug', 'name', 'category__name', 'brand__name',
+                    'valued_quantity', 'purchase_price', 'stock_value',
+                )
+            )
+            total = ZERO
+            for row in rows.iterator(chunk_size=chunk_size):
+                total += row[7] or ZERO
+                yield list(row[:3]) + [row[3] or GROUPINGS['category'][2], row[4] or GROUPINGS['brand'][2]] + list(row[5:])
+            yield ['', '', 'TOTAL', '', '', '', '', total]
+            return
+
+        groups = StockValuationService.get_groups(products, group_by, as_of)
+        yield CSV_GROUP_HEADER
+        for group in groups:
+            yield [group['name'], group['product_count'], group['quantity'], group['value']]
+        total = StockValuationService.rollup(groups)
+        yield ['TOTAL', total['product_count'], total['quantity'], total['value']]
+
+    @staticmethod
+    def serialize(valuation):
+        """Représentation JSON de la valorisation"""
+        def as_json(row):
+            return {**row, 'quantity': str(row['quantity']), 'value': str(row['value'])}
+
+        return {
+            'as_of': valuation['as_of'].isoformat() if valuation['as_of'] else None,
+            'groups': {name: [as_json(row) for row in rows] for name, rows in valuation['groups'].items()},
+            'total': as_json(valuation['total']),
+        }
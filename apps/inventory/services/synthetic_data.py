@@ -0,0 +1,544 @@
+"""
+Jeux de données synthétiques pour mesurer les performances sur des volumes réalistes.
+
+Le jeu complet (sites, catégories sur 3 niveaux, marques, produits, codes-barres,
+copies entre sites, clients, ventes et lignes, mouvements de stock, journaux de
+crédit et de fidélité) est d'abord planifié avec numpy à partir d'une graine : deux
+exécutions avec la même graine produisent les mêmes données. Les identifiants sont
+attribués à l'avance, ce qui permet d'écrire chaque table d'un bloc, dans l'ordre des
+clés étrangères : COPY sur PostgreSQL, INSERT groupés (executemany) ailleurs.
+
+Les valeurs dérivées sont cohérentes avec le journal : stock des produits égal à la
+somme des mouvements, soldes crédit et points de fidélité égaux aux journaux clients,
+totaux des ventes égaux à leurs lignes.
+"""
+import io
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from apps.core.models import Configuration
+from apps.inventory.models import Barcode, Brand, Category, Customer, Product, ProductCopy, Transaction
+from apps.loyalty.models import LoyaltyProgram, LoyaltyTransaction
+from apps.sales.models import CreditTransaction, Sale, SaleItem
+
+logger = logging.getLogger(__name__)
+
+RAYON_TYPES = [choice for choice, _ in Category.RAYON_TYPE_CHOICES]
+PRODUCT_WORDS = [
+    'Riz', 'Huile', 'Sucre', 'Lait', 'Savon', 'Thé', 'Café', 'Farine', 'Pâtes', 'Sardines', 'Biscuits', 'Jus',
+    'Eau', 'Tomate', 'Lessive', 'Couches', 'Bouillon', 'Beurre', 'Mayonnaise', 'Dentifrice',
+]
+PAYMENT_METHODS = ['cash', 'mobile', 'card', 'transfer', 'sarali', 'credit']
+PAYMENT_WEIGHTS = [0.55, 0.2, 0.05, 0.02, 0.03, 0.15]
+MOVEMENT_TYPES = ['in', 'in', 'in', 'in', 'loss', 'adjustment']
+LOYALTY_AMOUNT = 1000  # FCFA par point (valeurs par défaut de LoyaltyProgram)
+
+
+def ean13(number):
+    """EAN-13 valide (préfixe 29, usage interne) à partir d'un entier"""
+    digits = f"29{number % 10 ** 10:010d}"
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return digits + str((10 - total % 10) % 10)
+
+
+def split_sizes(total, parts):
+    """Répartit `total` en `parts` tailles aussi égales que possible"""
+    base, extra = divmod(total, parts)
+    return np.array([base + (index < extra) for index in range(parts)], dtype=np.int64)
+
+
+def running_balance(groups, amounts):
+    """Solde cumulé par groupe (lignes déjà triées par groupe puis par date)"""
+    cumulative = np.cumsum(amounts)
+    starts = np.r_[True, groups[1:] != groups[:-1]] if len(groups) else np.array([], dtype=bool)
+    first = np.maximum.accumulate(np.where(starts, np.arange(len(groups)), 0))
+    return cumulative - (cumulative - amounts)[first]
+
+
+class SyntheticDataGenerator:
+    """
+    Génère un jeu multi-sites déterministe. Les volumes sont des cibles : au moins un
+    code-barres par produit et un mouvement de stock par ligne de vente.
+    """
+    BATCH_SIZE = 10000
+
+    def __init__(self, sites=20, products=100000, barcodes=300000, transactions=5000000, sales=1000000,
+                 customers=50000, copies=5000, days=365, seed=42, prefix='synth', batch_size=None, log=None):
+        if min(sites, products) < 1:
+            raise ValueError("Il faut au moins un site et un produit")
+        if products < sites:
+            raise ValueError("Il faut au moins un produit par site")
+        self.sites = sites
+        self.products = products
+        self.barcodes = max(barcodes, products)
+        self.transactions = transactions
+        self.sales = sales
+        self.customers = max(customers, sites)
+        self.copies = copies if sites > 1 else 0
+        self.days = max(days, 1)
+        self.prefix = prefix
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.rng = np.random.default_rng(seed)
+        self.log = log or (lambda message: logger.info(f"🧪 [SYNTHETIC] {message}"))
+        self.now = timezone.now().replace(microsecond=0)
+        self.start = self.now - timedelta(days=self.days)
+        self.counts = {}
+
+    # ------------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _next_id(model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    @staticmethod
+    def _copy_value(value):
+        """Valeur au format texte de COPY"""
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+    def _insert(self, model, columns, rows):
+        """
+        Écrit `rows` (tuples alignés sur `columns`, noms d'attributs) par lots. Les autres
+        colonnes reçoivent leur valeur par défaut (dates automatiques : maintenant).
+        """
+        fields = {field.attname: field for field in model._meta.concrete_fields}
+        defaults = []
+        for attname, field in fields.items():
+            if attname in columns:
+                continue
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                defaults.append((attname, self.now))
+            elif isinstance(field, models.AutoField):
+                continue
+            else:
+                defaults.append((attname, field.get_default()))
+        names = list(columns) + [attname for attname, _ in defaults]
+        tail = tuple(value for _, value in defaults)
+        table = connection.ops.quote_name(model._meta.db_table)
+        column_sql = ', '.join(connection.ops.quote_name(fields[name].column) for name in names)
+        datetime_positions = [
+            index for index, name in enumerate(names) if isinstance(fields[name], models.DateTimeField)
+        ]
+
+        written = 0
+        batch = []
+
+        def flush():
+            nonlocal written
+            if not batch:
+                return
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    buffer = io.StringIO()
+                    for row in batch:
+                        buffer.write('\t'.join(self._copy_value(value) for value in row + tail))
+                        buffer.write('\n')
+                    buffer.seek(0)
+                    cursor.cursor.copy_expert(f"COPY {table} ({column_sql}) FROM STDIN", buffer)
+                else:
+                    params = []
+                    for row in batch:
+                        values = list(row + tail)
+                        for index in datetime_positions:
+                            values[index] = connection.ops.adapt_datetimefield_value(values[index])
+                        params.append(values)
+                    placeholders = ', '.join(['%s'] * len(names))
+                    cursor.executemany(f"INSERT INTO {table} ({column_sql}) VALUES ({placeholders})", params)
+            written += len(batch)
+            batch.clear()
+
+        for row in rows:
+            batch.append(tuple(row))
+            if len(batch) >= self.batch_size:
+                flush()
+        flush()
+        self.counts[model._meta.label] = self.counts.get(model._meta.label, 0) + written
+        return written
+
+    def _reset_sequences(self):
+        """Séquences PostgreSQL recalées après les identifiants attribués à l'avance"""
+        if connection.vendor != 'postgresql':
+            return
+        tables = [
+            Category, Brand, Brand.rayons.through, Product, Barcode, ProductCopy, Customer, Sale, SaleItem,
+            Transaction, CreditTransaction, LoyaltyTransaction,
+        ]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), tables):
+                cursor.execute(sql)
+
+    def _moment(self, seconds):
+        return self.start + timedelta(seconds=int(seconds))
+
+    # ------------------------------------------------------------------
+    # Planification
+    # ------------------------------------------------------------------
+
+    def _plan_catalog(self):
+        rng = self.rng
+        self.site_sizes = split_sizes(self.products, self.sites)
+        self.site_starts = np.r_[0, np.cumsum(self.site_sizes)[:-1]]
+        self.product_site = np.repeat(np.arange(self.sites), self.site_sizes)
+        self.purchase = rng.integers(4, 800, size=self.products) * 25
+        self.selling = (self.purchase * rng.uniform(1.1, 1.6, size=self.products) // 25 * 25).astype(np.int64)
+        self.product_word = rng.integers(0, len(PRODUCT_WORDS), size=self.products)
+
+        # Copies : produits d'un site repris depuis un produit d'un autre site
+        self.copy_pairs = np.empty((0, 2), dtype=np.int64)
+        if self.copies:
+            copied = rng.choice(self.products, size=min(self.copies, self.products), replace=False)
+            source_site = (self.product_site[copied] + rng.integers(1, self.sites, size=len(copied))) % self.sites
+            original = self.site_starts[source_site] + (
+                rng.random(len(copied)) * self.site_sizes[source_site]
+            ).astype(np.int64)
+            pairs = np.stack([original, copied], axis=1)
+            _, keep = np.unique(np.stack([original, self.product_site[copied]], axis=1), axis=0, return_index=True)
+            self.copy_pairs = pairs[np.sort(keep)]
+
+        self.customer_sizes = split_sizes(self.customers, self.sites)
+        self.customer_starts = np.r_[0, np.cumsum(self.customer_sizes)[:-1]]
+
+    def _plan_sales(self):
+        rng = self.rng
+        seconds = self.days * 86400
+        count = self.sales
+        self.sale_time = np.sort(rng.integers(0, seconds, size=count))
+        self.sale_site = rng.choice(self.sites, size=count, p=self.site_sizes / self.products)
+        has_customer = rng.random(count) < 0.4
+        self.sale_customer = np.where(
+            has_customer,
+            self.customer_starts[self.sale_site] + (rng.random(count) * self.customer_sizes[self.sale_site]).astype(np.int64),
+            -1,
+        )
+        method = rng.choice(len(PAYMENT_METHODS), size=count, p=PAYMENT_WEIGHTS)
+        credit = PAYMENT_METHODS.index('credit')
+        self.sale_method = np.where((method == credit) & ~has_customer, 0, method)
+
+        item_counts = rng.poisson(1.5, size=count) + 1
+        self.item_sale = np.repeat(np.arange(count), item_counts)
+        item_site = self.sale_site[self.item_sale]
+        self.item_product = self.site_starts[item_site] + (
+            rng.random(len(self.item_sale)) * self.site_sizes[item_site]
+        ).astype(np.int64)
+        self.item_quantity = rng.poisson(0.5, size=len(self.item_sale)) + 1
+        self.item_price = self.selling[self.item_product]
+        self.item_amount = self.item_quantity * self.item_price
+        self.sale_total = np.bincount(self.item_sale, weights=self.item_amount, minlength=count).astype(np.int64)
+        self.sale_points = np.where(self.sale_customer >= 0, self.sale_total // LOYALTY_AMOUNT, 0)
+
+    def _plan_movements(self):
+        """Sorties des lignes de vente et autres mouvements, fusionnés par date"""
+        rng = self.rng
+        items = len(self.item_sale)
+        others = max(self.transactions - items, 0)
+        kinds = np.array(MOVEMENT_TYPES)[rng.integers(0, len(MOVEMENT_TYPES), size=others)]
+        quantity = np.where(
+            kinds == 'in', rng.poisson(24, size=others) + 6,
+            np.where(kinds == 'loss', rng.poisson(1, size=others) + 1, rng.integers(1, 6, size=others)
+                     * rng.choice([-1, 1], size=others)),
+        )
+        time_ = np.concatenate([self.sale_time[self.item_sale], rng.integers(0, self.days * 86400, size=others)])
+        order = np.argsort(time_, kind='stable')
+        self.move_time = time_[order]
+        self.move_product = np.concatenate([self.item_product, rng.integers(0, self.products, size=others)])[order]
+        self.move_type = np.concatenate([np.full(items, 'out'), kinds])[order]
+        self.move_quantity = np.concatenate([self.item_quantity, quantity])[order]
+        self.move_item = np.concatenate([np.arange(items), np.full(others, -1)])[order]
+
+        signed = np.where(np.isin(self.move_type, ['out', 'loss']), -self.move_quantity, self.move_quantity)
+        self.stock = np.bincount(self.move_product, weights=signed, minlength=self.products).astype(np.int64)
+
+    def _plan_ledgers(self):
+        """Journaux crédit (achats à crédit et remboursements) et fidélité des clients"""
+        rng = self.rng
+        credit_sales = np.flatnonzero(self.sale_method == PAYMENT_METHODS.index('credit'))
+        repaid = credit_sales[rng.random(len(credit_sales)) < 0.6]
+        delay = rng.integers(86400, 30 * 86400, size=len(repaid))
+        self.credit_sale = np.concatenate([credit_sales, repaid])
+        self.credit_kind = np.concatenate([np.zeros(len(credit_sales), int), np.ones(len(repaid), int)])
+        self.credit_time = np.minimum(
+            np.concatenate([self.sale_time[credit_sales], self.sale_time[repaid] + delay]), self.days * 86400 - 1
+        )
+        self.credit_customer = self.sale_customer[self.credit_sale]
+        self.credit_amount = self.sale_total[self.credit_sale]
+        self.credit_signed = np.where(self.credit_kind == 0, -self.credit_amount, self.credit_amount)
+
+        by_customer = np.lexsort((self.credit_time, self.credit_customer))
+        balance = np.empty(len(by_customer), dtype=np.int64)
+        balance[by_customer] = running_balance(self.credit_customer[by_customer], self.credit_signed[by_customer])
+        self.credit_balance = balance
+        self.customer_credit = np.bincount(
+            self.credit_customer, weights=self.credit_signed, minlength=self.customers
+        ).astype(np.int64)
+
+        self.loyalty_sale = np.flatnonzero(self.sale_points > 0)
+        loyalty_customer = self.sale_customer[self.loyalty_sale]
+        points = self.sale_points[self.loyalty_sale]
+        by_customer = np.lexsort((self.loyalty_sale, loyalty_customer))
+        balance = np.empty(len(by_customer), dtype=np.int64)
+        balance[by_customer] = running_balance(loyalty_customer[by_customer], points[by_customer])
+        self.loyalty_balance = balance
+        self.customer_points = np.bincount(loyalty_customer, weights=points, minlength=self.customers).astype(np.int64)
+        first_sale = np.full(self.customers, -1)
+        first_sale[loyalty_customer[::-1]] = self.loyalty_sale[::-1]
+        self.customer_joined = first_sale
+
+    # ------------------------------------------------------------------
+    # Création
+    # ------------------------------------------------------------------
+
+    def _create_sites(self):
+        User = get_user_model()
+        if Configuration.objects.filter(site_name__startswith=f"{self.prefix} ").exists():
+            raise ValueError(f"Des sites « {self.prefix} … » existent déjà : utiliser un autre préfixe")
+        self.site_objects = []
+        self.users = []
+        for index in range(self.sites):
+            user = User(username=f"{self.prefix}_gerant_{index + 1}", is_site_admin=True)
+            user.set_unusable_password()
+            user.save()
+            site = Configuration.objects.create(
+                site_name=f"{self.prefix} {index + 1:03d}", site_owner=user, nom_societe=f"Société {index + 1}",
+                adresse='Bamako', telephone=f"70{index:06d}", email=f"site{index + 1}@{self.prefix}.example.com",
+            )
+            user.site_configuration = site
+            user.save(update_fields=['site_configuration'])
+            LoyaltyProgram.objects.create(site_configuration=site)
+            self.site_objects.append(site)
+            self.users.append(user)
+        self.site_ids = np.array([site.id for site in self.site_objects])
+        self.user_ids = np.array([user.id for user in self.users])
+
+    def _create_categories(self):
+        """4 rayons par site, 3 familles par rayon, 3 sous-familles par famille"""
+        first = self._next_id(Category)
+        rows = []
+        leaves = []
+        next_id = first
+        for site_index, site_id in enumerate(self.site_ids.tolist()):
+            site_leaves = []
+            for rayon in range(4):
+                rayon_id = next_id
+                slug = f"{self.prefix}-{site_index}-{rayon}"
+                rows.append((rayon_id, f"Rayon {rayon + 1}", slug, None, 0, rayon, True,
+                             RAYON_TYPES[(site_index + rayon) % len(RAYON_TYPES)], site_id))
+                next_id += 1
+                for family in range(3):
+                    family_id = next_id
+                    rows.append((family_id, f"Famille {rayon + 1}.{family + 1}", f"{slug}-{family}", rayon_id, 1,
+                                 family, False, None, site_id))
+                    next_id += 1
+                    for leaf in range(3):
+                        rows.append((next_id, f"Sous-famille {rayon + 1}.{family + 1}.{leaf + 1}",
+                                     f"{slug}-{family}-{leaf}", family_id, 2, leaf, False, None, site_id))
+                        site_leaves.append(next_id)
+                        next_id += 1
+            leaves.append(site_leaves)
+        self._insert(Category, ['id', 'name', 'slug', 'parent_id', 'level', 'order', 'is_rayon', 'rayon_type',
+                                'site_configuration_id'], rows)
+        self.site_leaves = np.array(leaves)
+        self.site_rayons = [
+            [row[0] for row in rows if row[8] == site_id and row[6]] for site_id in self.site_ids.tolist()
+        ]
+
+    def _create_brands(self):
+        """30 marques par site, chacune présente dans un ou deux rayons"""
+        first = self._next_id(Brand)
+        per_site = 30
+        self.brand_ids = first + np.arange(self.sites * per_site).reshape(self.sites, per_site)
+        self._insert(Brand, ['id', 'name', 'site_configuration_id'], (
+            (int(self.brand_ids[site, index]), f"Marque {index + 1}", int(self.site_ids[site]))
+            for site in range(self.sites) for index in range(per_site)
+        ))
+        through = Brand.rayons.through
+        rows = []
+        for site in range(self.sites):
+            rayons = self.site_rayons[site]
+            for index in range(per_site):
+                rows.append((int(self.brand_ids[site, index]), rayons[index % len(rayons)]))
+                if index % 2:
+                    rows.append((int(self.brand_ids[site, index]), rayons[(index + 1) % len(rayons)]))
+        self._insert(through, ['brand_id', 'category_id'], rows)
+
+    def _create_products(self):
+        rng = self.rng
+        self.product_first = self._next_id(Product)
+        leaf = rng.integers(0, self.site_leaves.shape[1], size=self.products)
+        brand = rng.integers(0, self.brand_ids.shape[1], size=self.products)
+        names = [f"{PRODUCT_WORDS[word]} {index + 1}" for index, word in enumerate(self.product_word.tolist())]
+        for original, copied in self.copy_pairs.tolist():
+            names[copied] = names[original]
+        created = (self._moment(seconds) for seconds in rng.integers(0, 86400 * 7, size=self.products).tolist())
+        self._insert(Product, [
+            'id', 'name', 'slug', 'cug', 'purchase_price', 'selling_price', 'quantity', 'category_id', 'brand_id',
+            'site_configuration_id', 'created_at',
+        ], (
+            (self.product_first + index, names[index], f"{self.prefix}-{index}", f"{self.prefix.upper()}{index:08d}",
+             purchase, selling, stock, int(self.site_leaves[site, leaf_index]), int(self.brand_ids[site, brand_index]),
+             int(self.site_ids[site]), moment)
+            for index, (purchase, selling, stock, site, leaf_index, brand_index, moment) in enumerate(zip(
+                self.purchase.tolist(), self.selling.tolist(), self.stock.tolist(), self.product_site.tolist(),
+                leaf.tolist(), brand.tolist(), created,
+            ))
+        ))
+
+    def _create_barcodes(self):
+        """Un code principal par produit, les autres répartis au hasard"""
+        first = self._next_id(Barcode)
+        extra = self.rng.integers(0, self.products, size=self.barcodes - self.products)
+        owners = np.concatenate([np.arange(self.products), extra])
+        self._insert(Barcode, ['id', 'product_id', 'ean', 'is_primary'], (
+            (first + index, self.product_first + owner, ean13(first + index), index < self.products)
+            for index, owner in enumerate(owners.tolist())
+        ))
+
+    def _create_copies(self):
+        first = self._next_id(ProductCopy)
+        self._insert(ProductCopy, [
+            'id', 'original_product_id', 'copied_product_id', 'source_site_id', 'destination_site_id',
+        ], (
+            (first + index, self.product_first + original, self.product_first + copied,
+             int(self.site_ids[self.product_site[original]]), int(self.site_ids[self.product_site[copied]]))
+            for index, (original, copied) in enumerate(self.copy_pairs.tolist())
+        ))
+
+    def _create_customers(self):
+        self.customer_first = self._next_id(Customer)
+        customer_site = np.repeat(np.arange(self.sites), self.customer_sizes)
+        self._insert(Customer, [
+            'id', 'name', 'phone', 'credit_balance', 'credit_limit', 'loyalty_points', 'is_loyalty_member',
+            'loyalty_joined_at', 'site_configuration_id',
+        ], (
+            (self.customer_first + index, f"Client {index + 1}", f"6{index:07d}", credit, 500000, points,
+             joined >= 0, self._moment(self.sale_time[joined]) if joined >= 0 else None, int(self.site_ids[site]))
+            for index, (site, credit, points, joined) in enumerate(zip(
+                customer_site.tolist(), self.customer_credit.tolist(), self.customer_points.tolist(),
+                self.customer_joined.tolist(),
+            ))
+        ))
+
+    def _create_sales(self):
+        self.sale_first = self._next_id(Sale)
+        customer = np.where(self.sale_customer >= 0, self.sale_customer + self.customer_first, -1)
+
+        def rows():
+            for index, (moment, site, buyer, method, total, points) in enumerate(zip(
+                self.sale_time.tolist(), self.sale_site.tolist(), customer.tolist(), self.sale_method.tolist(),
+                self.sale_total.tolist(), self.sale_points.tolist(),
+            )):
+                on_credit = PAYMENT_METHODS[method] == 'credit'
+                at = self._moment(moment)
+                yield (
+                    self.sale_first + index, f"{self.prefix.upper()}-{index + 1:08d}", buyer if buyer >= 0 else None,
+                    int(self.user_ids[site]), at, 'completed', 'pending' if on_credit else 'paid', total, total,
+                    0 if on_credit else total, PAYMENT_METHODS[method], points, int(self.site_ids[site]), at, at,
+                )
+
+        self._insert(Sale, [
+            'id', 'reference', 'customer_id', 'seller_id', 'sale_date', 'status', 'payment_status', 'subtotal',
+            'total_amount', 'amount_paid', 'payment_method', 'loyalty_points_earned', 'site_configuration_id',
+            'created_at', 'updated_at',
+        ], rows())
+
+        self.item_first = self._next_id(SaleItem)
+        self._insert(SaleItem, ['id', 'sale_id', 'product_id', 'quantity', 'unit_price', 'amount'], (
+            (self.item_first + index, self.sale_first + sale, self.product_first + product, quantity, price, amount)
+            for index, (sale, product, quantity, price, amount) in enumerate(zip(
+                self.item_sale.tolist(), self.item_product.tolist(), self.item_quantity.tolist(),
+                self.item_price.tolist(), self.item_amount.tolist(),
+            ))
+        ))
+
+    def _create_movements(self):
+        first = self._next_id(Transaction)
+
+        def rows():
+            for index, (moment, product, kind, quantity, item) in enumerate(zip(
+                self.move_time.tolist(), self.move_product.tolist(), self.move_type.tolist(),
+                self.move_quantity.tolist(), self.move_item.tolist(),
+            )):
+                site = int(self.product_site[product])
+                if item >= 0:
+                    sale = self.sale_first + int(self.item_sale[item])
+                    price, reason = int(self.item_price[item]), 'sale'
+                else:
+                    sale = None
+                    price = int(self.purchase[product])
+                    reason = {'in': 'reception', 'loss': 'loss', 'adjustment': 'inventory'}[kind]
+                yield (
+                    first + index, kind, reason, self.product_first + product, quantity, self._moment(moment), sale,
+                    price, price * abs(quantity), int(self.user_ids[site]), int(self.site_ids[site]),
+                )
+
+        self._insert(Transaction, [
+            'id', 'type', 'reason', 'product_id', 'quantity', 'transaction_date', 'sale_id', 'unit_price',
+            'total_amount', 'user_id', 'site_configuration_id',
+        ], rows())
+
+    def _create_ledgers(self):
+        first = self._next_id(CreditTransaction)
+        order = np.argsort(self.credit_time, kind='stable')
+        self._insert(CreditTransaction, [
+            'id', 'customer_id', 'sale_id', 'type', 'amount', 'balance_after', 'transaction_date', 'user_id',
+            'site_configuration_id',
+        ], (
+            (first + index, self.customer_first + int(self.credit_customer[row]),
+             self.sale_first + int(self.credit_sale[row]), ('credit', 'payment')[self.credit_kind[row]],
+             int(self.credit_amount[row]), int(self.credit_balance[row]), self._moment(self.credit_time[row]),
+             int(self.user_ids[self.sale_site[self.credit_sale[row]]]),
+             int(self.site_ids[self.sale_site[self.credit_sale[row]]]))
+            for index, row in enumerate(order.tolist())
+        ))
+
+        first = self._next_id(LoyaltyTransaction)
+        self._insert(LoyaltyTransaction, [
+            'id', 'customer_id', 'sale_id', 'type', 'points', 'balance_after', 'transaction_date',
+            'site_configuration_id',
+        ], (
+            (first + index, self.customer_first + int(self.sale_customer[sale]), self.sale_first + sale, 'earned',
+             int(self.sale_points[sale]), int(balance), self._moment(self.sale_time[sale]),
+             int(self.site_ids[self.sale_site[sale]]))
+            for index, (sale, balance) in enumerate(zip(self.loyalty_sale.tolist(), self.loyalty_balance.tolist()))
+        ))
+
+    def run(self):
+        """Planifie puis écrit le jeu de données ; retourne le nombre de lignes par modèle"""
+        steps = [
+            ('Planification', lambda: (self._plan_catalog(), self._plan_sales(), self._plan_movements(),
+                                       self._plan_ledgers())),
+            ('Sites et utilisateurs', self._create_sites),
+            ('Catégories', self._create_categories),
+            ('Marques', self._create_brands),
+            ('Produits', self._create_products),
+            ('Codes-barres', self._create_barcodes),
+            ('Copies de produits', self._create_copies),
+            ('Clients', self._create_customers),
+            ('Ventes et lignes', self._create_sales),
+            ('Mouvements de stock', self._create_movements),
+            ('Journaux crédit et fidélité', self._create_ledgers),
+        ]
+        with transaction.atomic():
+            for label, step in steps:
+                started = time.perf_counter()
+                step()
+                self.log(f"{label} : {time.perf_counter() - started:.1f}s")
+            self._reset_sequences()
+        return dict(self.counts)
@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.core.cache import Namespace
+from apps.core.models import Notification
+from apps.core.site_context import invalidate_site
+
+from .models import Category, LabelSetting, Product, Transaction
+from .services.product_copy import ProductCopySyncService
+from .services.rollups import RollupService
+from .services.stock_alerts import StockAlertService
+
+
+# Doit précéder la propagation aux copies, qui réinitialise l'instantané des valeurs chargées
+@receiver(post_save, sender=Product)
+def detect_stock_alert_crossing(sender, instance, created, raw=False, **kwargs):
+    """
+    Alerte du site si la quantité sauvegardée franchit le seuil d'alerte ou zéro
+    """
+    if created or raw:
+        return
+    StockAlertService.check_saved_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def propagate_product_changes_to_copies(sender, instance, created, raw=False, **kwargs):
+    """
+    Propage aux copies (ProductCopy) les champs modifiés du produit original, après commit
+    """
+    if created or raw:
+        return
+    ProductCopySyncService.schedule_propagation(instance)
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_movement_rollup_state(sender, instance, raw=False, **kwargs):
+    """État enregistré du mouvement, pour l'écart appliqué aux agrégats après la sauvegarde"""
+    if not raw:
+        instance._rollup_previous = RollupService.previous_state(
+            instance, RollupService.movement_state, Transaction.objects.select_related('product')
+        )
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollups_on_movement(sender, instance, raw=False, **kwargs):
+    """
+    Applique aux agrégats journaliers l'écart du mouvement, dans la même transaction
+    """
+    if raw:
+        return
+    RollupService.record_movement(instance, getattr(instance, '_rollup_previous', None))
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollups_on_movement_delete(sender, instance, **kwargs):
+    """Mouvement supprimé : sa part est retirée des agrégats"""
+    RollupService.record_movement(instance, deleted=True)
+
+
+@receiver(post_save, sender=Notification)
+def invalidate_stock_alert_counter(sender, instance, raw=False, **kwargs):
+    """
+    Une alerte de stock lue ou modifiée invalide le compteur de non-lus du site
+    """
+    if raw or not instance.site_configuration_id or not instance.cle_alerte:
+        return
+    StockAlertService.invalidate_unread(instance.site_configuration_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_caches(sender, instance, raw=False, **kwargs):
+    """
+    Catégorie créée, renommée ou supprimée : recommandations du site à recalculer, celles
+    de tous les sites pour une catégorie globale (les embeddings sont indexés par nom)
+    """
+    if raw:
+        return
+    Namespace('categories', None if instance.is_global else instance.site_configuration_id).bump()
+
+
+
+@receiver(post_save, sender=LabelSetting)
+@receiver(post_delete, sender=LabelSetting)
+def invalidate_label_settings(sender, instance, raw=False, **kwargs):
+    """
+    Réglages d'étiquettes modifiés : ceux en cache du site (apps.core.site_context) sont relus
+    """
+    if not raw:
+        site_id = instance.site_configuration_id
+        transaction.on_commit(lambda: invalidate_site(site_id))
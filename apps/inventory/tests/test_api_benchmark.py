@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.core.models import Configuration
+from apps.inventory.services.api_benchmark import (
+    SCENARIOS, ApiBenchmark, baseline_key, compare, load_baseline, save_baseline,
+)
+from apps.inventory.services.logging_benchmark import LoggingBenchmark
+from apps.inventory.services.session_benchmark import SessionBenchmark
+from apps.inventory.services.synthetic_data import SyntheticDataGenerator
+from apps.sales.models import Sale
+
+# Le scénario 'catalog' génère des PDF : hors du MEDIA_ROOT du projet
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def _report(p95=100, throughput=50, queries=10, errors=0, database='sqlite'):
+    return {'database': database, 'transport': 'client', 'scenarios': {'dashboard': {
+        'latency_ms': {'p95': p95}, 'throughput_rps': throughput, 'queries_per_iteration': queries, 'errors': errors,
+    }}}
+
+
+class CompareTest(SimpleTestCase):
+    def test_regressions_beyond_tolerance(self):
+        baseline = _report()
+        self.assertEqual(compare(_report(p95=115, throughput=45), baseline), [])
+        regressions = compare(_report(p95=130, throughput=30, queries=12, errors=1), baseline)
+        self.assertEqual({r['metric'] for r in regressions},
+                         {'latency_ms.p95', 'throughput_rps', 'queries_per_iteration', 'errors'})
+
+    def test_baseline_kept_per_database_and_transport(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            self.assertIsNone(load_baseline(path, 'sqlite-client'))
+            save_baseline(path, _report(p95=1))
+            save_baseline(path, _report(p95=2, database='postgresql'))
+            self.assertEqual(load_baseline(path, 'sqlite-client')['scenarios']['dashboard']['latency_ms']['p95'], 1)
+            self.assertEqual(load_baseline(path, 'postgresql-client')['scenarios']['dashboard']['latency_ms']['p95'], 2)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ApiBenchmarkTest(TestCase):
+    """Rejeu des scénarios de caisse sur un petit jeu synthétique (une caisse, client de test)"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        SyntheticDataGenerator(sites=1, products=40, barcodes=60, transactions=100, sales=20, customers=5,
+                               copies=0, days=10, prefix='bench').run()
+        self.site = Configuration.objects.get(site_name='bench 001')
+
+    def test_all_scenarios_without_errors(self):
+        sales = Sale.objects.count()
+        report = ApiBenchmark([self.site], registers=1, iterations=1).run()
+
+        self.assertEqual(list(report['scenarios']), list(SCENARIOS))
+        for name, scenario in report['scenarios'].items():
+            self.assertEqual(scenario['errors'], 0, f"{name}: {scenario['error_samples']}")
+            self.assertGreater(scenario['requests'], 0)
+            self.assertLessEqual(scenario['latency_ms']['p50'], scenario['latency_ms']['p99'])
+            self.assertGreater(scenario['queries_per_request'], 0)
+        # 3 scans, la vente puis 3 sorties de stock
+        self.assertEqual(report['scenarios']['scan_checkout']['requests'], 7)
+        self.assertEqual(Sale.objects.count(), sales + 1)
+
+    def test_command_writes_report_and_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output, baseline = os.path.join(directory, 'report.json'), os.path.join(directory, 'baseline.json')
+            call_command('benchmark_api', prefix='bench', registers=1, iterations=1, scenarios=['dashboard'],
+                         output=output, baseline=baseline, save_baseline=True, stderr=StringIO())
+            with open(output) as handle:
+                report = json.load(handle)
+            self.assertEqual(list(report['scenarios']), ['dashboard'])
+            self.assertIsNotNone(load_baseline(baseline, baseline_key(report)))
+
+    def test_logging_benchmark_compares_configurations(self):
+        root = logging.getLogger()
+        existing = logging.NullHandler()  # Handler posé par un lanceur de tests, par exemple
+        root.addHandler(existing)
+        self.addCleanup(root.removeHandler, existing)
+        handlers, level = root.handlers[:], root.level
+        logging.getLogger('apps').setLevel(logging.WARNING)
+        self.addCleanup(logging.getLogger('apps').setLevel, logging.NOTSET)
+        report = LoggingBenchmark([self.site], modes=['silent', 'sync_debug'], iterations=1, rounds=1,
+                                  scenarios=['scan_checkout']).run()
+
+        silent, debug = report['modes']['silent'], report['modes']['sync_debug']
+        self.assertEqual((silent['errors'], debug['errors']), (0, 0))
+        self.assertEqual(silent['bytes_per_request'], 0)
+        self.assertGreater(debug['records_per_request'], 0)
+        self.assertIn('overhead_ms_per_request', debug)
+        # Configuration en place avant la mesure rétablie (mêmes handlers, mêmes niveaux)
+        self.assertEqual((root.handlers, root.level), (handlers, level))
+        self.assertEqual(logging.getLogger('apps').level, logging.WARNING)
+
+    def test_session_benchmark_counts_session_writes(self):
+        report = SessionBenchmark([self.site], iterations=1, rounds=1, scenarios=['product_scroll']).run()
+
+        before, after = report['modes']['before'], report['modes']['after']
+        self.assertEqual((before['errors'], after['errors']), (0, 0))
+        self.assertEqual(before['session_writes_per_request'], 1)
+        self.assertEqual((after['session_queries_per_request'], after['writes_per_request']), (0, 0))
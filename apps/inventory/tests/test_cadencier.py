@@ -0,0 +1,100 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core.models import Configuration
+from apps.inventory.models import Product, Transaction
+from apps.inventory.services.cadencier import CadencierService
+
+User = get_user_model()
+
+
+class CadencierServiceTest(TestCase):
+    """Tests du cadencier calculé par requête groupée"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cadencier', password='testpass123')
+        self.site = self._site(self.user, 'Site Cadencier')
+        self.products = [self._product(f'Produit {i}', self.site) for i in range(3)]
+
+    def tearDown(self):
+        cache.clear()
+
+    def _site(self, user, name):
+        site = Configuration.objects.create(
+            site_name=name, site_owner=user, nom_societe='Test Company',
+            adresse='Bamako', telephone='123456789', email='test@example.com',
+        )
+        user.site_configuration = site
+        user.save()
+        return site
+
+    def _product(self, name, site, quantity=5):
+        return Product.objects.create(
+            name=name, purchase_price=Decimal('100'), selling_price=Decimal('150'),
+            quantity=quantity, site_configuration=site,
+        )
+
+    def _move(self, product, type, quantity, days_ago=0):
+        transaction = Transaction.objects.create(product=product, type=type, quantity=Decimal(quantity))
+        Transaction.objects.filter(pk=transaction.pk).update(
+            transaction_date=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def test_totals_weekly_buckets_and_order_quantity(self):
+        """Entrées / sorties de la période, ventilées par semaine"""
+        product = self.products[0]
+        self._move(product, 'in', '10', days_ago=1)
+        self._move(product, 'out', '14', days_ago=1)
+        self._move(product, 'out', '7', days_ago=8)
+        self._move(product, 'out', '100', days_ago=40)
+        start, end = CadencierService.get_period()
+
+        result = CadencierService.compute(Product.objects.filter(site_configuration=self.site), start, end)
+
+        data = next(row for row in result['product_data'] if row['product'] == product)
+        self.assertEqual(data['incoming'], Decimal('10'))
+        self.assertEqual(data['outgoing'], Decimal('21'))
+        self.assertEqual(sum(week['outgoing'] for week in data['weekly']), Decimal('21'))
+        self.assertEqual(len(data['weekly']), len(result['weeks']))
+        # 21 sorties sur 31 jours, couverture de 7 jours
+        self.assertEqual(data['minimum_stock'], Decimal('21') / Decimal('31') * 7)
+        self.assertEqual(data['quantity_to_order'], Decimal('0'))
+
+    def test_query_count_independent_of_product_count(self):
+        """Nombre de requêtes fixe (comptage, page de produits, mouvements groupés)"""
+        for product in self.products:
+            self._move(product, 'out', '1')
+        start, end = CadencierService.get_period()
+        with CaptureQueriesContext(connection) as ctx:
+            CadencierService.compute(Product.objects.all(), start, end)
+        small = len(ctx.captured_queries)
+
+        for i in range(30):
+            self._move(self._product(f'Autre {i}', self.site), 'in', '2')
+        with CaptureQueriesContext(connection) as ctx:
+            result = CadencierService.compute(Product.objects.all(), start, end)
+        self.assertEqual(len(ctx.captured_queries), small)
+        self.assertEqual(small, 3)
+        self.assertEqual(result['total_products'], 33)
+
+    def test_view_cache_is_per_site(self):
+        """Deux sites consultant la même URL ne partagent pas le cadencier en cache"""
+        other_user = User.objects.create_user(username='other', password='testpass123')
+        foreign = self._product('Étranger', self._site(other_user, 'Autre site'))
+
+        self.client.force_login(self.user)
+        first = self.client.get('/inventory/cadencier/')
+        self.client.force_login(other_user)
+        second = self.client.get('/inventory/cadencier/')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn(foreign, [row['product'] for row in first.context['product_data']])
+        self.assertEqual([row['product'] for row in second.context['product_data']], [foreign])
@@ -0,0 +1,130 @@
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.core.models import Configuration
+from apps.inventory.catalog_models import CatalogGeneration, CatalogItem, CatalogTemplate
+from apps.inventory.models import Product
+from apps.inventory.printing.catalog_pdf import generate_catalog, get_catalog_cache_key, render_catalog_pdf
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CatalogPDFTest(TestCase):
+    """Tests du rendu serveur des catalogues PDF"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='catalog', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Catalogue',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        self.template = CatalogTemplate.objects.create(
+            name='Catalogue test', format='A4', products_per_page=12, site_configuration=self.site
+        )
+        self.products = [
+            Product.objects.create(
+                name=f'Produit {i}',
+                purchase_price=Decimal('500'),
+                selling_price=Decimal('750'),
+                quantity=i,
+                site_configuration=self.site,
+            )
+            for i in range(25)
+        ]
+
+    def _create_generation(self, products):
+        generation = CatalogGeneration.objects.create(
+            name='Catalogue', template=self.template, site_configuration=self.site, user=self.user
+        )
+        for position, product in enumerate(products):
+            CatalogItem.objects.create(batch=generation, product=product, position=position)
+        return generation
+
+    def test_render_catalog_pdf_pages(self):
+        """Le rendu produit un PDF valide avec une page par groupe de 12 produits"""
+        output = BytesIO()
+        pages = render_catalog_pdf(self.template, iter(self.products), output, total_products=len(self.products))
+
+        self.assertEqual(pages, 3)
+        self.assertTrue(output.getvalue().startswith(b'%PDF'))
+
+    def test_generate_catalog_writes_and_reuses_file(self):
+        """La génération écrit le PDF dans le stockage et réutilise le fichier si rien n'a changé"""
+        generation = generate_catalog(self._create_generation(self.products))
+
+        self.assertEqual(generation.status, 'success')
+        self.assertEqual(generation.total_products, 25)
+        self.assertEqual(generation.total_pages, 3)
+        self.assertTrue(default_storage.exists(generation.file_path))
+        self.assertGreater(generation.file_size_bytes, 0)
+
+        again = generate_catalog(self._create_generation(self.products))
+        self.assertEqual(again.file_path, generation.file_path)
+
+    def test_cache_key_changes_with_products(self):
+        """La clé de cache dépend de l'ensemble des produits et de leur date de modification"""
+        products = Product.objects.filter(site_configuration=self.site)
+        key = get_catalog_cache_key(self.template, products)
+
+        self.assertNotEqual(key, get_catalog_cache_key(self.template, products.exclude(pk=self.products[0].pk)))
+
+        Product.objects.filter(pk=self.products[0].pk).update(updated_at=self.products[0].updated_at.replace(year=2100))
+        self.assertNotEqual(key, get_catalog_cache_key(self.template, products))
+
+    def test_api_generates_pdf_server_side(self):
+        """L'API renvoie un lien de téléchargement au lieu des images en base64"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post('/api/v1/catalog/pdf/', {
+            'product_ids': [p.id for p in self.products[:5]],
+            'template_id': self.template.id,
+            'include_images': True,
+            'mode': 'server',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'success')
+        self.assertNotIn('catalog', response.data)
+
+        download = client.get(f"/api/v1/catalog/generations/{response.data['generation_id']}/download/")
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+
+    def test_api_default_keeps_legacy_payload(self):
+        """Sans mode, les versions installées de l'app reçoivent toujours l'ancien format"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post('/api/v1/catalog/pdf/', {
+            'product_ids': [p.id for p in self.products[:5]],
+            'template_id': self.template.id,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        catalog = response.data['catalog']
+        self.assertEqual(catalog['total_products'], 5)
+        self.assertEqual(catalog['total_pages'], 1)
+        self.assertTrue(catalog['id'])
+        self.assertFalse(CatalogGeneration.objects.exists())
@@ -0,0 +1,169 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.core.models import Configuration
+from apps.inventory.models import Barcode, InventoryCountLine, Product, Transaction
+from apps.inventory.services.inventory_count import InventoryCountService
+
+User = get_user_model()
+
+
+class InventoryCountServiceTest(TestCase):
+    """Tests des sessions d'inventaire (comptage, gel, écarts, application)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='inventory', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Inventaire',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        self.products = [
+            Product.objects.create(
+                name=f'Produit {i}',
+                purchase_price=Decimal('100'),
+                selling_price=Decimal('150'),
+                quantity=10,
+                site_configuration=self.site,
+            )
+            for i in range(5)
+        ]
+
+    def test_counts_from_several_devices_add_up(self):
+        """Les envois de plusieurs appareils s'additionnent ; 'set' remplace ; codes résolus"""
+        Barcode.objects.create(product=self.products[1], ean='3017620422003')
+        session = InventoryCountService.start_session(self.site, user=self.user)
+
+        InventoryCountService.record_counts(session, [{'product_id': self.products[0].id, 'quantity': 4}], device_id='a')
+        result = InventoryCountService.record_counts(session, [
+            {'product_id': self.products[0].id, 'quantity': '3'},
+            {'code': '3017620422003', 'quantity': '2,5'},
+            {'code': self.products[2].cug, 'quantity': 1},
+            {'code': 'inconnu', 'quantity': 1},
+            {'product_id': self.products[3].id, 'quantity': 'abc'},
+        ], device_id='b')
+        InventoryCountService.record_counts(session, [{'product_id': self.products[2].id, 'quantity': 8}], mode='set')
+
+        self.assertEqual(result['recorded'], 3)
+        self.assertEqual([e['index'] for e in result['errors']], [3, 4])
+        counted = dict(InventoryCountLine.objects.values_list('product_id', 'counted_quantity'))
+        self.assertEqual(counted, {
+            self.products[0].id: Decimal('7'),
+            self.products[1].id: Decimal('2.5'),
+            self.products[2].id: Decimal('8'),
+        })
+
+    def test_apply_keeps_movements_after_freeze(self):
+        """Le delta (compté - théorique au gel) s'ajoute au stock courant"""
+        session = InventoryCountService.start_session(self.site, user=self.user)
+        InventoryCountService.record_counts(session, [
+            {'product_id': self.products[0].id, 'quantity': 7},
+            {'product_id': self.products[1].id, 'quantity': 10},
+        ])
+        InventoryCountService.freeze(session)
+        # Vente de 2 unités entre le gel et l'application
+        Product.objects.filter(pk=self.products[0].pk).update(quantity=8)
+
+        lines, summary = InventoryCountService.get_diff(session)
+        self.assertEqual(summary['products_with_difference'], 1)
+        self.assertEqual(summary['total_delta_value'], Decimal('-300'))
+        self.assertEqual([line.product_id for line in lines], [self.products[0].id])
+
+        result = InventoryCountService.apply(session, user=self.user)
+
+        self.assertEqual(result['adjusted_count'], 1)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].quantity, Decimal('5'))
+        adjustment = Transaction.objects.get()
+        self.assertEqual(adjustment.type, 'adjustment')
+        self.assertEqual(adjustment.quantity, Decimal('-3'))
+        self.assertEqual(adjustment.total_amount, Decimal('-300'))
+        self.assertEqual(adjustment.site_configuration, self.site)
+        with self.assertRaises(ValidationError):
+            InventoryCountService.apply(session)
+
+    def test_full_inventory_zeroes_uncounted_products(self):
+        """En inventaire complet, les produits non comptés sont ramenés à 0"""
+        session = InventoryCountService.start_session(self.site, zero_uncounted=True)
+        InventoryCountService.record_counts(session, [{'product_id': self.products[0].id, 'quantity': 10}])
+        InventoryCountService.freeze(session)
+        with self.assertRaises(ValidationError):
+            InventoryCountService.record_counts(session, [{'product_id': self.products[0].id, 'quantity': 1}])
+
+        self.assertEqual(InventoryCountService.apply(session)['adjusted_count'], 4)
+        self.assertEqual(Product.objects.filter(quantity=0).count(), 4)
+
+    def test_apply_query_count_independent_of_lines(self):
+        """L'application se fait en un nombre fixe de requêtes"""
+        def run(products):
+            session = InventoryCountService.start_session(self.site)
+            InventoryCountService.record_counts(session, [{'product_id': p.id, 'quantity': 1} for p in products])
+            InventoryCountService.freeze(session)
+            with CaptureQueriesContext(connection) as ctx:
+                InventoryCountService.apply(session)
+            return len(ctx.captured_queries)
+
+        # Ligne d'agrégat du jour déjà créée : les deux passes l'incrémentent
+        Transaction.objects.create(product=self.products[-1], type='in', quantity=1, site_configuration=self.site)
+        small = run(self.products[:2])
+        # Même stock de départ que les premiers produits : les deux passes franchissent le seuil d'alerte
+        more = [
+            Product.objects.create(name=f'Autre {i}', quantity=10, site_configuration=self.site)
+            for i in range(20)
+        ]
+        self.assertEqual(run(more), small)
+
+    def test_legacy_inventory_form_uses_bulk_apply(self):
+        """Le formulaire web d'inventaire applique les écarts des produits du site uniquement"""
+        other_user = User.objects.create_user(username='other', password='testpass123')
+        other_site = Configuration.objects.create(
+            site_name='Autre', site_owner=other_user, nom_societe='Autre',
+            adresse='Bamako', telephone='123456789', email='other@example.com',
+        )
+        foreign = Product.objects.create(name='Étranger', quantity=3, site_configuration=other_site)
+        self.client.force_login(self.user)
+
+        response = self.client.post('/inventory/inventory/count/', {
+            f'product_{self.products[0].id}': '12',
+            f'product_{self.products[1].id}': '10',
+            f'product_{foreign.id}': '0',
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.products[0].refresh_from_db()
+        foreign.refresh_from_db()
+        self.assertEqual(self.products[0].quantity, Decimal('12'))
+        self.assertEqual(foreign.quantity, Decimal('3'))
+        self.assertEqual(Transaction.objects.get().quantity, Decimal('2'))
+
+    def test_api_session_workflow(self):
+        """Parcours complet via l'API mobile"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        base = '/api/v1/inventory/count-sessions/'
+
+        session = client.post(base, {'name': 'Inventaire annuel'}, format='json').data
+        url = f"{base}{session['id']}/"
+        counts = client.post(f'{url}counts/', {
+            'items': [{'product_id': self.products[0].id, 'quantity': 6}],
+            'device_id': 'tablette-1',
+        }, format='json')
+        self.assertEqual(counts.data['recorded'], 1)
+
+        self.assertEqual(client.post(f'{url}freeze/').data['status'], 'frozen')
+        diff = client.get(f'{url}diff/').data
+        self.assertEqual(diff['lines'][0]['delta'], Decimal('-4'))
+        self.assertEqual(client.post(f'{url}apply/').data['adjusted_count'], 1)
+        self.assertEqual(client.post(f'{url}apply/').status_code, 400)
+        self.assertEqual(client.get(url).data['status'], 'applied')
@@ -0,0 +1,141 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.models import Configuration
+from apps.inventory.models import LedgerClosing, Product, Transaction, TransactionArchive
+from apps.inventory.services.ledger_archive import LedgerArchiveService, month_ranges
+from apps.inventory.services.rollups import RollupService
+from apps.inventory.services.stock_valuation import StockValuationService
+
+User = get_user_model()
+
+
+class MonthRangesTest(SimpleTestCase):
+    def test_months_cover_period(self):
+        """Un intervalle [1er du mois, 1er du mois suivant[ par mois, passage d'année compris"""
+        self.assertEqual(list(month_ranges(date(2024, 11, 15), date(2025, 1, 3))), [
+            (date(2024, 11, 1), date(2024, 12, 1)),
+            (date(2024, 12, 1), date(2025, 1, 1)),
+            (date(2025, 1, 1), date(2025, 2, 1)),
+        ])
+
+
+class LedgerArchiveServiceTest(TestCase):
+    """Tests de la clôture de période du journal des mouvements"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ledger', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Journal',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        self.rice = self._product('Riz', quantity=12)
+        self.oil = self._product('Huile', quantity=3)
+        self.now = timezone.now()
+
+        # Mouvements datés : il y a 60, 50 et 40 jours (archivés), il y a 5 jours (conservé)
+        self._movement(self.rice, 'in', '20', days=60)
+        self._movement(self.rice, 'out', '5', days=50)
+        self._movement(self.oil, 'in', '4', days=50)
+        self._movement(self.rice, 'loss', '1', days=40)
+        self._movement(self.oil, 'adjustment', '-1', days=40)
+        self.recent = self._movement(self.rice, 'out', '2', days=5)
+
+    def _product(self, name, **kwargs):
+        return Product.objects.create(
+            name=name, purchase_price=Decimal('100'), selling_price=Decimal('150'),
+            site_configuration=self.site, **kwargs
+        )
+
+    def _movement(self, product, type, quantity, days):
+        movement = Transaction.objects.create(
+            product=product, type=type, quantity=Decimal(quantity), site_configuration=self.site
+        )
+        Transaction.objects.filter(pk=movement.pk).update(transaction_date=self.now - timedelta(days=days))
+        return movement
+
+    def _valuation(self, as_of):
+        groups = StockValuationService.get_groups(Product.objects.filter(site_configuration=self.site), 'category', as_of)
+        return groups[0]['quantity']
+
+    def test_close_period_folds_movements_into_opening_balances(self):
+        """Mouvements anciens archivés par lots, un solde d'ouverture par produit"""
+        cutoff = self.now - timedelta(days=30)
+        closing = LedgerArchiveService.close_period(self.site, cutoff, user=self.user, batch_size=2)
+
+        self.assertEqual(closing.archived_count, 5)
+        self.assertEqual(closing.opening_count, 2)
+        self.assertEqual(TransactionArchive.objects.count(), 5)
+        openings = dict(Transaction.objects.filter(type='opening').values_list('product_id', 'quantity'))
+        # Riz : 20 - 5 - 1 = 14 ; Huile : 4 - 1 = 3
+        self.assertEqual(openings, {self.rice.id: Decimal('14'), self.oil.id: Decimal('3')})
+        self.assertEqual(set(Transaction.objects.exclude(type='opening').values_list('id', flat=True)), {self.recent.id})
+        self.assertTrue(Transaction.objects.filter(type='opening', transaction_date=cutoff).exists())
+
+        # Historique archivé : identifiants d'origine, lecture séparée
+        history = LedgerArchiveService.history(site=self.site, product=self.rice)
+        self.assertEqual([movement.type for movement in history], ['loss', 'out', 'in'])
+
+    def test_second_closing_folds_previous_openings(self):
+        """Une clôture ultérieure replie les soldes précédents sans les archiver"""
+        LedgerArchiveService.close_period(self.site, self.now - timedelta(days=45))
+        self.assertEqual(
+            Transaction.objects.get(type='opening', product=self.rice).quantity, Decimal('15')
+        )
+
+        LedgerArchiveService.close_period(self.site, self.now - timedelta(days=30))
+
+        self.assertEqual(TransactionArchive.objects.count(), 5)
+        self.assertEqual(
+            dict(Transaction.objects.filter(type='opening').values_list('product_id', 'quantity')),
+            {self.rice.id: Decimal('14'), self.oil.id: Decimal('3')},
+        )
+        self.assertEqual(LedgerClosing.objects.filter(site_configuration=self.site).count(), 2)
+        with self.assertRaises(ValueError):
+            LedgerArchiveService.close_period(self.site, self.now - timedelta(days=40))
+
+    def test_valuation_and_rollups_unchanged(self):
+        """Valorisation passée et agrégats reconstruits identiques avant / après clôture"""
+        moments = [self.now - timedelta(days=days) for days in (55, 45, 35, 1)]
+        before = [self._valuation(moment) for moment in moments]
+        start = (self.now - timedelta(days=61)).date()
+        RollupService.rebuild(start, timezone.localdate(), site_ids=[self.site.id])
+
+        LedgerArchiveService.close_period(self.site, self.now - timedelta(days=30))
+
+        self.assertEqual([self._valuation(moment) for moment in moments], before)
+        self.assertEqual(RollupService.check(start, timezone.localdate(), site_ids=[self.site.id]), [])
+
+    def test_archive_api_is_scoped_to_site(self):
+        """L'API d'historique archivé ne renvoie que les produits du site"""
+        other_owner = User.objects.create_user(username='ledger_other', password='testpass123')
+        other_site = Configuration.objects.create(
+            site_name='Autre site', site_owner=other_owner, nom_societe='Autre', adresse='Ségou',
+            telephone='987654321', email='autre@example.com',
+        )
+        other_owner.site_configuration = other_site
+        other_owner.save()
+        LedgerArchiveService.close_period(self.site, self.now - timedelta(days=30))
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get('/api/v1/transactions-archive/', {'product': self.oil.id})
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([row['type'] for row in results], ['adjustment', 'in'])
+
+        client.force_authenticate(user=other_owner)
+        response = client.get('/api/v1/transactions-archive/')
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(results, [])
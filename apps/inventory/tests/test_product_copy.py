@@ -0,0 +1,214 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.core.models import Configuration, Notification
+from apps.inventory.models import Barcode, Product, ProductCopy, ProductCopyJob
+from apps.inventory.services.product_copy import ProductCopyService, ProductCopySyncService
+
+User = get_user_model()
+
+
+class ProductCopyServiceTest(TestCase):
+    """Tests du moteur de copie de produits en masse"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='copy', password='testpass123')
+        self.source = self._create_site('Site source')
+        self.destination = self._create_site('Site destination')
+
+    def _create_site(self, name):
+        return Configuration.objects.create(
+            site_name=name,
+            site_owner=self.user,
+            nom_societe=name,
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+
+    def _create_originals(self, count):
+        originals = []
+        for i in range(count):
+            product = Product.objects.create(
+                name=f'Produit {i}',
+                purchase_price=Decimal('500'),
+                selling_price=Decimal('750'),
+                quantity=10,
+                site_configuration=self.source,
+            )
+            Product.objects.filter(pk=product.pk).update(image=f'assets/products/site-{self.source.id}/p{i}.jpg')
+            Barcode.objects.create(product=product, ean=f'{3000000000000 + product.id}', is_primary=True)
+            originals.append(product)
+        return originals
+
+    def test_copy_products_in_bulk(self):
+        """Les produits, codes-barres et liens de copie sont créés, l'image est partagée"""
+        originals = self._create_originals(30)
+
+        result = ProductCopyService.copy_products([p.id for p in originals], self.destination)
+
+        self.assertEqual(result['copied_count'], 30)
+        self.assertEqual(result['errors'], [])
+        copies = Product.objects.filter(site_configuration=self.destination)
+        self.assertEqual(copies.count(), 30)
+        self.assertEqual(len({p.cug for p in Product.objects.all()}), 60)
+        self.assertEqual(len({p.slug for p in Product.objects.all()}), 60)
+
+        link = ProductCopy.objects.get(original_product=originals[0])
+        self.assertEqual(link.source_site, self.source)
+        self.assertEqual(link.destination_site, self.destination)
+        copied = link.copied_product
+        self.assertEqual(copied.quantity, 0)
+        self.assertEqual(copied.image.name, f'assets/products/site-{self.source.id}/p0.jpg')
+        self.assertTrue(copied.generated_ean)
+        self.assertEqual(copied.barcodes.get().ean, f'{3000000000000 + originals[0].id}')
+
+    def test_query_count_independent_of_size(self):
+        """Le nombre de requêtes ne dépend pas du nombre de produits copiés"""
+        small = self._create_originals(3)
+        with CaptureQueriesContext(connection) as ctx:
+            ProductCopyService.copy_products([p.id for p in small], self.destination)
+        small_queries = len(ctx.captured_queries)
+
+        large = self._create_originals(40)
+        with CaptureQueriesContext(connection) as ctx:
+            ProductCopyService.copy_products([p.id for p in large], self.destination)
+        self.assertEqual(len(ctx.captured_queries), small_queries)
+
+    def test_skips_existing_copies_eans_and_own_products(self):
+        """Copies existantes ignorées, EAN déjà présents sur le site ignorés, produits du site refusés"""
+        originals = self._create_originals(2)
+        ProductCopyService.copy_products([originals[0].id], self.destination)
+        own = Product.objects.create(name='Local', site_configuration=self.destination)
+        Barcode.objects.create(product=own, ean=f'{3000000000000 + originals[1].id}')
+
+        result = ProductCopyService.copy_products(
+            [originals[0].id, originals[1].id, own.id, 999999], self.destination
+        )
+
+        self.assertEqual(result['copied_count'], 1)
+        self.assertEqual(len(result['errors']), 2)
+        copied = ProductCopy.objects.get(original_product=originals[1]).copied_product
+        self.assertFalse(copied.barcodes.exists())
+
+    def test_run_job_records_result(self):
+        """Une tâche de copie enregistre son statut et son résultat"""
+        originals = self._create_originals(5)
+        job = ProductCopyJob.objects.create(
+            destination_site=self.destination,
+            product_ids=[p.id for p in originals],
+            total=5,
+        )
+
+        ProductCopyService.run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'success')
+        self.assertEqual(job.copied_count, 5)
+        self.assertEqual(ProductCopyService.get_job_progress(job)['progress'], 100)
+
+
+class ProductCopySyncTest(TestCase):
+    """Tests de la propagation des modifications d'un original vers ses copies"""
+
+    COPIES = 500
+
+    def setUp(self):
+        user = User.objects.create_user(username='sync', password='testpass123')
+        sites = Configuration.objects.bulk_create([
+            Configuration(
+                site_name=f'Site {i}', site_owner=user, nom_societe=f'Site {i}',
+                adresse='Bamako', telephone='123456789', email='test@example.com',
+            )
+            for i in range(self.COPIES + 1)
+        ])
+        self.original = Product.objects.create(
+            name='Original', purchase_price=Decimal('500'), selling_price=Decimal('750'),
+            description='Avant', site_configuration=sites[0],
+        )
+        copies = Product.objects.bulk_create([
+            Product(
+                name='Original', slug=f'copie-{i}', cug=f'C{i}', purchase_price=Decimal('500'),
+                selling_price=Decimal('750'), description='Avant', site_configuration=site,
+            )
+            for i, site in enumerate(sites[1:])
+        ])
+        # Une copie sur dix ne synchronise pas les prix
+        ProductCopy.objects.bulk_create([
+            ProductCopy(
+                original_product=self.original, copied_product=copy, source_site=sites[0],
+                destination_site=copy.site_configuration, sync_prices=(i % 10 != 0),
+            )
+            for i, copy in enumerate(copies)
+        ])
+        self.original = Product.objects.get(pk=self.original.pk)
+
+    def test_price_change_fans_out_to_copies(self):
+        """Un changement de prix est propagé en quelques requêtes, après commit"""
+        self.original.selling_price = Decimal('900')
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.original.save()
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(Product.objects.filter(selling_price=Decimal('900')).exclude(pk=self.original.pk).exists())
+
+        with CaptureQueriesContext(connection) as ctx:
+            callbacks[0]()
+        self.assertLessEqual(len(ctx.captured_queries), 6)
+
+        copies = Product.objects.exclude(pk=self.original.pk)
+        self.assertEqual(copies.filter(selling_price=Decimal('900')).count(), 450)
+        self.assertEqual(copies.filter(selling_price=Decimal('750')).count(), 50)
+        self.assertEqual(copies.filter(description='Avant').count(), self.COPIES)
+
+    def test_only_changed_columns_are_written(self):
+        """La description n'est écrite que sur les copies, sans toucher aux prix locaux"""
+        copy = Product.objects.exclude(pk=self.original.pk).first()
+        Product.objects.filter(pk=copy.pk).update(selling_price=Decimal('100'))
+
+        synced = ProductCopySyncService.propagate(self.original.pk, {'description': ('Avant', 'Après')})
+
+        self.assertEqual(synced, self.COPIES)
+        copy.refresh_from_db()
+        self.assertEqual(copy.description, 'Après')
+        self.assertEqual(copy.selling_price, Decimal('100'))
+
+    def test_save_without_tracked_changes_does_nothing(self):
+        """Aucune propagation si aucun champ synchronisé n'a changé"""
+        self.original.name = 'Renommé'
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.original.save()
+        self.assertEqual(callbacks, [])
+
+    def test_propagate_values_in_bulk(self):
+        """Les quantités appliquées en masse sont propagées aux copies qui synchronisent le stock"""
+        ProductCopy.objects.filter(original_product=self.original).update(sync_stock=False)
+        ProductCopy.objects.filter(pk=ProductCopy.objects.first().pk).update(sync_stock=True)
+
+        with self.captureOnCommitCallbacks(execute=True):  # Agrégats des copies recalculés après commit
+            synced = ProductCopySyncService.propagate_values('quantity', {self.original.pk: Decimal('42')})
+
+        self.assertEqual(synced, 1)
+        self.assertEqual(Product.objects.filter(quantity=Decimal('42')).count(), 1)
+
+    def test_stock_sync_refreshes_rollups_and_alerts(self):
+        """Le stock propagé par UPDATE recalcule les agrégats et alerte le site de la copie"""
+        link = ProductCopy.objects.first()
+        ProductCopy.objects.exclude(pk=link.pk).update(sync_stock=False)
+        ProductCopy.objects.filter(pk=link.pk).update(sync_stock=True)
+        Product.objects.filter(pk=link.copied_product_id).update(quantity=Decimal('10'))
+
+        with mock.patch('apps.inventory.services.product_copy.RollupService.schedule') as schedule:
+            synced = ProductCopySyncService.propagate(self.original.pk, {'quantity': (Decimal('10'), Decimal('2'))})
+
+        self.assertEqual(synced, 1)
+        schedule.assert_called_once()
+        self.assertEqual(schedule.call_args.args[0], link.destination_site_id)
+        self.assertEqual(schedule.call_args.args[2], [link.copied_product_id])
+        alert = Notification.objects.get(site_configuration_id=link.destination_site_id)
+        self.assertIn('low_stock', alert.cle_alerte)
@@ -0,0 +1,221 @@
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from openpyxl import Workbook
+from rest_framework.test import APIClient
+
+from apps.core.models import Configuration
+from apps.inventory.models import Barcode, Brand, Category, Product, ProductImportJob
+from apps.inventory.services import product_import
+from apps.inventory.services.product_import import ProductImportService
+from apps.inventory.utils import normalize_ean, reserve_product_slugs
+from apps.subscription.models import Plan
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+HEADER = 'nom;code_barre;catégorie;marque;prix_achat;prix_vente;quantité\n'
+
+
+def csv_file(lines):
+    return BytesIO((HEADER + ''.join(lines)).encode('utf-8'))
+
+
+def ean13(prefix):
+    """Complète un préfixe de 12 chiffres avec sa clé de contrôle"""
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(prefix))
+    return prefix + str((10 - total % 10) % 10)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ProductImportServiceTest(TestCase):
+    """Tests de l'import en masse de produits (CSV/XLSX)"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='import', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Import',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        self.category = Category.objects.create(name='Boissons', site_configuration=self.site)
+
+    def _lines(self, count, start=0):
+        return [
+            f'Produit {i};{ean13(f"611{i:09d}")};Boissons;Marque A;500;750,5;{i}\n'
+            for i in range(start, start + count)
+        ]
+
+    def test_csv_import_creates_products_and_barcodes(self):
+        """Les lignes valides créent produits, codes-barres, et la marque manquante"""
+        report = ProductImportService.import_file(csv_file(self._lines(3)), 'csv', self.site)
+
+        self.assertEqual(report['created_count'], 3)
+        self.assertEqual(report['errors'], [])
+        product = Product.objects.get(name='Produit 1')
+        self.assertEqual(product.category, self.category)
+        self.assertEqual(product.brand.name, 'Marque A')
+        self.assertEqual(product.selling_price, Decimal('750.5'))
+        self.assertTrue(product.cug and product.slug and product.generated_ean)
+        self.assertEqual(product.barcodes.get().ean, ean13('611000000001'))
+        self.assertEqual(Brand.objects.filter(site_configuration=self.site).count(), 1)
+
+    def test_xlsx_import(self):
+        """Le format XLSX est lu en flux, les EAN numériques sont normalisés"""
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Name', 'EAN', 'Selling price'])
+        sheet.append(['Riz 5kg', float(ean13('611000000042')), 4500])
+        output = BytesIO()
+        workbook.save(output)
+        output.seek(0)
+
+        report = ProductImportService.import_file(output, 'xlsx', self.site)
+
+        self.assertEqual(report['created_count'], 1)
+        self.assertEqual(Barcode.objects.get().ean, ean13('611000000042'))
+
+    def test_per_row_errors(self):
+        """Chaque ligne invalide est rapportée avec son numéro, les autres sont importées"""
+        Barcode.objects.create(
+            product=Product.objects.create(name='Existant', site_configuration=self.site),
+            ean=ean13('611000000000'),
+        )
+        Brand.objects.create(name='Marque A', site_configuration=self.site)
+        lines = self._lines(2) + [
+            ';;;;;;\n',
+            f'Sans prix;{ean13("611000000009")};Boissons;;abc;;\n',
+            'Mauvais EAN;6110000000005;Boissons;;;;\n',
+            f'Doublon;{ean13("611000000001")};;;;;\n',
+            f'Catégorie inconnue;;Inconnue;;;;\n',
+        ]
+
+        report = ProductImportService.import_file(csv_file(lines), 'csv', self.site, create_missing=False)
+
+        self.assertEqual(report['created_count'], 1)
+        self.assertEqual([e['row'] for e in report['errors']], [2, 5, 6, 7, 8])
+        self.assertEqual(report['total_rows'], 6)
+
+    def test_plan_limit_checked_once(self):
+        """La limite du plan s'applique à l'ensemble du fichier"""
+        # Slug absent des migrations (0002_create_initial_plans crée déjà 'starter')
+        plan = Plan.objects.create(name='Import limité', slug='import-limite', max_products=2)
+        self.site.subscription_plan = plan
+        self.site.save()
+
+        report = ProductImportService.import_file(csv_file(self._lines(4)), 'csv', self.site)
+
+        self.assertEqual(report['created_count'], 2)
+        self.assertEqual(report['error_count'], 2)
+        self.assertEqual(Product.objects.filter(site_configuration=self.site).count(), 2)
+
+    def test_slug_fallback_checked_against_database(self):
+        """Le slug suffixé par le CUG est lui aussi vérifié en base"""
+        Product.objects.create(name='Riz', slug='riz', site_configuration=self.site)
+        Product.objects.create(name='Riz bis', slug='riz-12345', site_configuration=self.site)
+
+        self.assertEqual(reserve_product_slugs(['Riz', 'Riz'], ['12345', '54321']), ['riz-12345-2', 'riz-54321'])
+
+    def test_slug_collision_retries_chunk(self):
+        """Un slug pris entre la réservation et l'insertion ne fait pas échouer l'import"""
+        Product.objects.create(name='Existant', slug='existant', site_configuration=self.site)
+        reserve = product_import.reserve_product_slugs
+        calls = []
+
+        def collide_once(names, cugs):
+            calls.append(names)
+            return ['existant'] * len(names) if len(calls) == 1 else reserve(names, cugs)
+
+        with mock.patch.object(product_import, 'reserve_product_slugs', side_effect=collide_once):
+            report = ProductImportService.import_file(csv_file(self._lines(1)), 'csv', self.site)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(report['created_count'], 1)
+        self.assertEqual(Product.objects.get(name='Produit 0').slug, 'produit-0')
+
+    def test_other_constraint_reported_per_row(self):
+        """Une autre contrainte violée n'est pas réessayée : seules les lignes fautives sont rejetées"""
+        taken = ean13('611000000001')
+        bulk_create = Barcode.objects.bulk_create
+        calls = []
+
+        def reject_taken(objs, *args, **kwargs):
+            calls.append(len(objs))
+            if any(barcode.ean == taken for barcode in objs):
+                raise IntegrityError('UNIQUE constraint failed: inventory_barcode.ean')
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Barcode.objects, 'bulk_create', side_effect=reject_taken):
+            report = ProductImportService.import_file(csv_file(self._lines(3)), 'csv', self.site)
+
+        self.assertEqual(calls, [3, 1, 1, 1])  # Lot, puis une ligne à la fois
+        self.assertEqual(report['created_count'], 2)
+        self.assertEqual([error['row'] for error in report['errors']], [3])
+        self.assertFalse(Product.objects.filter(name='Produit 1').exists())
+        self.assertTrue(Product.objects.filter(name='Produit 2').exists())
+
+    def test_dry_run_writes_nothing(self):
+        """En simulation, rien n'est écrit mais le rapport est complet"""
+        report = ProductImportService.import_file(csv_file(self._lines(3)), 'csv', self.site, dry_run=True)
+
+        self.assertEqual(report['created_count'], 3)
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(Brand.objects.exists())
+
+    def test_query_count_independent_of_rows(self):
+        """Le nombre de requêtes ne dépend pas du nombre de lignes d'un lot"""
+        with CaptureQueriesContext(connection) as ctx:
+            ProductImportService.import_file(csv_file(self._lines(3)), 'csv', self.site)
+        small_queries = len(ctx.captured_queries)
+
+        with CaptureQueriesContext(connection) as ctx:
+            ProductImportService.import_file(csv_file(self._lines(40, start=100)), 'csv', self.site)
+        # La marque existe désormais : une création en moins
+        self.assertLessEqual(len(ctx.captured_queries), small_queries)
+
+    def test_normalize_ean(self):
+        """Les EAN sont nettoyés et leur clé de contrôle vérifiée"""
+        self.assertEqual(normalize_ean(' 3017620422003 '), '3017620422003')
+        self.assertEqual(normalize_ean(3017620422003.0), '3017620422003')
+        self.assertEqual(normalize_ean('96385074'), '96385074')
+        self.assertIsNone(normalize_ean(''))
+        with self.assertRaises(ValueError):
+            normalize_ean('3017620422004')
+
+    def test_api_job(self):
+        """L'API enregistre l'import et renvoie l'URL de suivi ; le rapport est consultable"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        upload = SimpleUploadedFile('catalogue.csv', csv_file(self._lines(2)).getvalue(), content_type='text/csv')
+
+        # Exécution synchrone pour le test (le thread ne voit pas la transaction du test)
+        with mock.patch.object(ProductImportService, 'start_job_async', side_effect=ProductImportService.run_job):
+            response = client.post('/api/v1/inventory/import/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 202)
+        status_response = client.get(response.data['status_url'])
+        self.assertEqual(status_response.data['status'], 'success')
+        self.assertEqual(status_response.data['created_count'], 2)
+        self.assertEqual(ProductImportJob.objects.get().site_configuration, self.site)
+
+        bad = SimpleUploadedFile('catalogue.pdf', b'%PDF', content_type='application/pdf')
+        self.assertEqual(client.post('/api/v1/inventory/import/', {'file': bad}, format='multipart').status_code, 400)
@@ -0,0 +1,77 @@
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from apps.core.models import Configuration
+from apps.inventory.models import Barcode, Product, Transaction
+from apps.inventory.services.query_advisor import HOT_QUERIES, QueryAdvisorService
+
+User = get_user_model()
+
+
+class PlanAnalysisTest(SimpleTestCase):
+    """Détection des problèmes dans des plans d'exécution"""
+
+    def test_postgres_seq_scan_and_row_estimate(self):
+        plan = {
+            'Node Type': 'Limit', 'Plan Rows': 50, 'Actual Rows': 50, 'Actual Loops': 1,
+            'Plans': [
+                {'Node Type': 'Seq Scan', 'Relation Name': 'inventory_transaction',
+                 'Plan Rows': 60, 'Actual Rows': 50, 'Actual Loops': 1, 'Rows Removed by Filter': 20000},
+                {'Node Type': 'Index Scan', 'Relation Name': 'sales_sale',
+                 'Plan Rows': 2, 'Actual Rows': 900, 'Actual Loops': 1},
+                {'Node Type': 'Seq Scan', 'Relation Name': 'core_configuration',
+                 'Plan Rows': 3, 'Actual Rows': 3, 'Actual Loops': 1},
+            ],
+        }
+        issues = QueryAdvisorService.analyze_postgres_plan(plan)
+        self.assertEqual(
+            [(issue['type'], issue['relation']) for issue in issues],
+            [('seq_scan', 'inventory_transaction'), ('row_estimate', 'sales_sale')],
+        )
+
+    def test_sqlite_full_scan(self):
+        plan = '2 0 0 SCAN inventory_transaction\n5 0 0 SEARCH sales_sale USING INDEX sales_sale_site_date (site_configuration_id=?)'
+        self.assertEqual(
+            [issue['relation'] for issue in QueryAdvisorService.analyze_sqlite_plan(plan)],
+            ['inventory_transaction'],
+        )
+        self.assertEqual(QueryAdvisorService.analyze_sqlite_plan('SCAN inventory_product USING INDEX x'), [])
+
+
+class HotQueryPlansTest(TestCase):
+    """Les requêtes chaudes du registre sont servies par des index"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='advisor', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Index',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        product = Product.objects.create(
+            name='Savon', purchase_price=Decimal('100'), selling_price=Decimal('150'),
+            quantity=3, site_configuration=self.site,
+        )
+        Barcode.objects.create(product=product, ean='3017620422003', is_primary=True)
+        Transaction.objects.create(product=product, type='in', quantity=Decimal('3'), site_configuration=self.site)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Plans SQLite')
+    def test_registry_has_no_full_scan(self):
+        results = QueryAdvisorService.run(self.site)
+        self.assertEqual(set(results), set(HOT_QUERIES))
+        self.assertEqual({name: result['issues'] for name, result in results.items() if result['issues']}, {})
+
+    def test_command_reports_each_query(self):
+        out = StringIO()
+        call_command('explain_hot_queries', site=self.site.id, query=['barcode_scan', 'sales_site_period'], stdout=out)
+        self.assertIn('barcode_scan', out.getvalue())
+        self.assertIn('2 requête(s) analysée(s)', out.getvalue())
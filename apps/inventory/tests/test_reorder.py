@@ -0,0 +1,122 @@
+import math
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.models import Configuration
+from apps.inventory.models import Order, OrderItem, Product, ReorderJob, Supplier, Transaction
+from apps.inventory.services.reorder import ReorderService
+
+User = get_user_model()
+
+
+class ReorderServiceTest(TestCase):
+    """Tests du moteur de réapprovisionnement sur un journal de sorties synthétique"""
+
+    WEEKS = 8
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reorder', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Réappro',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        self.supplier = Supplier.objects.create(name='Grossiste', site_configuration=self.site)
+        self.fast = self._product('Sucre', quantity=10, supplier=self.supplier)
+        self.idle = self._product('Bougie', quantity=100, supplier=self.supplier)
+        self.steady = self._product('Lait', quantity=0)
+
+        # Journal synthétique reproductible : demande de Poisson pour le sucre, 2/jour pour le lait
+        rng = np.random.default_rng(42)
+        days = self.WEEKS * 7
+        self.fast_series = rng.poisson(5, size=days).astype(float)
+        self._seed_ledger(self.fast, self.fast_series)
+        self._seed_ledger(self.steady, np.full(days, 2.0))
+
+    def _product(self, name, **kwargs):
+        return Product.objects.create(
+            name=name, purchase_price=Decimal('100'), selling_price=Decimal('150'),
+            site_configuration=self.site, **kwargs
+        )
+
+    def _seed_ledger(self, product, series):
+        """Une sortie par jour (index 0 = aujourd'hui), dates fixées après création"""
+        noon = timezone.localtime(timezone.now()).replace(hour=12, minute=0, second=0, microsecond=0)
+        for offset, quantity in enumerate(series):
+            if quantity:
+                transaction = Transaction.objects.create(
+                    product=product, type='out', quantity=Decimal(str(quantity)), site_configuration=self.site
+                )
+                Transaction.objects.filter(pk=transaction.pk).update(transaction_date=noon - timedelta(days=offset))
+
+    def test_suggestions_match_demand_statistics(self):
+        """Moyenne, écart-type, stock de sécurité et quantité suggérée"""
+        report = ReorderService.suggest(self.site, weeks=self.WEEKS, lead_time_days=7, coverage_days=14)
+
+        lines = {line['product_id']: line for line in report['suggestions']}
+        self.assertEqual(report['product_count'], 3)
+        self.assertNotIn(self.idle.id, lines)
+
+        mean = self.fast_series.mean()
+        std = self.fast_series.std(ddof=1)
+        expected = math.ceil(mean * 21 + ReorderService.SERVICE_LEVEL_Z * std * math.sqrt(7) - 10)
+        fast = lines[self.fast.id]
+        self.assertAlmostEqual(fast['avg_daily_demand'], round(mean, 3))
+        self.assertAlmostEqual(fast['demand_std'], round(std, 3))
+        self.assertEqual(fast['suggested_quantity'], Decimal(expected))
+        self.assertEqual(fast['days_of_cover'], round(10 / mean, 1))
+
+        steady = lines[self.steady.id]
+        self.assertEqual(steady['suggested_quantity'], Decimal('42'))
+        self.assertEqual(steady['days_of_cover'], 0)
+        # Le plus urgent (sans stock) en premier
+        self.assertEqual(report['suggestions'][0]['product_id'], self.steady.id)
+
+    def test_draft_order_per_supplier(self):
+        """Une commande brouillon par fournisseur, produits sans fournisseur regroupés"""
+        report = ReorderService.suggest(self.site, weeks=self.WEEKS, create_orders=True)
+
+        orders = Order.objects.filter(id__in=report['order_ids'])
+        self.assertEqual(orders.count(), 2)
+        self.assertTrue(all(order.status == 'draft' for order in orders))
+        supplier_order = orders.get(supplier=self.supplier)
+        item = OrderItem.objects.get(order=supplier_order)
+        self.assertEqual(item.product, self.fast)
+        self.assertEqual(supplier_order.total_amount, item.quantity * Decimal('100'))
+        self.assertEqual(orders.get(supplier__isnull=True).items.get().quantity, Decimal('42'))
+
+    def test_query_count_independent_of_catalog_size(self):
+        """Produits et demande lus en deux requêtes, quel que soit le volume"""
+        with CaptureQueriesContext(connection) as ctx:
+            ReorderService.suggest(self.site, weeks=self.WEEKS)
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_api_job(self):
+        """Le calcul lancé via l'API est suivi par son statut"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        with mock.patch.object(ReorderService, 'start_job_async', side_effect=ReorderService.run_job):
+            response = client.post('/api/v1/inventory/reorder/', {'weeks': self.WEEKS, 'create_orders': False}, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        status = client.get(response.data['status_url']).data
+        self.assertEqual(status['status'], 'success')
+        self.assertEqual(status['suggestion_count'], 2)
+        self.assertEqual(status['order_ids'], [])
+        self.assertEqual(ReorderJob.objects.get().product_count, 3)
+        self.assertEqual(client.post('/api/v1/inventory/reorder/', {'weeks': 'x'}).status_code, 400)
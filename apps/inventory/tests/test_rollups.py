@@ -0,0 +1,160 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core.models import Configuration
+from apps.inventory.models import DailyProductRollup, DailySiteRollup, Product, Transaction
+from apps.inventory.services.rollups import RollupService
+from apps.sales.models import Sale, SaleItem
+
+User = get_user_model()
+
+
+class RollupServiceTest(TestCase):
+    """Tests des agrégats journaliers tenus à jour par écarts, dans la transaction d'écriture"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rollups', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Agrégats',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        self.product = Product.objects.create(
+            name='Savon', purchase_price=Decimal('100'), selling_price=Decimal('150'),
+            quantity=50, site_configuration=self.site,
+        )
+        self.today = timezone.localdate()
+
+    def _sale(self, quantity, unit_price, payment_method='cash'):
+        sale = Sale.objects.create(
+            seller=self.user, site_configuration=self.site, status='completed', payment_method=payment_method
+        )
+        SaleItem.objects.create(sale=sale, product=self.product, quantity=quantity, unit_price=unit_price)
+        return sale
+
+    def test_deltas_applied_in_writing_transaction(self):
+        """Ventes et mouvements mettent à jour les lignes du jour avant le commit, sans recalcul différé"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self._sale(2, Decimal('150'))
+            self._sale(1, Decimal('130'), payment_method='mobile')
+            Transaction.objects.create(product=self.product, type='in', quantity=Decimal('10'), site_configuration=self.site)
+        self.assertEqual(callbacks, [])
+
+        site_row = DailySiteRollup.objects.get(site_configuration=self.site, date=self.today)
+        self.assertEqual(site_row.sales_count, 2)
+        self.assertEqual(site_row.revenue, Decimal('430'))
+        self.assertEqual(site_row.revenue_mobile, Decimal('130'))
+        self.assertEqual(site_row.margin, Decimal('130'))
+        self.assertEqual(site_row.quantity_in, Decimal('10'))
+        product_row = DailyProductRollup.objects.get(product=self.product, date=self.today)
+        self.assertEqual(product_row.quantity_sold, Decimal('3'))
+        self.assertEqual(product_row.revenue, Decimal('430'))
+
+    def test_cancelled_sale_is_removed(self):
+        """L'annulation d'une vente retire son chiffre d'affaires et ses lignes de l'agrégat"""
+        sale = self._sale(2, Decimal('150'))
+        sale.status = 'cancelled'
+        sale.save()
+
+        summary = RollupService.get_sales_summary(self.user, self.today, self.today)
+        self.assertEqual(summary['sales_count'], 0)
+        self.assertEqual(summary['total_revenue'], Decimal('0'))
+        product_row = DailyProductRollup.objects.get(product=self.product, date=self.today)
+        self.assertEqual((product_row.quantity_sold, product_row.revenue), (Decimal('0'), Decimal('0')))
+
+    def test_changes_and_deletions_match_full_recompute(self):
+        """Modifications et suppressions de ventes, lignes et mouvements : aucun écart avec le recalcul"""
+        other = Product.objects.create(
+            name='Huile', purchase_price=Decimal('500'), selling_price=Decimal('700'),
+            quantity=20, site_configuration=self.site,
+        )
+        sale = self._sale(2, Decimal('150'))
+        item = SaleItem.objects.create(sale=sale, product=other, quantity=1, unit_price=Decimal('700'))
+        item.quantity = 3
+        item.save()
+        self._sale(1, Decimal('150')).delete()
+        sale.items.filter(product=self.product).first().delete()
+
+        draft = Sale.objects.create(seller=self.user, site_configuration=self.site, payment_method='card')
+        SaleItem.objects.create(sale=draft, product=self.product, quantity=4, unit_price=Decimal('150'))
+        draft = Sale.objects.get(pk=draft.pk)  # Instance relue, sans instantané
+        draft.status = 'completed'
+        draft.save()
+
+        movement = Transaction.objects.create(product=other, type='in', quantity=Decimal('10'), site_configuration=self.site)
+        movement.type = 'loss'
+        movement.save()
+        Transaction.objects.create(product=self.product, type='out', quantity=Decimal('2'), site_configuration=self.site).delete()
+
+        self.assertEqual(RollupService.check(self.today, self.today, site_ids=[self.site.id]), [])
+        site_row = DailySiteRollup.objects.get(site_configuration=self.site, date=self.today)
+        self.assertEqual(site_row.sales_count, 2)
+        self.assertEqual(site_row.revenue, Decimal('3000'))  # Suppression d'une ligne : total de la vente inchangé
+        self.assertEqual(site_row.revenue_card, Decimal('600'))
+        self.assertEqual(site_row.quantity_loss, Decimal('10'))
+        self.assertEqual(site_row.movement_count, 1)
+
+    def test_inconsistent_row_recomputed_after_commit(self):
+        """Jour jamais agrégé : l'écart négatif est remplacé par un recalcul après commit"""
+        sale = self._sale(2, Decimal('150'))
+        self._sale(1, Decimal('150'))
+        DailySiteRollup.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.status = 'cancelled'
+            sale.save()
+
+        site_row = DailySiteRollup.objects.get(site_configuration=self.site, date=self.today)
+        self.assertEqual((site_row.sales_count, site_row.revenue), (1, Decimal('150')))
+        self.assertEqual(RollupService.check(self.today, self.today, site_ids=[self.site.id]), [])
+
+    def test_sale_cost_independent_of_day_volume(self):
+        """Le coût d'une vente ne dépend pas du nombre de ventes déjà enregistrées dans la journée"""
+        def sale_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self._sale(1, Decimal('150'))
+            return len(ctx.captured_queries)
+
+        sale_queries()  # Lignes du jour créées
+        first = sale_queries()
+        for _ in range(20):
+            self._sale(1, Decimal('150'))
+        self.assertEqual(sale_queries(), first)
+
+    def test_rebuild_and_check(self):
+        """Reconstruction d'une période et vérification sans écart, écart détecté sinon"""
+        self._sale(2, Decimal('150'))
+        movement = Transaction.objects.create(
+            product=self.product, type='out', quantity=Decimal('4'), site_configuration=self.site
+        )
+        Transaction.objects.filter(pk=movement.pk).update(transaction_date=timezone.now() - timedelta(days=3))
+        start = self.today - timedelta(days=7)
+
+        written = RollupService.rebuild(start, self.today, site_ids=[self.site.id])
+
+        self.assertEqual(written, {'site_rows': 2, 'product_rows': 2})
+        self.assertEqual(RollupService.check(start, self.today, site_ids=[self.site.id]), [])
+        DailySiteRollup.objects.filter(date=self.today).update(revenue=Decimal('1'))
+        differences = RollupService.check(start, self.today, site_ids=[self.site.id])
+        self.assertEqual([(d['level'], d['field'], d['expected']) for d in differences], [('site', 'revenue', Decimal('300'))])
+
+    def test_summary_reads_one_row_per_day(self):
+        """Le résumé des ventes est une seule requête, quel que soit le nombre de ventes"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(20):
+                self._sale(1, Decimal('150'))
+        with CaptureQueriesContext(connection) as ctx:
+            summary = RollupService.get_sales_summary(self.user, self.today - timedelta(days=30), self.today)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(summary['sales_count'], 20)
+        self.assertEqual(summary['cash_revenue'], Decimal('3000'))
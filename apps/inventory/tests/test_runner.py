@@ -1,10 +1,85 @@
+import sys
+import unittest
+from contextlib import ExitStack
+
 from django.test.runner import DiscoverRunner
 
+from apps.core.nplusone import NPlusOneError, QueryDetector, format_report, in_test_method
+
+
+class NPlusOneResultMixin:
+    """
+    Résultat de test surveillant les requêtes N+1 de chaque test : rapport en fin de run,
+    échec du test concerné si `nplusone_fail`
+    """
+    nplusone_threshold = None
+    nplusone_fail = False
+
+    def startTest(self, test):
+        super().startTest(test)
+        self._nplusone_detector = QueryDetector(self.nplusone_threshold, scope=in_test_method)
+        self._nplusone_stack = ExitStack()
+        self._nplusone_stack.enter_context(self._nplusone_detector.watch())
+
+    def _finish_detection(self, test):
+        """Retire le détecteur (une seule fois) et enregistre les requêtes répétées du test"""
+        stack = getattr(self, '_nplusone_stack', None)
+        if stack is None:
+            return []
+        stack.close()
+        self._nplusone_stack = None
+        offenders = self._nplusone_detector.offenders()
+        if offenders:
+            self.nplusone_reports.append((test.id(), offenders))
+        return offenders
+
+    def addSuccess(self, test):
+        offenders = self._finish_detection(test)
+        if offenders and self.nplusone_fail:
+            error = NPlusOneError(format_report(offenders, "Requêtes N+1 détectées :"))
+            self.addFailure(test, (NPlusOneError, error, None))
+            return
+        super().addSuccess(test)
+
+    def stopTest(self, test):
+        self._finish_detection(test)
+        super().stopTest(test)
+
+
 class CustomTestRunner(DiscoverRunner):
+    def __init__(self, nplusone_threshold=None, nplusone_fail=False, **kwargs):
+        super().__init__(**kwargs)
+        self.nplusone_threshold = nplusone_threshold
+        self.nplusone_fail = nplusone_fail
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--nplusone-threshold', type=int,
+                            help='Répétitions d\'une même requête signalées (NPLUSONE_THRESHOLD par défaut)')
+        parser.add_argument('--nplusone-fail', action='store_true',
+                            help='Faire échouer les tests qui répètent une requête au-delà du seuil')
+
+    def get_resultclass(self):
+        base = super().get_resultclass() or unittest.TextTestResult
+        return type('NPlusOneTestResult', (NPlusOneResultMixin, base), {
+            'nplusone_threshold': self.nplusone_threshold,
+            'nplusone_fail': self.nplusone_fail,
+            'nplusone_reports': [],
+        })
+
     def setup_test_environment(self, **kwargs):
         super().setup_test_environment(**kwargs)
         # Configuration supplémentaire si nécessaire
 
+    def suite_result(self, suite, result, **kwargs):
+        reports = getattr(result, 'nplusone_reports', [])
+        if reports and self.verbosity > 0:
+            sys.stderr.write(f"\n🔁 Requêtes N+1 : {len(reports)} test(s) concerné(s)\n")
+            for test_id, offenders in reports:
+                sys.stderr.write(format_report(offenders, test_id) + '\n')
+        return super().suite_result(suite, result, **kwargs)
+
     def teardown_test_environment(self, **kwargs):
         super().teardown_test_environment(**kwargs)
-        # Nettoyage supplémentaire si nécessaire 
+        # Nettoyage supplémentaire si nécessaire
@@ -0,0 +1,113 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.models import Configuration, Notification
+from apps.inventory.models import Product
+from apps.inventory.services.stock_alerts import StockAlertService
+
+User = get_user_model()
+
+
+class StockAlertServiceTest(TestCase):
+    """Tests des alertes de stock déclenchées au franchissement des seuils"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alertes', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Alertes',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        self.product = Product.objects.create(
+            name='Savon', purchase_price=Decimal('100'), selling_price=Decimal('150'),
+            quantity=10, alert_threshold=5, site_configuration=self.site,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_crossing_levels(self):
+        self.assertEqual(StockAlertService.crossing(10, 5, 5), 'low_stock')
+        self.assertEqual(StockAlertService.crossing(10, 0, 5), 'out_of_stock')
+        self.assertEqual(StockAlertService.crossing(4, -1, 5), 'out_of_stock')
+        self.assertIsNone(StockAlertService.crossing(4, 3, 5))
+        self.assertIsNone(StockAlertService.crossing(3, 8, 5))
+
+    def test_remove_stock_alerts_once_per_crossing(self):
+        """Retraits via l'API : une alerte au franchissement, pas de doublon tant qu'elle est non lue"""
+        url = f'/api/v1/products/{self.product.id}/remove_stock/'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(url, {'quantity': 2}).status_code, 200)
+        self.assertFalse(Notification.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'quantity': 4})
+        self.assertEqual(response.data['new_quantity'], Decimal('4'))
+        alert = Notification.objects.get()
+        self.assertEqual((alert.cle_alerte, alert.destinataire, alert.site_configuration),
+                         (f'stock:low_stock:{self.product.id}', self.user, self.site))
+
+        # Réassort puis nouveau franchissement : l'alerte non lue n'est pas dupliquée
+        self.client.post(f'/api/v1/products/{self.product.id}/add_stock/', {'quantity': 10})
+        self.client.post(url, {'quantity': 10})
+        self.assertEqual(Notification.objects.filter(cle_alerte__startswith='stock:low_stock').count(), 1)
+        self.client.post(url, {'quantity': 4})
+        self.assertEqual(Notification.objects.filter(cle_alerte__startswith='stock:out_of_stock').count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, Decimal('0'))
+
+    def test_movement_cost_is_constant(self):
+        """Un retrait sans franchissement ne lit ni les produits ni les notifications"""
+        with CaptureQueriesContext(connection) as ctx:
+            StockAlertService.adjust_quantity(self.product, Decimal('-1'))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertTrue(ctx.captured_queries[0]['sql'].startswith('UPDATE'))
+
+    def test_save_path_and_cached_counter(self):
+        """Product.save() détecte aussi le franchissement ; compteur en cache invalidé"""
+        self.assertEqual(StockAlertService.get_unread_count(self.site), 0)
+        product = Product.objects.get(pk=self.product.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.quantity = 0
+            product.save()
+        response = self.client.get('/api/v1/inventory/stock-alerts/')
+        self.assertEqual(response.data['unread_count'], 1)
+        self.assertEqual(response.data['alerts'][0]['cle_alerte'], f'stock:out_of_stock:{self.product.id}')
+        with self.assertNumQueries(0):
+            self.assertEqual(StockAlertService.get_unread_count(self.site), 1)
+
+        response = self.client.post('/api/v1/inventory/stock-alerts/', {}, format='json')
+        self.assertEqual(response.data, {'marked_read': 1, 'unread_count': 0})
+
+    def test_digest_per_site(self):
+        """Le résumé regroupe les alertes non lues par site"""
+        other = Product.objects.create(
+            name='Riz', purchase_price=Decimal('100'), selling_price=Decimal('150'),
+            quantity=3, alert_threshold=5, site_configuration=self.site,
+        )
+        StockAlertService.adjust_quantity(self.product, Decimal('-6'))
+        StockAlertService.adjust_quantity(other, Decimal('-3'))
+
+        self.assertEqual(StockAlertService.send_digests(timezone.now() - timedelta(hours=1)), 1)
+        digest = Notification.objects.get(cle_alerte__startswith='digest:')
+        self.assertEqual(digest.titre, 'Résumé des alertes de stock : 1 rupture de stock, 1 stock faible')
+        self.assertIn('Savon', digest.message)
+        # Un seul résumé par site et par jour
+        StockAlertService.send_digests(timezone.now() - timedelta(hours=1))
+        self.assertEqual(Notification.objects.filter(cle_alerte__startswith='digest:').count(), 1)
@@ -0,0 +1,144 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.core.models import Configuration
+from apps.inventory.models import Product, Transaction
+from apps.inventory.services.stock_report import StockReportService
+from apps.inventory.views import calculate_stock_report_stats
+from apps.sales.models import Sale, SaleItem
+from apps.subscription.models import Plan
+from apps.subscription.services import SubscriptionService
+
+User = get_user_model()
+
+
+class StockReportServiceTest(TestCase):
+    """Tests du moteur d'agrégation du rapport de stock"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='report', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Rapport',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        self.unit_product = self._product('Savon', quantity=10)
+        self.weight_product = self._product('Riz', quantity=Decimal('20'), sale_unit_type='weight', weight_unit='kg')
+
+    def _product(self, name, **kwargs):
+        return Product.objects.create(
+            name=name, purchase_price=Decimal('100'), selling_price=Decimal('150'),
+            site_configuration=self.site, **kwargs
+        )
+
+    def _transaction(self, product, type, quantity, notes=''):
+        return Transaction.objects.create(
+            product=product, type=type, quantity=Decimal(quantity), unit_price=product.purchase_price,
+            notes=notes, site_configuration=self.site,
+        )
+
+    def _sale(self, product, quantity, unit_price, payment_method='cash'):
+        sale = Sale.objects.create(
+            seller=self.user, site_configuration=self.site, status='completed', payment_method=payment_method
+        )
+        SaleItem.objects.create(sale=sale, product=product, quantity=quantity, unit_price=unit_price)
+        return sale
+
+    def _create_activity(self, size=1):
+        # Les agrégats journaliers des ventes sont recalculés après commit
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(size):
+                self._transaction(self.unit_product, 'adjustment', '3')
+                self._transaction(self.unit_product, 'out', '2', notes='Écart inventaire - Retrait manuel')
+                self._transaction(self.weight_product, 'adjustment', '-1.5')
+                self._transaction(self.weight_product, 'loss', '0.5')
+                self._transaction(self.unit_product, 'out', '1', notes='Retrait pour vente #12')
+                self._sale(self.unit_product, 2, Decimal('150'))
+                self._sale(self.unit_product, 1, Decimal('130'), payment_method='sarali')
+
+    def test_excess_products_excluded_in_sql(self):
+        """Au-delà de la limite du plan, les produits les plus anciens sont exclus, sans requête de plus"""
+        self.site.subscription_plan = Plan.objects.create(name='Rapport', slug='rapport', max_products=2)
+        self.site.save()
+        newest = self._product('Sucre')
+
+        self.assertEqual(SubscriptionService.get_excess_product_ids(self.site), [self.unit_product.id])
+        products, _, _ = StockReportService.get_scope(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            ids = set(products.values_list('id', flat=True))
+        self.assertEqual(ids, {self.weight_product.id, newest.id})
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_reason_classified_on_write(self):
+        """Le motif est déduit à l'écriture et remplace le filtrage des notes"""
+        self.assertEqual(self._transaction(self.unit_product, 'in', '1', 'Correction stock').reason, 'inventory')
+        self.assertEqual(self._transaction(self.unit_product, 'in', '1', 'Réception marchandise').reason, 'reception')
+        self.assertEqual(self._transaction(self.unit_product, 'out', '1', 'Retrait').reason, 'other')
+        self.assertEqual(self._transaction(self.unit_product, 'loss', '1').reason, 'loss')
+
+    def test_report_figures(self):
+        """Ajustements, casse, unités et bilan financier"""
+        self._create_activity()
+
+        report = StockReportService.build_report(self.user, 'today')
+
+        self.assertEqual(report['total_products'], 2)
+        self.assertEqual(report['total_value'], Decimal('3000'))
+        self.assertEqual(report['adjustments_count'], 4)
+        self.assertEqual(report['pos_adj_count'], 1)
+        self.assertEqual(report['positive_qty_quantity'], Decimal('3'))
+        self.assertEqual(report['total_pos_val'], Decimal('300'))
+        # Négatifs : sortie d'inventaire (2 unités) + ajustement (-1,5 kg) + casse (0,5 kg)
+        self.assertEqual(report['neg_adj_count'], 3)
+        self.assertEqual(report['negative_qty_quantity'], Decimal('2'))
+        self.assertEqual(report['negative_qty_weight'], Decimal('2'))
+        self.assertEqual(report['negative_unit_weight'], 'kg')
+        self.assertTrue(report['has_negative_mixed'])
+        self.assertEqual(report['unknown_val'], Decimal('350'))
+        self.assertEqual(report['loss_val'], Decimal('50'))
+        self.assertEqual(report['loss_qty'], Decimal('0.5'))
+        self.assertEqual(report['total_neg_val'], Decimal('400'))
+        # Ventes : 2 x 150 + 1 x 130, marge 2 x 50 + 1 x 30
+        self.assertEqual(report['total_revenue'], Decimal('430'))
+        self.assertEqual(report['sarali_revenue'], Decimal('130'))
+        self.assertEqual(report['total_margin'], Decimal('130'))
+        self.assertEqual(report['net_profit'], Decimal('-270'))
+        self.assertEqual(report['top_products'][0]['product'], self.unit_product)
+        self.assertEqual(report['top_products'][0]['net_qty'], Decimal('1'))
+
+    def test_query_count_independent_of_data_size(self):
+        """Le rapport s'exécute en un nombre fixe de requêtes"""
+        self._create_activity()
+        # Premier appel : l'abonnement du site est mis en cache sur l'instance
+        StockReportService.build_report(self.user, 'month')
+        with CaptureQueriesContext(connection) as ctx:
+            StockReportService.build_report(self.user, 'month')
+        small = len(ctx.captured_queries)
+
+        self._create_activity(size=10)
+        for i in range(10):
+            self._product(f'Produit {i}', quantity=i)
+        with CaptureQueriesContext(connection) as ctx:
+            StockReportService.build_report(self.user, 'month')
+        self.assertEqual(len(ctx.captured_queries), small)
+        self.assertLessEqual(small, 7)
+
+    def test_dashboard_stats(self):
+        """Les statistiques du tableau de bord gardent leurs clés, sans l'état du stock"""
+        self._create_activity()
+
+        stats = calculate_stock_report_stats(self.user)
+
+        self.assertEqual(stats['loss_count'], 1)
+        self.assertEqual(stats['cash_revenue'], Decimal('300'))
+        self.assertNotIn('total_value', stats)
+
@@ -0,0 +1,100 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.models import Configuration
+from apps.inventory.models import Brand, Category, Product, Transaction
+from apps.inventory.services.stock_valuation import StockValuationService
+
+User = get_user_model()
+
+
+class StockValuationServiceTest(TestCase):
+    """Tests de la valorisation du stock par agrégats groupés"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='valuation', password='testpass123')
+        self.site = Configuration.objects.create(
+            site_name='Site Valorisation',
+            site_owner=self.user,
+            nom_societe='Test Company',
+            adresse='Bamako',
+            telephone='123456789',
+            email='test@example.com',
+        )
+        self.user.site_configuration = self.site
+        self.user.save()
+        self.category = Category.objects.create(name='Boissons', slug='boissons-valuation', site_configuration=self.site)
+        self.brand = Brand.objects.create(name='Marque V', site_configuration=self.site)
+        self.drink = self._product('Jus', quantity=10, category=self.category, brand=self.brand)
+        self.water = self._product('Eau', quantity=5, category=self.category)
+        self.other = self._product('Divers', quantity=2)
+
+    def _product(self, name, **kwargs):
+        return Product.objects.create(
+            name=name, purchase_price=Decimal('100'), selling_price=Decimal('150'),
+            site_configuration=self.site, **kwargs
+        )
+
+    def test_groups_and_rollup_total(self):
+        """Valeurs par catégorie et par marque, libellés par défaut, total général"""
+        valuation = StockValuationService.build_valuation(self.user)
+
+        categories = {group['name']: group['value'] for group in valuation['groups']['category']}
+        brands = {group['name']: group['value'] for group in valuation['groups']['brand']}
+        self.assertEqual(categories, {'Boissons': Decimal('1500'), 'Non catégorisé': Decimal('200')})
+        self.assertEqual(brands, {'Marque V': Decimal('1000'), 'Non spécifié': Decimal('700')})
+        self.assertEqual(list(categories), ['Boissons', 'Non catégorisé'])
+        self.assertEqual(valuation['total']['value'], Decimal('1700'))
+        self.assertEqual(valuation['total']['product_count'], 3)
+
+    def test_valuation_at_past_date_uses_ledger(self):
+        """Le stock passé = stock actuel moins les mouvements postérieurs"""
+        Transaction.objects.create(product=self.drink, type='in', quantity=Decimal('4'), site_configuration=self.site)
+        Transaction.objects.create(product=self.drink, type='out', quantity=Decimal('1'), site_configuration=self.site)
+        Transaction.objects.create(product=self.water, type='adjustment', quantity=Decimal('-2'), site_configuration=self.site)
+        Transaction.objects.create(product=self.other, type='loss', quantity=Decimal('1'), site_configuration=self.site)
+
+        yesterday = timezone.now() - timedelta(days=1)
+        valuation = StockValuationService.build_valuation(self.user, ['category'], as_of=yesterday)
+
+        categories = {group['name']: group['quantity'] for group in valuation['groups']['category']}
+        # Jus : 10 - (4 - 1) = 7 ; Eau : 5 + 2 = 7 ; Divers : 2 + 1 = 3
+        self.assertEqual(categories, {'Boissons': Decimal('14'), 'Non catégorisé': Decimal('3')})
+        self.assertEqual(valuation['total']['value'], Decimal('1700'))
+
+    def test_query_count_independent_of_catalog_size(self):
+        """Une requête par regroupement, quel que soit le nombre de produits"""
+        StockValuationService.build_valuation(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            StockValuationService.build_valuation(self.user)
+        small = len(ctx.captured_queries)
+
+        for i in range(20):
+            self._product(f'Produit {i}', quantity=i, category=self.category)
+        with CaptureQueriesContext(connection) as ctx:
+            StockValuationService.build_valuation(self.user)
+        self.assertEqual(len(ctx.captured_queries), small)
+
+    def test_api_json_and_csv_export(self):
+        """L'API renvoie le JSON groupé et l'export CSV en flux"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        url = '/api/v1/reports/stock-valuation/'
+
+        data = client.get(url, {'group_by': 'brand'}).data
+        self.assertEqual(list(data['groups']), ['brand'])
+        self.assertEqual(Decimal(data['total']['value']), Decimal('1700'))
+        self.assertEqual(client.get(url, {'as_of': 'hier'}).status_code, 400)
+
+        response = client.get(url, {'export': 'csv', 'group_by': 'product'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(Decimal(lines[-1].split(';')[-1]), Decimal('1700'))
@@ -0,0 +1,82 @@
+from io import StringIO
+
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.db.models import F, Sum
+from django.test import SimpleTestCase, TestCase
+
+from apps.core.models import Configuration
+from apps.inventory.models import Barcode, Category, Customer, Product, ProductCopy, Transaction
+from apps.inventory.services.synthetic_data import SyntheticDataGenerator, ean13, running_balance
+from apps.loyalty.models import LoyaltyTransaction
+from apps.sales.models import CreditTransaction, Sale, SaleItem
+
+
+class HelpersTest(SimpleTestCase):
+    def test_ean13_check_digit(self):
+        """Clé de contrôle EAN-13 calculée comme un lecteur de caisse"""
+        code = ean13(123)
+        self.assertEqual(len(code), 13)
+        digits = [int(d) for d in code]
+        self.assertEqual(sum(d * (3 if i % 2 else 1) for i, d in enumerate(digits)) % 10, 0)
+
+    def test_running_balance_restarts_per_group(self):
+        groups = np.array([1, 1, 1, 2, 2, 5])
+        amounts = np.array([10, -4, 3, 7, 1, -2])
+        self.assertEqual(running_balance(groups, amounts).tolist(), [10, 6, 9, 7, 8, -2])
+
+
+class SyntheticDataGeneratorTest(TestCase):
+    """Tests du générateur de jeux de données synthétiques"""
+
+    SIZES = dict(sites=3, products=60, barcodes=150, transactions=900, sales=200, customers=15, copies=8, days=30)
+
+    def _generate(self, prefix='synth', seed=7):
+        return SyntheticDataGenerator(prefix=prefix, seed=seed, batch_size=50, **self.SIZES).run()
+
+    def test_volumes(self):
+        counts = self._generate()
+        self.assertEqual(Configuration.objects.filter(site_name__startswith='synth ').count(), 3)
+        self.assertEqual(Product.objects.count(), 60)
+        self.assertEqual(Barcode.objects.count(), 150)
+        self.assertEqual(Barcode.objects.filter(is_primary=True).count(), 60)
+        self.assertEqual(Transaction.objects.count(), 900)
+        self.assertEqual(Sale.objects.count(), 200)
+        self.assertEqual(Category.objects.filter(site_configuration__site_name='synth 001', level=2).count(), 36)
+        self.assertTrue(ProductCopy.objects.exists())
+        self.assertEqual(counts['inventory.Transaction'], 900)
+
+    def test_derived_values_match_ledgers(self):
+        """Stock = somme des mouvements, soldes clients = journaux, totaux ventes = lignes"""
+        self._generate()
+        stock = {}
+        for product_id, kind, quantity in Transaction.objects.values_list('product_id', 'type', 'quantity'):
+            stock[product_id] = stock.get(product_id, 0) + (-quantity if kind in ('out', 'loss') else quantity)
+        for product_id, quantity in Product.objects.values_list('id', 'quantity'):
+            self.assertEqual(quantity, stock.get(product_id, 0))
+
+        # Dernier solde de chaque journal (lignes lues dans l'ordre chronologique)
+        credit = dict(CreditTransaction.objects.order_by('transaction_date', 'id').values_list('customer_id', 'balance_after'))
+        points = dict(LoyaltyTransaction.objects.order_by('transaction_date', 'id').values_list('customer_id', 'balance_after'))
+        self.assertTrue(credit and points)
+        for customer_id, balance, loyalty in Customer.objects.values_list('id', 'credit_balance', 'loyalty_points'):
+            self.assertEqual(balance, credit.get(customer_id, 0))
+            self.assertEqual(loyalty, points.get(customer_id, 0))
+
+        mismatched = Sale.objects.annotate(lines=Sum('items__amount')).exclude(lines=F('total_amount'))
+        self.assertFalse(mismatched.exists())
+        self.assertEqual(SaleItem.objects.count(), Transaction.objects.filter(type='out').count())
+
+    def test_same_seed_same_data(self):
+        self._generate(prefix='a')
+        self._generate(prefix='b')
+        first = list(Product.objects.filter(slug__startswith='a-').order_by('id').values_list('name', 'quantity'))
+        second = list(Product.objects.filter(slug__startswith='b-').order_by('id').values_list('name', 'quantity'))
+        self.assertEqual(first, second)
+
+    def test_existing_prefix_is_refused(self):
+        call_command('generate_synthetic_data', sites=1, products=5, barcodes=5, transactions=20, sales=5,
+                     customers=2, copies=0, days=5, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('generate_synthetic_data', sites=1, products=5, barcodes=5, transactions=20, sales=5,
+                         customers=2, copies=0, days=5, stdout=StringIO())
@@ -60,3 +60,115 @@ def calculate_ean13_checksum(code):
     
     checksum = (10 - (total % 10)) % 10
     return checksum
+
+
+def normalize_ean(value):
+    """
+    Normalise un code-barres saisi ou importé (tableur) en EAN-8 / EAN-13.
+
+    - Supprime espaces, tirets et le suffixe ".0" des cellules numériques Excel
+    - Complète un UPC-A (12 chiffres) en EAN-13
+    - Vérifie la clé de contrôle
+
+    Returns:
+        str: EAN normalisé, ou None si la valeur est vide
+
+    Raises:
+        ValueError: Si le code n'est pas un EAN valide
+    """
+    if value is None:
+        return None
+    if isinstance(value, float):
+        value = f"{value:.0f}"
+    code = str(value).strip().replace(' ', '').replace('-', '')
+    if code.endswith('.0'):
+        code = code[:-2]
+    if not code:
+        return None
+    if not code.isdigit():
+        raise ValueError(f"Code-barres invalide '{value}' : chiffres uniquement")
+    if len(code) == 12:
+        code = '0' + code
+    if len(code) == 13:
+        if calculate_ean13_checksum(code[:12]) != int(code[12]):
+            raise ValueError(f"Code-barres invalide '{value}' : clé de contrôle EAN-13 incorrecte")
+    elif len(code) == 8:
+        total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(code[:7]))
+        if (10 - total % 10) % 10 != int(code[7]):
+            raise ValueError(f"Code-barres invalide '{value}' : clé de contrôle EAN-8 incorrecte")
+    else:
+        raise ValueError(f"Code-barres invalide '{value}' : 8, 12 ou 13 chiffres attendus")
+    return code
+
+
+def reserve_product_cugs(count, used=None):
+    """
+    Réserve `count` CUG à 5 chiffres libres (même format que Product.generate_unique_cug)
+    sans requête par produit.
+
+    Args:
+        count: Nombre de CUG à réserver
+        used: Ensemble des CUG déjà pris ; chargé en une requête si None. Il est
+              complété avec les CUG réservés, ce qui permet de le réutiliser d'un lot à l'autre.
+
+    Returns:
+        list: CUG réservés
+    """
+    import random
+    from .models import Product
+
+    if used is None:
+        used = set(Product.objects.filter(cug__regex=r'^[0-9]{5}$').values_list('cug', flat=True))
+    available = 90000 - len(used)
+    if count > available:
+        raise ValueError(f"Plus assez de CUG disponibles ({available} restants pour {count} produits)")
+
+    reserved = []
+    while len(reserved) < count:
+        candidate = str(random.randint(10000, 99999))
+        if candidate not in used:
+            used.add(candidate)
+            reserved.append(candidate)
+    return reserved
+
+
+def reserve_product_slugs(names, cugs):
+    """
+    Calcule des slugs uniques pour une liste de produits, en une seule requête.
+    Même règle que Product.save() : slug du nom, suffixé par le CUG s'il est déjà pris.
+    """
+    from django.utils.text import slugify
+    from .models import Product
+
+    max_length = Product._meta.get_field('slug').max_length
+    base_slugs = [slugify(name)[:max_length - len(cug) - 1] or cug for name, cug in zip(names, cugs)]
+    fallbacks = [f"{base_slug}-{cug}" for base_slug, cug in zip(base_slugs, cugs)]
+    taken = set(Product.objects.filter(slug__in=set(base_slugs + fallbacks)).values_list('slug', flat=True))
+
+    slugs = []
+    pending = []
+    for index, candidates in enumerate(zip(base_slugs, fallbacks)):
+        slug = next((candidate for candidate in candidates if candidate not in taken), None)
+        if slug is None:
+            pending.append(index)
+        else:
+            taken.add(slug)
+        slugs.append(slug)
+
+    # Slug suffixé par le CUG déjà pris (rare) : suffixe numérique, vérifié en base lui aussi
+    suffix = 2
+    while pending:
+        proposals = {
+            index: f"{base_slugs[index][:max_length - len(cugs[index]) - len(str(suffix)) - 2]}-{cugs[index]}-{suffix}"
+            for index in pending
+        }
+        taken.update(Product.objects.filter(slug__in=set(proposals.values())).values_list('slug', flat=True))
+        pending = []
+        for index, slug in proposals.items():
+            if slug in taken:
+                pending.append(index)
+            else:
+                taken.add(slug)
+                slugs[index] = slug
+        suffix += 1
+    return slugs
@@ -16,18 +16,21 @@ from django.http import JsonResponse, HttpResponseRedirect, HttpResponse
 from django.template.loader import render_to_string
 from io import BytesIO
 from django.views.decorators.http import require_POST
-from apps.core.utils import cache_result
 from apps.core.storage import storage
 from django.http import Http404
 from django.db import transaction
 from django.core.paginator import Paginator
-from apps.core.models import Configuration
+from apps.core.site_context import default_site
 from apps.core.services import (
     PermissionService, UserInfoService,
     can_user_manage_brand_quick, can_user_create_brand_quick, can_user_delete_brand_quick,
     can_user_manage_category_quick, can_user_create_category_quick, can_user_delete_category_quick
 )
 from .models import ProductCopy
+from .services.cadencier import CadencierService
+from .services.inventory_count import InventoryCountService, parse_quantity
+from .services.stock_report import StockReportService
+from .services.stock_valuation import StockValuationService
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -220,8 +223,7 @@ class ProductCreateView(SiteRequiredMixin, CreateView):
             form.instance.site_configuration = site_config
         else:
             # Les superusers créent des produits pour le site principal
-            from apps.core.models import Configuration
-            main_site = Configuration.objects.order_by('id').first()
+            main_site = default_site()
             if main_site:
                 form.instance.site_configuration = main_site
             site_config = main_site
@@ -299,27 +301,18 @@ class ProductUpdateView(SiteFilterMixin, UpdateView):
         return form
 
     def form_valid(self, form):
-        print("=" * 50)
-        print(f"ProductUpdateView.form_valid appelé pour produit {self.object.id}")
-        print("=" * 50)
-        logger.warning(f"=== ProductUpdateView.form_valid appelé pour produit {self.object.id} ===")
-        
         # Récupérer l'ancienne quantité directement depuis la DB sans modifier self.object
         product_id = self.object.id
         old_product = Product.objects.get(pk=product_id)
         old_quantity = Decimal(str(old_product.quantity)) if old_product.quantity else Decimal('0')
-        print(f"Ancienne quantité (depuis DB): {old_quantity}")
-        logger.warning(f"Ancienne quantité (depuis DB): {old_quantity}")
         
-        # Récupérer la nouvelle quantité depuis le formulaire
+        # Récupérer la nouvelle quantité depuis le formulaire (ancienne valeur si absente)
         new_quantity_raw = form.cleaned_data.get('quantity', None)
-        logger.warning(f"Quantité depuis formulaire (raw): {new_quantity_raw}, type: {type(new_quantity_raw)}")
         if new_quantity_raw is None:
             new_quantity = old_quantity
-            logger.warning("Quantité None dans formulaire, utilisation de l'ancienne valeur")
         else:
             new_quantity = Decimal(str(new_quantity_raw))
-        logger.warning(f"Nouvelle quantité (calculée): {new_quantity}")
+        logger.debug("🔍 [PRODUCT_UPDATE] Produit %s: quantité %s -> %s", product_id, old_quantity, new_quantity)
         
         # Gérer l'image avec le stockage du modèle (multisite)
         if 'image' in self.request.FILES:
@@ -367,12 +360,9 @@ class ProductUpdateView(SiteFilterMixin, UpdateView):
         # Normaliser les Decimal pour la comparaison
         old_quantity_normalized = Decimal(str(old_quantity)).quantize(Decimal('0.001'))
         new_quantity_normalized = Decimal(str(new_quantity)).quantize(Decimal('0.001'))
-        logger.warning(f"Comparaison: {new_quantity_normalized} != {old_quantity_normalized} ? {new_quantity_normalized != old_quantity_normalized}")
-        print(f"Comparaison: {new_quantity_normalized} != {old_quantity_normalized} ? {new_quantity_normalized != old_quantity_normalized}")
         
         # Sauvegarder le formulaire d'abord
         response = super().form_valid(form)
-        logger.warning(f"Formulaire sauvegardé, self.object.quantity = {self.object.quantity}")
         
         # Recharger l'objet pour avoir accès à toutes les propriétés (comme unit_display)
         self.object.refresh_from_db()
@@ -381,17 +371,11 @@ class ProductUpdateView(SiteFilterMixin, UpdateView):
         actual_new_quantity = Decimal(str(self.object.quantity)) if self.object.quantity else Decimal('0')
         actual_new_quantity_normalized = actual_new_quantity.quantize(Decimal('0.001'))
         
-        logger.warning(f"Quantité réelle après sauvegarde: {actual_new_quantity_normalized}")
-        print(f"Quantité réelle après sauvegarde: {actual_new_quantity_normalized}")
-        
         if actual_new_quantity_normalized != old_quantity_normalized:
             quantity_diff = actual_new_quantity_normalized - old_quantity_normalized
             unit_price = self.object.purchase_price or Decimal('0')
             total_amount = abs(quantity_diff) * unit_price
             
-            logger.warning(f"Création transaction: diff={quantity_diff}, unit_price={unit_price}, total={total_amount}")
-            print(f"Création transaction: diff={quantity_diff}, unit_price={unit_price}, total={total_amount}")
-            logger.warning(f"User: {self.request.user}, Site: {getattr(self.request.user, 'site_configuration', None)}")
             
             try:
                 # Utiliser l'unité correcte du produit
@@ -414,8 +398,10 @@ class ProductUpdateView(SiteFilterMixin, UpdateView):
                     user=self.request.user,
                     site_configuration=getattr(self.request.user, 'site_configuration', None)
                 )
-                print(f"=== Transaction créée avec succès: ID={transaction.id}, produit {self.object.id}: {old_quantity} -> {new_quantity} ===")
-                logger.warning(f"=== Transaction créée avec succès: ID={transaction.id}, produit {self.object.id}: {old_quantity} -> {new_quantity} ===")
+                logger.info(
+                    "✅ [PRODUCT_UPDATE] Transaction %s créée: produit %s, %s -> %s",
+                    transaction.id, self.object.id, old_quantity, new_quantity,
+                )
                 messages.info(self.request, f"Transaction créée: {sign}{qty_display} {unit_display}")
             except Exception as e:
                 logger.error(f"Erreur lors de la création de la transaction: {str(e)}", exc_info=True)
@@ -445,87 +431,26 @@ class ProductDeleteView(SiteFilterMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 @login_required
-@cache_result(timeout=300)  # Cache pour 5 minutes
 def cadencier_view(request):
     # Récupérer les paramètres de filtrage
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
     product_id = request.GET.get('product')
+    product_id = int(product_id) if product_id and product_id.isdigit() else None
+    try:
+        start_date, end_date = CadencierService.get_period(request.GET.get('start_date'), request.GET.get('end_date'))
+    except ValueError:
+        messages.error(request, "Format de date invalide (AAAA-MM-JJ attendu)")
+        start_date, end_date = CadencierService.get_period()
     
-    # Convertir les dates
-    if start_date:
-        start_date = datetime.strptime(start_date, '%Y-%m-%d')
-    else:
-        start_date = timezone.now() - timedelta(days=30)
-        
-    if end_date:
-        end_date = datetime.strptime(end_date, '%Y-%m-%d')
-    else:
-        end_date = timezone.now()
-    
-    # Filtrer les produits (exclut les produits excédentaires pour les rapports)
-    user_site = request.user.site_configuration
-    if request.user.is_superuser:
-        products = Product.objects.select_related().all()
-    elif user_site:
-        from apps.subscription.services import SubscriptionService
-        products = SubscriptionService.get_products_queryset(user_site, exclude_excess=True).select_related()
-    else:
-        products = Product.objects.none()
-    
-    if product_id:
-        products = products.filter(id=product_id)
-    
-    # Préparer les données pour chaque produit
-    product_data = []
-    for product in products:
-        # Récupérer le stock actuel
-        current_stock = product.quantity
-        
-        # Récupérer les entrées (transactions de type 'in')
-        incoming = Transaction.objects.filter(
-            product=product,
-            type='in',
-            transaction_date__range=[start_date, end_date]
-        ).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
-        
-        # Récupérer les sorties (transactions de type 'out')
-        outgoing = Transaction.objects.filter(
-            product=product,
-            type='out',
-            transaction_date__range=[start_date, end_date]
-        ).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
-        
-        # Convertir en Decimal pour assurer la cohérence des types
-        incoming = Decimal(str(incoming))
-        outgoing = Decimal(str(outgoing))
-        current_stock = Decimal(str(current_stock))
-        
-        # Calculer la consommation moyenne par jour
-        days = (end_date - start_date).days + 1
-        daily_consumption = outgoing / Decimal(str(days)) if days > 0 else Decimal('0')
-        
-        # Calculer le stock minimum requis (consommation moyenne sur 7 jours)
-        minimum_stock = daily_consumption * Decimal('7')
-        
-        # Calculer la quantité à commander
-        quantity_to_order = max(Decimal('0'), minimum_stock - current_stock)
-        
-        product_data.append({
-            'product': product,
-            'current_stock': current_stock,
-            'incoming': incoming,
-            'outgoing': outgoing,
-            'daily_consumption': daily_consumption,
-            'minimum_stock': minimum_stock,
-            'quantity_to_order': quantity_to_order,
-        })
+    # Entrées / sorties groupées par produit et par semaine (mis en cache par site et période)
+    cadencier = CadencierService.get_cadencier(
+        request.user, start_date, end_date, product_id=product_id, page=request.GET.get('page', 1)
+    )
     
     context = {
-        'product_data': product_data,
+        **cadencier,
         'start_date': start_date,
         'end_date': end_date,
-        'products': Product.objects.all(),
+        'products': StockReportService.get_scope(request.user)[0].order_by('name').only('id', 'name'),
         'selected_product': product_id,
     }
     
@@ -537,7 +462,6 @@ class CategoryListView(SiteFilterMixin, ListView):
     context_object_name = 'categories'
     paginate_by = 50  # Limiter à 50 catégories par page
 
-    @cache_result(timeout=300)  # Cache pour 5 minutes
     def get_queryset(self):
         return Category.objects.all().order_by('level', 'order', 'name')
 
@@ -639,7 +563,6 @@ class BrandListView(SiteFilterMixin, ListView):
     template_name = 'inventory/brand_list.html'
     context_object_name = 'brands'
 
-    @cache_result(timeout=300)  # Cache pour 5 minutes
     def get_queryset(self):
         return Brand.objects.all().order_by('name')
 
@@ -1067,35 +990,44 @@ class CashRegisterView(SiteRequiredMixin, View):
         
         return render(request, self.template_name, context)
 
+def _get_posted_counts(request):
+    """Quantités comptées postées par les formulaires d'inventaire (champs product_<id>)"""
+    counts = {}
+    for key, value in request.POST.items():
+        if not key.startswith('product_'):
+            continue
+        quantity = parse_quantity(value)
+        try:
+            product_id = int(key.replace('product_', ''))
+        except ValueError:
+            continue
+        if quantity is not None:
+            counts[product_id] = quantity
+    return counts
+
+
+def _get_countable_products(user):
+    """Produits que l'utilisateur peut inventorier"""
+    if user.is_superuser:
+        return Product.objects.all()
+    user_site = getattr(user, 'site_configuration', None)
+    if not user_site:
+        return Product.objects.none()
+    return Product.objects.filter(site_configuration=user_site)
+
+
 @login_required
 def inventory_count(request):
     """Vue pour effectuer un inventaire complet."""
     if request.method == 'POST':
-        # Traiter les données de l'inventaire
-        for product_id, count in request.POST.items():
-            if product_id.startswith('product_'):
-                product_id = product_id.replace('product_', '')
-                try:
-                    product = Product.objects.get(id=product_id)
-                    actual_count = int(count)
-                    if actual_count != product.quantity:
-                        # Créer une transaction de régularisation (type adjustment pour le rapport)
-                        diff = actual_count - product.quantity
-                        Transaction.objects.create(
-                            product=product,
-                            type='adjustment',
-                            quantity=diff, # Delta signé
-                            unit_price=product.purchase_price,
-                            total_amount=abs(diff) * product.purchase_price,
-                            notes=f'Écart inventaire: {product.quantity} -> {actual_count}',
-                            user=request.user,
-                            site_configuration=getattr(request.user, 'site_configuration', None)
-                        )
-                        # Mettre à jour la quantité
-                        product.quantity = actual_count
-                        product.save()
-                except (Product.DoesNotExist, ValueError):
-                    continue
+        # Appliquer tous les écarts en une transaction (bulk_create / bulk_update)
+        counts = _get_posted_counts(request)
+        InventoryCountService.apply_direct_counts(
+            _get_countable_products(request.user),
+            counts,
+            user=request.user,
+            note_label='Écart inventaire',
+        )
         messages.success(request, 'L\'inventaire a été enregistré avec succès.')
         return redirect('inventory:product_list')
     
@@ -1117,27 +1049,15 @@ def inventory_count(request):
 def stock_count(request):
     """Vue pour effectuer un comptage rapide de stock."""
     if request.method == 'POST':
-        # Traiter les données du comptage
-        for product_id, count in request.POST.items():
-            if product_id.startswith('product_'):
-                product_id = product_id.replace('product_', '')
-                try:
-                    product = Product.objects.get(id=product_id)
-                    actual_count = int(count)
-                    if actual_count != product.quantity:
-                        # Créer une transaction de régularisation
-                        Transaction.objects.create(
-                            product=product,
-                            type='loss' if actual_count < product.quantity else 'in',
-                            quantity=abs(actual_count - product.quantity),
-                            unit_price=product.purchase_price,
-                            notes=f'Régularisation comptage: {product.quantity} -> {actual_count}'
-                        )
-                        # Mettre à jour la quantité
-                        product.quantity = actual_count
-                        product.save()
-                except (Product.DoesNotExist, ValueError):
-                    continue
+        # Régularisations (casse / entrée) appliquées en une transaction
+        counts = _get_posted_counts(request)
+        InventoryCountService.apply_direct_counts(
+            _get_countable_products(request.user),
+            counts,
+            user=request.user,
+            note_label='Régularisation comptage',
+            signed=False,
+        )
         messages.success(request, 'Le comptage a été enregistré avec succès.')
         return redirect('inventory:product_list')
     
@@ -1236,199 +1156,7 @@ def calculate_stock_report_stats(user, period='today'):
     Retourne None en cas d'erreur.
     """
     try:
-        from apps.subscription.services import SubscriptionService
-        
-        today = timezone.now()
-        
-        # Déterminer la période
-        if period == 'week':
-            start_date = today - timedelta(days=today.weekday())
-            start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        elif period == 'month':
-            start_date = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        else:  # today
-            start_date = today.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        end_date = today
-
-        # Filtrer les produits et transactions par site
-        user_site = user.site_configuration
-        if user.is_superuser:
-            products = Product.objects.select_related('category', 'brand').all()
-            transactions = Transaction.objects.all()
-        elif user_site:
-            products = SubscriptionService.get_products_queryset(user_site, exclude_excess=True)
-            transactions = Transaction.objects.filter(product__site_configuration=user_site)
-        else:
-            products = Product.objects.none()
-            transactions = Transaction.objects.none()
-
-        # Filtrer les transactions sur la période
-        period_transactions = transactions.filter(transaction_date__range=[start_date, end_date])
-
-        # Calculer les ajustements
-        inventory_keywords = Q(notes__icontains='écart inventaire') | \
-                            Q(notes__icontains='ajustement inventaire') | \
-                            Q(notes__icontains='correction stock') | \
-                            Q(notes__icontains='inventaire')
-        
-        adjustments = period_transactions.filter(
-            Q(type='adjustment') | 
-            (Q(type__in=['in', 'out']) & inventory_keywords)
-        ).select_related('product')
-
-        # Fonction pour déterminer si c'est une unité de poids
-        def is_weight_unit(unit):
-            return unit in ['kg', 'g']
-        
-        # Calculer les totaux positifs et négatifs
-        positive_by_unit = {}
-        negative_by_unit = {}
-        total_pos_val = Decimal('0')
-        total_neg_val = Decimal('0')
-        positive_adjustments = []
-        negative_adjustments = []
-
-        for adj in adjustments:
-            qty = adj.quantity
-            val = adj.total_amount or Decimal('0')
-            
-            product = adj.product
-            unit = product.unit_display if product else 'unité(s)'
-            is_weight = is_weight_unit(unit)
-            key = 'weight' if is_weight else 'quantity'
-            
-            if adj.type == 'out':
-                qty = -abs(qty)
-                val = abs(val)
-            elif adj.type == 'in':
-                qty = abs(qty)
-                val = abs(val)
-            else:
-                val = abs(val)
-
-            if qty > 0:
-                positive_adjustments.append(adj)
-                if key not in positive_by_unit:
-                    positive_by_unit[key] = {'total': Decimal('0'), 'unit': unit, 'count': 0}
-                positive_by_unit[key]['total'] += qty
-                positive_by_unit[key]['count'] += 1
-                total_pos_val += val
-            elif qty < 0:
-                negative_adjustments.append(adj)
-                if key not in negative_by_unit:
-                    negative_by_unit[key] = {'total': Decimal('0'), 'unit': unit, 'count': 0}
-                negative_by_unit[key]['total'] += abs(qty)
-                negative_by_unit[key]['count'] += 1
-                total_neg_val += val
-
-        # Calculer la démarque (Casse)
-        loss_transactions = period_transactions.filter(type='loss').select_related('product')
-        loss_by_unit = {}
-        loss_val = Decimal('0')
-        for tx in loss_transactions:
-            product = tx.product
-            unit = product.unit_display if product else 'unité(s)'
-            is_weight = is_weight_unit(unit)
-            key = 'weight' if is_weight else 'quantity'
-            
-            if key not in loss_by_unit:
-                loss_by_unit[key] = {'total': Decimal('0'), 'unit': unit}
-            loss_by_unit[key]['total'] += tx.quantity
-            loss_val += tx.total_amount or Decimal('0')
-
-        # Recalculer l'affichage des négatifs en incluant la casse
-        negative_display_by_unit = {
-            'weight': negative_by_unit.get('weight', {}).copy() if 'weight' in negative_by_unit else {},
-            'quantity': negative_by_unit.get('quantity', {}).copy() if 'quantity' in negative_by_unit else {}
-        }
-        for key, data in loss_by_unit.items():
-            if key not in negative_display_by_unit or not negative_display_by_unit[key]:
-                negative_display_by_unit[key] = {'total': Decimal('0'), 'unit': data.get('unit', 'unité(s)'), 'count': 0}
-            negative_display_by_unit[key]['total'] += abs(data.get('total', Decimal('0')))
-            if 'count' not in negative_display_by_unit[key]:
-                negative_display_by_unit[key]['count'] = 0
-
-        total_neg_count = len(negative_adjustments) + loss_transactions.count()
-        total_neg_val_with_loss = total_neg_val + loss_val
-
-        # Calculer le bilan financier (aperçu)
-        from apps.sales.models import Sale
-        financial_sales = Sale.objects.filter(sale_date__range=[start_date, end_date])
-        if not user.is_superuser and user_site:
-            financial_sales = financial_sales.filter(site_configuration=user_site)
-        
-        # Calculer les revenus et marges
-        total_revenue = Decimal('0')
-        total_margin = Decimal('0')
-        by_payment_method = {
-            'cash': Decimal('0'),
-            'credit': Decimal('0'),
-            'sarali': Decimal('0'),
-        }
-        
-        for sale in financial_sales.filter(status='completed'):
-            total_revenue += sale.total_amount or Decimal('0')
-            # Calculer la marge totale de la vente
-            sale_margin = Decimal('0')
-            for item in sale.items.all():
-                if item.product:
-                    margin_per_unit = (item.unit_price or Decimal('0')) - (item.product.purchase_price or Decimal('0'))
-                    sale_margin += margin_per_unit * (item.quantity or Decimal('0'))
-            total_margin += sale_margin
-            
-            # Par mode de paiement
-            payment_method = sale.payment_method or 'cash'
-            if payment_method in by_payment_method:
-                by_payment_method[payment_method] += sale.total_amount or Decimal('0')
-        
-        # Coûts et pertes
-        total_losses = loss_val  # Casse
-        total_shrinkage = total_neg_val  # Démarque inconnue (sans casse)
-        total_costs = total_losses + total_shrinkage
-        
-        # Résultat
-        net_profit = total_margin - total_costs  # Profit net = marge - pertes
-        profit_margin = (net_profit / total_revenue * 100) if total_revenue > 0 else Decimal('0')
-
-        return {
-        'pos_adj_count': len(positive_adjustments),
-        'neg_adj_count': total_neg_count,  # ajustements négatifs + casse
-        'total_pos_val': total_pos_val,
-        'total_neg_val': total_neg_val_with_loss,
-        'positive_qty_weight': positive_by_unit.get('weight', {}).get('total', Decimal('0')),
-        'positive_qty_quantity': positive_by_unit.get('quantity', {}).get('total', Decimal('0')),
-        'positive_unit_weight': positive_by_unit.get('weight', {}).get('unit', 'kg'),
-        'positive_unit_quantity': positive_by_unit.get('quantity', {}).get('unit', 'unité(s)'),
-        'negative_qty_weight': negative_display_by_unit.get('weight', {}).get('total', Decimal('0')),
-        'negative_qty_quantity': negative_display_by_unit.get('quantity', {}).get('total', Decimal('0')),
-        'negative_unit_weight': negative_display_by_unit.get('weight', {}).get('unit', 'kg'),
-        'negative_unit_quantity': negative_display_by_unit.get('quantity', {}).get('unit', 'unité(s)'),
-        'loss_count': loss_transactions.count(),
-        'loss_val': loss_val,
-        'loss_qty_weight': loss_by_unit.get('weight', {}).get('total', Decimal('0')),
-        'loss_qty_quantity': loss_by_unit.get('quantity', {}).get('total', Decimal('0')),
-        'loss_unit_weight': loss_by_unit.get('weight', {}).get('unit', 'kg'),
-        'loss_unit_quantity': loss_by_unit.get('quantity', {}).get('unit', 'unité(s)'),
-        # Inconnue reste basée sur les ajustements négatifs (sans casse)
-        'unknown_count': len(negative_adjustments),
-        'unknown_val': total_neg_val,
-        'unknown_qty_weight': negative_by_unit.get('weight', {}).get('total', Decimal('0')),
-        'unknown_qty_quantity': negative_by_unit.get('quantity', {}).get('total', Decimal('0')),
-        'unknown_unit_weight': negative_by_unit.get('weight', {}).get('unit', 'kg'),
-        'unknown_unit_quantity': negative_by_unit.get('quantity', {}).get('unit', 'unité(s)'),
-        # Bilan financier (aperçu)
-        'total_revenue': total_revenue,
-        'total_margin': total_margin,
-        'total_losses': total_losses,
-        'total_shrinkage': total_shrinkage,
-        'total_costs': total_costs,
-        'net_profit': net_profit,
-        'profit_margin': profit_margin,
-        'cash_revenue': by_payment_method['cash'],
-        'credit_revenue': by_payment_method['credit'],
-        'sarali_revenue': by_payment_method['sarali'],
-        }
+        return StockReportService.build_report(user, period, include_stock=False)
     except Exception as e:
         logger.error(f"Erreur lors du calcul des statistiques du rapport: {str(e)}")
         return None
@@ -1436,329 +1164,9 @@ def calculate_stock_report_stats(user, period='today'):
 @login_required
 def stock_report(request):
     """Vue pour le rapport détaillé du stock."""
-    # 1. Gestion de la période
-    period = request.GET.get('period', 'today')
-    today = timezone.now()
-    
-    if period == 'week':
-        start_date = today - timedelta(days=today.weekday())
-        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'month':
-        start_date = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    else:  # today
-        start_date = today.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-    end_date = today
-
-    # 2. Filtrer les produits et transactions par site
-    user_site = request.user.site_configuration
-    if request.user.is_superuser:
-        products = Product.objects.select_related('category', 'brand').all()
-        transactions = Transaction.objects.all()
-    elif user_site:
-        from apps.subscription.services import SubscriptionService
-        products = SubscriptionService.get_products_queryset(user_site, exclude_excess=True)
-        transactions = Transaction.objects.filter(product__site_configuration=user_site)
-    else:
-        products = Product.objects.none()
-        transactions = Transaction.objects.none()
-
-    # 3. Filtrer les transactions sur la période
-    # Note: transaction_date est un DateTimeField
-    period_transactions = transactions.filter(transaction_date__range=[start_date, end_date])
-
-    # 4. Calculer les statistiques globales (état actuel)
-    total_products = products.count()
-    total_categories = products.values('category').distinct().count()
-    total_brands = products.values('brand').distinct().count()
-    total_value = sum(product.purchase_price * product.quantity for product in products)
-    low_stock = products.filter(quantity__lte=F('alert_threshold')).count()
-    out_of_stock = products.filter(quantity=0).count()
-
-    # 5. Calculer les ajustements (comme sur mobile)
-    # Filtrer pour ne garder que les ajustements d'inventaire
-    inventory_keywords = Q(notes__icontains='écart inventaire') | \
-                        Q(notes__icontains='ajustement inventaire') | \
-                        Q(notes__icontains='correction stock') | \
-                        Q(notes__icontains='inventaire')
-    
-    adjustments = period_transactions.filter(
-        Q(type='adjustment') | 
-        (Q(type__in=['in', 'out']) & inventory_keywords)
-    ).select_related('product')
-
-    # Séparer positifs et négatifs, en tenant compte des unités
-    positive_adjustments = []
-    negative_adjustments = []
-    
-    # Fonction pour déterminer si c'est une unité de poids
-    def is_weight_unit(unit):
-        return unit in ['kg', 'g']
-    
-    # Calculer les totaux positifs séparément par type d'unité
-    positive_by_unit = {}  # {'weight': {'total': X, 'unit': 'kg', 'count': N}, 'quantity': {...}}
-    negative_by_unit = {}
-    
-    total_pos_val = Decimal('0')
-    total_neg_val = Decimal('0')
-
-    for adj in adjustments:
-        qty = adj.quantity
-        val = adj.total_amount or Decimal('0')
-        
-        # Récupérer l'unité du produit
-        product = adj.product
-        unit = product.unit_display if product else 'unité(s)'
-        is_weight = is_weight_unit(unit)
-        key = 'weight' if is_weight else 'quantity'
-        
-        # Normaliser pour 'out'
-        if adj.type == 'out':
-            qty = -abs(qty) # Forcer négatif
-            val = abs(val) # Valeur toujours positive pour la somme
-        elif adj.type == 'in':
-            qty = abs(qty)
-            val = abs(val)
-        else: # adjustment
-            val = abs(val)
-
-        if qty > 0:
-            positive_adjustments.append(adj)
-            # Grouper par type d'unité
-            if key not in positive_by_unit:
-                positive_by_unit[key] = {'total': Decimal('0'), 'unit': unit, 'count': 0}
-            positive_by_unit[key]['total'] += qty
-            positive_by_unit[key]['count'] += 1
-            total_pos_val += val
-        elif qty < 0:
-            negative_adjustments.append(adj)
-            # Grouper par type d'unité
-            if key not in negative_by_unit:
-                negative_by_unit[key] = {'total': Decimal('0'), 'unit': unit, 'count': 0}
-            negative_by_unit[key]['total'] += abs(qty)
-            negative_by_unit[key]['count'] += 1
-            total_neg_val += val
-    
-    # 6. Calculer la démarque (Casse et Inconnue)
-    # Casse (type='loss')
-    loss_transactions = period_transactions.filter(type='loss').select_related('product')
-    
-    # Séparer la casse par type d'unité
-    loss_by_unit = {}
-    loss_val = Decimal('0')
-    for tx in loss_transactions:
-        product = tx.product
-        unit = product.unit_display if product else 'unité(s)'
-        is_weight = is_weight_unit(unit)
-        key = 'weight' if is_weight else 'quantity'
-        
-        if key not in loss_by_unit:
-            loss_by_unit[key] = {'total': Decimal('0'), 'unit': unit}
-        loss_by_unit[key]['total'] += tx.quantity
-        loss_val += tx.total_amount or Decimal('0')
-    
-    # Recalculer l'affichage des négatifs en incluant la casse
-    negative_display_by_unit = {
-        'weight': negative_by_unit.get('weight', {}).copy() if 'weight' in negative_by_unit else {},
-        'quantity': negative_by_unit.get('quantity', {}).copy() if 'quantity' in negative_by_unit else {}
-    }
-    # Ajouter la casse aux écarts négatifs pour l'affichage
-    for key, data in loss_by_unit.items():
-        if key not in negative_display_by_unit or not negative_display_by_unit[key]:
-            negative_display_by_unit[key] = {'total': Decimal('0'), 'unit': data.get('unit', 'unité(s)'), 'count': 0}
-        negative_display_by_unit[key]['total'] += abs(data.get('total', Decimal('0')))
-        if 'count' not in negative_display_by_unit[key]:
-            negative_display_by_unit[key]['count'] = 0
-    
-    # Calculer le nombre total de déclarations négatives (ajustements + casse)
-    total_neg_count = len(negative_adjustments) + loss_transactions.count()
-    # Calculer la valeur totale négative (ajustements + casse)
-    total_neg_val_with_loss = total_neg_val + loss_val
-    
-    has_positive_mixed = len(positive_by_unit) > 1
-    has_negative_mixed = len({k:v for k,v in negative_display_by_unit.items() if v and v.get('total', 0) > 0}) > 1
-    
-    positive_unit = positive_by_unit.get('quantity', {}).get('unit') or positive_by_unit.get('weight', {}).get('unit') or 'unité(s)'
-    negative_unit = negative_display_by_unit.get('quantity', {}).get('unit') or negative_display_by_unit.get('weight', {}).get('unit') or 'unité(s)'
-    
-    total_pos_qty = Decimal('0') if has_positive_mixed else (positive_by_unit.get('quantity', {}).get('total') or positive_by_unit.get('weight', {}).get('total') or Decimal('0'))
-    total_neg_qty = Decimal('0') if has_negative_mixed else (negative_display_by_unit.get('quantity', {}).get('total') or negative_display_by_unit.get('weight', {}).get('total') or Decimal('0'))
 
-    has_loss_mixed = len(loss_by_unit) > 1
-    loss_unit = loss_by_unit.get('quantity', {}).get('unit') or loss_by_unit.get('weight', {}).get('unit') or 'unité(s)'
-    loss_qty = Decimal('0') if has_loss_mixed else (loss_by_unit.get('quantity', {}).get('total') or loss_by_unit.get('weight', {}).get('total') or Decimal('0'))
-    
-    # Démarque inconnue (ajustements négatifs)
-    unknown_shrinkage_qty = total_neg_qty
-    unknown_shrinkage_val = total_neg_val
-    unknown_count = len(negative_adjustments)  # Nombre de transactions d'écarts négatifs
-
-    # 7. Top Produits (par valeur d'écart)
-    # Filtrer toutes les transactions pertinentes (ajustements + casse)
-    relevant_transactions = period_transactions.filter(
-        Q(type='adjustment') | 
-        Q(type='loss') |
-        (Q(type__in=['in', 'out']) & inventory_keywords)
-    ).select_related('product')
-    
-    product_stats = {}
-    for tx in relevant_transactions:
-        pid = tx.product_id
-        if pid not in product_stats:
-            product_stats[pid] = {
-                'product': tx.product,
-                'adjustments_count': 0,
-                'loss_count': 0,
-                'total_abs_qty': Decimal('0'),
-                'total_abs_val': Decimal('0'),
-                'net_qty': Decimal('0')
-            }
-        
-        qty = tx.quantity
-        val = tx.total_amount or Decimal('0')
-        
-        # Compter par type
-        if tx.type == 'loss':
-            product_stats[pid]['loss_count'] += 1
-            # La casse réduit le stock
-            product_stats[pid]['net_qty'] -= abs(qty)
-        else:
-            product_stats[pid]['adjustments_count'] += 1
-            # Pour les ajustements, normaliser selon le type
-            if tx.type == 'out':
-                qty = -abs(qty)
-            product_stats[pid]['net_qty'] += qty
-        
-        product_stats[pid]['total_abs_qty'] += abs(qty)
-        product_stats[pid]['total_abs_val'] += abs(val)
-
-    # Trier par valeur absolue décroissante
-    top_products = sorted(product_stats.values(), key=lambda x: x['total_abs_val'], reverse=True)[:10]
-
-    # 8. Calculer le bilan financier (comme dans le mobile)
-    from apps.sales.models import Sale
-    financial_sales = Sale.objects.filter(sale_date__range=[start_date, end_date])
-    if not request.user.is_superuser and user_site:
-        financial_sales = financial_sales.filter(site_configuration=user_site)
-    
-    # Calculer les revenus et marges
-    total_revenue = Decimal('0')
-    total_margin = Decimal('0')
-    by_payment_method = {
-        'cash': Decimal('0'),
-        'credit': Decimal('0'),
-        'sarali': Decimal('0'),
-        'card': Decimal('0'),
-        'mobile': Decimal('0'),
-        'transfer': Decimal('0'),
-    }
-    
-    for sale in financial_sales.filter(status='completed'):
-        total_revenue += sale.total_amount or Decimal('0')
-        # Calculer la marge totale de la vente
-        sale_margin = Decimal('0')
-        for item in sale.items.all():
-            if item.product:
-                margin_per_unit = (item.unit_price or Decimal('0')) - (item.product.purchase_price or Decimal('0'))
-                sale_margin += margin_per_unit * (item.quantity or Decimal('0'))
-        total_margin += sale_margin
-        
-        # Par mode de paiement
-        payment_method = sale.payment_method or 'cash'
-        if payment_method in by_payment_method:
-            by_payment_method[payment_method] += sale.total_amount or Decimal('0')
-    
-    # Coûts et pertes
-    total_losses = loss_val  # Casse
-    total_shrinkage = total_neg_val  # Démarque inconnue (ajustements négatifs uniquement, sans casse)
-    total_costs = total_losses + total_shrinkage
-    
-    # Résultat
-    gross_profit = total_margin  # Marge brute
-    net_profit = total_margin - total_costs  # Profit net = marge - pertes
-    profit_margin = (net_profit / total_revenue * 100) if total_revenue > 0 else Decimal('0')
-    average_margin_percentage = (total_margin / total_revenue * 100) if total_revenue > 0 else Decimal('0')
-    
-    # Ratio de rotation des stocks
-    stock_turnover_ratio = (total_revenue / total_value) if total_value > 0 else Decimal('0')
-    
-    # Taux de perte et démarque
-    loss_rate = (total_losses / total_value * 100) if total_value > 0 else Decimal('0')
-    shrinkage_rate = (total_shrinkage / total_value * 100) if total_value > 0 else Decimal('0')
-
-    context = {
-        'period': period,
-        'today': today,
-        # Stats globales
-        'total_products': total_products,
-        'total_categories': total_categories,
-        'total_brands': total_brands,
-        'total_value': total_value,
-        'low_stock': low_stock,
-        'out_of_stock': out_of_stock,
-        # Ajustements (inclut aussi la casse pour le total des mouvements)
-        'adjustments_count': adjustments.count() + loss_transactions.count(),
-        'pos_adj_count': len(positive_adjustments),
-        'neg_adj_count': total_neg_count,  # Ajustements négatifs + casse
-        'total_pos_qty': total_pos_qty,
-        'total_neg_qty': total_neg_qty,
-        'total_pos_val': total_pos_val,
-        'total_neg_val': total_neg_val_with_loss,  # Ajustements négatifs + casse
-        'has_positive_mixed': has_positive_mixed,
-        'has_negative_mixed': has_negative_mixed,
-        'positive_unit': positive_unit,
-        'negative_unit': negative_unit,
-        # Totaux séparés par type d'unité (incluant la casse pour les négatifs)
-        'positive_qty_weight': positive_by_unit.get('weight', {}).get('total', Decimal('0')),
-        'positive_qty_quantity': positive_by_unit.get('quantity', {}).get('total', Decimal('0')),
-        'positive_unit_weight': positive_by_unit.get('weight', {}).get('unit', 'kg'),
-        'positive_unit_quantity': positive_by_unit.get('quantity', {}).get('unit', 'unité(s)'),
-        'negative_qty_weight': negative_display_by_unit.get('weight', {}).get('total', Decimal('0')),
-        'negative_qty_quantity': negative_display_by_unit.get('quantity', {}).get('total', Decimal('0')),
-        'negative_unit_weight': negative_display_by_unit.get('weight', {}).get('unit', 'kg'),
-        'negative_unit_quantity': negative_display_by_unit.get('quantity', {}).get('unit', 'unité(s)'),
-        # Démarque
-        'loss_count': loss_transactions.count(),
-        'loss_qty': loss_qty,
-        'loss_val': loss_val,
-        'has_loss_mixed': has_loss_mixed,
-        'loss_unit': loss_unit,
-        'loss_qty_weight': loss_by_unit.get('weight', {}).get('total', Decimal('0')),
-        'loss_qty_quantity': loss_by_unit.get('quantity', {}).get('total', Decimal('0')),
-        'loss_unit_weight': loss_by_unit.get('weight', {}).get('unit', 'kg'),
-        'loss_unit_quantity': loss_by_unit.get('quantity', {}).get('unit', 'unité(s)'),
-        'unknown_qty': unknown_shrinkage_qty,
-        'unknown_val': unknown_shrinkage_val,
-        'unknown_count': unknown_count,
-        'has_unknown_mixed': has_negative_mixed,  # Même logique que négatif
-        'unknown_unit': negative_unit,
-        'unknown_qty_weight': negative_by_unit.get('weight', {}).get('total', Decimal('0')),
-        'unknown_qty_quantity': negative_by_unit.get('quantity', {}).get('total', Decimal('0')),
-        'unknown_unit_weight': negative_by_unit.get('weight', {}).get('unit', 'kg'),
-        'unknown_unit_quantity': negative_by_unit.get('quantity', {}).get('unit', 'unité(s)'),
-        # Top produits
-        'top_products': top_products,
-        # Bilan financier
-        'total_revenue': total_revenue,
-        'total_margin': total_margin,
-        'average_margin_percentage': average_margin_percentage,
-        'total_losses': total_losses,
-        'total_shrinkage': total_shrinkage,
-        'total_costs': total_costs,
-        'gross_profit': gross_profit,
-        'net_profit': net_profit,
-        'profit_margin': profit_margin,
-        'stock_turnover_ratio': stock_turnover_ratio,
-        'loss_rate': loss_rate,
-        'shrinkage_rate': shrinkage_rate,
-        'cash_revenue': by_payment_method['cash'],
-        'credit_revenue': by_payment_method['credit'],
-        'sarali_revenue': by_payment_method['sarali'],
-        'card_revenue': by_payment_method['card'],
-        'mobile_revenue': by_payment_method['mobile'],
-        'transfer_revenue': by_payment_method['transfer'],
-    }
-    
+    # Agrégats conditionnels en base : nombre de requêtes fixe quelle que soit la période
+    context = StockReportService.build_report(request.user, request.GET.get('period', 'today'))
     return render(request, 'inventory/stock_report.html', context)
 
 @login_required
@@ -1780,35 +1188,16 @@ def stock_valuation(request):
             from apps.subscription.services import SubscriptionService
             products = SubscriptionService.get_products_queryset(user_site, exclude_excess=True)
     
-    # Calculer la valeur par catégorie
-    category_values = {}
-    for product in products:
-        category = product.category.name if product.category else "Non catégorisé"
-        value = product.purchase_price * product.quantity
-        if category in category_values:
-            category_values[category] += value
-        else:
-            category_values[category] = value
-    
-    # Calculer la valeur par marque
-    brand_values = {}
-    for product in products:
-        brand = product.brand.name if product.brand else "Non spécifié"
-        value = product.purchase_price * product.quantity
-        if brand in brand_values:
-            brand_values[brand] += value
-        else:
-            brand_values[brand] = value
-    
-    # Trier les valeurs
-    category_values = dict(sorted(category_values.items(), key=lambda x: x[1], reverse=True))
-    brand_values = dict(sorted(brand_values.items(), key=lambda x: x[1], reverse=True))
+    # Totaux par catégorie et par marque agrégés en base (triés par valeur décroissante)
+    valuation = StockValuationService.build_valuation(request.user)
+    category_values = {group['name']: group['value'] for group in valuation['groups']['category']}
+    brand_values = {group['name']: group['value'] for group in valuation['groups']['brand']}
     
     context = {
         'products': products,
         'category_values': category_values,
         'brand_values': brand_values,
-        'total_value': sum(category_values.values()),
+        'total_value': valuation['total']['value'],
     }
     
     return render(request, 'inventory/stock_valuation.html', context) 
@@ -2576,7 +1965,7 @@ class ProductCopyView(LoginRequiredMixin, View):
             return redirect('inventory:product_list')
         
         # Récupérer les produits du site principal (première configuration)
-        main_site = Configuration.objects.first()
+        main_site = default_site()
         
         if not main_site or main_site == current_site:
             messages.error(request, "Aucun site principal disponible pour la copie.")
@@ -2635,7 +2024,7 @@ class ProductCopyView(LoginRequiredMixin, View):
             return redirect('inventory:product_copy')
         
         current_site = request.user.site_configuration
-        main_site = Configuration.objects.first()
+        main_site = default_site()
         
         if not current_site or not main_site:
             messages.error(request, "Configuration de site invalide.")
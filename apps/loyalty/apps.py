@@ -6,3 +6,6 @@ class LoyaltyConfig(AppConfig):
     name = 'apps.loyalty'
     verbose_name = 'Fidélité'
 
+    def ready(self):
+        import apps.loyalty.signals  # noqa
+
@@ -13,6 +13,16 @@ class LoyaltyService:
     
     @staticmethod
     def get_program(site_configuration):
+        """
+        Programme de fidélité du site, lu dans le cache partagé du site (apps.core.site_context)
+        """
+        if not site_configuration:
+            return LoyaltyService.load_program(site_configuration)
+        from apps.core.site_context import loyalty_program
+        return loyalty_program(site_configuration)
+    
+    @staticmethod
+    def load_program(site_configuration):
         """
         Récupère le programme de fidélité pour un site donné
         Crée un programme par défaut si aucun n'existe
@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core.site_context import invalidate_site
+from .models import LoyaltyProgram
+
+
+@receiver(post_save, sender=LoyaltyProgram)
+@receiver(post_delete, sender=LoyaltyProgram)
+def invalidate_loyalty_program(sender, instance, raw=False, **kwargs):
+    """
+    Programme modifié : le programme en cache du site (apps.core.site_context) est relu
+    """
+    if not raw and instance.site_configuration_id:
+        site_id = instance.site_configuration_id
+        transaction.on_commit(lambda: invalidate_site(site_id))
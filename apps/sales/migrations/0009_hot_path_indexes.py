@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0008_convert_saleitem_quantity_to_decimal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='credittransaction',
+            index=models.Index(fields=['site_configuration', '-transaction_date'], name='sales_credit_site_date'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['site_configuration', '-sale_date'], name='sales_sale_site_date'),
+        ),
+    ]
@@ -283,6 +283,7 @@ class Sale(models.Model):
         verbose_name = "Vente"
         verbose_name_plural = "Ventes"
         ordering = ['-sale_date']
+        indexes = [models.Index(fields=['site_configuration', '-sale_date'], name='sales_sale_site_date')]
 
 class SaleItem(models.Model):
     sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name='items')
@@ -419,6 +420,7 @@ class CreditTransaction(models.Model):
         verbose_name = "Transaction crédit"
         verbose_name_plural = "Transactions crédit"
         ordering = ['-transaction_date']
+        indexes = [models.Index(fields=['site_configuration', '-transaction_date'], name='sales_credit_site_date')]
 
 
 class Payment(models.Model):
@@ -122,7 +122,7 @@ class CreditService:
         """
         queryset = CreditTransaction.objects.filter(
             customer=customer
-        ).select_related('sale', 'user').order_by('-transaction_date')
+        ).select_related('sale', 'user', 'customer__site_configuration').order_by('-transaction_date')
         
         if limit:
             queryset = queryset[:limit]
@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import Sale
+from apps.inventory.services.rollups import RollupService
+from .models import Sale, SaleItem
 
 
 @receiver(post_save, sender=Sale)
@@ -74,3 +75,55 @@ def generate_sale_reference(sender, instance, created, **kwargs):
         # S'assurer que l'instance est à jour en mémoire
         instance.refresh_from_db()
 
+
+@receiver(pre_save, sender=Sale)
+def remember_sale_rollup_state(sender, instance, raw=False, **kwargs):
+    """État enregistré de la vente, pour l'écart appliqué aux agrégats après la sauvegarde"""
+    if not raw:
+        instance._rollup_previous = RollupService.previous_state(instance, RollupService.sale_state, Sale.objects)
+
+
+@receiver(post_save, sender=Sale)
+def update_rollups_on_sale(sender, instance, created, raw=False, **kwargs):
+    """
+    Applique aux agrégats journaliers l'écart de la vente, dans la même transaction
+    (seules les ventes terminées comptent : brouillons et ventes annulées en sortent)
+    """
+    if raw:
+        return
+    RollupService.record_sale(instance, getattr(instance, '_rollup_previous', None), created=created)
+
+
+@receiver(pre_delete, sender=Sale)
+def update_rollups_on_sale_delete(sender, instance, **kwargs):
+    """Suppression d'une vente : sa part est retirée, celle des lignes l'est à leur suppression"""
+    previous = RollupService.previous_state(instance, RollupService.sale_state, Sale.objects)
+    RollupService.record_sale(instance, previous, deleted=True)
+
+
+@receiver(pre_save, sender=SaleItem)
+def remember_sale_item_rollup_state(sender, instance, raw=False, **kwargs):
+    """État enregistré de la ligne de vente"""
+    if not raw:
+        instance._rollup_previous = RollupService.previous_state(
+            instance, RollupService.item_state, SaleItem.objects.select_related('product')
+        )
+
+
+def _stored_sale_state(item):
+    sale = item.sale if SaleItem.sale.is_cached(item) else None
+    return RollupService.stored_sale_state(item.sale_id, sale)
+
+
+@receiver(post_save, sender=SaleItem)
+def update_rollups_on_sale_item(sender, instance, raw=False, **kwargs):
+    """Ligne ajoutée ou modifiée dans une vente terminée : écart de la ligne"""
+    if raw:
+        return
+    RollupService.record_sale_item(instance, _stored_sale_state(instance), getattr(instance, '_rollup_previous', None))
+
+
+@receiver(post_delete, sender=SaleItem)
+def update_rollups_on_sale_item_delete(sender, instance, **kwargs):
+    """Article retiré d'une vente (ou vente supprimée : elle existe encore en base à ce moment)"""
+    RollupService.record_sale_item(instance, _stored_sale_state(instance), deleted=True)
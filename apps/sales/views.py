@@ -14,6 +14,9 @@ from apps.inventory.models import Product, Barcode
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.contrib import messages
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class SaleListView(SiteFilterMixin, ListView):
@@ -284,10 +287,6 @@ def cash_register_scanner(request):
     if request.method == 'POST':
         search_query = request.POST.get('search', '').strip()
         if search_query:
-            print(f"\n🔍 RECHERCHE DEMANDÉE: '{search_query}'")
-            print(f"👤 Utilisateur: {request.user.username}")
-            print(f"🏢 Site: {request.user.site_configuration.site_name if request.user.site_configuration else 'Aucun'}")
-            
             # Rechercher le produit
             product = find_product_by_barcode(search_query, request.user)
             
@@ -302,10 +301,7 @@ def cash_register_scanner(request):
                 elif product.barcodes.filter(ean=search_query).exists():
                     search_type = "code-barres EAN"
                 
-                print(f"✅ PRODUIT TROUVÉ par recherche '{search_type}': {product.name}")
-                print(f"   CUG: {product.cug}")
-                print(f"   Stock: {product.quantity}")
-                print(f"   Codes-barres: {product.barcodes.count()}")
+                logger.debug("✅ [CAISSE] %r trouvé par %s: produit %s", search_query, search_type, product.id)
                 
                 return JsonResponse({
                     'success': True,
@@ -327,11 +323,9 @@ def cash_register_scanner(request):
                     }
                 })
             else:
-                print(f"❌ AUCUN PRODUIT TROUVÉ pour: '{search_query}'")
-                
                 # Fournir des suggestions utiles
                 suggestions = get_search_suggestions(search_query, request.user)
-                print(f"💡 Suggestions générées: {len(suggestions)}")
+                logger.debug("❌ [CAISSE] Aucun produit pour %r (%s suggestions)", search_query, len(suggestions))
                 
                 return JsonResponse({
                     'success': False,
@@ -420,41 +414,30 @@ def find_product_by_barcode(search_query, user):
     user_site = getattr(user, 'site_configuration', None)
     
     if not user_site:
-        print(f"❌ Utilisateur {user.username} n'a pas de site configuré")
+        logger.warning("❌ [CAISSE] Utilisateur %s sans site configuré", user.username)
         return None
     
-    print(f"🔍 Recherche pour '{search_query}' dans le site: {user_site.site_name}")
-    
     # Utiliser la fonction utilitaire (inclut les produits excédentaires pour la caisse)
     from apps.subscription.services import SubscriptionService
     queryset = SubscriptionService.get_products_queryset(user_site, exclude_excess=False)
     
     # 1. Recherche par CUG (exacte) - PRIORITÉ ÉLEVÉE
     if search_query.isdigit():
-        print(f"🔍 Recherche par CUG: {search_query}")
         product = queryset.filter(cug=search_query).first()
         if product:
-            print(f"✅ Produit trouvé par CUG: {product.name}")
+            logger.debug("✅ [CAISSE] Produit %s trouvé par CUG %r", product.id, search_query)
             return product
-        else:
-            print(f"❌ Aucun produit trouvé avec le CUG: {search_query}")
     
     # 2. Recherche par EAN dans le modèle Barcode lié
-    print(f"🔍 Recherche par EAN: {search_query}")
     product = queryset.filter(barcodes__ean=search_query).first()
     if product:
-        print(f"✅ Produit trouvé par EAN: {product.name}")
+        logger.debug("✅ [CAISSE] Produit %s trouvé par EAN %r", product.id, search_query)
         return product
-    else:
-        print(f"❌ Aucun produit trouvé avec l'EAN: {search_query}")
     
     # 3. Recherche par nom (exacte d'abord, puis contient)
-    print(f"🔍 Recherche par nom: {search_query}")
-    
-    # Recherche exacte d'abord
     product = queryset.filter(name__iexact=search_query).first()
     if product:
-        print(f"✅ Produit trouvé par nom exact: {product.name}")
+        logger.debug("✅ [CAISSE] Produit %s trouvé par nom exact %r", product.id, search_query)
         return product
     
     # Recherche par nom contient
@@ -462,23 +445,18 @@ def find_product_by_barcode(search_query, user):
         name__icontains=search_query
     ).first()
     if product:
-        print(f"✅ Produit trouvé par nom contient: {product.name}")
+        logger.debug("✅ [CAISSE] Produit %s trouvé par nom contenant %r", product.id, search_query)
         return product
     
-    print(f"❌ Aucun produit trouvé avec le nom: {search_query}")
-    
     # 4. Recherche par CUG (contient) - pour les cas où l'utilisateur saisit partiellement
     if len(search_query) >= 3:
-        print(f"🔍 Recherche par CUG contient: {search_query}")
         product = Product.objects.filter(
             site_configuration=user_site,
             cug__icontains=search_query
         ).first()
         if product:
-            print(f"✅ Produit trouvé par CUG contient: {product.name}")
+            logger.debug("✅ [CAISSE] Produit %s trouvé par CUG contenant %r", product.id, search_query)
             return product
-        else:
-            print(f"❌ Aucun produit trouvé avec le CUG contient: {search_query}")
     
-    print(f"❌ Aucun produit trouvé pour la recherche: {search_query}")
+    logger.debug("❌ [CAISSE] Aucun produit pour la recherche %r (site %s)", search_query, user_site.id)
     return None 
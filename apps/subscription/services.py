@@ -13,6 +13,16 @@ class SubscriptionService:
     
     @staticmethod
     def get_site_plan(site_configuration):
+        """
+        Plan d'abonnement actif du site, lu dans le cache partagé du site (apps.core.site_context)
+        """
+        if not site_configuration:
+            return None
+        from apps.core.site_context import site_plan
+        return site_plan(site_configuration)
+    
+    @staticmethod
+    def load_site_plan(site_configuration):
         """
         Récupère le plan d'abonnement actif d'un site
         
@@ -265,11 +275,16 @@ class SubscriptionService:
             site_configuration=site_configuration
         )
         
-        # Exclure les produits excédentaires si demandé (pour les listes)
+        # Exclure les produits excédentaires si demandé (pour les listes) : seuls les
+        # max_products plus récents sont gardés, en sous-requête (aucune requête de plus,
+        # quel que soit le nombre de produits du site)
         if exclude_excess:
-            excess_product_ids = SubscriptionService.get_excess_product_ids(site_configuration)
-            if excess_product_ids:
-                queryset = queryset.exclude(id__in=excess_product_ids)
+            plan = SubscriptionService.get_site_plan(site_configuration)
+            if plan and plan.max_products is not None:
+                kept = Product.objects.filter(
+                    site_configuration=site_configuration
+                ).order_by('-created_at', '-id').values('id')[:plan.max_products]
+                queryset = queryset.filter(id__in=kept)
         
         return queryset
     
@@ -300,7 +315,7 @@ class SubscriptionService:
         excess_count = current_count - plan.max_products
         excess_products = Product.objects.filter(
             site_configuration=site_configuration
-        ).order_by('created_at')[:excess_count].values_list('id', flat=True)
+        ).order_by('created_at', 'id')[:excess_count].values_list('id', flat=True)
         
         return list(excess_products)
     
@@ -341,7 +356,7 @@ class SubscriptionService:
         if not plan:
             return None
         
-        limits = site_configuration.get_plan_limits()
+        limits = site_configuration.get_plan_limits(plan)
         product_info = SubscriptionService.check_product_limit(site_configuration)
         
         # Vérifier l'accès aux fonctionnalités
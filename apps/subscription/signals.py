@@ -1,8 +1,11 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from apps.core.models import Configuration
-from .models import UsageLimit
+from apps.core.services import UserInfoService
+from apps.core.site_context import invalidate_site
+from .models import Plan, Subscription, UsageLimit
 
 
 @receiver(post_save, sender=Configuration)
@@ -22,3 +25,25 @@ def ensure_usage_limit(sender, instance, **kwargs):
     if not hasattr(instance, 'usage_limit'):
         UsageLimit.objects.get_or_create(site=instance)
 
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_subscription_users(sender, instance, raw=False, **kwargs):
+    """
+    Abonnement modifié : informations des utilisateurs et contexte du site en cache
+    """
+    if not raw:
+        UserInfoService.invalidate_site_users_cache(instance.site_id)
+        site_id = instance.site_id
+        transaction.on_commit(lambda: invalidate_site(site_id))
+
+
+@receiver(post_save, sender=Plan)
+@receiver(post_delete, sender=Plan)
+def invalidate_plan_users(sender, instance, raw=False, **kwargs):
+    """
+    Plan modifié ou supprimé : tous les contextes de site en cache (plan partagé entre sites)
+    """
+    if not raw:
+        transaction.on_commit(lambda: invalidate_site(None))
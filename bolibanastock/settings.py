@@ -59,15 +59,20 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.core.middlewares.RequestIdMiddleware',  # Identifiant de requête (X-Request-ID) dans les journaux
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.core.middlewares.RequestMetricsMiddleware',  # Durée, requêtes SQL et taille par route
+    'apps.core.middlewares.PathAwareSessionMiddleware',  # Pas de session pour l'API authentifiée par jeton
     'corsheaders.middleware.CorsMiddleware',  # CORS pour l'API mobile
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.core.middlewares.SiteContextMiddleware',  # Site, plan et réglages résolus une fois par requête
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+if DEBUG:
+    MIDDLEWARE.append('apps.core.middlewares.QueryPatternMiddleware')  # Détection des requêtes N+1
 
 ROOT_URLCONF = 'bolibanastock.urls'
 
@@ -215,6 +220,21 @@ APP_NAME = os.getenv('APP_NAME', 'BoliBana Stock')
 APP_ENV = os.getenv('APP_ENV', 'development')
 APP_URL = os.getenv('APP_URL', 'http://localhost:8000')
 
+# Métriques des requêtes (RequestMetricsMiddleware, export Prometheus sur /metrics/)
+METRICS_DIR = os.getenv('METRICS_DIR', '')  # Répertoire partagé par les workers (temporaire par défaut)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # Jeton du collecteur Prometheus
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))  # Secondes entre deux écritures
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 1000))  # 0 désactive le journal des requêtes lentes
+SLOW_REQUEST_TOP_QUERIES = int(os.getenv('SLOW_REQUEST_TOP_QUERIES', 5))
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 100))  # Appelant relevé pour les requêtes SQL d'au moins ce temps
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 5))  # Répétitions d'une même requête signalées
+
+# Cache partagé (apps.core.cache) : redis://…, file:///chemin ou locmem:// (mémoire du processus)
+# Seul Redis propage les invalidations à toutes les instances (file/locmem : une seule instance)
+from apps.core.cache import cache_settings  # noqa: E402
+
+CACHES = cache_settings(os.getenv('CACHE_URL', os.getenv('REDIS_URL', 'locmem://')))
+
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "tailwind"
 CRISPY_TEMPLATE_PACK = "tailwind"
@@ -225,13 +245,17 @@ LOGIN_URL = '/core/login/'
 LOGOUT_REDIRECT_URL = '/core/login/'
 
 # Session settings
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Sessions du site web lues depuis le cache partagé (CACHES), la base restant la référence
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+SESSIONLESS_PATHS = ('/api/',)  # Ni lecture ni écriture de session pour les requêtes avec jeton
 SESSION_COOKIE_AGE = 43200  # 12 heures (au lieu de 2 semaines)
 SESSION_COOKIE_NAME = 'sessionid'
 SESSION_COOKIE_SECURE = False  # Mettre True en production avec HTTPS
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
-SESSION_SAVE_EVERY_REQUEST = True
+# Expiration glissante réservée au site web (PathAwareSessionMiddleware) : pas de
+# SESSION_SAVE_EVERY_REQUEST global, qui réécrirait la session à chaque appel d'API
+SESSION_SAVE_EVERY_WEB_REQUEST = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
 # Test runner configuration
@@ -240,7 +264,7 @@ TEST_RUNNER = 'apps.inventory.tests.test_runner.CustomTestRunner'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CustomJWTAuthentication',  # Utilisateur du jeton lu dans le cache partagé
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -368,24 +392,15 @@ FILE_UPLOAD_DIRECTORY_PERMISSIONS = 0o755
 if not DEBUG:
     # En production, rediriger les erreurs 404 vers une page personnalisée
     HANDLER404 = 'bolibanastock.views.custom_404'
-    # Logging pour Railway
-    LOGGING = {
-        'version': 1,
-        'disable_existing_loggers': False,
-        'handlers': {
-            'console': {
-                'class': 'logging.StreamHandler',
-            },
-        },
-        'root': {
-            'handlers': ['console'],
-            'level': 'INFO',
-        },
-        'loggers': {
-            'django': {
-                'handlers': ['console'],
-                'level': 'INFO',
-                'propagate': False,
-            },
-        },
-    }
+
+# Journalisation structurée (apps.core.log) : identifiant de requête, échantillonnage DEBUG,
+# écriture hors du thread de la requête. LOG_LEVELS='api.views=DEBUG' pour déboguer un module.
+from apps.core.log import logging_config, parse_levels, parse_sampling  # noqa: E402
+
+LOGGING = logging_config(
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    levels=parse_levels(os.getenv('LOG_LEVELS', '')),
+    json_format=os.getenv('LOG_FORMAT', 'text' if DEBUG else 'json') == 'json',
+    asynchronous=os.getenv('LOG_ASYNC', 'True') == 'True',
+    sampling=parse_sampling(os.getenv('LOG_SAMPLING', 'api=100,apps.sales.views=100')),
+)
@@ -95,14 +95,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.core.middlewares.RequestIdMiddleware',  # Identifiant de requête (X-Request-ID) dans les journaux
     'django.middleware.security.SecurityMiddleware',
+    'apps.core.middlewares.RequestMetricsMiddleware',  # Durée, requêtes SQL et taille par route
     'bolibanastock.middleware.TailwindCSSMiddleware',  # Servir output.css directement si nécessaire
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Gestion des fichiers statiques
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.core.middlewares.PathAwareSessionMiddleware',  # Pas de session pour l'API authentifiée par jeton
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.core.middlewares.SiteContextMiddleware',  # Site, plan et réglages résolus une fois par requête
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -504,7 +507,7 @@ for host in ALLOWED_HOSTS:
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CustomJWTAuthentication',  # Utilisateur du jeton lu dans le cache partagé
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -520,44 +523,17 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),  # 30 jours - permet de récupérer un nouvel access token
 }
 
-# Logging
-LOGGING = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
-            'style': '{',
-        },
-    },
-    'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
-        },
-    },
-    'root': {
-        'handlers': ['console'],
-        'level': 'INFO',
-    },
-    'loggers': {
-        'django': {
-            'handlers': ['console'],
-            'level': 'INFO',
-            'propagate': False,
-        },
-        'django.request': {
-            'handlers': ['console'],
-            'level': 'ERROR',
-            'propagate': False,
-        },
-        'django.db.backends': {
-            'handlers': ['console'],
-            'level': 'ERROR',
-            'propagate': False,
-        },
-    },
-}
+# Journalisation structurée (apps.core.log) : identifiant de requête, échantillonnage DEBUG,
+# écriture hors du thread de la requête. LOG_LEVELS='api.views=DEBUG' pour déboguer un module.
+from apps.core.log import logging_config, parse_levels, parse_sampling  # noqa: E402
+
+LOGGING = logging_config(
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    levels=parse_levels(os.getenv('LOG_LEVELS', '')),
+    json_format=os.getenv('LOG_FORMAT', 'json') == 'json',
+    asynchronous=os.getenv('LOG_ASYNC', 'True') == 'True',
+    sampling=parse_sampling(os.getenv('LOG_SAMPLING', 'api=100,apps.sales.views=100')),
+)
 
 # Security settings pour la production
 SECURE_BROWSER_XSS_FILTER = True
@@ -571,6 +547,11 @@ SECURE_HSTS_PRELOAD = True
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True
 SESSION_COOKIE_DOMAIN = None  # Laissez Railway gérer le domaine
+# Sessions du site web en cache uniquement si celui-ci est partagé entre les instances (Redis) :
+# une déconnexion doit invalider la session sur toutes les instances
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db' if os.getenv(
+    'CACHE_URL', os.getenv('REDIS_URL', '')).startswith(('redis://', 'rediss://')) else 'django.contrib.sessions.backends.db')
+SESSIONLESS_PATHS = ('/api/',)  # Ni lecture ni écriture de session pour les requêtes avec jeton
 
 # Email configuration pour Railway
 # Support pour SendGrid Web API (recommandé) ou Gmail SMTP
@@ -603,3 +584,18 @@ else:
     EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
     EMAIL_TIMEOUT = 10
     print("📧 Configuration Gmail activée pour l'envoi d'emails (⚠️ peut ne pas fonctionner sur Railway)")
+
+# Métriques des requêtes (RequestMetricsMiddleware, export Prometheus sur /metrics/)
+METRICS_DIR = os.getenv('METRICS_DIR', '')  # Répertoire partagé par les workers (temporaire par défaut)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # Jeton du collecteur Prometheus
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))  # Secondes entre deux écritures
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 1000))  # 0 désactive le journal des requêtes lentes
+SLOW_REQUEST_TOP_QUERIES = int(os.getenv('SLOW_REQUEST_TOP_QUERIES', 5))
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 100))  # Appelant relevé pour les requêtes SQL d'au moins ce temps
+
+# Cache partagé (apps.core.cache) : Redis si REDIS_URL est fourni, sinon mémoire du processus.
+# L'invalidation entre instances (déconnexion, site ou plan modifié) n'atteint toutes les
+# instances qu'avec Redis : sans lui, chaque conteneur sert son cache jusqu'à expiration.
+from apps.core.cache import cache_settings  # noqa: E402
+
+CACHES = cache_settings(os.getenv('CACHE_URL', os.getenv('REDIS_URL', 'locmem://')))
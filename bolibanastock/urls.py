@@ -39,6 +39,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     # Health check en premier pour éviter les erreurs
     path('health/', views.health_check, name='health_check'),
+    path('metrics/', views.metrics, name='metrics'),
     # Page d'accueil principale (remplace /home/)
     path('', home_view, name='home'),
     # Alias pour compatibilité avec les anciennes références
@@ -6,6 +6,24 @@ def health_check(request):
     """Vue ultra-simple pour le healthcheck Railway"""
     return HttpResponse("OK", status=200)
 
+def metrics(request):
+    """
+    Métriques des requêtes au format Prometheus : réservé au personnel connecté ou au
+    collecteur muni du jeton METRICS_TOKEN (en-tête Authorization: Bearer <jeton>)
+    """
+    import hmac
+    from django.conf import settings
+    from apps.core.metrics import render_prometheus
+
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if token and header.startswith('Bearer '):
+        authorized = authorized or hmac.compare_digest(header[len('Bearer '):], token)
+    if not authorized:
+        return HttpResponse("Accès refusé", status=403)
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 def simple_home(request):
     """Page d'accueil simplifiée pour Railway qui ne dépend pas des modèles"""
     # Essayer d'importer et utiliser HomeView si possible
@@ -5,6 +5,7 @@ from apps.inventory.models import Product, Category, Transaction
 from apps.sales.models import Sale
 from apps.core.models import Configuration
 from apps.core.utils import get_configuration
+from apps.inventory.services.rollups import RollupService
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse
 from datetime import datetime, timedelta
@@ -76,12 +77,12 @@ class HomeView(LoginRequiredMixin, TemplateView):
                 context['total_value'] = 0
                 context['value_error'] = str(e)
             
-            # Ventes du jour avec une seule requête
+            # Ventes du jour lues dans les agrégats journaliers (ventes terminées)
             try:
-                today = timezone.now().date()
-                today_sales = sales.filter(sale_date__date=today)
-                context['today_sales'] = today_sales.count()
-                context['revenue'] = today_sales.aggregate(total=Sum('total_amount'))['total'] or 0
+                today = timezone.localdate()
+                today_sales = RollupService.get_sales_summary(self.request.user, today, today)
+                context['today_sales'] = today_sales['sales_count']
+                context['revenue'] = today_sales['total_revenue']
             except Exception as e:
                 context['today_sales'] = 0
                 context['revenue'] = 0